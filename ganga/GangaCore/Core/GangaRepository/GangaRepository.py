@@ -168,6 +168,13 @@ class GangaRepository(object):
         Returns True on success, False on error."""
         return False
 
+    def getLoadedIds(self):
+        """getLoadedIds() --> list
+        Returns the ids of the objects which are fully loaded into memory.
+        Repositories which do not load lazily can keep this default, which reports every object as loaded.
+        """
+        return list(self.objects.keys())
+
     # Internal helper functions for derived classes
     def _make_empty_object_(self, this_id, category, classname):
         """Internal helper: adds an empty GangaObject of the given class to the repository.
@@ -32,11 +32,17 @@ from GangaCore.Core.GangaRepository.SubJobXMLList import SubJobXMLList
 from GangaCore.GPIDev.Base.Proxy import isType, stripProxy, getName
 
 from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.Metrics import metrics
 
 logger = GangaCore.Utility.logging.getLogger()
 
 save_all_history = False
 
+flush_timer = metrics.timer('repository_flush_seconds', 'Time to write a set of objects of a local repository to disk')
+load_timer = metrics.timer('repository_load_seconds', 'Time to read a set of objects of a local repository from disk')
+flushed_objects = metrics.counter('repository_flushed_objects_total', 'Objects written to disk by the local repositories')
+loaded_objects = metrics.counter('repository_loaded_objects_total', 'Objects read from disk by the local repositories')
+
 def check_app_hash(obj):
     """Writes a file safely, raises IOError on error
     Args:
@@ -87,12 +93,11 @@ def safe_save(fn, _obj, to_file, ignore_subs=''):
         ignore_subs (str): This is the name(s) of the attribute of _obj we want to ignore in writing to disk
     """
 
-    # Add a global lock to make absolutely sure we don't have multiple threads writing files
-    # See Github Issue 185
-    with safe_save.lock:
+    # Make absolutely sure we don't have multiple threads writing the same file (see Github Issue 185)
+    # whilst letting writes of different objects go ahead in parallel
+    with _getFileLock(fn):
 
         obj = stripProxy(_obj)
-        check_app_hash(obj)
 
         # Create the dirs
         dirname = os.path.dirname(fn)
@@ -113,8 +118,17 @@ def safe_save(fn, _obj, to_file, ignore_subs=''):
 
             os.rename(new_name, fn)
 
-# Global lock for above function - See issue #185
-safe_save.lock = threading.Lock()
+# Striped locks for the above function, a file always maps to the same lock - See issue #185
+_file_locks = [threading.Lock() for _ in range(64)]
+
+
+def _getFileLock(fn):
+    """
+    Returns the lock guarding writes to the file fn
+    Args:
+        fn (str): name of the file being written
+    """
+    return _file_locks[hash(fn) % len(_file_locks)]
 
 def rmrf(name, count=0):
     """
@@ -208,6 +222,8 @@ class GangaRepositoryLocal(GangaRepository):
         self._cache_load_timestamp = {}
         self.printed_explanation = False
         self._fully_loaded = {}
+        # Guards the caches and the dict of loaded objects, which several writer threads update at once
+        self._cache_lock = threading.RLock()
 
     def startup(self):
         """ Starts a repository and reads in a directory structure.
@@ -260,7 +276,9 @@ class GangaRepositoryLocal(GangaRepository):
         from GangaCore.Utility.logging import getLogger
         logger = getLogger()
         logger.debug("Shutting Down GangaRepositoryLocal: %s" % self.registry.name)
-        for k in self._fully_loaded:
+        with self._cache_lock:
+            loaded_ids = list(self._fully_loaded.keys())
+        for k in loaded_ids:
             try:
                 self.index_write(k, True)
             except Exception as err:
@@ -328,15 +346,18 @@ class GangaRepositoryLocal(GangaRepository):
                 this_data[k] = v
             #obj.setNodeData(this_data)
             obj._index_cache = cache
-            self._cache_load_timestamp[this_id] = fn_ctime
-            self._cached_cat[this_id] = cat
-            self._cached_cls[this_id] = cls
-            self._cached_obj[this_id] = cache
+            with self._cache_lock:
+                self._cache_load_timestamp[this_id] = fn_ctime
+                self._cached_cat[this_id] = cat
+                self._cached_cls[this_id] = cls
+                self._cached_obj[this_id] = cache
+            self.registry._markChanged([this_id])
             return True
         elif this_id not in self.objects:
             self.objects[this_id] = self._make_empty_object_(this_id, self._cached_cat[this_id], self._cached_cls[this_id])
             self.objects[this_id]._index_cache = self._cached_obj[this_id]
             setattr(self.objects[this_id], '_registry_refresh', True)
+            self.registry._markChanged([this_id])
             return True
         else:
             logger.debug("Doubly loading of object with ID: %s" % this_id)
@@ -362,9 +383,9 @@ class GangaRepositoryLocal(GangaRepository):
                     new_index = (obj._category, getName(obj), new_cache)
                     logger.debug("Writing: %s" % str(new_index))
                     pickle_to_file(new_index, this_file)
-                self._cached_obj[this_id] = new_cache
                 obj._index_cache = {}
-            self._cached_obj[this_id] = new_idx_cache
+            with self._cache_lock:
+                self._cached_obj[this_id] = new_idx_cache
         except IOError as err:
             logger.error("Index saving to '%s' failed: %s %s" % (ifn, getName(err), err))
 
@@ -414,10 +435,11 @@ class GangaRepositoryLocal(GangaRepository):
                 for this_cache in this_master_cache:
                     if this_cache[1] >= 0:
                         this_id = this_cache[0]
-                        self._cache_load_timestamp[this_id] = this_cache[1]
-                        self._cached_cat[this_id] = this_cache[2]
-                        self._cached_cls[this_id] = this_cache[3]
-                        self._cached_obj[this_id] = this_cache[4]
+                        with self._cache_lock:
+                            self._cache_load_timestamp[this_id] = this_cache[1]
+                            self._cached_cat[this_id] = this_cache[2]
+                            self._cached_cls[this_id] = this_cache[3]
+                            self._cached_obj[this_id] = this_cache[4]
             else:
                 logger.debug("Not Reading Master Index")
         except Exception as err:
@@ -432,14 +454,11 @@ class GangaRepositoryLocal(GangaRepository):
         """
         clear the master cache(s) which have been stored in memory
         """
-        for k, v in self._cache_load_timestamp.items():
-            self._cache_load_timestamp.pop(k)
-        for k, v in self._cached_cat.items():
-            self._cached_cat.pop(k)
-        for k, v in self._cached_cls.items():
-            self._cached_cls.pop(k)
-        for k, v in self._cached_obj.items():
-            self._cached_obj.pop(k)
+        with self._cache_lock:
+            self._cache_load_timestamp.clear()
+            self._cached_cat.clear()
+            self._cached_cls.clear()
+            self._cached_obj.clear()
 
     def _write_master_cache(self, shutdown=False):
         """
@@ -454,12 +473,14 @@ class GangaRepositoryLocal(GangaRepository):
                 if abs(self._master_index_timestamp - os.stat(_master_idx).st_ctime) < 300:
                     return
 
-            items_to_save = iter(self.objects.items())
+            items_to_save = list(self.objects.items())
+            with self._cache_lock:
+                loaded_ids = set(self._fully_loaded.keys())
             for k, v in items_to_save:
                 if k in self.incomplete_objects:
                     continue
                 try:
-                    if k in self._fully_loaded:
+                    if k in loaded_ids:
                         # Check and write index first
                         obj = v#self.objects[k]
                         new_index = None
@@ -472,14 +493,17 @@ class GangaRepositoryLocal(GangaRepository):
                             if len(self.lock(arr_k)) != 0:
                                 self.index_write(k)
                                 self.unlock(arr_k)
-                                self._cached_obj[k] = new_index
+                                with self._cache_lock:
+                                    self._cached_obj[k] = new_index
 
                 except Exception as err:
                     logger.debug("Failed to update index: %s on startup/shutdown" % k)
                     logger.debug("Reason: %s" % err)
 
-            iterables = iter(self._cache_load_timestamp.items())
-            for k, v in iterables:
+            with self._cache_lock:
+                iterables = [(k, (self._cached_cat[k], self._cached_cls[k], self._cached_obj[k]))
+                             for k in self._cache_load_timestamp]
+            for k, cached in iterables:
                 if k in self.incomplete_objects:
                     continue
                 cached_list = []
@@ -501,9 +525,7 @@ class GangaRepositoryLocal(GangaRepository):
 
                 if time > 0:
                     cached_list.append(time)
-                    cached_list.append(self._cached_cat[k])
-                    cached_list.append(self._cached_cls[k])
-                    cached_list.append(self._cached_obj[k])
+                    cached_list.extend(cached)
                     this_master_cache.append(cached_list)
 
             try:
@@ -756,9 +778,10 @@ class GangaRepositoryLocal(GangaRepository):
         else:
             raise RepositoryError(self, "Cannot flush an Empty object for ID: %s" % this_id)
 
-        if this_id not in self._fully_loaded:
-            self._fully_loaded[this_id] = obj
+        with self._cache_lock:
+            self._fully_loaded.setdefault(this_id, obj)
 
+    @flush_timer.timed
     def flush(self, ids):
         """
         flush the set of "ids" to disk and write the XML representing said objects in self.objects
@@ -767,6 +790,7 @@ class GangaRepositoryLocal(GangaRepository):
             ids (list): List of integers, used as keys to objects in the self.objects dict
         """
         logger.debug("Flushing: %s" % ids)
+        flushed_objects.inc(len(ids))
 
         #import traceback
         #traceback.print_stack()
@@ -775,13 +799,17 @@ class GangaRepositoryLocal(GangaRepository):
                 logger.debug("Should NEVER re-flush an incomplete object, it's now 'bad' respect this!")
                 continue
             try:
+                # Only check the application once per object written rather than on every file saved
+                check_app_hash(self.objects[this_id])
+
                 logger.debug("safe_flush: %s" % this_id)
                 self._safe_flush_xml(this_id)
 
-                self._cache_load_timestamp[this_id] = time.time()
-                self._cached_cls[this_id] = getName(self.objects[this_id])
-                self._cached_cat[this_id] = self.objects[this_id]._category
-                self._cached_obj[this_id] = self.objects[this_id]._index_cache
+                with self._cache_lock:
+                    self._cache_load_timestamp[this_id] = time.time()
+                    self._cached_cls[this_id] = getName(self.objects[this_id])
+                    self._cached_cat[this_id] = self.objects[this_id]._category
+                    self._cached_obj[this_id] = self.objects[this_id]._index_cache
 
                 try:
                     self.index_write(this_id)
@@ -789,8 +817,8 @@ class GangaRepositoryLocal(GangaRepository):
                     logger.debug("Index write failed")
                     pass
 
-                if this_id not in self._fully_loaded:
-                    self._fully_loaded[this_id] = self.objects[this_id]
+                with self._cache_lock:
+                    self._fully_loaded.setdefault(this_id, self.objects[this_id])
 
                 subobj_attr = getattr(self.objects[this_id], self.sub_split, None)
                 sub_attr_dirty = getattr(subobj_attr, '_dirty', False)
@@ -903,8 +931,8 @@ class GangaRepositoryLocal(GangaRepository):
 
         obj._index_cache = {}
 
-        if this_id not in self._fully_loaded:
-            self._fully_loaded[this_id] = obj
+        with self._cache_lock:
+            self._fully_loaded.setdefault(this_id, obj)
 
     def _load_xml_from_obj(self, fobj, fn, this_id, load_backup):
         """
@@ -996,6 +1024,7 @@ class GangaRepositoryLocal(GangaRepository):
 
         return fobj, has_loaded_backup
 
+    @load_timer.timed
     def load(self, ids, load_backup=False):
         """
         Load the following "ids" from disk
@@ -1011,6 +1040,7 @@ class GangaRepositoryLocal(GangaRepository):
         #print("\n")
 
         logger.debug("Loading Repo object(s): %s" % ids)
+        loaded_objects.inc(len(ids))
 
         for this_id in ids:
 
@@ -1130,8 +1160,8 @@ class GangaRepositoryLocal(GangaRepository):
                 logger.debug("Delete Error: %s" % err)
             self._internal_del__(this_id)
             rmrf(os.path.dirname(fn))
-            if this_id in self._fully_loaded:
-                del self._fully_loaded[this_id]
+            with self._cache_lock:
+                self._fully_loaded.pop(this_id, None)
             if this_id in self.objects:
                 del self.objects[this_id]
 
@@ -1192,9 +1222,13 @@ class GangaRepositoryLocal(GangaRepository):
         Args:
             obj (GangaObject): The object we want to know if it was loaded into memory
         """
-        try:
-            _id = next(id_ for id_, o in self._fully_loaded.items() if o is obj)
-            return True
-        except StopIteration:
-            return False
+        with self._cache_lock:
+            return any(o is obj for o in self._fully_loaded.values())
+
+    def getLoadedIds(self):
+        """
+        Returns the ids of the objects which have been fully loaded into memory
+        """
+        with self._cache_lock:
+            return list(self._fully_loaded.keys())
 
@@ -1,5 +1,6 @@
 
 
+import collections
 import functools
 from GangaCore.Utility.logging import getLogger
 
@@ -7,8 +8,10 @@ from GangaCore.Core.exceptions import (GangaException,
                                    InaccessibleObjectError,
                                    RepositoryError)
 
+import os
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from GangaCore.Core.GangaThread.GangaThread import GangaThread
 from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
@@ -207,12 +210,18 @@ def synchronised_complete_lock(f):
 
 class RegistryFlusher(GangaThread):
     """
-    This class is intended to be used by the registry to perfom
-    automatic flushes on a fixed schedule so that information is not
-    lost if Ganga is shut down abruptly.
+    This class is intended to be used by the registry to write dirty
+    objects behind the user's back so that information is not lost if
+    Ganga is shut down abruptly.
+
+    Objects which become dirty are queued once, however often they change,
+    and are written by a small pool of writer threads no later than
+    ``FlushDelay`` seconds after they first became dirty. Every
+    ``AutoFlusherWaitTime`` seconds the loaded objects are also swept for
+    changes which were not queued.
     """
 
-    __slots__ = ('registry', '_stop_event')
+    __slots__ = ('registry', '_stop_event', '_pending', '_pending_lock', '_writers', '_stats')
 
     def __init__(self, registry, *args, **kwargs):
         """
@@ -225,6 +234,104 @@ class RegistryFlusher(GangaThread):
         super(RegistryFlusher, self).__init__(*args, **kwargs)
         self.registry = registry
         self._stop_event = threading.Event()
+        # registry id -> (time the object first became dirty, object), in the order they became dirty
+        self._pending = collections.OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._writers = ThreadPoolExecutor(max_workers=max(1, getConfig('Registry')['FlushWorkers']))
+        self._stats = {'queued': 0, 'coalesced': 0, 'written': 0, 'errors': 0, 'write_time': 0., 'max_write_time': 0.}
+
+    def enqueue(self, obj):
+        """
+        Queue a dirty object for writing. An object which is already queued keeps its place and original time
+        Args:
+            obj (GangaObject): root object of the registry which has become dirty
+        """
+        this_id = getattr(obj, '_registry_id', None)
+        if this_id is None:
+            return
+        with self._pending_lock:
+            if this_id in self._pending:
+                self._stats['coalesced'] += 1
+            else:
+                self._pending[this_id] = (time.time(), obj)
+                self._stats['queued'] += 1
+
+    def discard(self, obj):
+        """
+        Drop a queued write, e.g. because the object is being removed
+        Args:
+            obj (GangaObject): object which should no longer be written
+        """
+        with self._pending_lock:
+            self._pending.pop(getattr(obj, '_registry_id', None), None)
+
+    def _takeDue(self, due_time=None):
+        """
+        Returns and unqueues the objects which became dirty before due_time, all of them if due_time is None
+        Args:
+            due_time (float): time.time() before which objects are due
+        """
+        due = []
+        with self._pending_lock:
+            for this_id, (dirty_time, obj) in list(self._pending.items()):
+                if due_time is not None and dirty_time > due_time:
+                    break
+                del self._pending[this_id]
+                due.append(obj)
+        return due
+
+    def _timedFlush(self, obj):
+        """
+        Write one object and return how long it took, run on the writer threads
+        Args:
+            obj (GangaObject): object to write
+        """
+        t0 = time.time()
+        self.registry._flushObject(obj)
+        return time.time() - t0
+
+    def _writeBatch(self, objs):
+        """
+        Write a batch of objects with the writer threads and wait for them, then sync the disk once for the whole batch
+        Args:
+            objs (list): objects to write
+        """
+        if not objs:
+            return
+        futures = [self._writers.submit(self._timedFlush, obj) for obj in objs]
+        for future in futures:
+            try:
+                write_time = future.result()
+            except Exception as err:
+                logger.error("Error writing object from '%s' registry: %s" % (self.registry.name, err))
+                with self._pending_lock:
+                    self._stats['errors'] += 1
+                continue
+            with self._pending_lock:
+                self._stats['written'] += 1
+                self._stats['write_time'] += write_time
+                self._stats['max_write_time'] = max(self._stats['max_write_time'], write_time)
+        if getConfig('Registry')['FlushFsync'] and hasattr(os, 'sync'):
+            os.sync()
+
+    def _sweep(self):
+        """
+        Queue every loaded object which is dirty, this catches changes which did not come through _setDirty
+        """
+        for obj in self.registry._getLoadedObjects():
+            if obj._dirty:
+                self.enqueue(obj)
+
+    def getStatistics(self):
+        """
+        Returns a dict of counters about the writes performed: queue depth, objects queued, changes coalesced
+        into an already queued write, writes, errors and mean/max write latency in seconds
+        """
+        with self._pending_lock:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._pending)
+        stats['mean_write_time'] = stats['write_time'] / stats['written'] if stats['written'] else 0.
+        return stats
 
     def stop(self):
         """
@@ -250,26 +357,28 @@ class RegistryFlusher(GangaThread):
         """
         self.stop()
         super(RegistryFlusher, self).join(*args, **kwargs)
+        self._writers.shutdown(wait=True)
 
     def run(self):
         """
         This will run an indefinite loop which periodically checks
-        whether it should stop. In between calls to ``flush_all`` it
-        will wait for a fixed period of time.
+        whether it should stop. In between it hands the objects which
+        are due to the writer threads and sweeps the loaded objects
+        every ``AutoFlusherWaitTime`` seconds.
         """
         sleeps_per_second = 10  # This changes the granularity of the sleep.
         regConf = getConfig('Registry')
+        last_sweep = time.time()
         while not self.stopped:
-            sleep_period = regConf['AutoFlusherWaitTime']
-            for i in range(sleep_period*sleeps_per_second):
-                time.sleep(1/sleeps_per_second)
-                if self.stopped:
-                    return
-            # This will trigger a flush on all dirty objects in the repo,
-            # It will lock all objects dirty as a result of the nature of the flush command
-            logger.debug('Auto-flushing: %s', self.registry.name)
-            if regConf['EnableAutoFlush']:
-                self.registry.flush_all()
+            self._stop_event.wait(1. / sleeps_per_second)
+            if self.stopped or not regConf['EnableAutoFlush']:
+                continue
+            now = time.time()
+            if now - last_sweep >= regConf['AutoFlusherWaitTime']:
+                logger.debug('Auto-flushing: %s', self.registry.name)
+                self._sweep()
+                last_sweep = now
+            self._writeBatch(self._takeDue(now - regConf['FlushDelay']))
         logger.debug("Auto-Flusher shutting down for Registry: %s" % self.registry.name)
 
 
@@ -279,7 +388,11 @@ class Registry(object):
     Base class providing a dict-like locked and lazy-loading interface to a Ganga repository
     """
 
-    __slots__ = ('name', 'doc', '_hasStarted', '_needs_metadata', 'metadata', '_read_lock', '_flush_lock', '_parent', 'repository', '_objects', '_incomplete_objects', 'flush_thread', 'type', 'location')
+    __slots__ = ('name', 'doc', '_hasStarted', '_needs_metadata', 'metadata', '_read_lock', '_flush_lock', '_parent', 'repository', '_objects', '_incomplete_objects', 'flush_thread', 'type', 'location',
+                 '_changed_ids', '_changed_lock', '_attribute_index', '_attribute_values')
+
+    # attributes which select() can answer from the index cache, mapped to their index cache key
+    _indexed_attributes = {}
 
     def __init__(self, name, doc):
         """Registry constructor, giving public name and documentation
@@ -303,6 +416,14 @@ class Registry(object):
 
         self.flush_thread = None
 
+        # ids of objects added, flushed or removed since each consumer last polled
+        self._changed_ids = {}
+        self._changed_lock = threading.Lock()
+
+        # secondary indexes over _indexed_attributes: attribute -> value -> ids, None collects the ids without a cached value
+        self._attribute_index = collections.defaultdict(lambda: collections.defaultdict(set))
+        self._attribute_values = {}
+
     def hasStarted(self):
         """
         Wrapper function to return _hasStarted boolen
@@ -392,6 +513,98 @@ class Registry(object):
         returnable = iter(list(self.values()))
         return returnable
 
+    def _markChanged(self, ids):
+        """
+        Record that the objects with the given ids have changed for all consumers of pollChangedJobs
+        Args:
+            ids (list): ids of the objects which have been added, flushed or removed
+        """
+        with self._changed_lock:
+            for changed in self._changed_ids.values():
+                changed.update(ids)
+
+    def pollChangedJobs(self, name):
+        """
+        Returns the ids of the objects which have been added, flushed or removed since the consumer 'name' last polled.
+        The first call for a given consumer returns all ids currently in the registry.
+        Args:
+            name (str): Name of the consumer, e.g. 'WebGUI'
+        """
+        with self._changed_lock:
+            if name not in self._changed_ids:
+                self._changed_ids[name] = set()
+                return list(self._objects.keys())
+            changed = self._changed_ids[name]
+            self._changed_ids[name] = set()
+        return sorted(changed)
+
+    def getIndexedValue(self, obj, attr):
+        """
+        Returns the value of attr for an object which is not loaded from its index cache.
+        Raises KeyError if the attribute is not indexed, not cached or if the object is loaded, in which case
+        the live value must be used instead
+        Args:
+            obj (GangaObject): object in this registry
+            attr (str): name of the attribute
+        """
+        key = self._indexed_attributes[attr]
+        if self.repository.isObjectLoaded(obj):
+            raise KeyError(attr)
+        # bypass the _index_cache property, it looks up the object in the whole registry
+        return obj._index_cache_dict[key]
+
+    @synchronised_read_lock
+    def _updateAttributeIndex(self):
+        """
+        Brings the secondary attribute indexes up to date with the objects which changed since the last update
+        """
+        for this_id in self.pollChangedJobs('AttributeIndex'):
+            for attr, value in self._attribute_values.pop(this_id, {}).items():
+                self._attribute_index[attr][value].discard(this_id)
+            if this_id not in self._objects:
+                continue
+            obj = self._objects[this_id]
+            if self.repository.isObjectLoaded(obj):
+                cache = self.getIndexCache(obj)
+            else:
+                cache = obj._index_cache_dict or {}
+            values = {}
+            for attr, key in self._indexed_attributes.items():
+                value = cache.get(key)
+                try:
+                    self._attribute_index[attr][value].add(this_id)
+                except TypeError:
+                    value = None
+                    self._attribute_index[attr][value].add(this_id)
+                values[attr] = value
+            self._attribute_values[this_id] = values
+
+    def selectIds(self, predicates):
+        """
+        Returns the set of ids which may match all the given predicates according to the secondary indexes, or None
+        if none of the predicates is on an indexed attribute. Objects without a cached value and objects loaded in memory,
+        whose live values may differ from their index, are always returned so the caller must still check each object.
+        Args:
+            predicates (dict): attribute name -> callable returning True for a value which matches
+        """
+        indexed = [a for a in predicates if a in self._indexed_attributes]
+        if not indexed or self.hasStarted() is not True:
+            return None
+
+        self._updateAttributeIndex()
+
+        with self._read_lock:
+            candidates = None
+            for attr in indexed:
+                buckets = self._attribute_index[attr]
+                matching = set(buckets.get(None, ()))
+                for value, ids in buckets.items():
+                    if value is not None and ids and predicates[attr](value):
+                        matching.update(ids)
+                candidates = matching if candidates is None else candidates & matching
+            candidates.update(self.repository.getLoadedIds())
+        return candidates
+
     def find(self, obj):
         """Returns the id of the given object in this registry, or 
         Raise ObjectNotInRegistryError if the Object is not found
@@ -453,6 +666,7 @@ class Registry(object):
         obj._registry_locked = True
 
         self.repository.flush(ids)
+        self._markChanged(ids)
 
         return ids[0]
 
@@ -484,7 +698,12 @@ class Registry(object):
             self._acquire_session_lock(obj)
 
             logger.debug('deleting the object %d from the registry %s', this_id, self.name)
-            self.repository.delete([this_id])
+            if self.flush_thread is not None:
+                self.flush_thread.discard(obj)
+            # wait for a write-behind flush of this object which is in progress
+            with obj.const_lock:
+                self.repository.delete([this_id])
+            self._markChanged([this_id])
 
     @synchronised_flush_lock
     def _flush(self, objs):
@@ -518,6 +737,45 @@ class Registry(object):
                 obj_id = self.find(obj)
                 self.repository.flush([obj_id])
                 obj._setFlushed()
+            self._markChanged([obj_id])
+
+    def _markDirty(self, obj):
+        """
+        Queue a root object which has just become dirty with the write-behind flusher, if this registry has one
+        Args:
+            obj (GangaObject): the object which has become dirty
+        """
+        flush_thread = self.flush_thread
+        if flush_thread is not None:
+            flush_thread.enqueue(obj)
+
+    def _flushObject(self, obj):
+        """
+        Flush a single object holding only its own lock rather than the registry flush lock,
+        so that the write-behind flusher can write several objects at once.
+        Returns True if the object was written
+        Args:
+            obj (GangaObject): the object to flush
+        """
+        if self.hasStarted() is not True:
+            return False
+
+        with obj.const_lock:
+            this_id = getattr(obj, '_registry_id', None)
+            # the object may have been flushed, removed or unloaded since it was queued
+            if not obj._dirty or self._objects.get(this_id) is not obj or not self.repository.isObjectLoaded(obj):
+                return False
+            self.repository.flush([this_id])
+            obj._setFlushed()
+        self._markChanged([this_id])
+        return True
+
+    @synchronised_read_lock
+    def _getLoadedObjects(self):
+        """
+        Returns the objects of this registry which are loaded into memory, in order of ID. Only these can be dirty
+        """
+        return [self._objects[i] for i in sorted(self.repository.getLoadedIds()) if i in self._objects]
 
     def flush_all(self):
         """
@@ -525,7 +783,8 @@ class Registry(object):
         It does this via ``_flush`` so the same conditions apply.
         """
         if self.hasStarted():
-            for _obj in self.values():
+            # objects which are not loaded cannot have changed, so don't look at them
+            for _obj in self._getLoadedObjects():
                 self._flush(_obj)
 
         if self.metadata and self.metadata.hasStarted():
@@ -469,14 +469,15 @@ class SubJobXMLList(GangaObject):
         """Get the cached data from the index for all subjobs"""
         cached_data = []
         #logger.debug("Cache: %s" % self._subjobIndexData)
-        if len(self._subjobIndexData) == len(self):
-            for i in range(len(self)):
+        n_subjobs = len(self)
+        if len(self._subjobIndexData) == n_subjobs:
+            for i in range(n_subjobs):
                 if self.isLoaded(i):
                     cached_data.append( self._registry.getIndexCache( self.__getitem__(i) ) )
                 else:
                     cached_data.append( self._subjobIndexData[i] )
         else:
-            for i in range(len(self)):
+            for i in range(n_subjobs):
                 cached_data.append(self._registry.getIndexCache( self.__getitem__(i) ) )
 
         return cached_data
@@ -486,14 +487,16 @@ class SubJobXMLList(GangaObject):
         Returns the cached statuses of the subjobs whilst respecting the Lazy loading
         """
         sj_statuses = []
-        if len(self._subjobIndexData) == len(self):
-            for i in range(len(self)):
+        # len() stats the job directory, so only ask once
+        n_subjobs = len(self)
+        if len(self._subjobIndexData) == n_subjobs:
+            for i in range(n_subjobs):
                 if self.isLoaded(i):
                     sj_statuses.append(self.__getitem__(i).status)
                 else:
                     sj_statuses.append(self._subjobIndexData[i]['status'])
         else:
-            for i in range(len(self)):
+            for i in range(n_subjobs):
                 sj_statuses.append(self.__getitem__(i).status)
         return sj_statuses
 
@@ -0,0 +1,263 @@
+"""
+Run one function over many items in a pool of threads: the submission, preparation and downloads of the grid jobs.
+
+    operation = BulkOperation('lcg_jsubmit', submit_chunk, num_threads=10, retries=2, timeout=600)
+    for r in operation.stream(chunks):
+        if not r.ok:
+            logger.error('%s failed: %s', r.item, r.error)
+
+The function is called with one item and returns its result, it fails by raising. Every item gives one ItemResult,
+in the order they finish or, with ordered=True, in the order of the items. An item which raised is tried again
+up to 'retries' times, after retry_backoff seconds doubled at each attempt. An item still running after 'timeout'
+seconds is given up: its ItemResult holds a TimeoutError and what it returns later is dropped. With progress=True
+the number of items done is logged every progress_interval seconds.
+
+The operations running when Ganga exits are stopped by stopBulkOperations(): the items which have not started are
+not run, the ones running are waited for.
+
+This replaces GangaCore.Core.GangaThread.MTRunner, whose workers poll their data queue and whose results are
+gathered in a shared dictionary. See GangaCore/scripts/bulk_benchmark.py for a comparison of the two.
+"""
+
+import queue
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from GangaCore.Core.exceptions import GangaException
+from GangaCore.Utility.logging import getLogger
+from GangaCore.Utility.Metrics import metrics
+
+logger = getLogger()
+
+
+class BulkOperationStopped(GangaException):
+
+    """ The item was not run as its operation was stopped """
+
+
+class ItemResult(namedtuple('ItemResult', ['item', 'result', 'error', 'attempts', 'seconds'])):
+
+    """ The outcome of one item: its result, or the exception it raised after all its attempts """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class _Task(object):
+
+    """ One item submitted to the executor """
+
+    __slots__ = ('item', 'started', 'abandoned')
+
+    def __init__(self, item):
+        self.item = item
+        self.started = None
+        self.abandoned = False
+
+
+_operations = weakref.WeakSet()
+
+
+class BulkOperation(object):
+
+    """
+    Runs a function over items in a pool of num_threads threads.
+
+    The threads are started on first use. They are stopped at the end of stream() and run(), unless keep_alive is
+    set for an operation fed item by item with submit().
+    """
+
+    progress_interval = 10.
+
+    def __init__(self, name, function, num_threads=10, retries=0, retry_backoff=0., timeout=None, progress=False,
+                 keep_alive=False):
+        self.name = name
+        self.function = function
+        self.num_threads = max(1, int(num_threads))
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.progress = progress
+        self.keep_alive = keep_alive
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._pending = 0
+        self._seconds = metrics.histogram('bulk_item_seconds', 'Time to process one item of a bulk operation', operation=name)
+        _operations.add(self)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._stopping.is_set():
+                raise BulkOperationStopped('%s is stopped' % self.name)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix=self.name)
+            return self._executor
+
+    def _process(self, task):
+        """ Run the function for the item of the task, with its retries, and return its ItemResult """
+        task.started = time.time()
+        attempts = 0
+        try:
+            while True:
+                if self._stopping.is_set():
+                    return ItemResult(task.item, None, BulkOperationStopped('%s is stopped' % self.name), attempts,
+                                      time.time() - task.started)
+                attempts += 1
+                try:
+                    result = self.function(task.item)
+                except Exception as err:
+                    if attempts > self.retries or task.abandoned:
+                        logger.debug('%s: %s failed after %d attempt(s): %s', self.name, task.item, attempts, err)
+                        return ItemResult(task.item, None, err, attempts, time.time() - task.started)
+                    logger.debug('%s: %s failed, trying again: %s', self.name, task.item, err)
+                    self._stopping.wait(self.retry_backoff * 2 ** (attempts - 1))
+                else:
+                    seconds = time.time() - task.started
+                    self._seconds.observe(seconds)
+                    return ItemResult(task.item, result, None, attempts, seconds)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _submit(self, task):
+        executor = self._get_executor()
+        with self._lock:
+            self._pending += 1
+        try:
+            return executor.submit(self._process, task)
+        except RuntimeError:
+            # the executor was shut down in the meantime
+            with self._lock:
+                self._pending -= 1
+            raise BulkOperationStopped('%s is stopped' % self.name)
+
+    def submit(self, item):
+        """ Add one item, return the Future of its ItemResult. The timeout is only applied by stream() """
+        return self._submit(_Task(item))
+
+    def pending(self):
+        """ The number of items submitted and not finished """
+        with self._lock:
+            return self._pending
+
+    def stream(self, items, ordered=False):
+        """
+        Run the function over the items and yield their ItemResult as they finish, or in the order of the items
+        if ordered is set
+        """
+        start = time.time()
+        tasks = {}
+        finished_futures = queue.Queue()
+        try:
+            for index, item in enumerate(items):
+                task = _Task(item)
+                try:
+                    future = self._submit(task)
+                except BulkOperationStopped as err:
+                    future = _stopped_future(item, err)
+                tasks[future] = (index, task)
+                future.add_done_callback(finished_futures.put)
+            total = len(tasks)
+            done_count = 0
+            failed = 0
+            last_report = last_check = start
+            waiting = {}
+            next_index = 0
+
+            while tasks:
+                finished = []
+                try:
+                    future = finished_futures.get(timeout=self._poll(last_report, last_check))
+                    while True:
+                        if future in tasks:
+                            finished.append((tasks.pop(future), future.result()))
+                        future = finished_futures.get_nowait()
+                except queue.Empty:
+                    pass
+
+                now = time.time()
+                if self.timeout is not None and now - last_check >= self._check_interval():
+                    last_check = now
+                    for future, (index, task) in list(tasks.items()):
+                        if task.started is not None and now - task.started > self.timeout:
+                            task.abandoned = True
+                            del tasks[future]
+                            logger.warning('%s: giving up %s after %ss', self.name, task.item, self.timeout)
+                            error = TimeoutError('%s ran for more than %ss' % (task.item, self.timeout))
+                            finished.append(((index, task), ItemResult(task.item, None, error, 1, now - task.started)))
+
+                for (index, task), result in finished:
+                    done_count += 1
+                    if not result.ok:
+                        failed += 1
+                    if not ordered:
+                        yield result
+                    else:
+                        waiting[index] = result
+                if ordered:
+                    while next_index in waiting:
+                        yield waiting.pop(next_index)
+                        next_index += 1
+
+                if self.progress and tasks and time.time() - last_report >= self.progress_interval:
+                    last_report = time.time()
+                    logger.info('%s: %d/%d done, %d failed', self.name, done_count, total, failed)
+
+            if self.progress:
+                logger.info('%s: %d/%d done, %d failed in %.1fs', self.name, done_count, total, failed, time.time() - start)
+        finally:
+            # the items left when the caller stops reading the results
+            for future, (index, task) in tasks.items():
+                task.abandoned = True
+                if future.cancel():
+                    with self._lock:
+                        self._pending -= 1
+            if not self.keep_alive:
+                self._shutdown(wait=False)
+
+    def _check_interval(self):
+        """ Seconds between two looks for the items running past the timeout """
+        return min(1., self.timeout / 10.)
+
+    def _poll(self, last_report, last_check):
+        """ Seconds to wait for an item before looking at the timeouts or reporting the progress """
+        polls = []
+        if self.progress:
+            polls.append(last_report + self.progress_interval)
+        if self.timeout is not None:
+            polls.append(last_check + self._check_interval())
+        return max(0.01, min(polls) - time.time()) if polls else None
+
+    def run(self, items):
+        """ Run the function over the items and return the list of their ItemResult, in the order of the items """
+        return list(self.stream(items, ordered=True))
+
+    def _shutdown(self, wait):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stop(self, wait=True):
+        """ Do not start the items left, and wait for the items running if wait is set """
+        self._stopping.set()
+        self._shutdown(wait)
+
+
+def _stopped_future(item, error):
+    future = Future()
+    future.set_result(ItemResult(item, None, error, 0, 0.))
+    return future
+
+
+def stopBulkOperations(wait=True):
+    """ Stop all the bulk operations, when Ganga exits """
+    for operation in list(_operations):
+        operation.stop(wait)
@@ -1,4 +1,6 @@
-
+"""
+Superseded by GangaCore.Core.GangaThread.BulkOperation, kept for the extensions still using it.
+"""
 from .Data import Data, DuplicateDataItemError
 from .Algorithm import Algorithm, AlgorithmError
 from .MTRunner import MTRunner, MTRunnerError
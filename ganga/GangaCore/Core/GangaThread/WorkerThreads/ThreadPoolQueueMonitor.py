@@ -10,30 +10,39 @@ logger = getLogger()
 
 _user_threadpool = None
 _monitoring_threadpool = None
+_finalisation_threadpool = None
 
 
 class ThreadPoolQueueMonitor(object):
 
     '''
-    This class displays the user and monitor thread pools and associated queues
+    This class displays the user, monitor and finalisation thread pools and associated queues
 
-    The number of worker threads in the pool is initialized by
-    the getConfig('Queues')['NumWorkerThreads'] config option.
+    The number of worker threads in the user and monitoring pools is initialized by
+    the getConfig('Queues')['NumWorkerThreads'] config option, the one of the finalisation
+    pool by getConfig('Queues')['NumFinalisationThreads']. The work is kept apart in the
+    three pools, but an idle worker of one pool runs the work queued in another whose workers
+    are all busy.
     '''
 
-    __slots__ = ('_user_threadpool', '_monitoring_threadpool', '_frozen', '_shutdown')
+    __slots__ = ('_user_threadpool', '_monitoring_threadpool', '_finalisation_threadpool', '_frozen', '_shutdown')
 
-    def __init__(self, user_threadpool=None, monitoring_threadpool=None):
+    def __init__(self, user_threadpool=None, monitoring_threadpool=None, finalisation_threadpool=None):
 
         if user_threadpool is None:
             user_threadpool = WorkerThreadPool(worker_thread_prefix="User_Worker_")
         if monitoring_threadpool is None:
             monitoring_threadpool = WorkerThreadPool(worker_thread_prefix="Ganga_Worker_")
+        if finalisation_threadpool is None:
+            finalisation_threadpool = WorkerThreadPool(getConfig('Queues')['NumFinalisationThreads'],
+                                                       worker_thread_prefix="Ganga_Finaliser_")
 
         global _user_threadpool
         global _monitoring_threadpool
+        global _finalisation_threadpool
         self._user_threadpool = _user_threadpool
         self._monitoring_threadpool = _monitoring_threadpool
+        self._finalisation_threadpool = _finalisation_threadpool
 
         if user_threadpool is not None:
             if self._user_threadpool is not None:
@@ -49,13 +58,27 @@ class ThreadPoolQueueMonitor(object):
                 del self._monitoring_threadpool
                 del _monitoring_threadpool
             self._monitoring_threadpool = monitoring_threadpool
+        if finalisation_threadpool is not None:
+            if self._finalisation_threadpool is not None:
+                self._finalisation_threadpool.clear_queue()
+                self._finalisation_threadpool._stop_worker_threads()
+                del self._finalisation_threadpool
+                del _finalisation_threadpool
+            self._finalisation_threadpool = finalisation_threadpool
 
         _user_threadpool = self._user_threadpool
         _monitoring_threadpool = self._monitoring_threadpool
+        _finalisation_threadpool = self._finalisation_threadpool
+
+        for pool in self._threadpools():
+            pool.share_with(*self._threadpools())
 
         self._frozen = False
         self._shutdown = False
 
+    def _threadpools(self):
+        return (self._user_threadpool, self._monitoring_threadpool, self._finalisation_threadpool)
+
     def _display_element(self, item):
         if hasattr(item, 'name') and item.name is not None:
             return item.name
@@ -97,8 +120,36 @@ class ThreadPoolQueueMonitor(object):
         output += "Ganga monitoring queue:\n"
         output += "----------------------\n"
         output += str([self._display_element(elem) for elem in self._monitoring_threadpool.get_queue()])
+        output += '\n\n'
+        output += "Ganga finalisation threads:\n"
+        output += "--------------------------\n"
+        for f in self._finalisation_threadpool.worker_status():
+            colour = getColour('fg.green') if f[1] == 'idle' else getColour('fg.red')
+            output += '{0:<35} {1:<26} {2:<15}\n'.format(colour + str(f[0]) + getColour('fg.normal'),
+                                                        f[1][:30].replace("\n", "\\n"), f[2])
+        output += "Ganga finalisation queue:\n"
+        output += "------------------------\n"
+        output += str([self._display_element(elem) for elem in self._finalisation_threadpool.get_queue()])
+        output += '\n\n'
+        output += '{0:<14} {1:>8} {2:>8} {3:>8} {4:>9} {5:>10} {6:>10} {7:>10} {8:>10}\n'.format(
+            'Queue', 'Workers', 'Queued', 'Running', 'Borrowed', 'Wait p50', 'Wait p95', 'Run p50', 'Run p95')
+        for name, stats in self.stats().items():
+            output += '{0:<14} {1:>8} {2:>8} {3:>8} {4:>9} {5:>9.2f}s {6:>9.2f}s {7:>9.2f}s {8:>9.2f}s\n'.format(
+                name, stats['workers'], stats['queued'], stats['running'], stats['borrowed'],
+                stats['wait_p50'], stats['wait_p95'], stats['run_p50'], stats['run_p95'])
         return output
 
+    def stats(self):
+        '''
+        Return the statistics of each queue: the number of its worker threads, of the tasks queued and
+        running, of its workers running the work of another queue and the seconds (median and 95th percentile)
+        the tasks waited for a worker and ran.
+
+        In[0]: queues.stats()['monitoring']['queued']
+        '''
+        return collections.OrderedDict((name, pool.stats()) for name, pool in
+                                       zip(('user', 'monitoring', 'finalisation'), self._threadpools()))
+
     def _repr_pretty_(self, p, cycle):
         if cycle:
             p.text('tasks...')
@@ -150,7 +201,8 @@ class ThreadPoolQueueMonitor(object):
 
         self.purge(force)
 
-        _monitor_queue = [i for i in self._monitoring_threadpool.get_queue()]
+        _monitor_queue = [i for i in self._monitoring_threadpool.get_queue()] + \
+            [i for i in self._finalisation_threadpool.get_queue()]
 
         queue_size = len(_monitor_queue)
         _actually_purge = False
@@ -171,8 +223,9 @@ class ThreadPoolQueueMonitor(object):
                     keyin = None
         if _actually_purge:
             self._monitoring_threadpool.clear_queue()
+            self._finalisation_threadpool.clear_queue()
 
-    def add(self, worker_code, args=(), kwargs={}, priority=5):
+    def add(self, worker_code, args=(), kwargs={}, priority=5, deadline=None):
         """
         Run any python callable object asynchronously through the user thread pool
 
@@ -204,6 +257,13 @@ class ThreadPoolQueueMonitor(object):
                    priority    = The thread queuing system is a priority
                                  queue with lower number = higher priority.
                                  This then should be an int normally 0-9
+                   deadline    = Seconds after which the code is given up if it
+                                 has not finished, None for no limit
+
+        returns:
+        -------
+                   A concurrent.futures.Future of the return value of the code,
+                   future.cancel() removes it from the queue if it has not started
         """
         if not isinstance(worker_code, collections.Callable):
             logger.error('Only python callable objects can be added to the queue using queues.add()')
@@ -211,12 +271,13 @@ class ThreadPoolQueueMonitor(object):
             logger.error('e.g. Incorrect:     queues.add(myfunc()) *NOTE the brackets*')
             logger.error('e.g. Correct  :     queues.add(myfunc)')
             return
-        self._user_threadpool.add_function(worker_code,
-                                           args=args,
-                                           kwargs=kwargs,
-                                           priority=priority)
+        return self._user_threadpool.add_function(worker_code,
+                                                  args=args,
+                                                  kwargs=kwargs,
+                                                  priority=priority,
+                                                  deadline=deadline)
 
-    def _addSystem(self, worker_code, args=(), kwargs={}, priority=5, name=None):
+    def _addSystem(self, worker_code, args=(), kwargs={}, priority=5, name=None, deadline=None, pool=None):
 
         if not isinstance(worker_code, collections.Callable):
             logger.error("Error Adding internal task!! please report this to the Ganga developers!")
@@ -227,11 +288,35 @@ class ThreadPoolQueueMonitor(object):
                 logger.warning("Queue System is frozen not adding any more System processes!")
             return
 
-        self._monitoring_threadpool.add_function(worker_code,
-                                                 args=args,
-                                                 kwargs=kwargs,
-                                                 priority=priority,
-                                                 name=name)
+        if pool is None:
+            pool = self._monitoring_threadpool
+        return pool.add_function(worker_code,
+                                 args=args,
+                                 kwargs=kwargs,
+                                 priority=priority,
+                                 name=name,
+                                 deadline=deadline)
+
+    def _addFinalisation(self, worker_code, args=(), kwargs={}, priority=5, name=None, deadline=None,
+                         fallback_func=None, fallback_args=()):
+        """
+        Run the finalisation of jobs in the finalisation thread pool, so that it is not held up by the monitoring and
+        the other way round. The task is given up after getConfig('Queues')['FinalisationDeadline'] seconds by default.
+        """
+        if deadline is None:
+            deadline = getConfig('Queues')['FinalisationDeadline']
+        if self.isfrozen() is True:
+            if not self._shutdown:
+                logger.warning("Queue System is frozen not adding any more System processes!")
+            return
+        return self._finalisation_threadpool.add_function(worker_code,
+                                                          args=args,
+                                                          kwargs=kwargs,
+                                                          priority=priority,
+                                                          name=name,
+                                                          deadline=deadline,
+                                                          fallback_func=fallback_func,
+                                                          fallback_args=fallback_args)
 
     def addProcess(self,
                    command,
@@ -247,7 +332,8 @@ class ThreadPoolQueueMonitor(object):
                    callback_kwargs={},
                    fallback_func=None,
                    fallback_args=(),
-                   fallback_kwargs={}):
+                   fallback_kwargs={},
+                   deadline=None):
         """
         Run a command asynchronously in a new process monitored by the user thread pool.
 
@@ -302,6 +388,12 @@ class ThreadPoolQueueMonitor(object):
                                      are specified here as a tuple
                    fallback_kwargs = kwargs for the fallback_func are given here
                                      as a dict.
+                   deadline        = Seconds after which the command is given up if
+                                     it has not finished, None for no limit
+
+        returns:
+        -------
+                   A concurrent.futures.Future of the output of the command
         """
         if type(command) != type(''):
             logger.error("Input command must be of type 'string'")
@@ -312,20 +404,21 @@ class ThreadPoolQueueMonitor(object):
                 logger.warning("Queues system is frozen. Not adding any more processes!")
             return
 
-        self._user_threadpool.add_process(command,
-                                          timeout=timeout,
-                                          env=env,
-                                          cwd=cwd,
-                                          shell=shell,
-                                          eval_includes=eval_includes,
-                                          update_env=update_env,
-                                          priority=priority,
-                                          callback_func=callback_func,
-                                          callback_args=callback_args,
-                                          callback_kwargs=callback_kwargs,
-                                          fallback_func=fallback_func,
-                                          fallback_args=fallback_args,
-                                          fallback_kwargs=fallback_kwargs)
+        return self._user_threadpool.add_process(command,
+                                                 timeout=timeout,
+                                                 env=env,
+                                                 cwd=cwd,
+                                                 shell=shell,
+                                                 eval_includes=eval_includes,
+                                                 update_env=update_env,
+                                                 priority=priority,
+                                                 callback_func=callback_func,
+                                                 callback_args=callback_args,
+                                                 callback_kwargs=callback_kwargs,
+                                                 fallback_func=fallback_func,
+                                                 fallback_args=fallback_args,
+                                                 fallback_kwargs=fallback_kwargs,
+                                                 deadline=deadline)
 
     def threadStatus(self):
         statuses = []
@@ -335,6 +428,9 @@ class ThreadPoolQueueMonitor(object):
         for t in self._monitoring_threadpool.worker_status():
             if t[1] != "idle":
                 statuses.append(t[0])
+        for t in self._finalisation_threadpool.worker_status():
+            if t[1] != "idle":
+                statuses.append(t[0])
         return statuses
 
     def totalNumUserThreads(self):
@@ -352,7 +448,7 @@ class ThreadPoolQueueMonitor(object):
             if t[1] != "idle":
                 num += 1
 
-        return num + len(self._user_threadpool.get_queue())
+        return num + len(self._monitoring_threadpool.get_queue())
 
     def totalNumAllThreads(self):
         """Return the total number of ALL user and worker threads currently running and queued"""
@@ -363,25 +459,25 @@ class ThreadPoolQueueMonitor(object):
 
     def freeze(self):
         self._frozen = True
-        self._user_threadpool.freeze()
-        self._monitoring_threadpool.freeze()
+        for pool in self._threadpools():
+            pool.freeze()
 
     def unfreeze(self):
         self._frozen = False
-        self._user_threadpool.unfreeze()
-        self._monitoring_threadpool.unfreeze()
+        for pool in self._threadpools():
+            pool.unfreeze()
 
     def isfrozen(self):
         return self._frozen
 
     def _stop_all_threads(self, shutdown=False):
         self._shutdown = shutdown
-        self._user_threadpool._stop_worker_threads(shutdown)
-        self._monitoring_threadpool._stop_worker_threads(shutdown)
+        for pool in self._threadpools():
+            pool._stop_worker_threads(shutdown)
         return
 
     def _start_all_threads(self):
-        self._user_threadpool._start_worker_threads()
-        self._monitoring_threadpool._start_worker_threads()
+        for pool in self._threadpools():
+            pool._start_worker_threads()
         return
 
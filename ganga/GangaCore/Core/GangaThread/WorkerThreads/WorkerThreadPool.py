@@ -1,13 +1,31 @@
 #!/usr/bin/env python
-import queue
+"""
+A pool of worker threads running the functions and the commands added to its priority queue.
+
+Every task added to a pool gets a concurrent.futures.Future holding its result. A task which has not started can be
+cancelled with future.cancel(). A task can be given a deadline, in seconds from the time it is added: if it has not
+started by then it is dropped, if it is still running then it is abandoned. In both cases its future fails with a
+TimeoutError and its fallback_func is called with it, a TaskAbandoned if the task may still be running. The thread stuck in an abandoned task cannot be interrupted,
+it is left to finish on its own and a new worker takes its place in the pool, so that a call which never returns
+does not hold up the pool for good.
+
+Pools can be linked with share_with(): an idle worker of one pool then takes work from the queue of a linked pool
+whose own workers are all busy. At most half of the workers of a pool (and at least one) run borrowed work at the
+same time so that work added to the pool itself is never left without a worker.
+"""
+import heapq
+import itertools
+import time
 import traceback
 import threading
 import collections
+from concurrent.futures import Future, TimeoutError
 from GangaCore.Core.exceptions import GangaException, GangaTypeError
 from GangaCore.Core.GangaThread import GangaThread
 from GangaCore.Utility.execute import execute
 from GangaCore.Utility.logging import getLogger
 from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.Metrics import metrics
 from GangaCore.GPIDev.Base.Proxy import getName
 
 from collections import namedtuple
@@ -16,7 +34,10 @@ timeout = getConfig('Queues')['ShutDownTimeout']
 timeout = 0.1 if timeout==None else timeout
 
 logger = getLogger()
-QueueElement = namedtuple('QueueElement',  ['priority', 'command_input', 'callback_func', 'fallback_func', 'name'])
+QueueElement = namedtuple('QueueElement',  ['priority', 'command_input', 'callback_func', 'fallback_func', 'name',
+                                            'future', 'deadline', 'added'])
+# the fields added with the futures are optional, as they are for the elements made before
+QueueElement.__new__.__defaults__ = (None, None, None, None, None, None)
 CommandInput = namedtuple('CommandInput',  ['command', 'timeout', 'env', 'cwd', 'shell', 'python_setup', 'eval_includes', 'update_env'])
 class FunctionInput(namedtuple('FunctionInput', ['function', 'args', 'kwargs'])):
     def __gt__(self, other):
@@ -25,24 +46,59 @@ class FunctionInput(namedtuple('FunctionInput', ['function', 'args', 'kwargs']))
         pass
 
 
+_no_function = FunctionInput(None, (), {})
+
+
+class TaskAbandoned(TimeoutError):
+    """ A task was given up past its deadline whilst it was running, it may still be running in its old thread """
+
+
+def _set_future(future, result=None, exception=None):
+    """ Set the outcome of a future unless it is done already, e.g. abandoned past its deadline or cancelled """
+    if future is None or future.done():
+        return
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except Exception:
+        # done in the meantime by another thread
+        pass
+
 
 class WorkerThreadPool(object):
 
     """
     Client class through which Ganga objects interact with the local DIRAC server.
     """
-    __slots__ = ['__queue', '__worker_threads',
-                 '_saved_num_worker', '_saved_thread_prefix', '_frozen', '_shutdown']
+    __slots__ = ['__queue', '__worker_threads', '__condition', '__running', '__siblings', '__sequence', '__next_index',
+                 '__watchdog', '_borrowed', '_saved_num_worker', '_saved_thread_prefix', '_frozen', '_shutdown',
+                 '_timer', '_wait_timer']
 
     def __init__(self, num_worker_threads=None, worker_thread_prefix='Worker_'):
         if num_worker_threads is None:
             num_worker_threads=getConfig('Queues')['NumWorkerThreads']
-        self.__queue = queue.PriorityQueue()
+        # heap of (priority, sequence, QueueElement), the sequence keeps the order of the tasks of one priority
+        self.__queue = []
+        self.__condition = threading.Condition()
+        self.__sequence = itertools.count()
+        # worker thread: (QueueElement, owning pool) it is running
+        self.__running = {}
+        self.__siblings = []
         self.__worker_threads = []
+        self.__next_index = 0
+        self.__watchdog = None
+        self._borrowed = 0
 
         self._saved_num_worker = num_worker_threads
         self._saved_thread_prefix = worker_thread_prefix
 
+        self._timer = metrics.timer('queue_task_seconds', 'Time to run one task taken from a queue', pool=worker_thread_prefix)
+        self._wait_timer = metrics.histogram('queue_wait_seconds', 'Time a task waited in a queue for a worker thread',
+                                             pool=worker_thread_prefix)
+        metrics.gauge('queue_length', 'Tasks waiting for a worker thread', self.queue_length, pool=worker_thread_prefix)
+
         self.__init_worker_threads(self._saved_num_worker, self._saved_thread_prefix)
 
         self._frozen = False
@@ -56,15 +112,118 @@ class WorkerThreadPool(object):
                     "Worker Thread: %s is already running!" % i.gangaName)
             return
 
+        self.__next_index = 0
         for i in range(num_worker_threads):
-            t = GangaThread(name=worker_thread_prefix + str(i),
-                            auto_register=False,
-                            target=self.__worker_thread)
-            t._name = worker_thread_prefix + str(i)
-            t._command = 'idle'
-            t._timeout = 'N/A'
-            t.start()
-            self.__worker_threads.append(t)
+            self.__add_worker_thread()
+
+        self.__watchdog = GangaThread(name=worker_thread_prefix + 'Watchdog',
+                                      auto_register=False,
+                                      target=self.__watchdog_thread)
+        self.__watchdog.start()
+
+    def __add_worker_thread(self):
+        name = self._saved_thread_prefix + str(self.__next_index)
+        self.__next_index += 1
+        t = GangaThread(name=name,
+                        auto_register=False,
+                        target=self.__worker_thread)
+        t._name = name
+        t._command = 'idle'
+        t._timeout = 'N/A'
+        t._abandoned = False
+        t.start()
+        self.__worker_threads.append(t)
+        return t
+
+    def share_with(self, *pools):
+        """
+        Let the idle workers of this pool run the work queued in the given pools when their workers are all busy
+        Args:
+            pools (WorkerThreadPool): the pools to take work from
+        """
+        for pool in pools:
+            if pool is not self and pool not in self.__siblings:
+                self.__siblings.append(pool)
+
+    def queue_length(self):
+        """ The number of tasks waiting for a worker """
+        with self.__condition:
+            return len(self.__queue)
+
+    def _pop(self, wait=0):
+        """
+        Take the first task of the queue, waiting up to wait seconds for one, or return None
+        Args:
+            wait (float): seconds to wait for a task when the queue is empty
+        """
+        with self.__condition:
+            if not self.__queue and wait:
+                self.__condition.wait(wait)
+            if not self.__queue:
+                return None
+            return heapq.heappop(self.__queue)[2]
+
+    def _lends(self):
+        """ Has this pool queued work and no worker free to take it """
+        with self.__condition:
+            return bool(self.__queue) and len(self.__running) >= len(self.__worker_threads)
+
+    def __steal(self):
+        """ Take a task from a linked pool which has no free worker, return (task, owning pool) or (None, None) """
+        with self.__condition:
+            if self._borrowed >= max(1, len(self.__worker_threads) // 2):
+                return None, None
+        for pool in self.__siblings:
+            if pool._lends():
+                item = pool._pop()
+                if item is not None:
+                    return item, pool
+        return None, None
+
+    def __watchdog_thread(self):
+        """ Abandon the tasks running past their deadline, replacing their worker threads """
+        thread = threading.current_thread()
+        while not thread.should_stop():
+            time.sleep(timeout)
+            self.abandon_overdue()
+
+    def abandon_overdue(self):
+        """
+        Give up on the tasks running past their deadline: their future fails, their fallback_func is called and
+        a new worker thread takes the place of the one stuck running each of them
+        """
+        now = time.time()
+        overdue = []
+        with self.__condition:
+            for thread, (item, owner) in list(self.__running.items()):
+                if item.deadline is not None and item.deadline < now and thread in self.__worker_threads:
+                    del self.__running[thread]
+                    thread._abandoned = True
+                    self.__worker_threads.remove(thread)
+                    if owner is not self:
+                        self._borrowed -= 1
+                    overdue.append((thread, item, owner))
+            if self.isfrozen() and self._shutdown:
+                replace = False
+            else:
+                replace = True
+            for _ in overdue:
+                if replace:
+                    self.__add_worker_thread()
+
+        for thread, item, owner in overdue:
+            logger.warning("Abandoning '%s' in Thread '%s' which ran past its deadline" % (thread._command, thread.gangaName))
+            metrics.counter('queue_task_timeouts', 'Tasks given up past their deadline', pool=owner._saved_thread_prefix).inc()
+            owner._fail(item, TaskAbandoned('%s ran past its deadline' % thread._command))
+
+    def _fail(self, item, error):
+        """ Fail the future of a task and call its fallback_func """
+        _set_future(item.future, exception=error)
+        if item.fallback_func is not None and item.fallback_func.function is not None:
+            try:
+                item.fallback_func.function(error, *item.fallback_func.args, **item.fallback_func.kwargs)
+            except Exception as x:
+                logger.error("Exception raised in fallback function '%s':\n%s" % (getName(item.fallback_func.function), traceback.format_exc()))
 
     def __worker_thread(self):
         """
@@ -73,37 +232,45 @@ class WorkerThreadPool(object):
         Can be used for executing non-blocking calls to local DIRAC server
         """
         thread = threading.current_thread()
-        # Occasionally when shutting down the Queue import at top has been garbage collected
-        # and line "except Queue.Empty: continue" will throw
-        # <type 'exceptions.AttributeError'>: 'NoneType' object has no attribute 'Empty'
-        # im hoping that importing within the thread will avoid this.
-        import queue
 
         oldname = thread.gangaName
 
         # Note can use threading.current_thread to get the thread rather than passing it as an arg
         # easier to unit test this way though with a dummy thread.
-        while not thread.should_stop():
-            try:
-                item = self.__queue.get(True,timeout)
-            except queue.Empty:
-                # wait 'timeout' sec then loop again to give shutdown a chance
+        while not thread.should_stop() and not thread._abandoned:
+            item, owner = self._pop(timeout), self
+            if item is None:
+                item, owner = self.__steal()
+                if item is None:
+                    # loop again to give shutdown a chance
+                    continue
+
+            if not isinstance(item, QueueElement):
+                logger.error("Unrecognised queue element: '%s'" % repr(item))
+                logger.error("                  expected: 'QueueElement'")
                 continue
 
+            if item.future is not None and not item.future.set_running_or_notify_cancel():
+                # cancelled while it was queued
+                continue
+            if item.deadline is not None and item.deadline < time.time():
+                metrics.counter('queue_task_timeouts', 'Tasks given up past their deadline', pool=owner._saved_thread_prefix).inc()
+                owner._fail(item, TimeoutError('%s was not started before its deadline' % (item.name or 'task')))
+                continue
+            if item.added is not None:
+                owner._wait_timer.observe(time.time() - item.added)
+
             # regster as a working thread
-            if isinstance(item, QueueElement):
-                oldname = thread.gangaName
+            oldname = thread.gangaName
+            if item.name is not None:
                 thread.gangaName = item.name
+            with self.__condition:
+                self.__running[thread] = (item, owner)
+                if owner is not self:
+                    self._borrowed += 1
 
             thread.register()
 
-            if not isinstance(item, QueueElement):
-                logger.error("Unrecognised queue element: '%s'" % repr(item))
-                logger.error("                  expected: 'QueueElement'")
-                self.__queue.task_done()
-                thread.unregister()
-                continue
-
             if isinstance(item.command_input, FunctionInput):
                 thread._command = getName(item.command_input.function)
             elif isinstance(item.command_input, CommandInput):
@@ -112,21 +279,26 @@ class WorkerThreadPool(object):
             else:
                 logger.error("Unrecognised input command type: '%s'" % repr(item.command_input))
                 logger.error("                       expected: ('FunctionInput' or 'CommandInput')")
-                self.__queue.task_done()
-                thread.unregister()
+                _set_future(item.future, exception=GangaTypeError('Unrecognised input command type'))
+                self.__done(thread, owner)
+                thread.gangaName = oldname
                 continue
 
             try:
-                if isinstance(item.command_input, FunctionInput):
-                    these_args = item.command_input.args
-                    if isinstance(these_args, str):
-                        these_args = (these_args, )
-                    result = item.command_input.function(*these_args, **item.command_input.kwargs)
-                else:
-                    result = execute(*item.command_input)
+                with owner._timer:
+                    if isinstance(item.command_input, FunctionInput):
+                        these_args = item.command_input.args
+                        if isinstance(these_args, str):
+                            these_args = (these_args, )
+                        result = item.command_input.function(*these_args, **item.command_input.kwargs)
+                    else:
+                        result = execute(*item.command_input)
             except Exception as e:
-                if issubclass(type(e), GangaException):
+                if thread._abandoned:
+                    logger.debug("Abandoned '%s' failed after its deadline: %s" % (thread._command, e))
+                elif issubclass(type(e), GangaException):
                     logger.error("%s" % e)
+                    _set_future(item.future, exception=e)
                 else:
                     logger.error("Exception raised executing '%s' in Thread '%s':\n%s" % (thread._command, thread.gangaName, traceback.format_exc()))
                     if item.fallback_func.function is not None:
@@ -143,37 +315,68 @@ class WorkerThreadPool(object):
                         else:
                             logger.error("Unrecognised fallback_func type: '%s'" % repr(item.fallback_func))
                             logger.error("                       expected: 'FunctionInput'")
+                    _set_future(item.future, exception=e)
             else:
-                if item.callback_func.function is not None:
-                    if isinstance(item.callback_func, FunctionInput):
-                        thread._command = getName(item.callback_func.function)
-                        thread._timeout = 'N/A'
-                        try:
-                            item.callback_func.function(
-                                result, *item.callback_func.args, **item.callback_func.kwargs)
-                        except Exception as e:
-                            if not issubclass(type(e), GangaException):
-                                logger.error("Exception raised in callback_func '%s' of Thread '%s': %s" % (
-                                    thread._command, thread.gangaName, traceback.format_exc()))
-                            else:
-                                logger.error("%s" % e)
-                    else:
-                        logger.error("Unrecognised callback_func type: '%s'" % repr(item.callback_func))
-                        logger.error("                       expected: 'FunctionInput'")
+                if thread._abandoned:
+                    logger.debug("Abandoned '%s' finished after its deadline" % thread._command)
+                else:
+                    if item.callback_func.function is not None:
+                        if isinstance(item.callback_func, FunctionInput):
+                            thread._command = getName(item.callback_func.function)
+                            thread._timeout = 'N/A'
+                            try:
+                                item.callback_func.function(
+                                    result, *item.callback_func.args, **item.callback_func.kwargs)
+                            except Exception as e:
+                                if not issubclass(type(e), GangaException):
+                                    logger.error("Exception raised in callback_func '%s' of Thread '%s': %s" % (
+                                        thread._command, thread.gangaName, traceback.format_exc()))
+                                else:
+                                    logger.error("%s" % e)
+                        else:
+                            logger.error("Unrecognised callback_func type: '%s'" % repr(item.callback_func))
+                            logger.error("                       expected: 'FunctionInput'")
+                    _set_future(item.future, result)
             finally:
-                # unregister as a working thread bcoz free
-                thread._command = 'idle'
-                thread._timeout = 'N/A'
-                self.__queue.task_done()
-                thread.unregister()
+                self.__done(thread, owner)
 
             thread.gangaName = oldname
 
+    def __done(self, thread, owner):
+        """ Unregister a worker thread at the end of a task as it is free again """
+        thread._command = 'idle'
+        thread._timeout = 'N/A'
+        with self.__condition:
+            if self.__running.pop(thread, None) is not None and owner is not self:
+                self._borrowed -= 1
+        thread.unregister()
+
+    def __put(self, priority, command_input, callback_func, fallback_func, name, deadline):
+        now = time.time()
+        future = Future()
+        item = QueueElement(priority=priority,
+                            command_input=command_input,
+                            callback_func=callback_func,
+                            fallback_func=fallback_func,
+                            name=name,
+                            future=future,
+                            deadline=None if deadline is None else now + deadline,
+                            added=now)
+        with self.__condition:
+            heapq.heappush(self.__queue, (priority, next(self.__sequence), item))
+            self.__condition.notify()
+        return future
+
     def add_function(self,
                      function, args=(), kwargs={}, priority=5,
                      callback_func=None, callback_args=(), callback_kwargs={},
                      fallback_func=None, fallback_args=(), fallback_kwargs={},
-                     name=None):
+                     name=None, deadline=None):
+        """
+        Add a function to the queue and return the Future of its result, or None if it cannot be added
+        Args:
+            deadline (float): seconds from now after which the task is given up, None for no limit
+        """
 
         if not isinstance(function, collections.Callable):
             logger.error('Only a python callable object may be added to the queue using the add_function() method')
@@ -182,20 +385,23 @@ class WorkerThreadPool(object):
             if not self._shutdown:
                 logger.warning("Cannot Add Process as Queue is frozen!")
             return
-        self.__queue.put(QueueElement(priority=priority,
-                                      command_input=FunctionInput(
-                                          function, args, kwargs),
-                                      callback_func=FunctionInput(
-                                          callback_func, callback_args, callback_kwargs),
-                                      fallback_func=FunctionInput(fallback_func, fallback_args, fallback_kwargs), name=name
-                                      ))
+        return self.__put(priority,
+                          FunctionInput(function, args, kwargs),
+                          FunctionInput(callback_func, callback_args, callback_kwargs),
+                          FunctionInput(fallback_func, fallback_args, fallback_kwargs),
+                          name, deadline)
 
     def add_process(self,
                     command, timeout=None, env=None, cwd=None, shell=False,
                     python_setup='', eval_includes=None, update_env=False, priority=5,
                     callback_func=None, callback_args=(), callback_kwargs={},
                     fallback_func=None, fallback_args=(), fallback_kwargs={},
-                    name=None):
+                    name=None, deadline=None):
+        """
+        Add a command to the queue and return the Future of its output, or None if it cannot be added
+        Args:
+            deadline (float): seconds from now after which the task is given up, None for no limit
+        """
 
         if not isinstance(command, str):
             logger.error("Input command must be of type 'string'")
@@ -204,36 +410,40 @@ class WorkerThreadPool(object):
             if self._shutdown:
                 logger.warning("Cannot Add Process as Queue is frozen!")
             return
-        self.__queue.put(QueueElement(priority=priority,
-                                      command_input=CommandInput(
-                                          command, timeout, env, cwd, shell, python_setup, eval_includes, update_env),
-                                      callback_func=FunctionInput(
-                                          callback_func, callback_args, callback_kwargs),
-                                      fallback_func=FunctionInput(fallback_func, fallback_args, fallback_kwargs), name=name
-                                      ))
+        return self.__put(priority,
+                          CommandInput(command, timeout, env, cwd, shell, python_setup, eval_includes, update_env),
+                          FunctionInput(callback_func, callback_args, callback_kwargs),
+                          FunctionInput(fallback_func, fallback_args, fallback_kwargs),
+                          name, deadline)
 
     def map(self, function, *iterables):
+        """ Add the function for each set of args taken from the iterables and return the list of the Futures """
         if not isinstance(function, collections.Callable):
             raise GangaTypeError('must be a function')
         if self.isfrozen() is True:
             logger.error("Cannot map a Function as Queue is frozen!")
-        for args in zip(*iterables):
-            self.__queue.put(QueueElement(priority=5,
-                                          command_input=FunctionInput(
-                                              function, args, {})
-                                          ))
+            return []
+        return [self.__put(5, FunctionInput(function, args, {}), _no_function, _no_function, None, None)
+                for args in zip(*iterables)]
 
     def clear_queue(self):
         """
-        Purges the thread pools queue.
+        Purges the thread pools queue, cancelling the futures of the tasks removed.
         """
-        self.__queue.queue = []
+        with self.__condition:
+            removed = [entry[2] for entry in self.__queue]
+            self.__queue = []
+        for item in removed:
+            if item.future is not None:
+                item.future.cancel()
 
     def get_queue(self):
         """
         Returns the current state of the multiprocess queue that the local DIRAC server is working through.
         """
-        return self.__queue.queue[:]
+        with self.__condition:
+            entries = sorted(self.__queue)
+        return [entry[2] for entry in entries if entry[2].future is None or not entry[2].future.cancelled()]
 
     def worker_status(self):
         """
@@ -241,6 +451,25 @@ class WorkerThreadPool(object):
         """
         return [(w.gangaName, w._command, w._timeout) for w in self.__worker_threads]
 
+    def stats(self):
+        """
+        Returns a dict of the number of workers, of the tasks queued and running, of the workers running the tasks
+        of other pools and of the seconds the tasks waited for a worker and ran (median and 95th percentile)
+        """
+        with self.__condition:
+            queued = len(self.__queue)
+            running = len(self.__running)
+            workers = len(self.__worker_threads)
+            borrowed = self._borrowed
+        return {'workers': workers,
+                'queued': queued,
+                'running': running,
+                'borrowed': borrowed,
+                'wait_p50': self._wait_timer.quantile(0.5),
+                'wait_p95': self._wait_timer.quantile(0.95),
+                'run_p50': self._timer.quantile(0.5),
+                'run_p95': self._timer.quantile(0.95)}
+
     def threads_matching(self, name_str):
         """
         Returns a list of all threads matching the given string at the start of their name
@@ -260,7 +489,11 @@ class WorkerThreadPool(object):
 
     def _stop_worker_threads(self, shutdown=False):
         self._shutdown = shutdown
-        for w in self.__worker_threads:
+        if self.__watchdog is not None:
+            self.__watchdog.stop()
+            self.__watchdog.join()
+            self.__watchdog = None
+        for w in list(self.__worker_threads):
             w.stop()
             w.join()
             # FIXME NEED TO CALL AN OPTIONAL CLEANUP FUCNTION HERE IF THREAD IS STOPPED
@@ -278,4 +511,3 @@ class WorkerThreadPool(object):
         return
 
 ###################################################################
-
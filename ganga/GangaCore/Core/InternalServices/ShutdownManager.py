@@ -10,12 +10,14 @@ import atexit
 # Ganga imports
 from GangaCore.Core.GangaThread import GangaThreadPool
 from GangaCore.Core.GangaThread.WorkerThreads import _global_queues, shutDownQueues
+from GangaCore.Core.GangaThread.BulkOperation import stopBulkOperations
 from GangaCore.Core import monitoring_component
 from GangaCore.Core.InternalServices import Coordinator
 from GangaCore.Runtime import Repository_runtime, bootstrap
 from GangaCore.Utility import stacktracer
 from GangaCore.Utility.logging import getLogger, requires_shutdown, final_shutdown
 from GangaCore.Utility.Config import setConfigOption
+from GangaCore.Utility.execute import stop_fork_servers
 from GangaCore.Core.MonitoringComponent.Local_GangaMC_Service import getStackTrace, _purge_actions_queue,\
     stop_and_free_thread_pool
 from GangaCore.GPIDev.Lib.Tasks import stopTasks
@@ -94,6 +96,12 @@ def _unprotected_ganga_exitfuncs():
     except Exception as err:
         logger.exception("Exception raised during freeze of Global Queues: %s" % err)
 
+    # Stop the bulk operations, letting the items running finish
+    try:
+        stopBulkOperations()
+    except Exception as err:
+        logger.exception("Exception raised while stopping the bulk operations: %s" % err)
+
     # shutdown the threads in the GangaThreadPool
     try:
         GangaThreadPool.getInstance().shutdown()
@@ -107,6 +115,12 @@ def _unprotected_ganga_exitfuncs():
     except Exception as err:
         logger.exception("Exception raised while purging shutting down queues: %s" % err)
 
+    # Stop the fork servers of execute(), now that no more commands are run
+    try:
+        stop_fork_servers()
+    except Exception as err:
+        logger.exception("Exception raised while stopping the fork servers: %s" % err)
+
     # shutdown the repositories
     try:
         logger.info("Shutting Down Ganga Repositories")
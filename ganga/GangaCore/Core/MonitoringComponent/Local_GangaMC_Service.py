@@ -24,6 +24,7 @@ from GangaCore.Utility.logging import getLogger, log_unknown_exception, log_user
 
 from GangaCore.Core.exceptions import BackendError
 from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.Metrics import metrics
 
 from collections import defaultdict
 
@@ -37,6 +38,11 @@ ThreadPool = []
 heartbeat_times = None
 global_start_time = None
 
+step_timer = metrics.timer('monitoring_step_seconds', 'Time to run the callback hooks of one step of the monitoring loop')
+action_timer = metrics.timer('monitoring_action_seconds', 'Time to run one action queued by the monitoring loop')
+jobs_updated = metrics.counter('monitoring_jobs_updated_total', 'Jobs passed to the backends to update their status')
+metrics.gauge('monitoring_queue_length', 'Actions waiting for a monitoring worker thread', Qin.qsize)
+
 # The JobAction class encapsulates a function, its arguments and its post result action
 # based on what is defined as a successful run of the function.
 
@@ -146,7 +152,8 @@ class MonitoringWorkerThread(GangaThread):
                 except:
                     self._running_cmd = "unknown"
                     self._running_args = []
-                result = action.function(*action.args, **action.kwargs)
+                with action_timer:
+                    result = action.function(*action.args, **action.kwargs)
             except Exception as err:
                 log.debug("_execUpdateAction: %s" % str(err))
                 action.callback_Failure()
@@ -599,7 +606,8 @@ class JobRegistry_Monitor(GangaThread):
                     self.__mainLoopCond.wait()
 
                 log.debug("Launching Monitoring Step")
-                self.__monStep()
+                with step_timer:
+                    self.__monStep()
 
                 log.debug("Finished Step")
 
@@ -1136,7 +1144,10 @@ class JobRegistry_Monitor(GangaThread):
                         job_ids += ' %s' % str(this_job.id) 
                     log.debug("Updating Jobs: %s" % job_ids)
                     try:
-                        stripProxy(backendObj).master_updateMonitoringInformation(this_job_list)
+                        jobs_updated.inc(len(this_job_list))
+                        with metrics.timer('monitoring_backend_update_seconds', 'Time for a backend to update the status of a bunch of jobs',
+                                           backend=getName(backendObj)):
+                            stripProxy(backendObj).master_updateMonitoringInformation(this_job_list)
                     except Exception as err:
                         #raise err
                         log.debug("Err: %s" % str(err))
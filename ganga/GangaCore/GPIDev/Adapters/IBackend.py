@@ -22,6 +22,7 @@ import os
 import itertools
 import time
 from collections import defaultdict
+from concurrent import futures
 
 from GangaCore.Core.GangaThread.WorkerThreads import getQueues
 from GangaCore.Utility.Config import getConfig
@@ -437,6 +438,25 @@ class IBackend(GangaObject):
 
         queues = getQueues()
 
+        # the monitoring tasks queued by this call: at most NumWorkerThreads of them are queued or running at once,
+        # the next one is queued when one finishes and the call returns when they are all done
+        pending = set()
+        max_pending = max(1, getConfig("Queues")['NumWorkerThreads'])
+
+        def monitoring_stopped():
+            return was_monitoring_running and not monitoring_component.isEnabled(False)
+
+        def wait_for_monitoring(max_left):
+            while len(pending) > max_left and not monitoring_stopped():
+                done, _ = futures.wait(pending, timeout=1., return_when=futures.FIRST_COMPLETED)
+                pending.difference_update(done)
+
+        def queue_monitoring(function, monitored_jobs):
+            wait_for_monitoring(max_pending - 1)
+            future = queues._addSystem(function, args=(monitored_jobs,), name="Backend Monitor")
+            if future is not None:
+                pending.add(future)
+
         for j in jobs:
             ## All subjobs should have same backend
             if len(j.subjobs) > 0:
@@ -490,8 +510,7 @@ class IBackend(GangaObject):
                         for sj_id in this_block:
                             subjobs_to_monitor.append(j.subjobs[sj_id])
                         if multiThreadMon:
-                            if queues.totalNumIntThreads() < getConfig("Queues")['NumWorkerThreads']:
-                                queues._addSystem(j.backend.updateMonitoringInformation, args=(subjobs_to_monitor,), name="Backend Monitor")
+                            queue_monitoring(j.backend.updateMonitoringInformation, subjobs_to_monitor)
                         else:
                             j.backend.updateMonitoringInformation(subjobs_to_monitor)
                     except Exception as err:
@@ -509,25 +528,14 @@ class IBackend(GangaObject):
             for this_backend in simple_jobs.keys():
                 logger.debug('Monitoring jobs: %s', repr([jj._repr() for jj in simple_jobs[this_backend]]))
                 if multiThreadMon:
-                    if queues.totalNumIntThreads() < getConfig("Queues")['NumWorkerThreads']:
-                        queues._addSystem(stripProxy(simple_jobs[this_backend][0].backend).updateMonitoringInformation,
-                                          args=(simple_jobs[this_backend],), name="Backend Monitor")
+                    queue_monitoring(stripProxy(simple_jobs[this_backend][0].backend).updateMonitoringInformation,
+                                     simple_jobs[this_backend])
                 else:
                     stripProxy(simple_jobs[this_backend][0].backend).updateMonitoringInformation(simple_jobs[this_backend])
 
         logger.debug("Finished Monitoring request")
 
-        if not multiThreadMon:
-            return
-
-        loop = True
-        while loop:
-            for stat in queues._monitoring_threadpool.worker_status():
-                loop = False;
-                if stat[0] is not None and stat[0].startswith("Backend Monitor"):
-                    loop = True;
-                    break;
-            time.sleep(1.)
+        wait_for_monitoring(0)
 
     @staticmethod
     def updateMonitoringInformation(jobs):
@@ -6,9 +6,14 @@
 from GangaCore.GPIDev.Base.Proxy import GPIProxyObject
 from GangaCore.Utility.Config import ConfigError, getConfig
 from GangaCore.GPIDev.Adapters.IPostProcessor import PostProcessException, IPostProcessor
+from GangaCore.Core.GangaThread.WorkerThreads import getQueues
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
 import GangaCore.Utility.logging
+import glob
+import json
 import os
+import shutil
+import threading
 
 from GangaCore.GPIDev.Base.Proxy import isType
 from posixpath import curdir, sep, pardir, join, abspath, commonprefix
@@ -42,6 +47,148 @@ def getDefaultMergeDir():
     return os.path.expanduser(outputdir)
 
 
+# one lock per master job so that subjobs finalised by different threads and the folds
+# queued in the finalisation pool do not touch the same partial merge at the same time, and the state of its
+# incremental merge so that its checkpoint is only read once
+_incremental_locks = {}
+_incremental_states = {}
+_incremental_locks_lock = threading.Lock()
+
+
+def _getIncrementalLock(job):
+    with _incremental_locks_lock:
+        return _incremental_locks.setdefault(job.getFQID('.'), threading.RLock())
+
+
+def _getIncrementalState(job):
+    """The state of the incremental merge of the master job, to be used with its lock held"""
+    with _incremental_locks_lock:
+        state = _incremental_states.get(job.getFQID('.'))
+    if state is None:
+        state = IncrementalMergeState(job)
+        with _incremental_locks_lock:
+            _incremental_states[job.getFQID('.')] = state
+    return state
+
+
+def _forgetIncremental(job):
+    """Drops the lock and the state of the incremental merge of the master job once it is over"""
+    with _incremental_locks_lock:
+        _incremental_locks.pop(job.getFQID('.'), None)
+        _incremental_states.pop(job.getFQID('.'), None)
+
+
+class IncrementalMergeState(object):
+
+    """
+    Checkpoint of an incremental merge of the subjobs of a master job.
+
+    For each output file (relative to the job outputdir) this records the files already
+    folded into the partial result together with their modification times, the files
+    waiting to be folded and the generation of the partial file. A fold always writes a
+    new generation before the checkpoint is updated, so an interrupted fold leaves the
+    checkpoint pointing at a consistent partial result or at nothing, in which case the
+    merge falls back to merging everything from scratch.
+
+    The subjobs recorded since the last fold are appended to a journal, one line each,
+    which is replayed over the checkpoint when it is read and emptied when it is saved.
+    """
+
+    checkpoint_name = 'checkpoint.json'
+    journal_name = 'journal.jsonl'
+
+    def __init__(self, job):
+        self.location = os.path.join(job.getDebugWorkspace().getPath(), 'incremental_merge')
+        self.subjobs = set()
+        self.files = {}
+        self.load()
+
+    def load(self):
+        checkpoint = os.path.join(self.location, self.checkpoint_name)
+        if os.path.exists(checkpoint):
+            try:
+                with open(checkpoint) as f:
+                    data = json.load(f)
+                self.subjobs = set(data['subjobs'])
+                self.files = data['files']
+            except (IOError, ValueError, KeyError) as err:
+                logger.warning('Could not read incremental merge checkpoint %s: %s' % (checkpoint, err))
+                self.subjobs = set()
+                self.files = {}
+                return
+
+        journal = os.path.join(self.location, self.journal_name)
+        if not os.path.exists(journal):
+            return
+        try:
+            with open(journal) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line of an interrupted append
+                        break
+                    self._add(record['subjob'], record['files'])
+        except (IOError, KeyError) as err:
+            logger.warning('Could not read incremental merge journal %s: %s' % (journal, err))
+
+    def _add(self, subjob, job_files):
+        if subjob in self.subjobs:
+            return
+        for key, matched in job_files.items():
+            self.entry(key)['pending'].extend(matched)
+        self.subjobs.add(subjob)
+
+    def record(self, subjob, job_files):
+        """Adds the files of a subjob to the pending files, appending it to the journal"""
+        if not os.path.isdir(self.location):
+            os.makedirs(self.location)
+        with open(os.path.join(self.location, self.journal_name), 'a') as f:
+            f.write(json.dumps({'subjob': subjob, 'files': job_files}) + '\n')
+        self._add(subjob, job_files)
+
+    def save(self):
+        if not os.path.isdir(self.location):
+            os.makedirs(self.location)
+        checkpoint = os.path.join(self.location, self.checkpoint_name)
+        with open(checkpoint + '.new', 'w') as f:
+            json.dump({'subjobs': sorted(self.subjobs), 'files': self.files}, f)
+        os.replace(checkpoint + '.new', checkpoint)
+        # the checkpoint now holds everything in the journal
+        journal = os.path.join(self.location, self.journal_name)
+        if os.path.exists(journal):
+            os.remove(journal)
+
+    def remove(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+        self.subjobs = set()
+        self.files = {}
+
+    def entry(self, key):
+        return self.files.setdefault(key, {'generation': 0, 'merged': {}, 'pending': []})
+
+    def partialPath(self, key, generation=None):
+        """Path of the partial result for key, None if nothing has been folded yet"""
+        if generation is None:
+            generation = self.files[key]['generation']
+        if not generation:
+            return None
+        # the original name goes last so that the file extension (e.g. .root) is kept
+        return os.path.join(self.location, os.path.dirname(key), 'gen%d_%s' % (generation, os.path.basename(key)))
+
+    def isValid(self):
+        """Checks that every partial result exists and that no merged input has changed since it was folded"""
+        for key, entry in self.files.items():
+            if entry['generation'] and not os.path.exists(self.partialPath(key)):
+                logger.debug('Partial merge of %s is missing' % key)
+                return False
+            for f, mtime in entry['merged'].items():
+                if not os.path.exists(f) or os.path.getmtime(f) != mtime:
+                    logger.debug('Input %s has changed since it was merged' % f)
+                    return False
+        return True
+
+
 class IMerger(IPostProcessor):
 
     """
@@ -74,13 +221,223 @@ class IMerger(IPostProcessor):
         """
         if (len(job.subjobs) != 0):
             try:
+                if self._isIncremental():
+                    return self.mergeIncremental(job)
                 return self.merge(job.subjobs, job.outputdir)
             except PostProcessException as e:
                 logger.error("%s" % e)
                 return self.failure
         else:
+            if job.master is not None and self._isIncremental():
+                self.foldSubjob(job, newstatus)
             return True
 
+    def _isIncremental(self):
+        return self._schema.hasAttribute('incremental') and self.incremental
+
+    def foldfiles(self, partial_file, file_list, output_file):
+        """Merges the partial result partial_file (None for the first fold) and file_list into output_file.
+        Mergers whose output can be merged again with more input files need not override this."""
+        if partial_file is not None:
+            file_list = [partial_file] + file_list
+        self.mergefiles(file_list, output_file)
+
+    def finalisefile(self, partial_file, output_file):
+        """Turns the partial result of an incremental merge into the final output_file"""
+        shutil.move(partial_file, output_file)
+
+    def _foldPending(self, state, key):
+        """Folds the pending files of key into a new generation of its partial result"""
+        entry = state.entry(key)
+        if not entry['pending']:
+            return
+        old_partial = state.partialPath(key)
+        new_partial = state.partialPath(key, entry['generation'] + 1)
+        if not os.path.isdir(os.path.dirname(new_partial)):
+            os.makedirs(os.path.dirname(new_partial))
+
+        self.foldfiles(old_partial, entry['pending'], new_partial)
+
+        for f in entry['pending']:
+            entry['merged'][f] = os.path.getmtime(f)
+        entry['pending'] = []
+        entry['generation'] += 1
+        state.save()
+
+        if old_partial is not None and os.path.exists(old_partial):
+            os.remove(old_partial)
+
+    def foldSubjob(self, job, newstatus):
+        """Records the output of a finished subjob in the incremental merge of its master.
+        Once enough files are pending they are folded into the partial result by the finalisation
+        thread pool, so that the thread finalising the subjob (usually the monitoring) never runs the merge.
+        Any problem here is left for the final merge to deal with and never fails the subjob."""
+        if newstatus != 'completed':
+            return
+
+        master = job.master
+        with _getIncrementalLock(master):
+            state = _getIncrementalState(master)
+            if job.id in state.subjobs:
+                return
+            try:
+                job_files = self._getJobFiles(job, self.ignorefailed)
+            except PostProcessException as err:
+                logger.debug('Not folding job %s into the incremental merge: %s' % (job.fqid, err))
+                return
+
+            state.record(job.id, job_files)
+
+            batch_size = getConfig('Mergers')['incremental_batch_size']
+            keys = [key for key in job_files if len(state.entry(key)['pending']) >= batch_size]
+
+        if keys:
+            # when the queues are frozen the files stay pending for the final merge
+            getQueues()._addFinalisation(self._foldQueued, args=(master, keys),
+                                         name='Incremental merge of job %s' % master.fqid)
+
+    def _foldQueued(self, master, keys):
+        """Folds the pending files of keys into the partial results of the incremental merge of master.
+        Nothing is done once the merge has been completed, or if another fold got there first."""
+        with _incremental_locks_lock:
+            lock = _incremental_locks.get(master.getFQID('.'))
+        if lock is None:
+            return
+        with lock:
+            with _incremental_locks_lock:
+                state = _incremental_states.get(master.getFQID('.'))
+            if state is None:
+                return
+            batch_size = getConfig('Mergers')['incremental_batch_size']
+            for key in keys:
+                if len(state.entry(key)['pending']) < batch_size:
+                    continue
+                try:
+                    self._foldPending(state, key)
+                except PostProcessException as err:
+                    logger.warning('Incremental merge of %s for job %s failed and will be retried when the job finishes: %s'
+                                   % (key, master.fqid, err))
+
+    def mergeIncremental(self, job):
+        """Completes the incremental merge of the subjobs of job into job.outputdir,
+        merging only the files that have not been folded into the partial results yet."""
+        with _getIncrementalLock(job):
+            state = _getIncrementalState(job)
+            try:
+                if not state.files or not state.isValid() or any(len(sj.subjobs) for sj in job.subjobs):
+                    if state.files:
+                        logger.warning('The incremental merge of job %s can not be used. Merging all files again.' % job.fqid)
+                    state.remove()
+                    return self.merge(job.subjobs, job.outputdir)
+
+                outputdir = job.outputdir
+                for sj in job.subjobs:
+                    if sj.id in state.subjobs:
+                        continue
+                    if self._checkJobStatus(sj, self.ignorefailed) is False:
+                        continue
+                    for key, matched in self._getJobFiles(sj, self.ignorefailed).items():
+                        state.entry(key)['pending'].extend(matched)
+
+                for key in state.files:
+                    outputfile = self._prepareOutputFile(outputdir, key, self.overwrite)
+                    entry = state.entry(key)
+                    for f in entry['pending']:
+                        if f == outputfile:
+                            raise PostProcessException(
+                                'Output file %s equals input file %s. The merge will fail.' % (outputfile, f))
+                    try:
+                        self._foldPending(state, key)
+                        self.finalisefile(state.partialPath(key), outputfile)
+                    except PostProcessException as e:
+                        self._writeSummary(outputfile, error=str(e))
+                        raise e
+                    self._writeSummary(outputfile, files=list(entry['merged']))
+
+                state.remove()
+            finally:
+                # the next merge of job, if any, reads its checkpoint again
+                _forgetIncremental(job)
+
+        return self.success
+
+    def _checkJobStatus(self, j, ignorefailed):
+        """Returns True if j can be merged, False if it should be skipped and raises otherwise"""
+        if j.status != 'completed':
+            # check if we can keep going
+            if j.status == 'failed' or j.status == 'killed':
+                if ignorefailed:
+                    logger.warning('Job %s has status %s and is being ignored.', j.fqid, j.status)
+                    return False
+                else:
+                    raise PostProcessException('Job %s has status %s and so the merge can not continue. '
+                                               'This can be overridden with the ignorefailed flag.' % (j.fqid, j.status))
+            else:
+                raise PostProcessException("Job %s is in an unsupported status %s and so the merge can not continue. '\
+                'Supported statuses are 'completed', 'failed' or 'killed' (if the ignorefailed flag is set)." % (j.fqid, j.status))
+        return True
+
+    def _getJobFiles(self, j, ignorefailed):
+        """Returns a dict of the files of j matching self.files, keyed by their path relative to j.outputdir"""
+        files = {}
+        for f in self.files:
+
+            matchedFiles = glob.glob(os.path.join(j.outputdir, f))
+            for matchedFile in matchedFiles:
+                relMatchedFile = ''
+                try:
+                    relMatchedFile = os.path.relpath(
+                        matchedFile, j.outputdir)
+                except Exception as err:
+                    logger.debug("Err: %s" % err)
+                    GangaCore.Utility.logging.log_unknown_exception()
+                    relMatchedFile = relpath(matchedFile, j.outputdir)
+                files.setdefault(relMatchedFile, []).append(matchedFile)
+
+            if not len(matchedFiles):
+                if ignorefailed:
+                    logger.warning('The file pattern %s in Job %s was not found. The file will be ignored.', f, j.fqid)
+                    continue
+                else:
+                    raise PostProcessException('The file pattern %s in Job %s was not found and so the merge can not continue. '
+                                               'This can be overridden with the ignorefailed flag.' % (f, j.fqid))
+        return files
+
+    @staticmethod
+    def _prepareOutputFile(outputdir, k, overwrite):
+        """Checks that the output file k may be written in outputdir and creates its directory"""
+        # make sure we are not going to over write anything
+        outputfile = os.path.join(outputdir, k)
+        if os.path.exists(outputfile) and not overwrite:
+            raise PostProcessException('The merge process can not continue as it will result in over writing. '
+                                       'Either move the file %s or set the overwrite flag to True.' % outputfile)
+
+        # make the directory if it does not exist
+        # other mergers may be creating it concurrently (see SmartMerger)
+        os.makedirs(outputdir, exist_ok=True)
+
+        # recreate structure from output sandbox
+        outputfile_dirname = os.path.dirname(outputfile)
+        if outputfile_dirname != outputdir:
+            os.makedirs(outputfile_dirname, exist_ok=True)
+
+        return outputfile
+
+    @staticmethod
+    def _writeSummary(outputfile, files=None, error=None):
+        """Writes the merge_summary log file next to outputfile"""
+        log_file = '%s.merge_summary' % outputfile
+        with open(log_file, 'w') as log:
+            if error is None:
+                log.write('# -- List of files merged -- #\n')
+                for f in files:
+                    log.write('%s\n' % f)
+                log.write('# -- End of list -- #\n')
+            else:
+                # store the error msg
+                log.write('# -- Error in Merge -- #\n')
+                log.write('\t%s\n' % error)
+
     def merge(self, jobs, outputdir=None, ignorefailed=None, overwrite=None):
 
         if ignorefailed is None:
@@ -113,18 +470,8 @@ class IMerger(IPostProcessor):
 
         for j in jobs:
             # first check that the job is ok
-            if j.status != 'completed':
-                # check if we can keep going
-                if j.status == 'failed' or j.status == 'killed':
-                    if ignorefailed:
-                        logger.warning('Job %s has status %s and is being ignored.', j.fqid, j.status)
-                        continue
-                    else:
-                        raise PostProcessException('Job %s has status %s and so the merge can not continue. '
-                                                   'This can be overridden with the ignorefailed flag.' % (j.fqid, j.status))
-                else:
-                    raise PostProcessException("Job %s is in an unsupported status %s and so the merge can not continue. '\
-                    'Supported statuses are 'completed', 'failed' or 'killed' (if the ignorefailed flag is set)." % (j.fqid, j.status))
+            if not self._checkJobStatus(j, ignorefailed):
+                continue
 
             if len(j.subjobs):
                 sub_result = self.merge(
@@ -133,48 +480,11 @@ class IMerger(IPostProcessor):
                     raise PostProcessException('The merge of Job %s failed and so the merge can not continue. '
                                                'This can be overridden with the ignorefailed flag.' % j.fqid)
 
-            import glob
-            for f in self.files:
-
-                for matchedFile in glob.glob(os.path.join(j.outputdir, f)):
-                    relMatchedFile = ''
-                    try:
-                        relMatchedFile = os.path.relpath(
-                            matchedFile, j.outputdir)
-                    except Exception as err:
-                        logger.debug("Err: %s" % err)
-                        GangaCore.Utility.logging.log_unknown_exception()
-                        relMatchedFile = relpath(matchedFile, j.outputdir)
-                    if relMatchedFile in files:
-                        files[relMatchedFile].append(matchedFile)
-                    else:
-                        files[relMatchedFile] = [matchedFile]
-
-                if not len(glob.glob(os.path.join(j.outputdir, f))):
-                    if ignorefailed:
-                        logger.warning('The file pattern %s in Job %s was not found. The file will be ignored.', f, j.fqid)
-                        continue
-                    else:
-                        raise PostProcessException('The file pattern %s in Job %s was not found and so the merge can not continue. '
-                                                   'This can be overridden with the ignorefailed flag.' % (f, j.fqid))
-                # files[f].extend(matchedFiles)
+            for relMatchedFile, matchedFiles in self._getJobFiles(j, ignorefailed).items():
+                files.setdefault(relMatchedFile, []).extend(matchedFiles)
 
         for k in files.keys():
-            # make sure we are not going to over write anything
-            outputfile = os.path.join(outputdir, k)
-            if os.path.exists(outputfile) and not overwrite:
-                raise PostProcessException('The merge process can not continue as it will result in over writing. '
-                                           'Either move the file %s or set the overwrite flag to True.' % outputfile)
-
-            # make the directory if it does not exist
-            if not os.path.exists(outputdir):
-                os.makedirs(outputdir)
-
-            # recreate structure from output sandbox
-            outputfile_dirname = os.path.dirname(outputfile)
-            if outputfile_dirname != outputdir:
-                if not os.path.exists(outputfile_dirname):
-                    os.mkdir(outputfile_dirname)
+            outputfile = self._prepareOutputFile(outputdir, k, overwrite)
 
             # check that we are merging some files
             if not files[k]:
@@ -187,27 +497,15 @@ class IMerger(IPostProcessor):
                     raise PostProcessException(
                         'Output file %s equals input file %s. The merge will fail.' % (outputfile, f))
             # merge the lists of files with a merge tool into outputfile
-            msg = None
             try:
                 self.mergefiles(files[k], outputfile)
 
                 # create a log file of the merge
                 # we only get to here if the merge_tool ran ok
-                log_file = '%s.merge_summary' % outputfile
-                with open(log_file, 'w') as log:
-                    log.write('# -- List of files merged -- #\n')
-                    for f in files[k]:
-                        log.write('%s\n' % f)
-                    log.write('# -- End of list -- #\n')
+                self._writeSummary(outputfile, files=files[k])
 
             except PostProcessException as e:
-                msg = str(e)
-
-                # store the error msg
-                log_file = '%s.merge_summary' % outputfile
-                with open(log_file, 'w') as log:
-                    log.write('# -- Error in Merge -- #\n')
-                    log.write('\t%s\n' % msg)
+                self._writeSummary(outputfile, error=str(e))
                 raise e
 
         return self.success
@@ -287,7 +287,7 @@ class Descriptor(object):
     This class also handles thread-locking of a class including both the getter and setter methods to ensure object consistency
     """
 
-    __slots__ = ('_name', '_item', '_checkset_name', '_filter_name', '_getter_name', '_checkset_name')
+    __slots__ = ('_name', '_item', '_checkset_name', '_filter_name', '_getter_name')
 
     def __init__(self, name, item):
         """
@@ -325,10 +325,29 @@ class Descriptor(object):
         if self._getter_name:
             raise AttributeError('cannot modify or delete "%s" property (declared as "getter")' % _getName(self))
 
-    @synchronised_get_descriptor
     def __get__(self, obj, cls):
         """
         Get method of Descriptor
+        Values already in memory are returned without locking: a value is only ever replaced in ``_data`` (under the
+        root object's lock in ``__set__``), never modified in place, and a single dict lookup is atomic, so a reader
+        sees either the old or the new value. Anything else, e.g. getters, the index cache or loading from disk,
+        goes through ``_locked_get`` which holds the read-lock of the root object.
+        Args:
+            obj (GangaObject): This is the object which controls the attribute of interest
+            cls (class): This is the class of the Ganga Object which is being called
+        """
+        if obj is not None and not self._getter_name:
+            try:
+                return obj._data_dict[self._name]
+            except KeyError:
+                pass
+
+        return self._locked_get(obj, cls)
+
+    @synchronised_get_descriptor
+    def _locked_get(self, obj, cls):
+        """
+        Get method of Descriptor for values which may need to be computed or loaded
         This wraps the object in question with a read-lock which ensures object onsistency across multiple threads
         Args:
             obj (GangaObject): This is the object which controls the attribute of interest
@@ -479,8 +498,11 @@ class Descriptor(object):
                 from GangaCore.GPIDev.Base.Proxy import stripProxy, runtimeEvalString
                 val = stripProxy(runtimeEvalString(obj, _set_name, val))
 
-        if hasattr(obj, '_checkset_name'):
-            checkSet = self._bind_method(obj, self._checkset_name)
+        # Only the status has its checkset method called, e.g. Job._checkset_status.
+        # The other checkset names of the schemas have never been called and are not all defined, e.g. the 'middleware' of LCG
+        is_status = _set_name == 'status'
+        if is_status and self._checkset_name is not None:
+            checkSet = getattr(obj, self._checkset_name, None)
             if checkSet is not None:
                 checkSet(val)
 
@@ -506,8 +528,17 @@ class Descriptor(object):
         if not basic:
             new_value = Descriptor.cleanValue(obj, val, _set_name)
 
+        if is_status:
+            old_value = obj._data.get(_set_name)
+
         obj.setSchemaAttribute(_set_name, new_value)
 
+        # tell the object once the new status is in place, e.g. Job._statusChanged keeps the histogram of its master
+        if is_status:
+            statusChanged = getattr(obj, '_statusChanged', None)
+            if statusChanged is not None:
+                statusChanged(old_value, new_value)
+
         obj._setDirty()
 
     @staticmethod
@@ -941,9 +972,10 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
             attrib_name (str): the name of the schema attribute
             attrib_value (unknown): the value to set it to
         """
-        self._data[attrib_name] = attrib_value
+        # set the parent before publishing the value, unlocked readers may pick it up straight away
         if isinstance(attrib_value, Node) and attrib_value._getParent() is not self:
-            self._data[attrib_name]._setParent(self)
+            attrib_value._setParent(self)
+        self._data[attrib_name] = attrib_value
 
     @property
     def _index_cache(self):
@@ -1089,6 +1121,12 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
         if reg is not None:
             reg._release_session_lock_and_flush(r)
 
+    def _setDirty(self):
+        """ Set the dirty flag all the way up to the parent and queue the root object with its registry for writing"""
+        super(GangaObject, self)._setDirty()
+        if self._getParent() is None and self._registry is not None:
+            self._registry._markDirty(self)
+
     def _loadObject(self):
         """If there's an attached registry then ask it to load this object"""
         if self._should_load and self._registry is not None:
@@ -265,7 +265,9 @@ def stripProxy(obj):
     Args:
         obj (object): This may be an instance or a class
     """
-    if is_namedtuple_instance(obj):
+    if isinstance(obj, GPIProxyObject):
+        return GPIProxyObject.__getattribute__(obj, implRef)
+    elif is_namedtuple_instance(obj):
         return type(obj)(*[stripProxy(_) for _ in obj])
     elif isinstance(obj, (list, tuple)):
         return type(obj)(stripProxy(_) for _ in obj)
@@ -282,12 +284,14 @@ def addProxy(obj):
     Args:
         obj (GangaObject): This may be a Ganga object which you're wanting to add a proxy to
     """
-    if isType(obj, GangaObject):
-        if not isProxy(obj):
-            if hasattr(obj, proxyObject):
-                return getattr(obj, proxyObject)
-            else:
-                return GPIProxyObjectFactory(obj)
+    if isinstance(obj, GangaObject):
+        # the proxy of an object is created once and then kept on the object itself
+        proxy = obj.__dict__.get(proxyObject)
+        if proxy is not None:
+            return proxy
+        return GPIProxyObjectFactory(obj)
+    elif isinstance(obj, GPIProxyObject):
+        return obj
     elif isclass(obj) and issubclass(obj, GangaObject):
         return getProxyClass(obj)
     elif is_namedtuple_instance(obj):
@@ -348,15 +352,21 @@ valueTypeAllowed = lambda val, valTypeList: _valueTypeAllowed(val, valTypeList,
 
 class ProxyDataDescriptor(object):
 
-    __slots__ = ('_name', )
+    __slots__ = ('_name', '_proxy_get', '_is_component', '_sequence', '_plain')
 
-    def __init__(self, name):
+    def __init__(self, name, item):
         """
         Descriptor which sits in fromnt  of raw unproxied objects
         Args:
             name (str): Name of the attribute which we're looking after here
+            item (Item): The schema item of this attribute, used to decide once how values are wrapped
         """
         self._name = name
+        self._proxy_get = item['proxy_get']
+        self._is_component = isinstance(item, ComponentItem)
+        self._sequence = item['sequence']
+        # plain attributes hold simple values which only need a proxy if a GangaObject has been stored in them
+        self._plain = not (self._proxy_get or self._is_component or self._sequence)
 
     # apply object conversion or if it failes, make the wrapper proxy
     def disguiseComponentObject(self, v):
@@ -395,28 +405,34 @@ class ProxyDataDescriptor(object):
             # return Schema.make_helper(getattr(getattr(cls, implRef), getName(self)))
             return getattr(stripProxy(cls), getName(self))
 
-        raw_obj = stripProxy(obj)
+        raw_obj = GPIProxyObject.__getattribute__(obj, implRef)
         try:
-            val = getattr(raw_obj, getName(self))
+            val = getattr(raw_obj, self._name)
         except Exception as err:
-            if getName(self) in raw_obj.__dict__:
-                val = raw_obj.__dict__[getName(self)]
+            if self._name in raw_obj.__dict__:
+                val = raw_obj.__dict__[self._name]
             else:
-                val = getattr(raw_obj, getName(self))
+                val = getattr(raw_obj, self._name)
+
+        if self._plain:
+            if isinstance(val, GangaObject):
+                return addProxy(val)
+            return val
 
         # wrap proxy
-        item = raw_obj._schema[getName(self)]
+        if self._proxy_get:
+            return getattr(raw_obj, self._proxy_get)()
 
-        if item['proxy_get']:
-            return getattr(raw_obj, item['proxy_get'])()
+        if not self._sequence and isinstance(val, GangaObject):
+            return addProxy(val)
 
-        if isType(item, ComponentItem):
+        if self._is_component:
             disguiser = self.disguiseComponentObject
         else:
             disguiser = self.disguiseAttribute
 
         ## FIXME Add GangaList?
-        if item['sequence'] and isType(val, list):
+        if self._sequence and isType(val, list):
             from GangaCore.GPIDev.Lib.GangaList.GangaList import makeGangaList
             val = makeGangaList(val, disguiser)
 
@@ -1121,27 +1137,29 @@ Setting a [protected] or a unexisting property raises AttributeError.""")
 #                return object.__getattribute__(self,name)
 #        return object.__getattribute__(self,name)
 
+    # The attributes read through _attribute_filter__get__ are worked out once for the class here,
+    # rather than by looking through dir() of the object on every attribute access from the GPI
+    if hasattr(pluginclass, '_attribute_filter__get__'):
+        filtered_attributes = frozenset(attr for attr, item in pluginclass._schema.allItems() if not item['hidden'])
+    else:
+        filtered_attributes = frozenset()
+
     def _getattribute(self, name):
 
         #logger.debug("_getattribute: %s" % name)
 
-        if name.startswith('__') or name == implRef:
+        if name in filtered_attributes:
+            # the filter may return a list or dict of GangaObjects, which need their proxies as well
+            return addProxy(GPIProxyObject.__getattribute__(self, implRef)._attribute_filter__get__(name))
+        elif name.startswith('__') or name == implRef:
             return GPIProxyObject.__getattribute__(self, name)
         else:
-            implInstance = stripProxy(self)
+            try:
+                returnable = GPIProxyObject.__getattribute__(self, name)
+            except AttributeError:
+                raise GangaAttributeError("Object '%s' does not have attribute: '%s'" % (getName(self), name))
 
-            if '_attribute_filter__get__' in dir(implInstance) and \
-                    not isType(implInstance, ObjectMetaclass) and \
-                    implInstance._schema.hasItem(name) and \
-                    not implInstance._schema.getItem(name)['hidden']:
-                        returnable = addProxy(implInstance._attribute_filter__get__(name))
-            else:
-                try:
-                    returnable = GPIProxyObject.__getattribute__(self, name)
-                except AttributeError:
-                    raise GangaAttributeError("Object '%s' does not have attribute: '%s'" % (getName(self), name))
-
-        if isType(returnable, GangaObject):
+        if isinstance(returnable, GangaObject):
             return addProxy(returnable)
         else:
             return returnable
@@ -1200,7 +1218,7 @@ Setting a [protected] or a unexisting property raises AttributeError.""")
     # export visible properties... do not export hidden properties
     for attr, item in pluginclass._schema.allItems():
         if not item['hidden']:
-            d[attr] = ProxyDataDescriptor(attr)
+            d[attr] = ProxyDataDescriptor(attr, item)
 
     return type(name, (GPIProxyObject,), d)
 
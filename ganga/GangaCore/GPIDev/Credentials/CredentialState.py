@@ -0,0 +1,169 @@
+"""
+The validity of the credential files, read in-process and shared by all the threads.
+
+Checking a proxy with voms-proxy-info or dirac-proxy-info starts a subprocess, which adds up when the monitoring
+checks the credential of every job on every cycle. Instead the certificates of the proxy file are read here: the
+end of validity of a proxy is the earliest notAfter of its chain. What was read is kept per file until the file
+changes (its mtime, size or inode). The file is stat()ed at most every Credentials.AtomicDelay seconds, except
+when the proxy is close to its end (Credentials.ExpiryMargin) so that a renewal is noticed straight away.
+
+When a proxy is found to have expired, one warning is logged and counted in the metrics. It is not repeated
+until the file has changed.
+"""
+
+import base64
+import calendar
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+import GangaCore.Utility.logging
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.Metrics import metrics
+
+logger = GangaCore.Utility.logging.getLogger()
+
+_pem_certificate = re.compile(b'-----BEGIN CERTIFICATE-----(.+?)-----END CERTIFICATE-----', re.DOTALL)
+
+
+def _der_element(data, offset):
+    """ Return (tag, start of the content, end of the content) of the DER element at offset """
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7f
+        length = int.from_bytes(data[offset:offset + count], 'big')
+        offset += count
+    return tag, offset, offset + length
+
+
+def _der_time(tag, value):
+    """ The datetime of an UTCTime or a GeneralizedTime """
+    text = value.decode('ascii').rstrip('Z')
+    if tag == 0x17:
+        year = int(text[:2])
+        text = ('19' if year >= 50 else '20') + text
+    return datetime.strptime(text[:14], '%Y%m%d%H%M%S')
+
+
+def certificate_not_after(der):
+    """ Return the notAfter of a DER encoded X.509 certificate, as a UTC datetime """
+    # Certificate ::= SEQUENCE { tbsCertificate SEQUENCE { [0] version OPTIONAL, serialNumber, signature, issuer,
+    #                                                      validity SEQUENCE { notBefore, notAfter }, ... }, ... }
+    _, start, _ = _der_element(der, 0)
+    _, offset, _ = _der_element(der, start)
+    tag, _, end = _der_element(der, offset)
+    if tag == 0xa0:
+        offset = end
+    # serialNumber, signature and issuer
+    for _ in range(3):
+        _, _, offset = _der_element(der, offset)
+    _, offset, _ = _der_element(der, offset)
+    _, _, offset = _der_element(der, offset)
+    tag, start, end = _der_element(der, offset)
+    return _der_time(tag, der[start:end])
+
+
+def proxy_not_after(path):
+    """
+    Return the end of validity of the certificate chain in a PEM file as a local datetime, or None if the file
+    does not hold any certificate which can be read
+    """
+    with open(path, 'rb') as pem_file:
+        blocks = _pem_certificate.findall(pem_file.read())
+    ends = []
+    for block in blocks:
+        try:
+            ends.append(certificate_not_after(base64.b64decode(b''.join(block.split()))))
+        except (ValueError, IndexError, TypeError):
+            logger.debug('Cannot read a certificate in %s', path)
+    if not ends:
+        return None
+    # the notAfter are in UTC, the credentials compare their expiry time with datetime.now()
+    return datetime.fromtimestamp(calendar.timegm(min(ends).timetuple()))
+
+
+class _FileState(object):
+
+    __slots__ = ('signature', 'expiry', 'checked', 'warned')
+
+    def __init__(self, signature, expiry):
+        self.signature = signature
+        self.expiry = expiry
+        self.checked = time.time()
+        self.warned = False
+
+
+class CredentialStateCache(object):
+
+    """ The end of validity of the credential files, by path """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size, st.st_ino
+
+    def _fresh(self, state):
+        """ Can the state be used without looking at the file again """
+        config = getConfig('Credentials')
+        if time.time() - state.checked > config['AtomicDelay']:
+            return False
+        if state.expiry is not None and state.expiry - datetime.now() < timedelta(seconds=config['ExpiryMargin']):
+            return False
+        return True
+
+    def expiry_time(self, path):
+        """
+        Return the end of validity of the credential file, or None if it cannot be read in-process, in which
+        case the caller asks the middleware
+        """
+        with self._lock:
+            state = self._states.get(path)
+            if state is None or not self._fresh(state):
+                signature = self._signature(path)
+                if state is not None and signature is not None and signature == state.signature:
+                    state.checked = time.time()
+                elif signature is None:
+                    self._states.pop(path, None)
+                    return None
+                else:
+                    try:
+                        expiry = proxy_not_after(path)
+                    except (IOError, OSError):
+                        return None
+                    state = _FileState(signature, expiry)
+                    self._states[path] = state
+
+            if state.expiry is not None and state.expiry <= datetime.now() and not state.warned:
+                state.warned = True
+                expired = True
+            else:
+                expired = False
+            expiry = state.expiry
+
+        if expired:
+            logger.warning('The credential %s expired at %s', path, expiry.strftime('%Y-%m-%d %H:%M:%S'))
+            metrics.counter('credentials_expired', 'Credential files found to have expired').inc()
+        return expiry
+
+    def forget(self, path):
+        """ Drop what is known of a file, e.g. when it has been renewed or destroyed by Ganga """
+        with self._lock:
+            self._states.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+credential_states = CredentialStateCache()
@@ -12,6 +12,7 @@ from GangaCore.Utility.Config import getConfig
 
 from GangaCore.GPIDev.Adapters.ICredentialInfo import ICredentialInfo, cache, retry_command
 from GangaCore.GPIDev.Adapters.ICredentialRequirement import ICredentialRequirement
+from GangaCore.GPIDev.Credentials.CredentialState import credential_states
 from GangaCore.Core.exceptions import CredentialRenewalError, InvalidCredentialError
 
 logger = GangaCore.Utility.logging.getLogger()
@@ -62,6 +63,7 @@ class VomsProxyInfo(ICredentialInfo):
         except subprocess.CalledProcessError:
             raise CredentialRenewalError('Failed to create VOMS proxy')
         else:
+            credential_states.forget(self.location)
             logger.debug('Grid proxy %s created. Valid for %s', self.location, self.time_left())
 
     @property
@@ -81,6 +83,7 @@ class VomsProxyInfo(ICredentialInfo):
 
         if os.path.isfile(self.location):
             os.remove(self.location)
+        credential_states.forget(self.location)
 
     @cache
     def info(self):
@@ -142,10 +145,19 @@ class VomsProxyInfo(ICredentialInfo):
             return None  # No group specified in command
         return group_role_list[-1].strip()
 
-    @cache
     def expiry_time(self):
         """
-        This returns the time that a proxy will expire at in seconds
+        This returns the time that a proxy will expire at, read from the proxy file itself or else from voms-proxy-info
+        """
+        expiry = credential_states.expiry_time(self.location)
+        if expiry is None:
+            return self.command_expiry_time()
+        return expiry
+
+    @cache
+    def command_expiry_time(self):
+        """
+        This returns the time that a proxy will expire at as given by voms-proxy-info
         """
         status, output, message = self.shell.cmd1('voms-proxy-info -file "%s" -timeleft' % self.location)
         if status != 0:
@@ -326,5 +326,5 @@ def bootstrap():
     for name in stripProxy(config):
         createSectionProxy(name)
     import GangaCore.Utility.Config.Config
-    GangaCore.Utility.Config.Config._after_bootstrap = True
+    GangaCore.Utility.Config.Config.setAfterBootstrap()
     GangaCore.Utility.Config.Config.sanityCheck()
@@ -1,5 +1,6 @@
 
 
+import collections
 import copy
 import errno
 import glob
@@ -26,6 +27,7 @@ from GangaCore.GPIDev.Lib.Job.MetadataDict import MetadataDict
 from GangaCore.GPIDev.Schema import ComponentItem, FileItem, GangaFileItem, Schema, SimpleItem, Version
 from GangaCore.Utility.Config import ConfigError, getConfig
 from GangaCore.Utility.logging import getLogger, log_user_exception
+from GangaCore.Utility.Metrics import metrics
 
 from .JobTime import JobTime
 from GangaCore.Lib.Localhost import Localhost
@@ -34,6 +36,9 @@ from GangaCore.Lib.Executable import Executable
 logger = getLogger()
 config = GangaCore.Utility.Config.getConfig('Configuration')
 
+submit_timer = metrics.timer('job_submit_seconds', 'Time to submit a job, including its splitting')
+split_timer = metrics.timer('job_split_seconds', 'Time to split a job into its subjobs')
+
 
 def lazyLoadJobFQID(this_job):
     return lazyLoadJobObject(this_job, 'fqid')
@@ -235,7 +240,7 @@ class Job(GangaObject):
 
     default_registry = 'jobs'
 
-    _additional_slots = ['_storedRTHandler', '_storedJobSubConfig', '_storedAppSubConfig', '_storedJobMasterConfig', '_storedAppMasterConfig', '_stored_subjobs_proxy']
+    _additional_slots = ['_storedRTHandler', '_storedJobSubConfig', '_storedAppSubConfig', '_storedJobMasterConfig', '_storedAppMasterConfig', '_stored_subjobs_proxy', '_subjob_status_counts', '_subjob_status_checked']
 
     # TODO: usage of **kwds may be envisaged at this level to optimize the
     # overriding of values, this must be reviewed
@@ -730,26 +735,80 @@ class Job(GangaObject):
 
         return postprocessFailure
 
-    def getSubJobStatuses(self):
+    def _statusChanged(self, old_status, new_status):
         """
-        This returns a set of all of the different subjob statuses whilst respecting lazy loading
+        Called by the descriptor once a new status has been set, with the lock of the master job held
+        Args:
+            old_status (str): the status the job had, None for a new job
+            new_status (str): the status which has been set
         """
+        # keep the status histogram of the master job up to date
+        master = self.master
+        if master is not None and old_status != new_status:
+            master._subjobStatusChanged(old_status, new_status)
 
-        if isinstance(self.subjobs, SubJobXMLList):
-            stats = set(self.subjobs.getAllSJStatus())
-        else:
-            stats = set(sj.status for sj in self.subjobs)
+    def _subjobStatusChanged(self, old_status, new_status):
+        """
+        Update the subjob status histogram for a subjob moving from old_status to new_status
+        Args:
+            old_status (str): the status the subjob is leaving, None for a new subjob
+            new_status (str): the status the subjob is entering
+        """
+        counts = self._subjob_status_counts
+        if counts is None:
+            # not built yet, getSubJobStatusCounts will count the subjobs when it is first needed
+            return
+
+        if old_status is not None:
+            counts[old_status] -= 1
+            if counts[old_status] < 0:
+                # the subjob was not counted, e.g. it was created before being attached, so recount next time
+                self._subjob_status_counts = None
+                return
+        counts[new_status] += 1
+
+        if new_status in ('completed', 'failed', 'killed') and not set(+counts).difference(['completed', 'failed', 'killed']):
+            # check each count before the master job follows its subjobs to a final status
+            self._subjob_status_checked = None
 
-        return stats
+    # the subjob status histogram is checked against the statuses of the subjobs at least this often, in seconds
+    subjob_status_check_interval = 60
+
+    def getSubJobStatusCounts(self):
+        """
+        This returns a collections.Counter of the number of subjobs in each status whilst respecting lazy loading.
+        The histogram is updated as the subjobs change status, so the subjobs are only looked at again when
+        the histogram no longer adds up to the number of subjobs, e.g. after (re)splitting. The count of each status
+        is also checked once the histogram says all the subjobs have finished, before the master job follows them,
+        and every subjob_status_check_interval seconds
+        """
+        with self._lock:
+            counts = self._subjob_status_counts
+            n_subjobs = len(self.subjobs)
+
+            if counts is None or sum(counts.values()) != n_subjobs or \
+                    time.time() - (self._subjob_status_checked or 0) > self.subjob_status_check_interval:
+                if isinstance(self.subjobs, SubJobXMLList):
+                    new_counts = collections.Counter(self.subjobs.getAllSJStatus())
+                else:
+                    new_counts = collections.Counter(sj.status for sj in self.subjobs)
+                if counts is not None and +counts != new_counts and sum(counts.values()) == n_subjobs:
+                    logger.debug('job %s: subjob status histogram %s recounted as %s', self.getFQID('.'), dict(+counts), dict(new_counts))
+                counts = self._subjob_status_counts = new_counts
+                self._subjob_status_checked = time.time()
+
+            return +counts
+
+    def getSubJobStatuses(self):
+        """
+        This returns a set of all of the different subjob statuses whilst respecting lazy loading
+        """
+        return set(self.getSubJobStatusCounts())
 
     def returnSubjobStatuses(self):
-        stats = []
-        if isinstance(self.subjobs, SubJobXMLList):
-            stats = self.subjobs.getAllSJStatus()
-        else:
-            stats = [sj.status for sj in self.subjobs]
+        stats = self.getSubJobStatusCounts()
 
-        return "%s/%s/%s/%s" % (stats.count('running'), stats.count('failed') + stats.count('killed'), stats.count('completing'), stats.count('completed'))
+        return "%s/%s/%s/%s" % (stats['running'], stats['failed'] + stats['killed'], stats['completing'], stats['completed'])
 
     def updateMasterJobStatus(self):
         """
@@ -1367,6 +1426,7 @@ class Job(GangaObject):
         self._storedJobMasterConfig = None
         self._storedAppMasterConfig = None
 
+    @split_timer.timed
     def _doSplitting(self):
         # Temporary polution of Atlas stuff to (almost) transparently switch
         # from Panda to Jedi
@@ -1424,6 +1484,7 @@ class Job(GangaObject):
 
         return rjobs
 
+    @submit_timer.timed
     def submit(self, keep_going=None, keep_on_fail=None, prepare=False):
         """Submits a job. Return true on success.
 
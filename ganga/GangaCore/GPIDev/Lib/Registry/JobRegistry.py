@@ -11,7 +11,7 @@ from GangaCore.Utility.external.OrderedDict import OrderedDict as oDict
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.Core.GangaRepository.Registry import Registry, RegistryKeyError, RegistryAccessError, RegistryFlusher
 
-from GangaCore.GPIDev.Base.Proxy import stripProxy, isType
+from GangaCore.GPIDev.Base.Proxy import stripProxy, isType, getName
 
 import GangaCore.Utility.logging
 
@@ -29,6 +29,8 @@ logger = GangaCore.Utility.logging.getLogger()
 
 class JobRegistry(Registry):
 
+    _indexed_attributes = {'status': 'status', 'name': 'name', 'backend': 'class:backend', 'application': 'class:application'}
+
     def __init__(self, name, doc):
         super(JobRegistry, self).__init__(name, doc)
         self.stored_slice = JobRegistrySlice(self.name)
@@ -59,15 +61,25 @@ class JobRegistry(Registry):
                 value = None
         del this_slice
 
-        # store subjob status
+        # store the plugin names so that select(backend=..., application=...) does not need to load the job
+        for component in ('backend', 'application'):
+            try:
+                cache["class:" + component] = getName(getattr(obj, component))
+            except Exception as err:
+                logger.debug("Could not cache %s name: %s" % (component, err))
+
+        # store the creation and final times so that time range queries do not need to load the job
+        try:
+            cache["time:new"] = obj.time.timestamps.get('new')
+            cache["time:final"] = obj.time.timestamps.get('final')
+        except Exception as err:
+            logger.debug("Could not cache creation time: %s" % err)
+
+        # store subjob status from the live histogram of the master, 'subjobs:status' is kept as a flat list for older readers
         if hasattr(obj, "subjobs"):
-            cache["subjobs:status"] = []
-            if hasattr(obj.subjobs, "getAllCachedData"):
-                for sj in obj.subjobs.getAllCachedData():
-                    cache["subjobs:status"].append(sj['status'])
-            else:
-                for sj in obj.subjobs:
-                    cache["subjobs:status"].append(sj.status)
+            status_counts = obj.getSubJobStatusCounts()
+            cache["subjobs:status_counts"] = dict(status_counts)
+            cache["subjobs:status"] = list(status_counts.elements())
 
         #print("Cache: %s" % str(cache))
         return cache
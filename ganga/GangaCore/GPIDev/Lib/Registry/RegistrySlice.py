@@ -198,7 +198,28 @@ class RegistrySlice(object):
                 maxid = sys.maxsize
             select = select_by_range
 
-        for this_id in self.objects.keys():
+        matchers = {}
+
+        def get_matchers(obj):
+            # the schema items only depend on the class, so the comparisons are built once per class
+            this_class = type(obj)
+            if this_class not in matchers:
+                matchers[this_class] = dict((a, self._makeMatcher(obj, a, attrs[a])) for a in attrs if a != 'ids')
+            return matchers[this_class]
+
+        select_ids = self.objects.keys()
+        if self.name != 'box' and hasattr(self.objects, 'selectIds'):
+            # let the registry narrow down the candidates with its indexes before looking at any object
+            for this_id in select_ids:
+                these_matchers = get_matchers(self.objects[this_id])
+                candidates = self.objects.selectIds(dict((a, m[1]) for a, m in these_matchers.items()))
+                if candidates is not None:
+                    select_ids = sorted(candidates)
+                break
+
+        for this_id in select_ids:
+            if this_id not in self.objects:
+                continue
             obj = self.objects[this_id]
             logger.debug("id, obj: %s, %s" % (this_id, obj))
             if select(int(this_id)):
@@ -238,45 +259,10 @@ class RegistrySlice(object):
                                 selected = False
                                 break
                         else:
-                            try:
-                                item = obj._schema.getItem(a)
-                                logger.debug("Here: %s, is item: %s" % (a, type(item)))
-                            except KeyError as err:
-                                from GangaCore.GPIDev.Base import GangaAttributeError
-                                logger.debug("KeyError getting item: '%s' from schema" % a)
-                                raise GangaAttributeError('undefined select attribute: %s' % a)
-                            else:
-                                attrvalue = attrs[a]
-
-                                if item.isA(ComponentItem):
-                                    ## TODO we need to distinguish between passing a Class type and a defined class instance
-                                    ## If we passed a class type to select it should look only for classes which are of this type
-                                    ## If we pass a class instance a compartison of the internal attributes should be performed
-                                    from GangaCore.GPIDev.Base.Filters import allComponentFilters
-
-                                    cfilter = allComponentFilters[item['category']]
-                                    filtered_value = cfilter(attrs[a], item)
-                                    from GangaCore.GPIDev.Base.Proxy import getName
-                                    if not filtered_value is None:
-                                        attrvalue = getName(filtered_value)
-                                    else:
-                                        attrvalue = getName(attrvalue)
-
-                                    if getName(getattr(obj, a)) != attrvalue:
-                                        selected = False
-                                        break
-                                else:
-                                    if isinstance(attrvalue, str):
-                                        regex = fnmatch.translate(attrvalue)
-                                        reobj = re.compile(regex)
-                                        # Compare the type of the attribute
-                                        # against attrvalue
-                                        if not reobj.match(str(getattr(obj, a))):
-                                            selected = False
-                                    else:
-                                        if getattr(obj, a) != attrvalue:
-                                            selected = False
-                                            break
+                            is_component, matcher = get_matchers(obj)[a]
+                            if not matcher(self._getSelectValue(obj, a, is_component)):
+                                selected = False
+                                break
                 if selected:
                     logger.debug("Actually Selected")
                     callback(this_id, obj)
@@ -285,6 +271,66 @@ class RegistrySlice(object):
             else:
                 logger.debug("NOT Selected: %s" % this_id)
 
+    @staticmethod
+    def _makeMatcher(obj, a, attrvalue):
+        """
+        Returns whether the attribute is a component and a function checking a value of it against attrvalue.
+        Components are compared by plugin name, strings as wildcard patterns and anything else by equality
+        Args:
+            obj (GangaObject): an object of the class being selected on
+            a (str): name of the schema attribute
+            attrvalue (unknown): the value passed to select
+        """
+        try:
+            item = obj._schema.getItem(a)
+            logger.debug("Here: %s, is item: %s" % (a, type(item)))
+        except KeyError as err:
+            from GangaCore.GPIDev.Base import GangaAttributeError
+            logger.debug("KeyError getting item: '%s' from schema" % a)
+            raise GangaAttributeError('undefined select attribute: %s' % a)
+
+        if item.isA(ComponentItem):
+            ## TODO we need to distinguish between passing a Class type and a defined class instance
+            ## If we passed a class type to select it should look only for classes which are of this type
+            ## If we pass a class instance a compartison of the internal attributes should be performed
+            from GangaCore.GPIDev.Base.Filters import allComponentFilters
+
+            cfilter = allComponentFilters[item['category']]
+            filtered_value = cfilter(attrvalue, item)
+            if not filtered_value is None:
+                name = getName(filtered_value)
+            else:
+                name = getName(attrvalue)
+            return True, lambda value: value == name
+
+        if isinstance(attrvalue, str):
+            reobj = re.compile(fnmatch.translate(attrvalue))
+            return False, lambda value: reobj.match(str(value)) is not None
+
+        return False, lambda value: value == attrvalue
+
+    @staticmethod
+    def _getSelectValue(obj, a, is_component):
+        """
+        Returns the value of the attribute to select on, from the index cache if the object is not loaded and the
+        attribute is indexed by its registry, otherwise from the object itself which may load it from disk.
+        Components are returned by plugin name
+        Args:
+            obj (GangaObject): the object being selected
+            a (str): name of the schema attribute
+            is_component (bool): whether the attribute is a ComponentItem
+        """
+        reg = obj._getRegistry()
+        if reg is not None:
+            try:
+                return reg.getIndexedValue(obj, a)
+            except KeyError:
+                pass
+        value = getattr(obj, a)
+        if is_component:
+            return getName(value)
+        return value
+
     def copy(self, keep_going):
         this_slice = self.__class__("copy of %s" % self.name)
         for _id in self.objects.keys():
@@ -368,7 +368,15 @@ class IUnit(GangaObject):
             j = stripProxy(job)
 
             # try to preserve lazy loading
-            if hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status' in j._index_cache:
+            if hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status_counts' in j._index_cache:
+                if len(j._index_cache['subjobs:status_counts']) > 0:
+                    for sj_stat, count in j._index_cache['subjobs:status_counts'].items():
+                        if sj_stat in active_states:
+                            tot_active += count
+                else:
+                    if j._index_cache['status'] in active_states:
+                        tot_active += 1
+            elif hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status' in j._index_cache:
                 if len(j._index_cache['subjobs:status']) > 0:
                     for sj_stat in j._index_cache['subjobs:status']:
                         if sj_stat in active_states:
@@ -405,7 +413,13 @@ class IUnit(GangaObject):
             j = stripProxy(job)
 
             # try to preserve lazy loading
-            if hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status' in j._index_cache:
+            if hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status_counts' in j._index_cache:
+                if len(j._index_cache['subjobs:status_counts']) > 0:
+                    tot_active += j._index_cache['subjobs:status_counts'].get(status, 0)
+                else:
+                    if j._index_cache['status'] == status:
+                        tot_active += 1
+            elif hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status' in j._index_cache:
                 if len(j._index_cache['subjobs:status']) > 0:
                     for sj_stat in j._index_cache['subjobs:status']:
                         if sj_stat == status:
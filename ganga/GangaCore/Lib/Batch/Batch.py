@@ -3,6 +3,7 @@ import time
 import os
 import re
 import os.path
+import threading
 
 import GangaCore.Utility.logging
 import GangaCore.Utility.Config
@@ -51,6 +52,91 @@ def shell_cmd(cmd, soutfile=None, allowed_exit=[0]):
     return rc, soutfile, m is None
 
 
+repid = re.compile(r'^PID: (?P<pid>\d+)', re.M)
+requeue = re.compile(r'^QUEUE: (?P<queue>\S+)', re.M)
+reactualCE = re.compile(r'^ACTUALCE: (?P<actualCE>\S+)', re.M)
+reexit = re.compile(r'^EXITCODE: (?P<exitcode>\d+)', re.M)
+
+
+def get_last_alive(f):
+    """Time since the statusfile was last touched in seconds"""
+    talive = 0
+    try:
+        talive = time.time() - os.path.getmtime(f)
+    except OSError as x:
+        logger.debug('Problem reading status file: %s (%s)', f, str(x))
+
+    return talive
+
+
+def get_status(f):
+    """Give (pid,queue,actualCE,exit code) for job"""
+
+    pid, queue, actualCE, exitcode = None, None, None, None
+
+    statusfile = None
+    try:
+        statusfile = open(f)
+        stat = statusfile.read()
+    except IOError as x:
+        logger.debug('Problem reading status file: %s (%s)', f, str(x))
+        return pid, queue, actualCE, exitcode
+    finally:
+        if statusfile:
+            statusfile.close()
+
+    mpid = repid.search(stat)
+    if mpid:
+        pid = int(mpid.group('pid'))
+
+    mqueue = requeue.search(stat)
+    if mqueue:
+        queue = str(mqueue.group('queue'))
+
+    mactualCE = reactualCE.search(stat)
+    if mactualCE:
+        actualCE = str(mactualCE.group('actualCE'))
+
+    mexit = reexit.search(stat)
+    if mexit:
+        exitcode = int(mexit.group('exitcode'))
+
+    return pid, queue, actualCE, exitcode
+
+
+def normalise_id(batch_id):
+    """ Strip the server name from a batch id, e.g. '1234.pbs.example.org' -> '1234' """
+    return str(batch_id).split('.')[0]
+
+
+def parse_scheduler_states(output, pattern, status_map):
+    """
+    Return {batch id: (state, queue, host)} from the output of a status command. Each line is matched
+    against pattern, which has the groups 'id' and 'status' and may have 'queue' and 'host'. The states
+    are translated with status_map, the jobs in other states are left out.
+    """
+    line_re = re.compile(pattern)
+    states = {}
+    for line in output.splitlines():
+        m = line_re.match(line)
+        if m is None or m.group('status') not in status_map:
+            continue
+        found = m.groupdict()
+        host = found.get('host')
+        states[normalise_id(m.group('id'))] = (status_map[m.group('status')], found.get('queue'),
+                                               host if host not in ('', '-') else None)
+    return states
+
+
+# the time and result of the last query of each batch system, by backend name
+_scheduler_states = {}
+_scheduler_lock = threading.Lock()
+# the number of queries in a row which have not listed each job, by (backend name, batch id)
+_missing_jobs = {}
+# the backends whose status command has failed, which is only reported once
+_failed_queries = set()
+
+
 class Batch(IBackend):
 
     """ Batch submission backend.
@@ -89,6 +175,11 @@ class Batch(IBackend):
 
     Kill job if it has exceeded the deadline (i.e. for your presentation)
     backend.extraopts = '-t 07:14:12:59' #Killed if not finished by 14 July before 1 pm
+
+    The state of all the jobs is found with one query of the batch system per monitoring cycle,
+    given by the status_str, status_res_pattern and status_map options of the configuration
+    section of each batch system. The status files written by the jobs are only read once the
+    batch system says a job has finished, or when status_str is empty or fails.
     """
     _schema = Schema(Version(1, 0), {'queue': SimpleItem(defvalue='', doc='queue name as defomed in your local Batch installation'),
                                      'extraopts': SimpleItem(defvalue='', doc='extra options for Batch. See help(Batch) for more details'),
@@ -486,99 +577,146 @@ class Batch(IBackend):
 
         return job.getInputWorkspace().writefile(FileBuffer('__jobscript__', text), executable=1)
 
-    @staticmethod
-    def updateMonitoringInformation(jobs):
-
-        repid = re.compile(r'^PID: (?P<pid>\d+)', re.M)
-        requeue = re.compile(r'^QUEUE: (?P<queue>\S+)', re.M)
-        reactualCE = re.compile(r'^ACTUALCE: (?P<actualCE>\S+)', re.M)
-        reexit = re.compile(r'^EXITCODE: (?P<exitcode>\d+)', re.M)
-
-        def get_last_alive(f):
-            """Time since the statusfile was last touched in seconds"""
-            import os.path
-            import time
-            talive = 0
-            try:
-                talive = time.time() - os.path.getmtime(f)
-            except OSError as x:
-                logger.debug('Problem reading status file: %s (%s)', f, str(x))
-
-            return talive
-
-        def get_status(f):
-            """Give (pid,queue,actualCE,exit code) for job"""
-
-            pid, queue, actualCE, exitcode = None, None, None, None
-
-            import re
-            statusfile = None
-            try:
-                statusfile = open(f)
-                stat = statusfile.read()
-            except IOError as x:
-                logger.debug('Problem reading status file: %s (%s)', f, str(x))
-                return pid, queue, actualCE, exitcode
-            finally:
-                if statusfile:
-                    statusfile.close()
-
-            mpid = repid.search(stat)
-            if mpid:
-                pid = int(mpid.group('pid'))
+    @classmethod
+    def queryScheduler(cls):
+        """
+        Ask the batch system for the state of all the jobs at once with the status_str command.
+        Returns {batch id: (state, queue, host)}, where state is 'submitted', 'running' or 'finished', or None
+        if the command is not configured or failed. The result is kept for updateMonitoringInformation()
+        """
+        states = None
+        if cls.config['status_str']:
+            rc, soutfile, executed = shell_cmd(cls.config['status_str'])
+            with open(soutfile) as sout_file:
+                sout = sout_file.read()
+            os.remove(soutfile)
+            if rc == 0 and executed:
+                states = parse_scheduler_states(sout, cls.config['status_res_pattern'], cls.config['status_map'])
+            elif cls._name not in _failed_queries:
+                _failed_queries.add(cls._name)
+                logger.warning('The %s status command failed, the status files of the jobs are read instead: %s', cls._name, sout[:255])
+
+        with _scheduler_lock:
+            _scheduler_states[cls._name] = (time.time(), states)
+        return states
+
+    @classmethod
+    def schedulerStates(cls):
+        """
+        Return the states of the last query of the batch system if it was made during this monitoring cycle,
+        else query it again
+        """
+        poll_config = GangaCore.Utility.Config.getConfig('PollThread')
+        max_age = poll_config[cls._name] if cls._name in poll_config else poll_config['default_backend_poll_rate']
+        with _scheduler_lock:
+            query_time, states = _scheduler_states.get(cls._name, (0, None))
+        if time.time() - query_time < max_age:
+            return states
+        return cls.queryScheduler()
 
-            mqueue = requeue.search(stat)
-            if mqueue:
-                queue = str(mqueue.group('queue'))
+    @staticmethod
+    def master_updateMonitoringInformation(jobs):
+        """
+        Query the batch system once for all the jobs (and subjobs) of this monitoring cycle before updating them
+        """
+        if jobs:
+            stripProxy(jobs[0].backend).__class__.queryScheduler()
+        IBackend.master_updateMonitoringInformation(jobs)
 
-            mactualCE = reactualCE.search(stat)
-            if mactualCE:
-                actualCE = str(mactualCE.group('actualCE'))
+    @staticmethod
+    def updateMonitoringInformation(jobs):
 
-            mexit = reexit.search(stat)
-            if mexit:
-                exitcode = int(mexit.group('exitcode'))
+        by_backend = {}
+        for j in jobs:
+            by_backend.setdefault(getName(j.backend), []).append(j)
 
-            return pid, queue, actualCE, exitcode
+        for these_jobs in by_backend.values():
+            states = stripProxy(these_jobs[0].backend).__class__.schedulerStates()
+            for j in these_jobs:
+                if states is None or not j.backend.id:
+                    Batch.updateFromStatusFiles(j)
+                else:
+                    Batch.updateFromScheduler(j, states)
 
-        from GangaCore.Utility.Config import getConfig
-        for j in jobs:
+    @staticmethod
+    def updateFromScheduler(j, states):
+        """
+        Update a job from the state given by the batch system. The status files of the job are only
+        read once the batch system says that it has finished, or no longer knows about it.
+        """
+        key = (getName(j.backend), normalise_id(j.backend.id))
+        state = states.get(key[1])
+
+        if state is None:
+            # the job has finished and left the batch system, or it was removed. As the status file may take a
+            # moment to show up on a shared filesystem the job is only failed if it is missing twice in a row
+            misses = _missing_jobs[key] = _missing_jobs.get(key, 0) + 1
+            if Batch.updateFromStatusFiles(j, check_alive=False):
+                _missing_jobs.pop(key, None)
+            elif misses > 1:
+                _missing_jobs.pop(key, None)
+                logger.warning('Job %s has disappeared from the batch system.', str(j.getFQID('.')))
+                stripProxy(j)._getSessionLock()
+                j.updateStatus('failed')
+            return
+
+        _missing_jobs.pop(key, None)
+        status, queue, host = state
+        if status == 'finished':
+            Batch.updateFromStatusFiles(j, check_alive=False)
+        elif status == 'running' and j.status == 'submitted':
             stripProxy(j)._getSessionLock()
-            outw = j.getOutputWorkspace()
+            j.updateStatus('running')
+            if queue and queue != j.backend.actualqueue:
+                j.backend.actualqueue = queue
+            if host:
+                j.backend.actualCE = host
 
-            statusfile = os.path.join(outw.getPath(), '__jobstatus__')
-            heartbeatfile = os.path.join(outw.getPath(), '__heartbeat__')
-            pid, queue, actualCE, exitcode = get_status(statusfile)
+    @staticmethod
+    def updateFromStatusFiles(j, check_alive=True):
+        """
+        Update a job from the __jobstatus__ file written by the job script. With check_alive the job is failed
+        if it has not touched its heartbeat file for [<backend>]timeout seconds.
+        Returns True if the job has finished
+        """
+        stripProxy(j)._getSessionLock()
+        outw = j.getOutputWorkspace()
 
-            if j.status == 'submitted':
-                if pid or queue:
-                    j.updateStatus('running')
+        statusfile = os.path.join(outw.getPath(), '__jobstatus__')
+        heartbeatfile = os.path.join(outw.getPath(), '__heartbeat__')
+        pid, queue, actualCE, exitcode = get_status(statusfile)
 
-                    if pid:
-                        j.backend.id = pid
+        if j.status == 'submitted':
+            if pid or queue:
+                j.updateStatus('running')
 
-                    if queue and queue != j.backend.actualqueue:
-                        j.backend.actualqueue = queue
+                if pid:
+                    j.backend.id = pid
 
-                    if actualCE:
-                        j.backend.actualCE = actualCE
+                if queue and queue != j.backend.actualqueue:
+                    j.backend.actualqueue = queue
 
-            if j.status == 'running':
-                if exitcode is not None:
-                    # Job has finished
-                    j.backend.exitcode = exitcode
-                    if exitcode == 0:
-                        j.updateStatus('completed')
-                    else:
-                        j.updateStatus('failed')
+                if actualCE:
+                    j.backend.actualCE = actualCE
+
+        if j.status == 'running':
+            if exitcode is not None:
+                # Job has finished
+                j.backend.exitcode = exitcode
+                if exitcode == 0:
+                    j.updateStatus('completed')
                 else:
-                    # Job is still running. Check if alive
-                    time = get_last_alive(heartbeatfile)
-                    config = getConfig(getName(j.backend))
-                    if time > config['timeout']:
-                        logger.warning(
-                            'Job %s has disappeared from the batch system.', str(j.getFQID('.')))
-                        j.updateStatus('failed')
+                    j.updateStatus('failed')
+                return True
+            elif check_alive:
+                # Job is still running. Check if alive
+                if get_last_alive(heartbeatfile) > stripProxy(j.backend).config['timeout']:
+                    logger.warning(
+                        'Job %s has disappeared from the batch system.', str(j.getFQID('.')))
+                    j.updateStatus('failed')
+                    return True
+
+        return False
 
 #_________________________________________________________________________
 
@@ -61,6 +61,11 @@ class Condor(IBackend):
                              doc="Condor status"),
         "cputime": SimpleItem(defvalue="", protected=1, copyable=0,
                               doc="CPU time used by job"),
+        "exitcode": SimpleItem(defvalue=None, typelist=[int, None], protected=1, copyable=0,
+                               doc="Exit code of the job, as given by condor_history"),
+        "tagged": SimpleItem(defvalue=False, protected=1, hidden=1, copyable=0,
+                             doc="Whether the Condor job carries the GangaJobId ClassAd attribute. "
+                                 "Jobs submitted by older versions of Ganga do not"),
         "actualCE": SimpleItem(defvalue="", protected=1, copyable=0,
                                doc="Machine where job has been submitted"),
         "shared_filesystem": SimpleItem(defvalue=True,
@@ -84,9 +89,15 @@ class Condor(IBackend):
             "2": "Running",
             "3": "Removed",
             "4": "Completed",
-            "5": "Held"
+            "5": "Held",
+            "6": "Transferring output",
+            "7": "Suspended"
         }
 
+    # attributes read for each job by condor_q and condor_history
+    queueAttributes = ["GlobalJobId", "ClusterId", "ProcId", "JobStatus", "RemoteHost", "RemoteUserCpu"]
+    historyAttributes = ["GlobalJobId", "ClusterId", "ProcId", "JobStatus", "LastRemoteHost", "RemoteUserCpu", "ExitCode"]
+
     def __init__(self):
 
         # Add a volatile variable for recording the first time a job's stdout is checked
@@ -112,6 +123,7 @@ class Condor(IBackend):
         for sj in rjobs:
             if str(sj.id) in stati:
                 sj.backend.id = stati[str(sj.id)]
+                sj.backend.tagged = True
                 sj.updateStatus('submitted')
                 sj.time.timenow('submitted')
                 stripProxy(sj.info).increment()
@@ -251,7 +263,11 @@ class Condor(IBackend):
 
         # Resubmit job
         if os.path.exists(cdfpath):
+            # the description files written by older versions of Ganga do not tag the jobs
+            with open(cdfpath) as cdf:
+                tagged = '+GangaJobId' in cdf.read()
             status = self.submit_cdf(cdfpath)
+            self.tagged = tagged
         else:
             logger.warning\
                 ("No Condor Description File for job '%s' found in '%s'" %
@@ -499,6 +515,9 @@ class Condor(IBackend):
         if outfileString:
             cdfDict['transfer_output_files'] = outfileString
 
+        # lets the monitoring select the jobs of Ganga with one condor_q query
+        cdfDict['+GangaJobId'] = '"%s"' % job.getFQID('.')
+
         cdfList = [
             "\n#jobNo: %s " % job.getFQID('.'),
             ""]
@@ -511,169 +530,227 @@ class Condor(IBackend):
 
         return cdfString
 
+    @staticmethod
+    def queryJobs(command, constraint, attributes):
+        """Run condor_q or condor_history for the jobs matching a ClassAd constraint
+
+           Arguments other than self:
+              command    - the command and its options, e.g. "condor_q -global"
+              constraint - ClassAd expression selecting the jobs
+              attributes - names of the ClassAd attributes to read
+
+           Return value: list of {attribute: value} for the jobs found,
+                         or None if the command failed"""
+
+        queryCommand = "%s -constraint '%s' -af:t %s" % (command, constraint, " ".join(attributes))
+        status, output = subprocess.getstatusoutput(queryCommand)
+        if 0 != status:
+            logger.error("Problem retrieving status for Condor jobs with '%s'" % queryCommand)
+            logger.error(output)
+            return None
+
+        result = []
+        for line in output.split("\n"):
+            values = line.split("\t")
+            if len(values) != len(attributes):
+                # e.g. "All queues are empty" or the schedd names printed by -global
+                continue
+            result.append(dict((attribute, value) for attribute, value in zip(attributes, values) if value != "undefined"))
+        return result
+
     def updateMonitoringInformation(jobs):
 
         jobDict = {}
         for job in jobs:
-            if job.backend.id:
+            if job.backend.id and job.status != "killed":
                 jobDict[job.backend.id] = job
 
-        idList = list(jobDict.keys())
-
-        if not idList:
+        if not jobDict:
             return
 
-        queryCommand = " ".join\
-            ([
-                "condor_q -global" if getConfig(
-                    "Condor")["query_global_queues"] else "condor_q",
-                "-format \"%s \" GlobalJobId",
-                "-format \"%s \" RemoteHost",
-                "-format \"%d \" JobStatus",
-                "-format \"%f\\n\" RemoteUserCpu"
-            ])
-        status, output = subprocess.getstatusoutput(queryCommand)
-        if 0 != status:
-            logger.error("Problem retrieving status for Condor jobs")
+        config = getConfig("Condor")
+        queueCommand = "condor_q -global" if config["query_global_queues"] else "condor_q"
+        # the jobs submitted before the GangaJobId attribute was added are selected by their ids
+        constraint = config["query_constraint"]
+        untagged = [id for id, job in jobDict.items() if not job.backend.tagged]
+        if untagged:
+            constraint = "(%s) || %s" % (constraint, Condor.idConstraint(untagged))
+        queued = Condor.queryJobs(queueCommand, constraint, Condor.queueAttributes)
+        if queued is None:
             return
 
-        if ("All queues are empty" == output):
-            infoList = []
-        else:
-            infoList = output.split("\n")
-
-        allDict = {}
-        for infoString in infoList:
-            tmpList = infoString.split()
-            id, host, status, cputime = ("", "", "", "")
-            if 3 == len(tmpList):
-                if not 'Failure' in tmpList[0]:
-                    id, status, cputime = tmpList
-            if 4 == len(tmpList):
-                id, host, status, cputime = tmpList
-            if id:
-                allDict[id] = {}
-                allDict[id]["status"] = Condor.statusDict[status]
-                allDict[id]["cputime"] = cputime
-                allDict[id]["host"] = host
-
         fg = Foreground()
         fx = Effects()
         status_colours = {'submitted': fg.orange,
                           'running': fg.green,
                           'completed': fg.blue}
 
-        for id in idList:
+        # the jobs are found by their GlobalJobId, or by their local id (cluster.proc) for the ones
+        # whose GlobalJobId was not known at submission. It is then kept in backend.id
+        byGlobalId, byLocalId = Condor.indexJobs(queued)
 
-            printStatus = False
-            if jobDict[id].status == "killed":
+        leftQueue = []
+        for id, job in jobDict.items():
+            info = byGlobalId.get(id) or byLocalId.get(Condor.localId(id))
+            if info is None:
+                leftQueue.append(id)
                 continue
 
-            localId = id.split("#")[-1]
-            globalId = id
-
-            if globalId == localId:
-                queryCommand = " ".join\
-                    ([
-                        "condor_q -global" if getConfig(
-                            "Condor")["query_global_queues"] else "condor_q",
-                        "-format \"%s\" GlobalJobId",
-                        id
-                    ])
-                status, output = subprocess.getstatusoutput(queryCommand)
-                if 0 == status:
-                    globalId = output
-
-            if globalId in allDict.keys():
-                status = allDict[globalId]["status"]
-                host = allDict[globalId]["host"]
-                cputime = allDict[globalId]["cputime"]
-                if status != jobDict[id].backend.status:
-                    printStatus = True
-                    stripProxy(jobDict[id])._getSessionLock()
-                    jobDict[id].backend.status = status
-                    if jobDict[id].backend.status == "Running":
-                        jobDict[id].updateStatus("running")
-
-                if host:
-                    if jobDict[id].backend.actualCE != host:
-                        jobDict[id].backend.actualCE = host
-                jobDict[id].backend.cputime = cputime
-            else:
-                jobDict[id].backend.status = ""
-                outDir = jobDict[id].getOutputWorkspace().getPath()
-                condorLogPath = "".join([outDir, "condorLog"])
-                checkExit = True
-                if os.path.isfile(condorLogPath):
-                    checkExit = False
-                    for line in open(condorLogPath):
-                        if -1 != line.find("terminated"):
-                            checkExit = True
-                            break
-                        if -1 != line.find("aborted"):
-                            checkExit = True
-                            break
-
-                if checkExit:
-                    printStatus = True
-                    stdoutPath = "".join([outDir, "stdout"])
-                    jobStatus = "failed"
-                    if os.path.isfile(stdoutPath):
-                        with open(stdoutPath) as stdout:
-                            lineList = stdout.readlines()
-                        try:
-                            exitLine = lineList[-1]
-                            exitCode = exitLine.strip().split()[-1]
-                        except IndexError:
-                            exitCode = '-1'
-
-                        if exitCode.isdigit():
-                            jobStatus = "completed"
-                        else:
-                            # Some filesystems/setups have the file created but empty - only worry if it's been 10mins
-                            # since we first checked the file
-                            if len(lineList) == 0:
-                                if not jobDict[id].backend._stdout_check_time:
-                                    jobDict[id].backend._stdout_check_time = time.time()
-
-                                if (time.time() - jobDict[id].backend._stdout_check_time) < 10*60:
-                                    continue
-                                else:
-                                    logger.error("Empty stdout file from job %s after waiting 10mins. Marking job as"
-                                                 "failed." % jobDict[id].fqid)
-                            else:
-                                logger.error("Problem extracting exit code from job %s. Line found was '%s'." % (
-                                    jobDict[id].fqid, exitLine))
-
-                    jobDict[id].updateStatus(jobStatus)
+            printStatus = False
+            status = Condor.statusDict.get(info.get("JobStatus"), "")
+            if "GlobalJobId" in info and id != info["GlobalJobId"]:
+                job.backend.id = info["GlobalJobId"]
+            if status != job.backend.status:
+                printStatus = True
+                stripProxy(job)._getSessionLock()
+                job.backend.status = status
+                if job.backend.status == "Running":
+                    job.updateStatus("running")
+
+            host = info.get("RemoteHost", "")
+            if host and job.backend.actualCE != host:
+                job.backend.actualCE = host
+            job.backend.cputime = info.get("RemoteUserCpu", "")
 
             if printStatus:
-                if jobDict[id].backend.actualCE:
-                    hostInfo = jobDict[id].backend.actualCE
-                else:
-                    hostInfo = "Condor"
-                status = jobDict[id].status
-                if status in status_colours:
-                    colour = status_colours[status]
-                else:
-                    colour = fg.magenta
-                if "submitted" == status:
-                    preposition = "to"
+                Condor.printStatus(job, status_colours, fx)
+
+        if not leftQueue:
+            return None
+
+        history = ({}, {})
+        if config["query_history"]:
+            found = Condor.queryJobs("condor_history -match %d" % len(leftQueue), Condor.idConstraint(leftQueue),
+                                     Condor.historyAttributes)
+            history = Condor.indexJobs(found or [])
+
+        for id in leftQueue:
+            job = jobDict[id]
+            info = history[0].get(id) or history[1].get(Condor.localId(id))
+            if info is not None and info.get("JobStatus") in ("3", "4"):
+                stripProxy(job)._getSessionLock()
+                job.backend.status = Condor.statusDict[info["JobStatus"]]
+                job.backend.cputime = info.get("RemoteUserCpu", "")
+                if info.get("LastRemoteHost"):
+                    job.backend.actualCE = info["LastRemoteHost"]
+                exitCode = info.get("ExitCode")
+                job.backend.exitcode = int(exitCode) if exitCode is not None and exitCode.lstrip("-").isdigit() else None
+                if info["JobStatus"] == "4" and job.backend.exitcode == 0:
+                    job.updateStatus("completed")
                 else:
-                    preposition = "on"
+                    job.updateStatus("failed")
+                Condor.printStatus(job, status_colours, fx)
+            elif Condor.updateFromOutputFiles(job):
+                Condor.printStatus(job, status_colours, fx)
+
+        return None
 
-                if jobDict[id].backend.status:
-                    backendStatus = "".join\
-                        ([" (", jobDict[id].backend.status, ") "])
+    @staticmethod
+    def idConstraint(ids):
+        """Return a ClassAd constraint selecting the jobs with the given GlobalJobIds or local ids"""
+        constraints = ['GlobalJobId == "%s"' % id for id in ids if id.count("#") == 2]
+        constraints += ["(ClusterId == %s && ProcId == %s)" % tuple(Condor.localId(id).split("."))
+                        for id in ids if id.count("#") != 2]
+        return " || ".join(constraints)
+
+    @staticmethod
+    def localId(id):
+        """Return the local id (cluster.proc) of a GlobalJobId (schedd#cluster.proc#time) or of a local id"""
+        if id.count("#") == 2:
+            id = id.split("#")[1]
+        return id if "." in id else id + ".0"
+
+    @staticmethod
+    def indexJobs(infoList):
+        """Return ({GlobalJobId: info}, {cluster.proc: info}) for the jobs returned by queryJobs()"""
+        byGlobalId = {}
+        byLocalId = {}
+        for info in infoList:
+            if "GlobalJobId" in info:
+                byGlobalId[info["GlobalJobId"]] = info
+            if "ClusterId" in info and "ProcId" in info:
+                byLocalId["%s.%s" % (info["ClusterId"], info["ProcId"])] = info
+        return byGlobalId, byLocalId
+
+    @staticmethod
+    def updateFromOutputFiles(job):
+        """Find out from the condorLog and stdout files whether a job which has left the queue has finished.
+           Returns True if the status of the job has changed"""
+
+        job.backend.status = ""
+        outDir = job.getOutputWorkspace().getPath()
+        condorLogPath = "".join([outDir, "condorLog"])
+        checkExit = True
+        if os.path.isfile(condorLogPath):
+            checkExit = False
+            for line in open(condorLogPath):
+                if -1 != line.find("terminated"):
+                    checkExit = True
+                    break
+                if -1 != line.find("aborted"):
+                    checkExit = True
+                    break
+
+        if not checkExit:
+            return False
+
+        stdoutPath = "".join([outDir, "stdout"])
+        jobStatus = "failed"
+        if os.path.isfile(stdoutPath):
+            with open(stdoutPath) as stdout:
+                lineList = stdout.readlines()
+            try:
+                exitLine = lineList[-1]
+                exitCode = exitLine.strip().split()[-1]
+            except IndexError:
+                exitCode = '-1'
+
+            if exitCode.isdigit():
+                jobStatus = "completed"
+            else:
+                # Some filesystems/setups have the file created but empty - only worry if it's been 10mins
+                # since we first checked the file
+                if len(lineList) == 0:
+                    if not job.backend._stdout_check_time:
+                        job.backend._stdout_check_time = time.time()
+
+                    if (time.time() - job.backend._stdout_check_time) < 10*60:
+                        return False
+                    else:
+                        logger.error("Empty stdout file from job %s after waiting 10mins. Marking job as"
+                                     "failed." % job.fqid)
                 else:
-                    backendStatus = ""
+                    logger.error("Problem extracting exit code from job %s. Line found was '%s'." % (
+                        job.fqid, exitLine))
 
-                logger.info(colour + 'Job %s %s%s %s %s - %s' + fx.normal,
-                            jobDict[
-                                id].fqid, status, backendStatus, preposition, hostInfo,
-                            time.strftime('%c'))
+        job.updateStatus(jobStatus)
+        return True
 
-        return None
+    @staticmethod
+    def printStatus(job, status_colours, fx):
+        if job.backend.actualCE:
+            hostInfo = job.backend.actualCE
+        else:
+            hostInfo = "Condor"
+        status = job.status
+        if status in status_colours:
+            colour = status_colours[status]
+        else:
+            colour = Foreground().magenta
+        if "submitted" == status:
+            preposition = "to"
+        else:
+            preposition = "on"
+
+        if job.backend.status:
+            backendStatus = "".join\
+                ([" (", job.backend.status, ") "])
+        else:
+            backendStatus = ""
+
+        logger.info(colour + 'Job %s %s%s %s %s - %s' + fx.normal,
+                    job.fqid, status, backendStatus, preposition, hostInfo,
+                    time.strftime('%c'))
 
     def getStateTime(self, status):
         """Obtains the timestamps for the 'running', 'completed', and 'failed' states.
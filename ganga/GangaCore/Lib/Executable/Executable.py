@@ -288,3 +288,4 @@ allHandlers.add('Executable', 'Remote', LCGRTHandler)
 allHandlers.add('Executable', 'CREAM', LCGRTHandler)
 allHandlers.add('Executable', 'ARC', LCGRTHandler)
 allHandlers.add('Executable', 'Slurm', RTHandler)
+allHandlers.add('Executable', 'SimulatedBackend', RTHandler)
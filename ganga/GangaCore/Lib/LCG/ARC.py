@@ -9,7 +9,7 @@ from collections import defaultdict
 
 from urllib.parse import urlparse
 
-from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
 from GangaCore.Core.exceptions import GangaException
 
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem, ComponentItem
@@ -19,6 +19,7 @@ from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger, log_user_exception
 from GangaCore.Utility.logic import implies
 from GangaCore.Lib.LCG.Utility import get_md5sum
+from GangaCore.Lib.LCG.Utility import OutputFetcher
 from GangaCore.Lib.LCG.ElapsedTimeProfiler import ElapsedTimeProfiler
 
 from GangaCore.Lib.LCG import Grid
@@ -30,6 +31,18 @@ from GangaCore.GPIDev.Base.Proxy import getName
 
 config = getConfig('LCG')
 
+_arc_output_fetcher = None
+
+
+def get_arc_output_fetcher():
+    global _arc_output_fetcher
+
+    if not _arc_output_fetcher:
+        _arc_output_fetcher = OutputFetcher('arc_output_fetcher')
+
+    return _arc_output_fetcher
+
+
 class ARC(IBackend):
 
     '''ARC backend - direct job submission to an ARC CE'''
@@ -235,49 +248,37 @@ class ARC(IBackend):
                 logger.error('master input sandbox perparation failed: %s' % f)
                 return None
 
-        # the algorithm for preparing a single bulk job
-        class MyAlgorithm(Algorithm):
+        # preparing a single job
+        def prepare_job(sj_info):
+            my_sc = sj_info[0]
+            my_sj = sj_info[1]
 
-            def __init__(self):
-                Algorithm.__init__(self)
+            try:
+                logger.debug("preparing job %s" % my_sj.getFQID('.'))
+                jdlpath = my_sj.backend.preparejob(
+                    my_sc, master_input_sandbox)
 
-            def process(self, sj_info):
-                my_sc = sj_info[0]
-                my_sj = sj_info[1]
+                if (not jdlpath) or (not os.path.exists(jdlpath)):
+                    raise GangaException(
+                        'job %s not properly prepared' % my_sj.getFQID('.'))
 
-                try:
-                    logger.debug("preparing job %s" % my_sj.getFQID('.'))
-                    jdlpath = my_sj.backend.preparejob(
-                        my_sc, master_input_sandbox)
-
-                    if (not jdlpath) or (not os.path.exists(jdlpath)):
-                        raise GangaException(
-                            'job %s not properly prepared' % my_sj.getFQID('.'))
-
-                    self.__appendResult__(my_sj.id, jdlpath)
-                    return True
-                except Exception as x:
-                    log_user_exception()
-                    return False
+                return jdlpath
+            except Exception as x:
+                log_user_exception()
+                raise
 
         mt_data = []
         for sc, sj in zip(subjobconfigs, rjobs):
             mt_data.append([sc, sj])
 
-        myAlg = MyAlgorithm()
-        myData = Data(collection=mt_data)
-
-        runner = MTRunner(
-            name='lcg_jprepare', algorithm=myAlg, data=myData, numThread=10)
-        runner.start()
-        runner.join(-1)
+        results = BulkOperation('lcg_jprepare', prepare_job, num_threads=10, progress=True).run(mt_data)
 
-        if len(runner.getDoneList()) < len(mt_data):
+        if not all(r.ok for r in results):
             return None
         else:
             # return a JDL file dictionary with subjob ids as keys, JDL file
             # paths as values
-            return runner.getResults()
+            return dict((r.item[1].id, r.result) for r in results)
 
     @require_credential
     def __mt_bulk_submit__(self, node_jdls):
@@ -288,50 +289,37 @@ class ARC(IBackend):
         logger.warning(
             'submitting %d subjobs ... it may take a while' % len(node_jdls))
 
-        # the algorithm for submitting a single bulk job
-        class MyAlgorithm(Algorithm):
+        cred_req = self.credential_requirements
+        ce = self.CE
+        arcverbose = self.verbose
 
-            def __init__(self, cred_req, masterInputWorkspace, ce, arcverbose):
-                Algorithm.__init__(self)
-                self.inpw = masterInputWorkspace
-                self.cred_req = cred_req
-                self.ce = ce
-                self.arcverbose = arcverbose
+        # submitting a single job
+        def submit_job(jdl_info):
+            my_sj_id = jdl_info[0]
+            my_sj_jdl = jdl_info[1]
 
-            def process(self, jdl_info):
-                my_sj_id = jdl_info[0]
-                my_sj_jdl = jdl_info[1]
+            my_sj_jid = Grid.arc_submit(my_sj_jdl, ce, arcverbose, cred_req)
 
-                my_sj_jid = Grid.arc_submit(my_sj_jdl, self.ce, self.arcverbose, self.cred_req)
-
-                if not my_sj_jid:
-                    return False
-                else:
-                    self.__appendResult__(my_sj_id, my_sj_jid)
-                    return True
+            if not my_sj_jid:
+                raise GangaException('job %s not submitted' % my_sj_id)
+            return my_sj_jid
 
         mt_data = []
         for id, jdl in node_jdls.items():
             mt_data.append((id, jdl))
 
-        myAlg = MyAlgorithm(cred_req=self.credential_requirements, masterInputWorkspace=job.getInputWorkspace(
-        ), ce=self.CE, arcverbose=self.verbose)
-        myData = Data(collection=mt_data)
-
-        runner = MTRunner(name='arc_jsubmit', algorithm=myAlg,
-                          data=myData, numThread=config['SubmissionThread'])
-        runner.start()
-        runner.join(timeout=-1)
+        submission = BulkOperation('arc_jsubmit', submit_job, num_threads=config['SubmissionThread'], progress=True)
+        sj_jids = dict((r.item[0], r.result) for r in submission.run(mt_data) if r.ok)
 
-        if len(runner.getDoneList()) < len(mt_data):
+        if len(sj_jids) < len(mt_data):
             # not all bulk jobs are successfully submitted. canceling the
             # submitted jobs on WMS immediately
             logger.error(
                 'some bulk jobs not successfully (re)submitted, canceling submitted jobs on WMS')
-            Grid.arc_cancel_multiple(list(runner.getResults().values()), self.credential_requirements)
+            Grid.arc_cancel_multiple(list(sj_jids.values()), self.credential_requirements)
             return None
         else:
-            return runner.getResults()
+            return sj_jids
 
     def __jobWrapperTemplate__(self):
         '''Create job wrapper'''
@@ -1206,7 +1194,9 @@ sys.exit(0)
             info = Grid.arc_status(job_ids, ce_list, cred_req)
             jobInfoDict.update(info)
 
-        jidListForPurge = []
+        # the outputs of the finished jobs are downloaded in the background, the monitoring does not wait for them:
+        # a job is finished in the download thread once its output is there
+        fetcher = get_arc_output_fetcher()
 
         # update job information for those available in jobInfoDict
         for id, info in jobInfoDict.items():
@@ -1230,44 +1220,58 @@ sys.exit(0)
                     # download output sandboxes if final status is reached
                     elif info['State'] in ['Finished', '(FINISHED)', 'Finished (FINISHED)']:
 
-                        # grab output sandbox
-                        if Grid.arc_get_output(job.backend.id, job.getOutputWorkspace(create=True).getPath(), job.backend.credential_requirements):
-                            (ick, app_exitcode) = Grid.__get_app_exitcode__(
-                                job.getOutputWorkspace(create=True).getPath())
-                            job.backend.exitcode = app_exitcode
-
-                            jidListForPurge.append(job.backend.id)
-
-                        else:
-                            logger.error(
-                                'fail to download job output: %s' % jobdict[id].getFQID('.'))
+                        # grab output sandbox, the job keeps its old status until then
+                        fetcher.fetch(id, ARC.__finish_job__, job, info)
+                        continue
 
                     if doStatusUpdate:
-                        job.backend.status = info['State']
-                        if 'Exit Code' in info:
-                            try:
-                                job.backend.exitcode_arc = int(
-                                    info['Exit Code'])
-                            except:
-                                job.backend.exitcode_arc = 1
-
-                        if 'Job Error' in info:
-                            try:
-                                job.backend.reason = info['Job Error']
-                            except:
-                                pass
-
-                        job.backend.updateGangaJobStatus()
+                        ARC.__update_status__(job, info)
             else:
                 logger.warning(
                     'fail to retrieve job informaton: %s' % jobdict[id].getFQID('.'))
 
-        # purging the jobs the output has been fetched locally
-        if jidListForPurge:
-            for cred_req, job_ids in cred_to_backend_id_list.items():
-                if not Grid.arc_purge_multiple(set(job_ids) & set(jidListForPurge), cred_req):
-                    logger.warning("Failed to purge all ARC jobs.")
+    @staticmethod
+    def __update_status__(job, info):
+        '''Sets the backend status of the job from the info of arcstat and updates the Ganga status'''
+        job.backend.status = info['State']
+        if 'Exit Code' in info:
+            try:
+                job.backend.exitcode_arc = int(
+                    info['Exit Code'])
+            except:
+                job.backend.exitcode_arc = 1
+
+        if 'Job Error' in info:
+            try:
+                job.backend.reason = info['Job Error']
+            except:
+                pass
+
+        job.backend.updateGangaJobStatus()
+
+    @staticmethod
+    def __finish_job__(job, info):
+        '''Downloads the output of a finished job, purges it from the CE and updates its status, in a download thread'''
+        # the job may have been killed or removed since its download was started
+        if job.status in ['completed', 'failed', 'killed', 'removed']:
+            return True
+
+        if Grid.arc_get_output(job.backend.id, job.getOutputWorkspace(create=True).getPath(),
+                               job.backend.credential_requirements):
+            (ick, app_exitcode) = Grid.__get_app_exitcode__(
+                job.getOutputWorkspace(create=True).getPath())
+            job.backend.exitcode = app_exitcode
+
+            # purging the job the output has been fetched locally
+            if not Grid.arc_purge_multiple([job.backend.id], job.backend.credential_requirements):
+                logger.warning("Failed to purge ARC job: %s" % job.backend.id)
+
+        else:
+            logger.error(
+                'fail to download job output: %s' % job.getFQID('.'))
 
+        ARC.__update_status__(job, info)
+        return True
 
     def updateGangaJobStatus(self):
         '''map backend job status to Ganga job status'''
@@ -9,7 +9,7 @@ from collections import defaultdict
 
 from urllib.parse import urlparse
 
-from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
 from GangaCore.Core.exceptions import GangaException
 
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem, ComponentItem
@@ -20,6 +20,7 @@ from GangaCore.Utility.logging import getLogger, log_user_exception
 from GangaCore.Utility.logic import implies
 from GangaCore.Lib.LCG.Utility import get_uuid
 from GangaCore.Lib.LCG.Utility import get_md5sum
+from GangaCore.Lib.LCG.Utility import OutputFetcher
 from GangaCore.Lib.LCG.ElapsedTimeProfiler import ElapsedTimeProfiler
 
 from GangaCore.Lib.LCG import Grid
@@ -30,6 +31,17 @@ from GangaCore.GPIDev.Credentials import require_credential, credential_store, n
 from GangaCore.GPIDev.Credentials.VomsProxy import VomsProxy
 config = getConfig('LCG')
 
+_cream_output_fetcher = None
+
+
+def get_cream_output_fetcher():
+    global _cream_output_fetcher
+
+    if not _cream_output_fetcher:
+        _cream_output_fetcher = OutputFetcher('cream_output_fetcher')
+
+    return _cream_output_fetcher
+
 def __cream_resolveOSBList__(job, jdl):
 
     osbURIList = []
@@ -262,49 +274,37 @@ class CREAM(IBackend):
                 logger.error('master input sandbox perparation failed: %s' % f)
                 return None
 
-        # the algorithm for preparing a single bulk job
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self):
-                Algorithm.__init__(self)
-
-            def process(self, sj_info):
-                my_sc = sj_info[0]
-                my_sj = sj_info[1]
+        # preparing a single job
+        def prepare_job(sj_info):
+            my_sc = sj_info[0]
+            my_sj = sj_info[1]
 
-                try:
-                    logger.debug("preparing job %s" % my_sj.getFQID('.'))
-                    jdlpath = my_sj.backend.preparejob(
-                        my_sc, master_input_sandbox)
+            try:
+                logger.debug("preparing job %s" % my_sj.getFQID('.'))
+                jdlpath = my_sj.backend.preparejob(
+                    my_sc, master_input_sandbox)
 
-                    if (not jdlpath) or (not os.path.exists(jdlpath)):
-                        raise GangaException(
-                            'job %s not properly prepared' % my_sj.getFQID('.'))
+                if (not jdlpath) or (not os.path.exists(jdlpath)):
+                    raise GangaException(
+                        'job %s not properly prepared' % my_sj.getFQID('.'))
 
-                    self.__appendResult__(my_sj.id, jdlpath)
-                    return True
-                except Exception as x:
-                    log_user_exception()
-                    return False
+                return jdlpath
+            except Exception as x:
+                log_user_exception()
+                raise
 
         mt_data = []
         for sc, sj in zip(subjobconfigs, rjobs):
             mt_data.append([sc, sj])
 
-        myAlg = MyAlgorithm()
-        myData = Data(collection=mt_data)
+        results = BulkOperation('lcg_jprepare', prepare_job, num_threads=10, progress=True).run(mt_data)
 
-        runner = MTRunner(
-            name='lcg_jprepare', algorithm=myAlg, data=myData, numThread=10)
-        runner.start()
-        runner.join(-1)
-
-        if len(runner.getDoneList()) < len(mt_data):
+        if not all(r.ok for r in results):
             return None
         else:
             # return a JDL file dictionary with subjob ids as keys, JDL file
             # paths as values
-            return runner.getResults()
+            return dict((r.item[1].id, r.result) for r in results)
 
     @require_credential
     def __mt_bulk_submit__(self, node_jdls):
@@ -315,52 +315,37 @@ class CREAM(IBackend):
         logger.warning(
             'submitting %d subjobs ... it may take a while' % len(node_jdls))
 
-        # the algorithm for submitting a single bulk job
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self, cred_req, masterInputWorkspace, ce, delid):
-                Algorithm.__init__(self)
-                self.inpw = masterInputWorkspace
-                self.cred_req = cred_req
-                self.ce = ce
-                self.delid = delid
+        cred_req = self.credential_requirements
+        ce = self.CE
+        delid = self.delegation_id
 
-            def process(self, jdl_info):
-                my_sj_id = jdl_info[0]
-                my_sj_jdl = jdl_info[1]
+        # submitting a single job
+        def submit_job(jdl_info):
+            my_sj_id = jdl_info[0]
+            my_sj_jdl = jdl_info[1]
 
-                my_sj_jid = Grid.cream_submit(my_sj_jdl, self.ce, self.delid, self.cred_req)
+            my_sj_jid = Grid.cream_submit(my_sj_jdl, ce, delid, cred_req)
 
-                if not my_sj_jid:
-                    return False
-                else:
-                    self.__appendResult__(my_sj_id, my_sj_jid)
-                    return True
+            if not my_sj_jid:
+                raise GangaException('job %s not submitted' % my_sj_id)
+            return my_sj_jid
 
         mt_data = []
         for id, jdl in node_jdls.items():
             mt_data.append((id, jdl))
 
-        myAlg = MyAlgorithm(cred_req=self.credential_requirements,
-                            masterInputWorkspace=job.getInputWorkspace(),
-                            ce=self.CE,
-                            delid=self.delegation_id)
-        myData = Data(collection=mt_data)
+        submission = BulkOperation('cream_jsubmit', submit_job, num_threads=config['SubmissionThread'], progress=True)
+        sj_jids = dict((r.item[0], r.result) for r in submission.run(mt_data) if r.ok)
 
-        runner = MTRunner(name='cream_jsubmit', algorithm=myAlg,
-                          data=myData, numThread=config['SubmissionThread'])
-        runner.start()
-        runner.join(timeout=-1)
-
-        if len(runner.getDoneList()) < len(mt_data):
+        if len(sj_jids) < len(mt_data):
             # not all bulk jobs are successfully submitted. canceling the
             # submitted jobs on WMS immediately
             logger.error(
                 'some bulk jobs not successfully (re)submitted, canceling submitted jobs on WMS')
-            Grid.cancel_multiple(list(runner.getResults().values()))
+            Grid.cancel_multiple(list(sj_jids.values()))
             return None
         else:
-            return runner.getResults()
+            return sj_jids
 
     def __jobWrapperTemplate__(self):
         '''Create job wrapper'''
@@ -1218,7 +1203,9 @@ sys.exit(0)
             info = Grid.cream_status(job_ids, cred_req)
             jobInfoDict.update(info)
 
-        jidListForPurge = []
+        # the outputs of the finished jobs are downloaded in the background, the monitoring does not wait for them:
+        # a job is finished in the download thread once its output is there
+        fetcher = get_cream_output_fetcher()
 
         # update job information for those available in jobInfoDict
         for id, info in jobInfoDict.items():
@@ -1257,42 +1244,57 @@ sys.exit(0)
                             logger.debug(f)
 
                         if osbURIList:
-
-                            if Grid.cream_get_output(osbURIList, job.getOutputWorkspace(create=True).getPath(), job.backend.credential_requirements):
-                                (ick, app_exitcode) = Grid.__get_app_exitcode__(
-                                    job.getOutputWorkspace(create=True).getPath())
-                                job.backend.exitcode = app_exitcode
-
-                                jidListForPurge.append(job.backend.id)
-
-                            else:
-                                logger.error(
-                                    'fail to download job output: %s' % jobdict[id].getFQID('.'))
+                            # grab output sandbox, the job keeps its old status until then
+                            fetcher.fetch(id, CREAM.__finish_job__, job, info, osbURIList)
+                            continue
 
                     if doStatusUpdate:
-                        job.backend.status = info['Current Status']
-                        if 'ExitCode' in info and info['ExitCode'] != "W":
-                            try:
-                                job.backend.exitcode_cream = int(
-                                    info['ExitCode'])
-                            except:
-                                job.backend.exitcode_cream = 1
-
-                        if 'FailureReason' in info:
-                            try:
-                                job.backend.reason = info['FailureReason']
-                            except:
-                                pass
-
-                        job.backend.updateGangaJobStatus()
+                        CREAM.__update_status__(job, info)
             else:
                 logger.warning(
                     'fail to retrieve job informaton: %s' % jobdict[id].getFQID('.'))
 
-        # purging the jobs the output has been fetched locally
-        if jidListForPurge:
-            for cred_req, job_ids in cred_to_backend_id_list.items():
-                Grid.cream_purge_multiple(set(job_ids) & set(jidListForPurge), cred_req)
+    @staticmethod
+    def __update_status__(job, info):
+        '''Sets the backend status of the job from the info of the CREAM status and updates the Ganga status'''
+        job.backend.status = info['Current Status']
+        if 'ExitCode' in info and info['ExitCode'] != "W":
+            try:
+                job.backend.exitcode_cream = int(
+                    info['ExitCode'])
+            except:
+                job.backend.exitcode_cream = 1
+
+        if 'FailureReason' in info:
+            try:
+                job.backend.reason = info['FailureReason']
+            except:
+                pass
+
+        job.backend.updateGangaJobStatus()
+
+    @staticmethod
+    def __finish_job__(job, info, osbURIList):
+        '''Downloads the output of a finished job, purges it from the CE and updates its status, in a download thread'''
+        # the job may have been killed or removed since its download was started
+        if job.status in ['completed', 'failed', 'killed', 'removed']:
+            return True
+
+        if Grid.cream_get_output(osbURIList, job.getOutputWorkspace(create=True).getPath(),
+                                 job.backend.credential_requirements):
+            (ick, app_exitcode) = Grid.__get_app_exitcode__(
+                job.getOutputWorkspace(create=True).getPath())
+            job.backend.exitcode = app_exitcode
+
+            # purging the job the output has been fetched locally
+            Grid.cream_purge_multiple([job.backend.id], job.backend.credential_requirements)
+
+        else:
+            logger.error(
+                'fail to download job output: %s' % job.getFQID('.'))
+
+        CREAM.__update_status__(job, info)
+        return True
 
     def updateGangaJobStatus(self):
         '''map backend job status to Ganga job status'''
@@ -0,0 +1,93 @@
+"""
+The latency and the failures of the middleware commands run against each CE or WMS.
+
+Every command run for one endpoint by Grid is recorded. An endpoint whose commands have failed or timed out
+LCG.EndpointFailureThreshold times in a row is skipped by the monitoring for LCG.EndpointBackoff seconds, so that
+one unresponsive CE does not hold up the status of the jobs on the others. After that time one query is let
+through again: the endpoint is healthy again as soon as a command succeeds.
+"""
+
+import threading
+import time
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+from GangaCore.Utility.Metrics import metrics
+
+logger = getLogger()
+config = getConfig('LCG')
+
+
+class EndpointStats(object):
+
+    """ What is known of the commands run for one endpoint """
+
+    __slots__ = ('calls', 'failures', 'consecutive_failures', 'total_seconds', 'last_seconds', 'skip_until')
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+        self.skip_until = 0.0
+
+    @property
+    def mean_seconds(self):
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+    def asDict(self):
+        return {'calls': self.calls, 'failures': self.failures, 'consecutive_failures': self.consecutive_failures,
+                'mean_seconds': self.mean_seconds, 'last_seconds': self.last_seconds,
+                'skipped_for': max(0.0, self.skip_until - time.time())}
+
+
+class EndpointHealth(object):
+
+    """ The statistics of all the endpoints, shared by the threads running commands """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        """ Record a command run for the endpoint, which took seconds and succeeded if ok """
+        if endpoint is None:
+            return
+        metrics.histogram('grid_endpoint_seconds', 'Time of the middleware commands for one endpoint',
+                          endpoint=str(endpoint)).observe(seconds)
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.last_seconds = seconds
+            if ok:
+                stats.consecutive_failures = 0
+                stats.skip_until = 0.0
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= config['EndpointFailureThreshold']:
+                stats.skip_until = time.time() + config['EndpointBackoff']
+                logger.warning('%s failed %d times in a row, its jobs are not monitored for the next %ss',
+                               endpoint, stats.consecutive_failures, config['EndpointBackoff'])
+        metrics.counter('grid_endpoint_failures', 'Failed or timed out middleware commands for one endpoint',
+                        endpoint=str(endpoint)).inc()
+
+    def available(self, endpoint):
+        """ Should the monitoring query the endpoint now """
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            return stats is None or stats.skip_until <= time.time()
+
+    def stats(self):
+        """ Return {endpoint: dict of its statistics} """
+        with self._lock:
+            return dict((endpoint, stats.asDict()) for endpoint, stats in self._stats.items())
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+endpoint_health = EndpointHealth()
@@ -1,8 +1,11 @@
 import os
 import re
 import shutil
+import hashlib
 import tempfile
 import datetime
+import threading
+import urllib.parse
 
 from GangaCore.GPIDev.Credentials import credential_store
 
@@ -10,9 +13,12 @@ from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger
 
 from GangaCore.Utility.GridShell import getShell
+from GangaCore.Utility.CommandExecutor import Command, getExecutor
+from GangaCore.Utility.files import expandfilename
 
 from GangaCore.Lib.LCG.GridftpSandboxCache import GridftpFileIndex, GridftpSandboxCache
 
+from GangaCore.Lib.LCG.EndpointHealth import endpoint_health
 from GangaCore.Lib.LCG.Utility import get_uuid
 from GangaCore.Lib.Root import randomString
 
@@ -150,6 +156,121 @@ def __resolve_no_matching_jobs__(cmd_output):
     return glite_ids
 
 
+def __endpoint__(uri):
+    """The host of a job id or of a CE, the commands run at the same time for one host are bounded"""
+    if not uri:
+        return None
+    if '://' not in uri:
+        uri = '//' + uri
+    return urllib.parse.urlparse(uri).hostname
+
+
+def __command__(cmd, cred_req, endpoint=None, timeout=None, retries=None, allowed_exit=(0, 255), parse=None, env=None):
+    """
+    A middleware command run in the grid shell of the credential, or in env if it is given, retried as set by
+    LCG.CommandRetries
+    """
+    if retries is None:
+        retries = config['CommandRetries']
+    if env is None:
+        env = getShell(cred_req).env
+    return Command(cmd, env=env, endpoint=endpoint, timeout=timeout, retries=retries,
+                   allowed_exit=allowed_exit, parse=parse)
+
+
+def __failed__(result):
+    """Did the command fail for the endpoint: it timed out, had an unexpected exit status or the generic error 255"""
+    return not result.ok or result.rc == 255
+
+
+def __run__(cmd, cred_req, **kwargs):
+    """Run a middleware command through the command executor, returns its exit status and output"""
+    result = getExecutor().run(__command__(cmd, cred_req, **kwargs))
+    endpoint_health.record(result.command.endpoint, result.seconds, not __failed__(result))
+    return result.rc, result.output
+
+
+def __ids_file__(name, endpoint, cred_req, content):
+    """
+    The file given to the status queries of the jobs on the endpoint. It is kept in the gangadir from one
+    monitoring cycle to the next and only written again when the jobs have changed
+    """
+    directory = os.path.join(expandfilename(getConfig('Configuration')['gangadir']), 'LCG', 'jids')
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    credential = hashlib.md5(repr(cred_req).encode('utf-8')).hexdigest()[:8]
+    path = os.path.join(directory, '%s_%s_%s.jids' % (name, endpoint, credential))
+
+    try:
+        with open(path) as ids_file:
+            if ids_file.read() == content:
+                return path
+    except IOError:
+        pass
+
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as ids_file:
+        ids_file.write(content)
+    os.replace(ids_file.name, path)
+    return path
+
+
+def __run_per_endpoint__(jobids, make_cmd, cred_req, header='', monitoring=None, lock=None, **kwargs):
+    """
+    Run a command for each host the jobs are on, all at the same time, with the ids of the jobs on the host
+    in a file. make_cmd returns the command for the path of the file. Returns the results of the commands.
+
+    monitoring names the status query run by the monitoring, whose ids files are kept from one cycle to the
+    next and which skips the hosts failing repeatedly, see EndpointHealth
+
+    With a lock, e.g. the one of a file all the commands write, the commands run one after the other under it
+    """
+    groups = {}
+    for jid in jobids:
+        groups.setdefault(__endpoint__(jid), []).append(jid)
+
+    # the credential is checked once for all the hosts
+    env = getShell(cred_req).env
+
+    commands = []
+    idsfiles = []
+    for endpoint, ids in groups.items():
+        content = header + '\n'.join(ids) + '\n'
+        if monitoring:
+            if not endpoint_health.available(endpoint):
+                logger.debug('%s is skipped for now, %d jobs not queried', endpoint, len(ids))
+                continue
+            idsfile = __ids_file__(monitoring, endpoint, cred_req, content)
+        else:
+            idsfile = tempfile.mktemp('.jids')
+            with open(idsfile, 'w') as ids_file:
+                ids_file.write(content)
+            idsfiles.append(idsfile)
+        commands.append(__command__(make_cmd(idsfile), cred_req, endpoint=endpoint, env=env, **kwargs))
+
+    try:
+        if lock is None:
+            results = getExecutor().run_many(commands)
+        else:
+            results = []
+            for command in commands:
+                with lock:
+                    results.append(getExecutor().run(command))
+    finally:
+        for idsfile in idsfiles:
+            if os.path.exists(idsfile):
+                os.remove(idsfile)
+
+    for result in results:
+        endpoint_health.record(result.command.endpoint, result.seconds, not __failed__(result))
+    return results
+
+
+def __combine__(results):
+    """The first failed exit status, or 0, and the output of several commands"""
+    rc = next((r.rc for r in results if r.rc != 0), 0)
+    return rc, '\n'.join(r.output for r in results)
+
+
 def list_match(jdlpath, cred_req, ce=None):
     """Returns a list of computing elements can run the job"""
 
@@ -213,9 +334,7 @@ def submit(jdlpath, cred_req, ce=None, perusable=False):
 
     logger.debug('job submit command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['SubmissionTimeout'])
+    rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(ce), timeout=config['SubmissionTimeout'], retries=0)
 
     if output:
         output = "%s" % output.strip()
@@ -254,7 +373,7 @@ def native_master_cancel(jobids, cred_req):
 
     logger.debug('job cancel command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
+    rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(jobids[0]))
 
     # clean up tempfile
     if os.path.exists(idsfile):
@@ -277,22 +396,18 @@ def status(jobids, cred_req, is_collection=False):
     if not jobids:
         return [], []
 
-    idsfile = tempfile.mktemp('.jids')
-    with open(idsfile, 'w') as ids_file:
-        ids_file.write('\n'.join(jobids) + '\n')
-
     cmd = 'glite-wms-job-status'
 
     if is_collection:
         cmd = '%s -v 3' % cmd
 
-    cmd = '%s --noint -i %s' % (cmd, idsfile)
+    cmd = '%s --noint -i %%s' % cmd
     logger.debug('job status command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['StatusPollingTimeout'])
-    os.remove(idsfile)
+    # one query per server, all at the same time
+    rc, output = __combine__(__run_per_endpoint__(jobids, lambda idsfile: cmd % idsfile, cred_req,
+                                                  monitoring='glite-status-v3' if is_collection else 'glite-status',
+                                                  timeout=config['StatusPollingTimeout']))
 
     missing_glite_jids = []
     if rc != 0:
@@ -424,7 +539,7 @@ def get_output(jobid, directory, cred_req):
 
     logger.debug('job get output command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
+    rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(jobid))
 
     match = re.search(r'directory:\n\s*([^\t\n\r\f\v]+)\s*\n', output)
 
@@ -442,7 +557,6 @@ def get_output(jobid, directory, cred_req):
 #       some versions of LCG middleware create an extra output directory (named <uid>_<jid_hash>)
 #       inside the job.outputdir. Try to match the jid_hash in the outdir. Do output movement
 #       if the <jid_hash> is found in the path of outdir.
-    import urllib.parse
     jid_hash = urllib.parse.urlparse(jobid)[2][1:]
 
     if outdir.count(jid_hash):
@@ -471,20 +585,12 @@ def cancel_multiple(jobids, cred_req):
     # do the cancellation using a proper LCG command
     cmd = 'glite-wms-job-cancel'
 
-    idsfile = tempfile.mktemp('.jids')
-    with open(idsfile, 'w') as ids_file:
-        ids_file.write('\n'.join(jobids) + '\n')
-
     # compose the cancel command
-    cmd = '%s --noint -i %s' % (cmd, idsfile)
+    cmd = '%s --noint -i %%s' % cmd
 
     logger.debug('job cancel command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
-
-    # clean up tempfile
-    if os.path.exists(idsfile):
-        os.remove(idsfile)
+    rc, output = __combine__(__run_per_endpoint__(jobids, lambda idsfile: cmd % idsfile, cred_req))
 
     if rc == 0:
         # job cancelling succeeded, try to remove the glite command logfile
@@ -506,7 +612,7 @@ def cancel(jobid, cred_req):
 
     logger.debug('job cancel command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
+    rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(jobid))
 
     if rc == 0:
         # job cancelling succeeded, try to remove the glite command logfile
@@ -634,9 +740,7 @@ def cream_submit(jdlpath, ce, delid, cred_req):
 
     logger.debug('job submit command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['SubmissionTimeout'])
+    rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(ce), timeout=config['SubmissionTimeout'], retries=0)
 
     if output:
         output = "%s" % output.strip()
@@ -657,25 +761,22 @@ def cream_status(jobids, cred_req):
     if not jobids:
         return [], []
 
-    idsfile = tempfile.mktemp('.jids')
-    with open(idsfile, 'w') as ids_file:
-        ids_file.write('##CREAMJOBS##\n' + '\n'.join(jobids) + '\n')
-
     cmd = 'glite-ce-job-status'
 
-    cmd = '%s -L 2 -n -i %s' % (cmd, idsfile)
+    cmd = '%s -L 2 -n -i %%s' % cmd
     logger.debug('job status command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['StatusPollingTimeout'])
-    job_info_dict = {}
-    if rc == 0 and output:
-        job_info_dict = __cream_parse_job_status__(output)
+    def parse(result):
+        if result.rc == 0 and result.output:
+            return __cream_parse_job_status__(result.output)
+        return {}
 
-    # clean up tempfile
-    if os.path.exists(idsfile):
-        os.remove(idsfile)
+    # one query per CE, all at the same time
+    job_info_dict = {}
+    for result in __run_per_endpoint__(jobids, lambda idsfile: cmd % idsfile, cred_req, header='##CREAMJOBS##\n',
+                                       monitoring='cream-status', timeout=config['StatusPollingTimeout'],
+                                       parse=parse):
+        job_info_dict.update(result.parsed)
 
     return job_info_dict
 
@@ -710,24 +811,17 @@ def cream_purge_multiple(jobids, cred_req):
 def cream_cancel_multiple(jobids, cred_req):
     """CREAM CE job cancelling"""
 
-    idsfile = tempfile.mktemp('.jids')
-    with open(idsfile, 'w') as ids_file:
-        ids_file.write('##CREAMJOBS##\n' + '\n'.join(jobids) + '\n')
-
     cmd = 'glite-ce-job-cancel'
 
-    cmd = '%s -n -N -i %s' % (cmd, idsfile)
+    cmd = '%s -n -N -i %%s' % cmd
 
     logger.debug('job cancel command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
+    rc, output = __combine__(__run_per_endpoint__(jobids, lambda idsfile: cmd % idsfile, cred_req,
+                                                  header='##CREAMJOBS##\n'))
 
     logger.debug(output)
 
-    # clean up tempfile
-    if os.path.exists(idsfile):
-        os.remove(idsfile)
-
     if rc == 0:
         return True
     else:
@@ -899,6 +993,19 @@ def wrap_lcg_infosites(opts=""):
         return output
 
 
+_arc_job_list_locks = {}
+_arc_job_list_locks_lock = threading.Lock()
+
+
+def __arc_job_list_lock__():
+    """
+    The lock of the ARC job list file. The ARC commands given the file with -j rewrite it, so only one of them
+    runs at a time
+    """
+    with _arc_job_list_locks_lock:
+        return _arc_job_list_locks.setdefault(config['ArcJobListFile'], threading.Lock())
+
+
 def __arc_get_config_file_arg__():
     """Helper function to return the config file argument"""
     if config['ArcConfigFile']:
@@ -929,9 +1036,7 @@ def arc_submit(jdlpath, ce, verbose, cred_req):
 
     logger.debug('job submit command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['SubmissionTimeout'])
+    rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(ce), timeout=config['SubmissionTimeout'], retries=0)
 
     if output:
         output = "%s" % output.strip()
@@ -959,26 +1064,28 @@ def arc_status(jobids, ce_list, cred_req):
     if not jobids:
         return [], []
 
-    idsfile = tempfile.mktemp('.jids')
-    with open(idsfile, 'w') as ids_file:
-        ids_file.write('\n'.join(jobids) + '\n')
-
     cmd = 'arcstat'
 
-    cmd += ' %s -i %s -j %s' % (__arc_get_config_file_arg__(), idsfile, config["ArcJobListFile"])
+    cmd += ' %s -i %%s -j %s' % (__arc_get_config_file_arg__(), config["ArcJobListFile"])
     logger.debug('job status command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 1, 255],
-                                            timeout=config['StatusPollingTimeout'])
-    job_info_dict = {}
+    def parse(result):
+        if result.rc == 0 and result.output:
+            return __arc_parse_job_status__(result.output)
+        return {}
 
-    if rc != 0:
+    # one query per CE, one after the other as they all update the job list file
+    results = __run_per_endpoint__(jobids, lambda idsfile: cmd % idsfile, cred_req, monitoring='arcstat',
+                                   lock=__arc_job_list_lock__(), allowed_exit=(0, 1, 255),
+                                   timeout=config['StatusPollingTimeout'], parse=parse)
+
+    if any(result.rc != 0 for result in results):
         logger.warning('jobs not found in XML file: arcsync will be executed to update the job information')
         __arc_sync__(ce_list, cred_req)
 
-    if rc == 0 and output:
-        job_info_dict = __arc_parse_job_status__(output)
+    job_info_dict = {}
+    for result in results:
+        job_info_dict.update(result.parsed)
 
     return job_info_dict
 
@@ -1038,9 +1145,10 @@ def __arc_sync__(ce_list, cred_req):
             __arc_get_config_file_arg__(), config["ArcJobListFile"])
 
     logger.debug('sync ARC jobs list with: %s' % cmd)
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['StatusPollingTimeout'])
+    with __arc_job_list_lock__():
+        rc, output, m = getShell(cred_req).cmd1(cmd,
+                                                allowed_exit=[0, 255],
+                                                timeout=config['StatusPollingTimeout'])
 
     if rc != 0:
         logger.error('Unable to sync ARC jobs. Error: %s' % output)
@@ -1052,9 +1160,7 @@ def arc_get_output(jid, directory, cred_req):
     # construct URI list from ID and output from arcls
     cmd = 'arcls %s %s' % (__arc_get_config_file_arg__(), jid)
     logger.debug('arcls command: %s' % cmd)
-    rc, output, m = getShell(cred_req).cmd1(cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['SubmissionTimeout'])
+    rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(jid), timeout=config['SubmissionTimeout'])
     if rc:
         logger.error(
             "Could not find directory associated with ARC job ID '%s'" % jid)
@@ -1063,10 +1169,10 @@ def arc_get_output(jid, directory, cred_req):
     tmpdir = tempfile.gettempdir()
     jobhash = jid.split('/')[-1]
 
-    copy_cmd =  'arcget -j %s %s -D %s' % (config["ArcJobListFile"],  jid, tmpdir)
-    rc, output, m = getShell(cred_req).cmd1(copy_cmd,
-                                            allowed_exit=[0, 255],
-                                            timeout=config['SubmissionTimeout'])
+    # --keep leaves the job on the CE and in the job list file, so that the download does not need the lock of the
+    # file: the job is dropped from both by arc_purge_multiple, which holds the lock whilst it updates the file
+    copy_cmd =  'arcget --keep -j %s %s -D %s' % (config["ArcJobListFile"],  jid, tmpdir)
+    rc, output = __run__(copy_cmd, cred_req, endpoint=__endpoint__(jid), timeout=config['SubmissionTimeout'])
     #By now the job's output should be in the temp directory
     if rc:
         logger.error(
@@ -1096,7 +1202,8 @@ def arc_purge_multiple(jobids, cred_req):
 
     logger.debug('job purge command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
+    with __arc_job_list_lock__():
+        rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
 
     logger.debug(output)
 
@@ -1116,7 +1223,8 @@ def arc_cancel(jobid, cred_req):
 
     logger.debug('job cancel command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
+    with __arc_job_list_lock__():
+        rc, output = __run__(cmd, cred_req, endpoint=__endpoint__(jobid))
 
     if rc == 0:
         # job cancelling succeeded, try to remove the glite command logfile
@@ -1148,7 +1256,8 @@ def arc_cancel_multiple(jobids, cred_req):
 
     logger.debug('job cancel command: %s' % cmd)
 
-    rc, output, m = getShell(cred_req).cmd1(cmd, allowed_exit=[0, 255])
+    with __arc_job_list_lock__():
+        rc, output = __run__(cmd, cred_req)
 
     if rc == 0:
         # job cancelling succeeded, try to remove the glite command logfile
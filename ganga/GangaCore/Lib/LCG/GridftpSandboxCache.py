@@ -9,7 +9,8 @@ from GangaCore.Utility.GridShell import getShell
 
 from GangaCore.Lib.LCG.GridSandboxCache import GridSandboxCache, GridFileIndex
 from GangaCore.Lib.LCG.Utility import urisplit, get_md5sum
-from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
+from GangaCore.Core.exceptions import GangaException
 
 gridftp_sandbox_cache_schema_datadict = GridSandboxCache._schema.inherit_copy(
 ).datadict
@@ -114,61 +115,45 @@ class GridftpSandboxCache(GridSandboxCache):
             self.logger.error('parent directory not available: %s' % destURI)
             return []
 
-        # the algorithm of uploading one file
-        class MyAlgorithm(Algorithm):
+        # uploading one file
+        def upload_file(file):
+            # decide number of parallel stream to be used
+            fsize = os.path.getsize(urlparse(file)[2])
+            fname = os.path.basename(urlparse(file)[2])
+            fpath = os.path.abspath(urlparse(file)[2])
 
-            def __init__(self, cacheObj):
-                Algorithm.__init__(self)
-                self.cacheObj = cacheObj
+            md5sum = get_md5sum(fpath, ignoreGzipTimestamp=True)
+            nbstream = int((fsize * 1.0) / (10.0 * 1024 * 1024 * 1024))
 
-            def process(self, file):
-                # decide number of parallel stream to be used
-                fsize = os.path.getsize(urlparse(file)[2])
-                fname = os.path.basename(urlparse(file)[2])
-                fpath = os.path.abspath(urlparse(file)[2])
+            if nbstream < 1:
+                nbstream = 1  # min stream
+            if nbstream > 8:
+                nbstream = 8  # max stream
 
-                md5sum = get_md5sum(fpath, ignoreGzipTimestamp=True)
-                nbstream = int((fsize * 1.0) / (10.0 * 1024 * 1024 * 1024))
+            myDestURI = '%s/%s' % (destURI, fname)
 
-                if nbstream < 1:
-                    nbstream = 1  # min stream
-                if nbstream > 8:
-                    nbstream = 8  # max stream
+            # uploading the file
+            cmd = 'uberftp'
+            if nbstream > 1:
+                cmd += ' -c %d' % nbstream
 
-                myDestURI = '%s/%s' % (destURI, fname)
+            cmd += ' file:%s %s' % (fpath, myDestURI)
 
-                # uploading the file
-                cmd = 'uberftp'
-                if nbstream > 1:
-                    cmd += ' -c %d' % nbstream
+            rc, output, m = self.__cmd_retry_loop__(
+                shell, cmd, self.max_try)
 
-                cmd += ' file:%s %s' % (fpath, myDestURI)
+            if rc != 0:
+                self.logger.error(output)
+                raise GangaException('cannot upload file: %s' % file)
 
-                rc, output, m = self.cacheObj.__cmd_retry_loop__(
-                    shell, cmd, self.cacheObj.max_try)
+            fidx = GridftpFileIndex()
+            fidx.id = myDestURI
+            fidx.name = fname
+            fidx.md5sum = md5sum
+            fidx.attributes['fpath'] = fpath
+            return fidx
 
-                if rc != 0:
-                    self.cacheObj.logger.error(output)
-                    return False
-                else:
-                    fidx = GridftpFileIndex()
-                    fidx.id = myDestURI
-                    fidx.name = fname
-                    fidx.md5sum = md5sum
-                    fidx.attributes['fpath'] = fpath
-
-                    self.__appendResult__(file, fidx)
-                    return True
-
-        myAlg = MyAlgorithm(cacheObj=self)
-        myData = Data(collection=files)
-
-        runner = MTRunner(
-            name='sandboxcache_gridftp', algorithm=myAlg, data=myData)
-        runner.start()
-        runner.join(-1)
-
-        return list(runner.getResults().values())
+        return [r.result for r in BulkOperation('sandboxcache_gridftp', upload_file).run(files) if r.ok]
 
     def impl_download(self, cred_req, files=[], dest_dir=None, opts=''):
         """
@@ -181,42 +166,25 @@ class GridftpSandboxCache(GridSandboxCache):
 
         shell = getShell(cred_req)
 
-        # the algorithm of downloading one file to a local directory
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self, cacheObj, copyCommand):
-                Algorithm.__init__(self)
-                self.cacheObj = cacheObj
-                self.copyCommand = copyCommand
-
-            def process(self, file):
+        # downloading one file to a local directory
+        def download_file(file):
 
-                srcURI = file.id
-                fname = os.path.basename(urisplit(srcURI)[2])
-                destURI = 'file:%s/%s' % (dest_dir, fname)
+            srcURI = file.id
+            fname = os.path.basename(urisplit(srcURI)[2])
+            destURI = 'file:%s/%s' % (dest_dir, fname)
 
-                #cmd  = 'uberftp %s %s' % (srcURI, destURI)
-                cmd = '%s %s %s' % (self.copyCommand, srcURI, destURI)
+            #cmd  = 'uberftp %s %s' % (srcURI, destURI)
+            cmd = '%s %s %s' % (self.copyCommand, srcURI, destURI)
 
-                rc, output, m = self.cacheObj.__cmd_retry_loop__(
-                    shell, cmd, self.cacheObj.max_try)
+            rc, output, m = self.__cmd_retry_loop__(
+                shell, cmd, self.max_try)
 
-                if rc != 0:
-                    self.cacheObj.logger.error(output)
-                    return False
-                else:
-                    self.__appendResult__(file.id, file)
-                    return True
+            if rc != 0:
+                self.logger.error(output)
+                raise GangaException('cannot download file: %s' % srcURI)
+            return file
 
-        myAlg = MyAlgorithm(cacheObj=self, copyCommand=self.copyCommand)
-        myData = Data(collection=files)
-
-        runner = MTRunner(
-            name='sandboxcache_gridftp', algorithm=myAlg, data=myData)
-        runner.start()
-        runner.join(-1)
-
-        return list(runner.getResults().values())
+        return [r.result for r in BulkOperation('sandboxcache_gridftp', download_file).run(files) if r.ok]
 
     def impl_delete(self, cred_req, files=[], opts=''):
         """
@@ -225,41 +193,25 @@ class GridftpSandboxCache(GridSandboxCache):
 
         shell = getShell(cred_req)
 
-        # the algorithm of downloading one file to a local directory
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self, cacheObj):
-                Algorithm.__init__(self)
-                self.cacheObj = cacheObj
-
-            def process(self, file):
-
-                destURI = file.id
-
-                uri_info = urisplit(destURI)
+        # deleting one file
+        def delete_file(file):
 
-                cmd = 'uberftp %s "rm %s"' % (uri_info[1], uri_info[2])
+            destURI = file.id
 
-                rc, output, m = self.cacheObj.__cmd_retry_loop__(
-                    shell, cmd, self.cacheObj.max_try)
+            uri_info = urisplit(destURI)
 
-                if rc != 0:
-                    self.cacheObj.logger.error(output)
-                    return False
-                else:
-                    self.__appendResult__(file.id, file)
-                    return True
+            cmd = 'uberftp %s "rm %s"' % (uri_info[1], uri_info[2])
 
-        myAlg = MyAlgorithm(cacheObj=self)
-        myData = Data(collection=files)
+            rc, output, m = self.__cmd_retry_loop__(
+                shell, cmd, self.max_try)
 
-        runner = MTRunner(
-            name='sandboxcache_lcgdel', algorithm=myAlg, data=myData)
-        runner.start()
-        runner.join(-1)
+            if rc != 0:
+                self.logger.error(output)
+                raise GangaException('cannot delete file: %s' % destURI)
+            return file
 
         # update the local index file
-        del_files = list(runner.getResults().values())
+        del_files = [r.result for r in BulkOperation('sandboxcache_lcgdel', delete_file).run(files) if r.ok]
         all_files = self.get_cached_files()
 
         left_files = []
@@ -18,7 +18,7 @@ import mimetypes
 import shutil
 from collections import defaultdict
 
-from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
 from GangaCore.Core.exceptions import GangaException
 
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem, ComponentItem
@@ -55,7 +55,6 @@ def get_lcg_output_downloader():
         number_of_threads = config['OutputDownloaderThread']
 
         _lcg_output_downloader = LCGOutputDownloader(numThread=number_of_threads)
-        _lcg_output_downloader.start()
 
     return _lcg_output_downloader
 
@@ -401,59 +400,50 @@ class LCG(IBackend):
         logger.info('submitting %d subjobs ... it may take a while' %
                     len(node_jdls))
 
-        # the algorithm for submitting a single bulk job
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self, cred_req, masterInputWorkspace):
-                Algorithm.__init__(self)
-                self.cred_req = cred_req
-                self.inpw = masterInputWorkspace
-
-            def process(self, node_info):
-                my_node_offset = node_info['offset']
-                my_node_jdls = node_info['jdls']
-                coll_jdl_name = '__jdlfile__%d_%d__' % (my_node_offset, my_node_offset + len(my_node_jdls))
-                # compose master JDL for collection job
-                jdl_cnt = self.__make_collection_jdl__(my_node_jdls, offset=my_node_offset)
-                jdl_path = self.inpw.writefile(FileBuffer(coll_jdl_name, jdl_cnt))
-
-                master_jid = Grid.submit(jdl_path, self.cred_req, ce=None)
-                if not master_jid:
-                    return False
-                else:
-                    self.__appendResult__(my_node_offset, master_jid)
-                    return True
-
-            def __make_collection_jdl__(self, nodeJDLFiles=[], offset=0):
-                '''Compose the collection JDL for the master job'''
-
-                nodes = ',\n'.join(
-                    ['[file = "%s";]' % x for x in nodeJDLFiles])
-
-                jdl = {
-                    'Type': 'collection',
-                    'VirtualOrganisation': config['VirtualOrganisation'],
-                    'Nodes': ''
-                }
-
-                # specification of the node jobs
-                node_cnt = offset
-                node_str = ''
-                jdl['Nodes'] = '{\n'
-                for f in nodeJDLFiles:
-                    node_str += '[NodeName = "gsj_%d"; file="%s";],\n' % (
-                        node_cnt, f)
-                    node_cnt += 1
-                if node_str:
-                    jdl['Nodes'] += node_str.strip()[:-1]
-                jdl['Nodes'] += '\n}'
-
-                jdlText = Grid.expandjdl(jdl)
-                logger.debug('master job JDL: %s' % jdlText)
-                return jdlText
+        inpw = job.getInputWorkspace()
+        cred_req = self.credential_requirements
+
+        def make_collection_jdl(nodeJDLFiles=[], offset=0):
+            '''Compose the collection JDL for the master job'''
+
+            jdl = {
+                'Type': 'collection',
+                'VirtualOrganisation': config['VirtualOrganisation'],
+                'Nodes': ''
+            }
+
+            # specification of the node jobs
+            node_cnt = offset
+            node_str = ''
+            jdl['Nodes'] = '{\n'
+            for f in nodeJDLFiles:
+                node_str += '[NodeName = "gsj_%d"; file="%s";],\n' % (
+                    node_cnt, f)
+                node_cnt += 1
+            if node_str:
+                jdl['Nodes'] += node_str.strip()[:-1]
+            jdl['Nodes'] += '\n}'
+
+            jdlText = Grid.expandjdl(jdl)
+            logger.debug('master job JDL: %s' % jdlText)
+            return jdlText
+
+        # submitting a single bulk job
+        def submit_bulk_job(node_info):
+            my_node_offset = node_info['offset']
+            my_node_jdls = node_info['jdls']
+            coll_jdl_name = '__jdlfile__%d_%d__' % (my_node_offset, my_node_offset + len(my_node_jdls))
+            # compose master JDL for collection job
+            jdl_cnt = make_collection_jdl(my_node_jdls, offset=my_node_offset)
+            jdl_path = inpw.writefile(FileBuffer(coll_jdl_name, jdl_cnt))
+
+            master_jid = Grid.submit(jdl_path, cred_req, ce=None)
+            if not master_jid:
+                raise GangaException('bulk job %s not submitted' % coll_jdl_name)
+            return master_jid
 
         # split to multiple glite bulk jobs
-        num_chunks = len(node_jdls) / max_node
+        num_chunks = len(node_jdls) // max_node
         if len(node_jdls) % max_node > 0:
             num_chunks += 1
 
@@ -467,22 +457,17 @@ class LCG(IBackend):
             data['jdls'] = node_jdls[ibeg:iend]
             mt_data.append(data)
 
-        myAlg = MyAlgorithm(self.credential_requirements, masterInputWorkspace=job.getInputWorkspace())
-        myData = Data(collection=mt_data)
+        submission = BulkOperation('lcg_jsubmit', submit_bulk_job, num_threads=config['SubmissionThread'], progress=True)
+        master_jids = dict((r.item['offset'], r.result) for r in submission.run(mt_data) if r.ok)
 
-        runner = MTRunner(name='lcg_jsubmit', algorithm=myAlg,
-                          data=myData, numThread=config['SubmissionThread'])
-        runner.start()
-        runner.join(timeout=-1)
-
-        if len(runner.getDoneList()) < num_chunks:
+        if len(master_jids) < num_chunks:
             # not all bulk jobs are successfully submitted. canceling the
             # submitted jobs on WMS immediately
             logger.error('some bulk jobs not successfully (re)submitted, canceling submitted jobs on WMS')
-            Grid.cancel_multiple(list(runner.getResults().values()), self.credential_requirements)
+            Grid.cancel_multiple(list(master_jids.values()), self.credential_requirements)
             return None
         else:
-            return runner.getResults()
+            return master_jids
 
     def __mt_job_prepare__(self, rjobs, subjobconfigs, masterjobconfig):
         '''preparing jobs in multiple threads'''
@@ -503,54 +488,36 @@ class LCG(IBackend):
                 logger.error('master input sandbox perparation failed: %s' % f)
                 return None
 
-        # the algorithm for preparing a single bulk job
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self):
-                Algorithm.__init__(self)
+        # preparing a single job
+        def prepare_job(sj_info):
+            my_sc = sj_info[0]
+            my_sj = sj_info[1]
 
-            def process(self, sj_info):
-                my_sc = sj_info[0]
-                my_sj = sj_info[1]
+            try:
+                logger.debug("preparing job %s" % my_sj.getFQID('.'))
+                jdlpath = my_sj.backend.preparejob(
+                    my_sc, master_input_sandbox)
 
-                try:
-                    logger.debug("preparing job %s" % my_sj.getFQID('.'))
-                    jdlpath = my_sj.backend.preparejob(
-                        my_sc, master_input_sandbox)
-
-                    if (not jdlpath) or (not os.path.exists(jdlpath)):
-                        raise GangaException(
-                            'job %s not properly prepared' % my_sj.getFQID('.'))
+                if (not jdlpath) or (not os.path.exists(jdlpath)):
+                    raise GangaException(
+                        'job %s not properly prepared' % my_sj.getFQID('.'))
 
-                    self.__appendResult__(my_sj.id, jdlpath)
-                    return True
-                except Exception as x:
-                    log_user_exception()
-                    return False
+                return jdlpath
+            except Exception as x:
+                log_user_exception()
+                raise
 
         mt_data = []
         for sc, sj in zip(subjobconfigs, rjobs):
             mt_data.append([sc, sj])
 
-        myAlg = MyAlgorithm()
-        myData = Data(collection=mt_data)
+        results = BulkOperation('lcg_jprepare', prepare_job, num_threads=10, progress=True).run(mt_data)
 
-        runner = MTRunner(
-            name='lcg_jprepare', algorithm=myAlg, data=myData, numThread=10)
-        runner.start()
-        runner.join(-1)
-
-        if len(runner.getDoneList()) < len(mt_data):
+        if not all(r.ok for r in results):
             return None
         else:
             # the result should be sorted
-            results = runner.getResults()
-            sc_ids = sorted(results.keys())
-
-            node_jdls = []
-            for id in sc_ids:
-                node_jdls.append(results[id])
-            return node_jdls
+            return [r.result for r in sorted(results, key=lambda r: r.item[1].id)]
 
     @require_credential
     def master_bulk_submit(self, rjobs, subjobconfigs, masterjobconfig):
@@ -1,5 +1,7 @@
+import threading
+
 from GangaCore.Utility.logging import getLogger
-from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
 from GangaCore.Lib.LCG import Grid
 
 logger = getLogger()
@@ -32,7 +34,7 @@ class LCGOutputDownloadTask(object):
         return 'downloading task for job %s' % self.jobObj.getFQID('.')
 
 
-class LCGOutputDownloadAlgorithm(Algorithm):
+class LCGOutputDownloadAlgorithm(object):
 
     """
     Class for implementing the logic of each downloading task.
@@ -81,35 +83,54 @@ class LCGOutputDownloadAlgorithm(Algorithm):
         if job.master:
             job.master.updateMasterJobStatus()
 
-        self.__appendResult__(job.getFQID('.'), True)
-
         return True
 
 
-class LCGOutputDownloader(MTRunner):
+class LCGOutputDownloader(BulkOperation):
 
     """
-    Class for managing the LCG output downloading activities based on MTRunner.
+    Class for managing the LCG output downloading activities, in numThread threads started with the first task.
     """
 
     def __init__(self, numThread=10):
 
-        MTRunner.__init__(self, name='lcg_output_downloader', data=Data(
-            collection=[]), algorithm=LCGOutputDownloadAlgorithm())
-
-        self.keepAlive = True
-        self.numThread = numThread
+        self.algorithm = LCGOutputDownloadAlgorithm()
+        BulkOperation.__init__(self, 'lcg_output_downloader', self.algorithm.process,
+                               num_threads=numThread, keep_alive=True)
+        # the FQIDs of the jobs being downloaded
+        self._tasks = set()
+        self._tasks_lock = threading.Lock()
 
     def countAliveAgent(self):
 
-        return self.__cnt_alive_threads__()
+        return min(self.pending(), self.num_threads)
 
     def addTask(self, job):
 
-        task = LCGOutputDownloadTask(job)
+        fqid = job.getFQID('.')
 
-        logger.debug('add output downloading task: job %s' % job.getFQID('.'))
+        with self._tasks_lock:
+            if fqid in self._tasks:
+                logger.debug('skip adding new item: downloading task for job %s already in the task queue' % fqid)
+                return True
+            self._tasks.add(fqid)
 
-        self.addDataItem(task)
+        logger.debug('add output downloading task: job %s' % fqid)
+
+        try:
+            future = self.submit(LCGOutputDownloadTask(job))
+        except Exception:
+            # e.g. the downloader is stopped: let the task be added again
+            with self._tasks_lock:
+                self._tasks.discard(fqid)
+            raise
+        future.add_done_callback(lambda f: self.__taskDone__(fqid, f.result()))
 
         return True
+
+    def __taskDone__(self, fqid, result):
+
+        with self._tasks_lock:
+            self._tasks.discard(fqid)
+        if not result.ok:
+            logger.error('output downloading failed for job %s: %s' % (fqid, result.error))
@@ -15,7 +15,8 @@ import re
 
 from urllib.parse import urlparse
 
-from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
+from GangaCore.Core.exceptions import GangaException
 
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
 
@@ -96,81 +97,63 @@ class LCGSandboxCache(GridSandboxCache):
         self.logger.debug(
             'upload file with LFC_HOST: %s', shell.env['LFC_HOST'])
 
-        # the algorithm of uploading one file
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self, cacheObj):
-                Algorithm.__init__(self)
-                self.cacheObj = cacheObj
-                self.dirname = self.cacheObj.__get_unique_fname__()
-
-            def process(self, file):
-                # decide number of parallel stream to be used
-                fsize = os.path.getsize(urlparse(file)[2])
-                fname = os.path.basename(urlparse(file)[2])
-                fpath = os.path.abspath(urlparse(file)[2])
-
-                md5sum = get_md5sum(fpath, ignoreGzipTimestamp=True)
-                nbstream = int((fsize * 1.0) / (10.0 * 1024 * 1024 * 1024))
-
-                if nbstream < 1:
-                    nbstream = 1  # min stream
-                if nbstream > 8:
-                    nbstream = 8  # max stream
-
-                cmd = 'lcg-cr -t 180 --vo %s -n %d' % (
-                    self.cacheObj.vo, nbstream)
-                if self.cacheObj.se is not None:
-                    cmd = cmd + ' -d %s' % self.cacheObj.se
-                if self.cacheObj.se_type == 'srmv2' and self.cacheObj.srm_token:
-                    cmd = cmd + ' -D srmv2 -s %s' % self.cacheObj.srm_token
-
-                # specify the physical location
-                cmd = cmd + \
-                    ' -P %s/ganga.%s/%s' % (self.cacheObj.se_rpath,
-                                            self.dirname, fname)
-
-                # specify the logical filename
-                # NOTE: here we assume the root dir for VO is /grid/<voname>
-                lfc_dir = '/grid/%s/ganga.%s' % (
-                    self.cacheObj.vo, self.dirname)
-                if not self.cacheObj.__lfc_mkdir__(shell, lfc_dir):
-                    self.cacheObj.logger.warning(
-                        'cannot create LFC directory: %s' % lfc_dir)
-                    return None
-
-                cmd = cmd + ' -l %s/%s %s' % (lfc_dir, fname, file)
-                rc, output, m = self.cacheObj.__cmd_retry_loop__(
-                    shell, cmd, self.cacheObj.max_try)
-
-                if rc != 0:
-                    return False
-                else:
-                    match = re.search('(guid:\S+)', output)
-                    if match:
-                        guid = match.group(1)
-
-                        fidx = LCGFileIndex()
-                        fidx.id = guid
-                        fidx.name = fname
-                        fidx.md5sum = md5sum
-                        fidx.lfc_host = self.cacheObj.lfc_host
-                        fidx.local_fpath = fpath
-
-                        self.__appendResult__(file, fidx)
-                        return True
-                    else:
-                        return False
-
-        myAlg = MyAlgorithm(cacheObj=self)
-        myData = Data(collection=files)
-
-        runner = MTRunner(
-            name='sandboxcache_lcgcr', algorithm=myAlg, data=myData)
-        runner.start()
-        runner.join(-1)
-
-        return list(runner.getResults().values())
+        dirname = self.__get_unique_fname__()
+
+        # uploading one file
+        def upload_file(file):
+            # decide number of parallel stream to be used
+            fsize = os.path.getsize(urlparse(file)[2])
+            fname = os.path.basename(urlparse(file)[2])
+            fpath = os.path.abspath(urlparse(file)[2])
+
+            md5sum = get_md5sum(fpath, ignoreGzipTimestamp=True)
+            nbstream = int((fsize * 1.0) / (10.0 * 1024 * 1024 * 1024))
+
+            if nbstream < 1:
+                nbstream = 1  # min stream
+            if nbstream > 8:
+                nbstream = 8  # max stream
+
+            cmd = 'lcg-cr -t 180 --vo %s -n %d' % (
+                self.vo, nbstream)
+            if self.se is not None:
+                cmd = cmd + ' -d %s' % self.se
+            if self.se_type == 'srmv2' and self.srm_token:
+                cmd = cmd + ' -D srmv2 -s %s' % self.srm_token
+
+            # specify the physical location
+            cmd = cmd + \
+                ' -P %s/ganga.%s/%s' % (self.se_rpath,
+                                        dirname, fname)
+
+            # specify the logical filename
+            # NOTE: here we assume the root dir for VO is /grid/<voname>
+            lfc_dir = '/grid/%s/ganga.%s' % (
+                self.vo, dirname)
+            if not self.__lfc_mkdir__(shell, lfc_dir):
+                self.logger.warning(
+                    'cannot create LFC directory: %s' % lfc_dir)
+                raise GangaException('cannot create LFC directory: %s' % lfc_dir)
+
+            cmd = cmd + ' -l %s/%s %s' % (lfc_dir, fname, file)
+            rc, output, m = self.__cmd_retry_loop__(
+                shell, cmd, self.max_try)
+
+            match = re.search('(guid:\S+)', output) if rc == 0 else None
+            if not match:
+                raise GangaException('cannot upload file: %s' % file)
+
+            guid = match.group(1)
+
+            fidx = LCGFileIndex()
+            fidx.id = guid
+            fidx.name = fname
+            fidx.md5sum = md5sum
+            fidx.lfc_host = self.lfc_host
+            fidx.local_fpath = fpath
+            return fidx
+
+        return [r.result for r in BulkOperation('sandboxcache_lcgcr', upload_file).run(files) if r.ok]
 
     def impl_download(self, cred_req, files=[], dest_dir=None, opts=''):
         """
@@ -181,97 +164,67 @@ class LCGSandboxCache(GridSandboxCache):
             dest_dir = os.getcwd()
         self.logger.debug('download file to: %s', dest_dir)
 
-        # the algorithm of downloading one file to a local directory
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self, cacheObj, cred_req):
-                Algorithm.__init__(self)
-                self.cacheObj = cacheObj
-                self.shell = getShell(cred_req)
-
-            def process(self, file):
-
-                guid = file.id
-                lfn = file.attributes['local_fpath']
-                lfc_host = file.attributes['lfc_host']
-                fname = os.path.basename(urlparse(lfn)[2])
+        shell = getShell(cred_req)
 
-                self.shell.env['LFC_HOST'] = lfc_host
-                self.cacheObj.logger.debug(
-                    'download file with LFC_HOST: %s', self.shell.env['LFC_HOST'])
+        # downloading one file to a local directory
+        def download_file(file):
 
-                cmd = 'lcg-cp -t %d --vo %s ' % (
-                    self.cacheObj.timeout, self.cacheObj.vo)
-                if self.cacheObj.se_type:
-                    cmd += '-T %s ' % self.cacheObj.se_type
-                cmd += '%s file://%s/%s' % (guid, dest_dir, fname)
+            guid = file.id
+            lfn = file.attributes['local_fpath']
+            lfc_host = file.attributes['lfc_host']
+            fname = os.path.basename(urlparse(lfn)[2])
 
-                self.cacheObj.logger.debug('download file: %s', cmd)
+            shell.env['LFC_HOST'] = lfc_host
+            self.logger.debug(
+                'download file with LFC_HOST: %s', shell.env['LFC_HOST'])
 
-                rc, output, m = self.cacheObj.__cmd_retry_loop__(
-                    self.shell, cmd, self.cacheObj.max_try)
+            cmd = 'lcg-cp -t %d --vo %s ' % (
+                self.timeout, self.vo)
+            if self.se_type:
+                cmd += '-T %s ' % self.se_type
+            cmd += '%s file://%s/%s' % (guid, dest_dir, fname)
 
-                if rc != 0:
-                    return False
-                else:
-                    self.__appendResult__(file.id, file)
-                    return True
+            self.logger.debug('download file: %s', cmd)
 
-        myAlg = MyAlgorithm(cacheObj=self, cred_req=cred_req)
-        myData = Data(collection=files)
+            rc, output, m = self.__cmd_retry_loop__(
+                shell, cmd, self.max_try)
 
-        runner = MTRunner(
-            name='sandboxcache_lcgcp', algorithm=myAlg, data=myData)
-        runner.start()
-        runner.join(-1)
+            if rc != 0:
+                raise GangaException('cannot download file: %s' % guid)
+            return file
 
-        return list(runner.getResults().values())
+        return [r.result for r in BulkOperation('sandboxcache_lcgcp', download_file).run(files) if r.ok]
 
     def impl_delete(self, cred_req, files=[], opts=''):
         """
         Deletes multiple files from remote grid storages. 
         """
 
-        # the algorithm of downloading one file to a local directory
-        class MyAlgorithm(Algorithm):
-
-            def __init__(self, cacheObj, cred_req):
-                Algorithm.__init__(self)
-                self.cacheObj = cacheObj
-                self.shell = getShell(cred_req)
-
-            def process(self, file):
-
-                guid = file.id
+        shell = getShell(cred_req)
 
-                lfc_host = file.attributes['lfc_host']
+        # deleting one file
+        def delete_file(file):
 
-                self.shell.env['LFC_HOST'] = lfc_host
+            guid = file.id
 
-                self.cacheObj.logger.debug(
-                    'delete file with LFC_HOST: %s' % self.shell.env['LFC_HOST'])
+            lfc_host = file.attributes['lfc_host']
 
-                cmd = 'lcg-del -a -t 60 --vo %s %s' % (self.cacheObj.vo, guid)
+            shell.env['LFC_HOST'] = lfc_host
 
-                rc, output, m = self.cacheObj.__cmd_retry_loop__(
-                    self.shell, cmd, self.cacheObj.max_try)
+            self.logger.debug(
+                'delete file with LFC_HOST: %s' % shell.env['LFC_HOST'])
 
-                if rc != 0:
-                    return False
-                else:
-                    self.__appendResult__(file.id, file)
-                    return True
+            cmd = 'lcg-del -a -t 60 --vo %s %s' % (self.vo, guid)
 
-        myAlg = MyAlgorithm(cacheObj=self, cred_req=cred_req)
-        myData = Data(collection=files)
+            rc, output, m = self.__cmd_retry_loop__(
+                shell, cmd, self.max_try)
 
-        runner = MTRunner(
-            name='sandboxcache_lcgdel', algorithm=myAlg, data=myData)
-        runner.start()
-        runner.join(-1)
+            if rc != 0:
+                raise GangaException('cannot delete file: %s' % guid)
+            return file
 
         # update the local index file
-        del_files = list(runner.getResults().values())
+        del_files = [r.result for r in BulkOperation('sandboxcache_lcgdel', delete_file).run(files) if r.ok]
         all_files = self.get_cached_files()
 
         left_files = []
@@ -7,6 +7,8 @@ from GangaCore.Utility.logging import getLogger
 from GangaCore.Lib.LCG.ElapsedTimeProfiler import ElapsedTimeProfiler
 import hashlib
 import socket
+import threading
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
 
 
 def get_uuid(*args):
@@ -76,3 +78,46 @@ def get_md5sum(fname, ignoreGzipTimestamp=False):
     profiler.check('md5sum calculation time')
 
     return md5sum
+
+
+class OutputFetcher(BulkOperation):
+
+    '''
+    Downloads the outputs of jobs in at most LCG.OutputDownloaderThread threads, which are kept for the session.
+    The monitoring hands each download over with fetch() and goes on straight away: the function given finishes
+    the job once its output is there. The download of a key is not started again whilst it is running.
+    '''
+
+    def __init__(self, name, workers=None):
+        from GangaCore.Utility.Config import getConfig
+        BulkOperation.__init__(self, name, self._run, num_threads=workers or getConfig('LCG')['OutputDownloaderThread'],
+                               keep_alive=True)
+        self._fetching = set()
+        self._fetching_lock = threading.Lock()
+
+    @staticmethod
+    def _run(item):
+        function, args = item
+        return function(*args)
+
+    def fetch(self, key, function, *args):
+        ''' Start function(*args) in the background, unless the download of key is running. Returns True if started '''
+        with self._fetching_lock:
+            if key in self._fetching:
+                return False
+            self._fetching.add(key)
+        try:
+            future = self.submit((function, args))
+        except Exception:
+            # e.g. the fetcher is stopped: let the download be started again
+            with self._fetching_lock:
+                self._fetching.discard(key)
+            raise
+        future.add_done_callback(lambda f: self._done(key, f.result()))
+        return True
+
+    def _done(self, key, result):
+        with self._fetching_lock:
+            self._fetching.discard(key)
+        if not result.ok:
+            getLogger().error('output download failed for %s: %s' % (key, result.error))
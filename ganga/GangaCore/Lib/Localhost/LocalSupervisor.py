@@ -0,0 +1,301 @@
+"""
+The supervisor of the processes of the jobs run by the Local backend.
+
+One thread owns all the wrapper processes of this session. Jobs are started in the order they are submitted
+as long as fewer than [Local]max_running are running and, if [Local]min_free_memory is set, enough memory is
+available. The others wait in a FIFO queue, still in the 'submitted' state. The thread is woken when a wrapper
+process exits (through a pidfd where the platform has them, else it checks every poll_interval seconds), reaps it
+with wait4() to record the resources it used and hands the job over to the monitoring straight away.
+
+The jobs are changed by the monitoring loop, by the finalisation of the jobs whose wrapper has exited and by the
+supervisor itself. Each of them holds the job with updating() and its session lock while it changes it.
+"""
+
+import collections
+import os
+import select
+import subprocess
+import threading
+from contextlib import contextmanager
+
+import GangaCore.Utility.Config
+import GangaCore.Utility.logging
+
+from GangaCore.Core.GangaThread import GangaThread
+
+logger = GangaCore.Utility.logging.getLogger()
+config = GangaCore.Utility.Config.getConfig('Local')
+
+# seconds between the checks of the processes when they cannot be waited on with pidfds
+poll_interval = 0.5
+
+
+def available_memory():
+    """ Return the memory available for new processes in MB, or None if it is not known """
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+class WrapperProcess(object):
+
+    """ A wrapper process started by the supervisor and the job it runs """
+
+    __slots__ = ('job', 'scriptpath', 'process', 'pidfd')
+
+    def __init__(self, job, scriptpath):
+        self.job = job
+        self.scriptpath = scriptpath
+        self.process = None
+        self.pidfd = None
+
+
+class LocalSupervisor(GangaThread):
+
+    """ Start the wrapper processes of the Local jobs within the configured slots and reap them as they exit """
+
+    def __init__(self):
+        super(LocalSupervisor, self).__init__(name='LocalSupervisor', critical=False)
+        self._queue = collections.deque()
+        self._running = {}
+        # {id(job): wrapper} of the jobs queued or running, the wrapper keeps the job and so its id
+        self._wrappers = {}
+        # {pid: (exit status, resources)} of the wrappers which have exited and not been collected yet
+        self._exited = {}
+        # {FQID: [thread, depth]} of the jobs held with updating()
+        self._updating = {}
+        self._updated = threading.Condition(self._lock)
+        self._wake_read, self._wake_write = os.pipe()
+
+    def maxRunning(self):
+        return config['max_running'] or os.cpu_count() or 1
+
+    def _hasSlot(self):
+        if len(self._running) >= self.maxRunning():
+            return False
+        if config['min_free_memory'] and self._running:
+            free = available_memory()
+            if free is not None and free < config['min_free_memory']:
+                return False
+        return True
+
+    def launch(self, job, scriptpath):
+        """
+        Start the wrapper script of a job now if there is a free slot, else queue it.
+        Returns False if the process could not be started
+        """
+        wrapper = WrapperProcess(job, scriptpath)
+        with self._lock:
+            queued = bool(self._queue) or not self._hasSlot()
+            if queued:
+                self._queue.append(wrapper)
+                self._wrappers[id(job)] = wrapper
+            else:
+                started = self._start(wrapper)
+        if queued:
+            logger.debug('job %s waits for a free slot', job.getFQID('.'))
+            return True
+        # the job attributes are only set outside of the lock of the supervisor
+        if started:
+            with self.updating(job, wait=True):
+                job.backend.wrapper_pid = wrapper.process.pid
+        return started
+
+    def _start(self, wrapper):
+        try:
+            wrapper.process = subprocess.Popen(["python2", wrapper.scriptpath, 'subprocess'], stdin=subprocess.DEVNULL)
+        except OSError as x:
+            logger.error('cannot start a job process: %s', str(x))
+            self._wrappers.pop(id(wrapper.job), None)
+            return False
+        self._wrappers[id(wrapper.job)] = wrapper
+        pid = wrapper.process.pid
+        if hasattr(os, 'pidfd_open'):
+            try:
+                wrapper.pidfd = os.pidfd_open(pid)
+            except OSError:
+                wrapper.pidfd = None
+        self._running[pid] = wrapper
+        self._wake()
+        return True
+
+    def stop(self):
+        super(LocalSupervisor, self).stop()
+        self._wake()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_write, b'x')
+        except BlockingIOError:
+            # the supervisor has already been woken
+            pass
+
+    def isKnown(self, job):
+        """ Is the job waiting for a slot or running under this supervisor """
+        with self._lock:
+            wrapper = self._wrappers.get(id(job))
+            return wrapper is not None and wrapper.job is job
+
+    @contextmanager
+    def updating(self, job, wait=False):
+        """
+        Hold a job, and its session lock, while this thread changes it. Yields True once the job is held. If another
+        thread holds the job, yields False straight away unless wait is set, the job is then left to that thread.
+        A thread may hold a job more than once
+        """
+        key = job.getFQID('.')
+        me = threading.current_thread()
+        with self._updated:
+            holder = self._updating.get(key)
+            if holder is not None and holder[0] is not me and not wait:
+                held = False
+            else:
+                while holder is not None and holder[0] is not me:
+                    self._updated.wait()
+                    holder = self._updating.get(key)
+                if holder is None:
+                    self._updating[key] = holder = [me, 0]
+                holder[1] += 1
+                held = True
+
+        if not held:
+            yield False
+            return
+        try:
+            job._getSessionLock()
+            yield True
+        finally:
+            with self._updated:
+                holder[1] -= 1
+                if holder[1] == 0:
+                    del self._updating[key]
+                    self._updated.notify_all()
+
+    def dequeue(self, job):
+        """ Remove a job which has not been started yet from the queue. Returns True if it was queued """
+        with self._lock:
+            wrapper = self._wrappers.get(id(job))
+            if wrapper is None or wrapper.job is not job or wrapper.process is not None:
+                return False
+            self._queue.remove(wrapper)
+            del self._wrappers[id(job)]
+            return True
+
+    def pidOf(self, job):
+        """ Return the pid of the wrapper process of a job, None if it is not running under this supervisor """
+        with self._lock:
+            wrapper = self._wrappers.get(id(job))
+            if wrapper is None or wrapper.job is not job or wrapper.process is None:
+                return None
+            return wrapper.process.pid
+
+    def collect(self, pid):
+        """
+        Return (exit status, resources) of a wrapper process which has exited, None if it is still
+        running or not a child of this supervisor. The exit status is None if it is not known
+        """
+        with self._lock:
+            return self._exited.pop(pid, None)
+
+    def waitFor(self, pid):
+        """ Wait for a wrapper process which has been killed, its exit status is dropped """
+        with self._lock:
+            if pid in self._running:
+                self._reap(pid, blocking=True)
+            self._exited.pop(pid, None)
+        self._wake()
+
+    def _reap(self, pid, blocking):
+        """ wait4() for one wrapper process, return True if it has exited """
+        try:
+            reaped, status, usage = os.wait4(pid, 0 if blocking else os.WNOHANG)
+        except ChildProcessError:
+            # reaped by someone else, how it exited is lost
+            logger.warning('the exit status of the wrapper process %d is not known', pid)
+            reaped, status, usage = pid, None, None
+        if reaped == 0:
+            return False
+        wrapper = self._running.pop(pid)
+        self._wrappers.pop(id(wrapper.job), None)
+        if wrapper.pidfd is not None:
+            os.close(wrapper.pidfd)
+        if status is not None:
+            wrapper.process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        resources = {}
+        if usage is not None:
+            resources = {'utime': usage.ru_utime, 'stime': usage.ru_stime, 'maxrss_kb': usage.ru_maxrss}
+        self._exited[pid] = (status, resources)
+        return True
+
+    def run(self):
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        while not self.should_stop():
+            with self._lock:
+                pidfds = [w.pidfd for w in self._running.values() if w.pidfd is not None]
+                polling = len(pidfds) < len(self._running) or bool(self._queue)
+            try:
+                # without pidfds, or with jobs waiting for memory, the processes are checked every poll_interval
+                select.select([self._wake_read] + pidfds, [], [], poll_interval if polling else 5)
+                os.read(self._wake_read, 4096)
+            except (OSError, ValueError):
+                # nothing to read, or a pidfd closed by waitFor() in the meantime
+                pass
+
+            finished = []
+            started = []
+            failed = []
+            with self._lock:
+                for pid in list(self._running):
+                    job = self._running[pid].job
+                    if self._reap(pid, blocking=False):
+                        finished.append(job)
+                while self._queue and self._hasSlot():
+                    wrapper = self._queue.popleft()
+                    (started if self._start(wrapper) else failed).append(wrapper)
+
+            for wrapper in started:
+                with self.updating(wrapper.job, wait=True):
+                    wrapper.job.backend.wrapper_pid = wrapper.process.pid
+            for wrapper in failed:
+                with self.updating(wrapper.job, wait=True):
+                    wrapper.job.updateStatus('failed')
+            if finished:
+                self._finished(finished)
+
+    @staticmethod
+    def _finished(jobs):
+        """ Let the monitoring finalise the jobs whose wrapper has exited without waiting for its next cycle """
+        from GangaCore.Core.GangaThread.WorkerThreads import getQueues
+        getQueues()._addFinalisation(finalise, args=(jobs,), name='Local jobs finished')
+
+
+def finalise(jobs):
+    """ Update the jobs whose wrapper has exited and the status of their master jobs """
+    from GangaCore.Lib.Localhost.Localhost import Localhost
+    Localhost.updateMonitoringInformation(jobs)
+    masters = []
+    for j in jobs:
+        if j.master is not None and j.master not in masters:
+            masters.append(j.master)
+    for master in masters:
+        master.updateMasterJobStatus()
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def getSupervisor():
+    """ Return the supervisor of this session, started on first use """
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None or not _supervisor.is_alive():
+            _supervisor = LocalSupervisor()
+            _supervisor.start()
+        return _supervisor
@@ -1,7 +1,6 @@
 from GangaCore.GPIDev.Adapters.IBackend import IBackend
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
 
-import GangaCore.Utility.logic
 import GangaCore.Utility.util
 
 from GangaCore.GPIDev.Lib.File import FileBuffer
@@ -9,9 +8,7 @@ from GangaCore.GPIDev.Lib.File import FileBuffer
 import os
 import os.path
 import re
-import errno
 
-import subprocess
 
 import datetime
 import time
@@ -23,15 +20,23 @@ import GangaCore.Utility.Config
 import GangaCore.Utility.Virtualization
 
 from GangaCore.GPIDev.Base.Proxy import getName, stripProxy
+from GangaCore.Lib.Localhost.LocalSupervisor import getSupervisor
 
 logger = GangaCore.Utility.logging.getLogger()
 config = GangaCore.Utility.Config.getConfig('Local')
 
+exitcode_pattern = re.compile(r'^EXITCODE: (?P<exitcode>-?\d*)', re.M)
+pid_pattern = re.compile(r'^PID: (?P<pid>\d*)', re.M)
+
 class Localhost(IBackend):
 
     """Run jobs in the background on local host.
 
     The job is run in the workdir (usually in /tmp).
+
+    At most [Local]max_running jobs run at the same time (one per core by default), the
+    others wait in the submitted state and are started in the order of their submission.
+    The resources used by a finished job are kept in backend.resources.
     """
     _schema = Schema(Version(1, 2), {'id': SimpleItem(defvalue=-1, protected=1, copyable=0, doc='Process id.'),
                                      'status': SimpleItem(defvalue=None, typelist=[None, str], protected=1, copyable=0, hidden=1, doc='*NOT USED*'),
@@ -40,7 +45,8 @@ class Localhost(IBackend):
                                      'actualCE': SimpleItem(defvalue='', protected=1, copyable=0, doc='Hostname where the job was submitted.'),
                                      'wrapper_pid': SimpleItem(defvalue=-1, protected=1, copyable=0, hidden=1, doc='(internal) process id of the execution wrapper'),
                                      'nice': SimpleItem(defvalue=0, doc='adjust process priority using nice -n command'),
-                                     'force_parallel': SimpleItem(defvalue=False, doc='should jobs really be submitted in parallel')
+                                     'force_parallel': SimpleItem(defvalue=False, doc='should jobs really be submitted in parallel'),
+                                     'resources': SimpleItem(defvalue={}, protected=1, copyable=0, doc='Resources used by the job: user and system cpu seconds (utime, stime) and peak memory in kB (maxrss_kb)')
                                      })
     _category = 'backends'
     _name = 'Local'
@@ -81,12 +87,11 @@ class Localhost(IBackend):
         return self.run(job.getInputWorkspace().getPath('__jobscript__'))
 
     def run(self, scriptpath):
-        try:
-            process = subprocess.Popen(["python2", scriptpath, 'subprocess'], stdin=subprocess.DEVNULL)
-        except OSError as x:
-            logger.error('cannot start a job process: %s', str(x))
+        # the job is started by the supervisor as soon as there is a free slot
+        self.wrapper_pid = -1
+        self.resources = {}
+        if not getSupervisor().launch(self.getJobObject(), scriptpath):
             return 0
-        self.wrapper_pid = process.pid
         self.actualCE = GangaCore.Utility.util.hostname()
         return 1
 
@@ -258,21 +263,31 @@ class Localhost(IBackend):
 
         job = self.getJobObject()
 
-        ok = True
-        try:
-            # kill the wrapper script
-            # bugfix: #18178 - since wrapper script sets a new session and new
-            # group, we can use this to kill all processes in the group
-            os.kill(-self.wrapper_pid, signal.SIGKILL)
-        except OSError as x:
-            logger.warning('while killing wrapper script for job %s: pid=%d, %s', job.getFQID('.'), self.wrapper_pid, str(x))
-            ok = False
-
-        # waitpid to avoid zombies
-        try:
-            ws = os.waitpid(self.wrapper_pid, 0)
-        except OSError as x:
-            logger.warning('problem while waitpid %s: %s', job.getFQID('.'), x)
+        supervisor = getSupervisor()
+        # the job is held so that the supervisor does not finalise it as failed once its wrapper has been killed
+        with supervisor.updating(job, wait=True):
+            if supervisor.dequeue(job):
+                # the job has not been started yet
+                self.remove_workdir()
+                return 1
+
+            # the wrapper may have been started before its pid was set on the job
+            pid = supervisor.pidOf(job) or self.wrapper_pid
+            if pid > 0:
+                try:
+                    # kill the wrapper script
+                    # bugfix: #18178 - since wrapper script sets a new session and new
+                    # group, we can use this to kill all processes in the group
+                    os.kill(-pid, signal.SIGKILL)
+                except OSError as x:
+                    # the wrapper has not made its own process group yet, it has then not started the application either
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except OSError:
+                        logger.warning('while killing wrapper script for job %s: pid=%d, %s', job.getFQID('.'), pid, str(x))
+
+                # wait for the wrapper to avoid zombies
+                supervisor.waitFor(pid)
 
         from GangaCore.Utility.files import recursive_copy
 
@@ -299,86 +314,74 @@ class Localhost(IBackend):
     @staticmethod
     def updateMonitoringInformation(jobs):
 
-        def get_exit_code(f):
-            import re
-            with open(f) as statusfile:
-                stat = statusfile.read()
-            m = re.compile(
-                r'^EXITCODE: (?P<exitcode>-?\d*)', re.M).search(stat)
-
-            if m is None:
-                return None
-            else:
-                return int(m.group('exitcode'))
-
-        def get_pid(f):
-            import re
-            with open(f) as statusfile:
-                stat = statusfile.read()
-            m = re.compile(r'^PID: (?P<pid>\d*)', re.M).search(stat)
-
-            if m is None:
-                return None
-            else:
-                return int(m.group('pid'))
-
         logger.debug('local ping: %s', str(jobs))
 
-        for j in jobs:
-            outw = j.getOutputWorkspace()
-
-            # try to get the application exit code from the status file
-            try:
-                statusfile = os.path.join(outw.getPath(), '__jobstatus__')
-                if j.status == 'submitted':
-                    pid = get_pid(statusfile)
-                    if pid:
-                        j.backend.id = pid
-                        #logger.info('Local job %s status changed to running, pid=%d',j.getFQID('.'),pid)
-                        j.updateStatus('running')  # bugfix: 12194
-                exitcode = get_exit_code(statusfile)
-                with open(statusfile) as status_file:
-                    logger.debug('status file: %s %s', statusfile, status_file.read())
-            except IOError as x:
-                logger.debug('problem reading status file: %s (%s)', statusfile, str(x))
-                exitcode = None
-            except Exception as x:
-                logger.critical('problem during monitoring: %s', str(x))
-                import traceback
-                traceback.print_exc()
-                raise x
+        supervisor = getSupervisor()
 
-            # check if the exit code of the wrapper script is available (non-blocking check)
-            # if the wrapper script exited with non zero this is an error
-            try:
-                ws = os.waitpid(stripProxy(j.backend).wrapper_pid, os.WNOHANG)
-                if not GangaCore.Utility.logic.implies(ws[0] != 0, ws[1] == 0):
-                    # FIXME: for some strange reason the logger DOES NOT LOG (checked in python 2.3 and 2.5)
-                    # print 'logger problem', logger.name
-                    # print 'logger',logger.getEffectiveLevel()
-                    logger.critical('wrapper script for job %s exit with code %d', str(j.getFQID('.')), ws[1])
-                    logger.critical('report this as a bug at https://github.com/ganga-devs/ganga/issues/')
-                    j.updateStatus('failed')
-            except OSError as x:
-                if x.errno != errno.ECHILD:
-                    logger.warning('cannot do waitpid for %d: %s', stripProxy(j.backend).wrapper_pid, str(x))
-
-            # if the exit code was collected for the application get the exit
-            # code back
+        for j in jobs:
+            # the job is skipped if another thread, e.g. the finalisation of the jobs whose wrapper has exited,
+            # is updating it
+            with supervisor.updating(j) as held:
+                if held:
+                    Localhost._updateJob(j, supervisor)
 
-            if not exitcode is None:
-                # status file indicates that the application finished
+    @staticmethod
+    def _updateJob(j, supervisor):
+        """ Update one job held with supervisor.updating() """
+        if j.status not in ['submitted', 'running']:
+            # already finalised, e.g. by the supervisor when the wrapper exited
+            return
+
+        if j.status == 'submitted' and j.backend.wrapper_pid == -1 and not supervisor.isKnown(j):
+            # submitted in an earlier session but never started
+            logger.info('starting job %s submitted in a previous session', j.getFQID('.'))
+            if not supervisor.launch(j, j.getInputWorkspace().getPath('__jobscript__')):
+                j.updateStatus('failed')
+            return
+
+        # the exit status of the wrapper script is kept by the supervisor once it has exited
+        # it is collected before the status file is read as the wrapper writes the file before exiting
+        exited = supervisor.collect(j.backend.wrapper_pid)
+
+        # the status file is read once to get both the process id and the exit code of the application
+        statusfile = os.path.join(j.getOutputWorkspace().getPath(), '__jobstatus__')
+        try:
+            with open(statusfile) as status_file:
+                stat = status_file.read()
+            logger.debug('status file: %s %s', statusfile, stat)
+        except IOError as x:
+            logger.debug('problem reading status file: %s (%s)', statusfile, str(x))
+            stat = ''
+
+        if j.status == 'submitted':
+            m = pid_pattern.search(stat)
+            if m is not None and m.group('pid'):
+                j.backend.id = int(m.group('pid'))
+                j.updateStatus('running')  # bugfix: 12194
+
+        m = exitcode_pattern.search(stat)
+        exitcode = int(m.group('exitcode')) if m is not None and m.group('exitcode') else None
+
+        if exited is not None:
+            status, resources = exited
+            j.backend.resources = resources
+            # if the wrapper script exited with non zero, or without the exit code of the application, this is an error.
+            # A wrapper whose exit status is lost is judged by the exit code of the application alone
+            if (status is not None and status != 0) or exitcode is None:
+                logger.critical('wrapper script for job %s exit with code %s', str(j.getFQID('.')), status)
+                logger.critical('report this as a bug at https://github.com/ganga-devs/ganga/issues/')
                 j.backend.exitcode = exitcode
+                j.updateStatus('failed')
+                j.backend.remove_workdir()
+                return
 
-                if exitcode == 0:
-                    j.updateStatus('completed')
-                else:
-                    j.updateStatus('failed')
-
-                #logger.info('Local job %s finished with exitcode %d',j.getFQID('.'),exitcode)
-
-                # if j.outputdata:
-                # j.outputdata.fill()
+        if exitcode is not None:
+            # status file indicates that the application finished
+            j.backend.exitcode = exitcode
 
-                j.backend.remove_workdir()
+            if exitcode == 0:
+                j.updateStatus('completed')
+            else:
+                j.updateStatus('failed')
 
+            j.backend.remove_workdir()
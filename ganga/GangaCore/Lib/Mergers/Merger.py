@@ -14,9 +14,13 @@ from GangaCore.GPIDev.Adapters.IGangaFile import IGangaFile
 from GangaCore.Utility.Config import ConfigError, getConfig
 from GangaCore.Utility.Plugin import allPlugins
 from GangaCore.Utility.logging import getLogger
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import gzip
 import subprocess
 import os
-import string
+import shutil
+import tempfile
+import time
 import copy
 
 logger = getLogger()
@@ -48,6 +52,77 @@ def getMergerObject(file_ext):
     return result
 
 
+def _timedMerge(merge_function, file_list, output_file):
+    """Runs merge_function over file_list and returns the time it took in seconds"""
+    start = time.time()
+    merge_function(file_list, output_file)
+    return time.time() - start
+
+
+def treeMerge(merge_function, file_list, output_file, batch_size=None, workers=None):
+    """Merges file_list into output_file with merge_function(file_list, output_file) as a merge tree.
+
+    The input files are split into batches of batch_size which are merged concurrently
+    by up to workers threads into intermediate files. The intermediate files are then
+    merged in the same way until few enough remain to be merged into output_file in one go.
+    The merge functions used here shell out (hadd) or run user code, so each batch is
+    effectively a separate process and threads are enough to keep them all busy.
+
+    batch_size and workers default to the tree_batch_size and tree_workers options of the
+    [Mergers] config. A batch_size below 2 disables the tree and does a single merge.
+    """
+    config = getConfig('Mergers')
+    if batch_size is None:
+        batch_size = config['tree_batch_size']
+    if workers is None:
+        workers = config['tree_workers']
+
+    total_start = time.time()
+
+    if batch_size < 2 or len(file_list) <= batch_size:
+        merge_function(file_list, output_file)
+        logger.debug('Merged %d files into %s in %.2fs' % (len(file_list), output_file, time.time() - total_start))
+        return
+
+    # keep the intermediate files next to the output so they stay on the same filesystem
+    output_name = os.path.basename(output_file)
+    tmp_dir = tempfile.mkdtemp(prefix='.merge_tree_', dir=os.path.dirname(output_file) or None)
+
+    try:
+        level = 0
+        current_files = list(file_list)
+        while len(current_files) > batch_size:
+            batches = [current_files[i:i + batch_size] for i in range(0, len(current_files), batch_size)]
+            # the output name goes last so that the file extension (e.g. .root) is preserved
+            batch_outputs = [os.path.join(tmp_dir, 'level%d_batch%d_%s' % (level, n, output_name))
+                             for n in range(len(batches))]
+
+            level_start = time.time()
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                futures = {pool.submit(_timedMerge, merge_function, batch, batch_output): len(batch)
+                           for batch, batch_output in zip(batches, batch_outputs)}
+                for done, future in enumerate(as_completed(futures), 1):
+                    batch_time = future.result()
+                    logger.info('Merge of %s level %d: batch %d/%d (%d files) done in %.2fs',
+                                output_name, level, done, len(batches), futures[future], batch_time)
+            logger.info('Merge of %s level %d: %d files merged into %d in %.2fs',
+                        output_name, level, len(current_files), len(batch_outputs), time.time() - level_start)
+
+            # intermediate files from the previous level are no longer needed
+            if level > 0:
+                for f in current_files:
+                    if os.path.exists(f):
+                        os.remove(f)
+
+            current_files = batch_outputs
+            level += 1
+
+        merge_function(current_files, output_file)
+        logger.info('Merge of %s: %d files merged in %.2fs', output_name, len(file_list), time.time() - total_start)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
 class TextMerger(IMerger):
 
     """Merger class for text
@@ -100,44 +175,75 @@ class TextMerger(IMerger):
     '.merge_summary' extension appended and will be placed in the same directory
     as the merge results.
 
+    For jobs with many subjobs the incremental flag can be set. The output of each
+    subjob is then appended to a partial merge as the subjob completes, so that
+    only the last few files need to be merged when the master job finishes.
+
     """
     _category = 'postprocessor'
     _name = 'TextMerger'
     _schema = IMerger._schema.inherit_copy()
     _schema.datadict['compress'] = SimpleItem(
         defvalue=False, doc='Output should be compressed with gzip.')
+    _schema.datadict['incremental'] = SimpleItem(
+        defvalue=False, doc='Fold the output of each subjob into a partial merge as it completes, '
+                            'so only the remaining files are merged when the master job finishes.')
 
-    def mergefiles(self, file_list, output_file):
-
-        import time
-
+    def _openoutput(self, output_file):
+        """Returns the (possibly gzipped) output file opened for writing and its name"""
         if self.compress or output_file.lower().endswith('.gz'):
             # use gzip
-            import gzip
             if not output_file.lower().endswith('.gz'):
                 output_file += '.gz'
-            out_file = gzip.GzipFile(output_file, 'w')
-        else:
-            out_file = open(output_file, 'w')
-
-        out_file.write('# Ganga TextMergeTool - %s #\n' % time.asctime())
+            return gzip.GzipFile(output_file, 'wb'), output_file
+        return open(output_file, 'wb'), output_file
+
+    @staticmethod
+    def _writefiles(out_file, file_list):
+        """Streams each file of file_list, preceded by its header, into out_file"""
+        # files are copied in chunks so that large outputs are never held in memory
+        chunk_size = getConfig('Mergers')['copy_chunk_size']
         for f in file_list:
 
             if not f.lower().endswith('.gz'):
-                in_file = open(f)
+                in_file = open(f, 'rb')
             else:
-                import gzip
-                in_file = gzip.GzipFile(f)
+                in_file = gzip.GzipFile(f, 'rb')
 
-            out_file.write('# Start of file %s #\n' % str(f))
-            out_file.write(in_file.read())
-            out_file.write('\n')
+            out_file.write(('# Start of file %s #\n' % str(f)).encode())
+            with in_file:
+                shutil.copyfileobj(in_file, out_file, chunk_size)
+            out_file.write(b'\n')
 
-            in_file.close()
+    def mergefiles(self, file_list, output_file):
 
-        out_file.write('# Ganga Merge Ended Successfully #\n')
-        out_file.flush()
-        out_file.close()
+        start = time.time()
+        out_file, output_file = self._openoutput(output_file)
+        with out_file:
+            out_file.write(('# Ganga TextMergeTool - %s #\n' % time.asctime()).encode())
+            self._writefiles(out_file, file_list)
+            out_file.write(b'# Ganga Merge Ended Successfully #\n')
+            out_file.flush()
+
+        logger.debug('TextMerger merged %d files into %s in %.2fs' % (len(file_list), output_file, time.time() - start))
+
+    def foldfiles(self, partial_file, file_list, output_file):
+        # the partial result is kept as the plain concatenation of the file sections, so
+        # folding only has to append the new files rather than rewrite everything so far
+        if partial_file is not None:
+            os.replace(partial_file, output_file)
+        with open(output_file, 'ab') as out_file:
+            self._writefiles(out_file, file_list)
+
+    def finalisefile(self, partial_file, output_file):
+        out_file, output_file = self._openoutput(output_file)
+        with out_file:
+            out_file.write(('# Ganga TextMergeTool - %s #\n' % time.asctime()).encode())
+            with open(partial_file, 'rb') as in_file:
+                shutil.copyfileobj(in_file, out_file, getConfig('Mergers')['copy_chunk_size'])
+            out_file.write(b'# Ganga Merge Ended Successfully #\n')
+            out_file.flush()
+        os.remove(partial_file)
 
 
 class RootMerger(IMerger):
@@ -188,6 +294,14 @@ class RootMerger(IMerger):
     If outputdir is not specified, the default location specfied
     in the [Mergers] section of the .gangarc file will be used.
 
+    When merging a large number of files, setting tree_batch_size in the [Mergers]
+    section of the .gangarc file will run hadd over batches of that many files in
+    parallel (up to tree_workers at a time) and then hadd the partial results.
+
+    Setting the incremental flag hadds the output of subjobs into a partial
+    result as they complete (incremental_batch_size files at a time), so that
+    only the last few files need to be merged when the master job finishes.
+
     """
 
     _category = 'postprocessor'
@@ -195,8 +309,14 @@ class RootMerger(IMerger):
     _schema = IMerger._schema.inherit_copy()
     _schema.datadict['args'] = SimpleItem(defvalue=None, doc='Arguments to be passed to hadd.',
                                           typelist=[str, None])
+    _schema.datadict['incremental'] = SimpleItem(
+        defvalue=False, doc='Fold the output of each subjob into a partial merge as it completes, '
+                            'so only the remaining files are merged when the master job finishes.')
 
     def mergefiles(self, file_list, output_file):
+        treeMerge(self._hadd, file_list, output_file)
+
+    def _hadd(self, file_list, output_file):
 
         from GangaCore.Utility.root import getrootprefix, checkrootprefix
         rc, rootprefix = getrootprefix()
@@ -222,7 +342,7 @@ class RootMerger(IMerger):
         # add the list of files, output file first
         arg_list = [output_file]
         arg_list.extend(file_list)
-        merge_cmd += string.join(arg_list, ' ')
+        merge_cmd += ' '.join(arg_list)
 
         rc, out = subprocess.getstatusoutput(merge_cmd)
 
@@ -259,7 +379,11 @@ class CustomMerger(IMerger):
     non-zero integer.
 
     Clearly this tool is provided for advanced ganga usage only, and should be used with
-    this in mind.
+    this in mind. If tree_batch_size is set in the [Mergers] section of the .gangarc file
+    the merge function will be called concurrently on batches of files and then on the
+    partial results, so it must be safe to run in parallel. Likewise, if the incremental
+    flag is set the function will be called on the previous partial result together with
+    the output of newly completed subjobs, so merging a merged file must be supported.
 
     """
     _category = 'postprocessor'
@@ -267,10 +391,16 @@ class CustomMerger(IMerger):
     _schema = IMerger._schema.inherit_copy()
     _schema.datadict['module'] = FileItem(
         defvalue=None, doc='Path to a python module to perform the merge.')
+    _schema.datadict['incremental'] = SimpleItem(
+        defvalue=False, doc='Fold the output of each subjob into a partial merge as it completes, '
+                            'so only the remaining files are merged when the master job finishes.')
 
     def mergefiles(self, file_list, output_file):
+        treeMerge(self._custommerge, file_list, output_file)
+        return self.success
+
+    def _custommerge(self, file_list, output_file):
 
-        import os
         if isinstance(self.module, IGangaFile):
             module_name = os.path.join(self.module.localDir, self.module.namePattern)
         elif isinstance(self.module, File):
@@ -290,7 +420,6 @@ class CustomMerger(IMerger):
             raise PostProcessException('There was a problem executing the custom merge: %s. Merge will fail.' % e)
         if result is not True:
             raise PostProcessException('The custom merge did not return True, merge will fail.')
-        return self.success
 
 
 def findFilesToMerge(jobs):
@@ -350,6 +479,9 @@ class SmartMerger(IMerger):
     j.merger = sm
     j.submit() 
 
+    The different file types are merged concurrently by up to parallel_types threads
+    as set in the [Mergers] section of the .gangarc file.
+
     """
 
     _category = 'postprocessor'
@@ -399,7 +531,7 @@ class SmartMerger(IMerger):
             # store the file association
             type_map.setdefault(file_ext, []).append(f)
 
-        merge_results = []
+        merge_objects = {}
         for ext in type_map:
             merge_object = getMergerObject(ext)  # returns an instance
             if merge_object is None:
@@ -409,8 +541,19 @@ class SmartMerger(IMerger):
             else:
                 logger.debug('Extension %s matched and using appropriate object: %s' % (str(ext), str(merge_object)))
             merge_object.files = type_map[ext]
-            merge_result = merge_object.merge(jobs, outputdir, ignorefailed, overwrite)
-            merge_results.append(merge_result)
+            merge_objects[ext] = merge_object
+
+        def _merge_type(ext):
+            start = time.time()
+            result = merge_objects[ext].merge(jobs, outputdir, ignorefailed, overwrite)
+            logger.info('Merged %s files (%s) in %.2fs', ext, ', '.join(type_map[ext]), time.time() - start)
+            return result
+
+        parallel_types = getConfig('Mergers')['parallel_types']
+        if parallel_types > 1 and len(merge_objects) > 1:
+            with ThreadPoolExecutor(max_workers=parallel_types) as pool:
+                merge_results = list(pool.map(_merge_type, merge_objects))
+        else:
+            merge_results = [_merge_type(ext) for ext in merge_objects]
 
         return not False in merge_results
-
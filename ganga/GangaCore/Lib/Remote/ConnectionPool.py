@@ -0,0 +1,156 @@
+"""
+The SSH connections of the Remote backend.
+
+There is one connection per remote account (username, host and port), shared by all the Remote jobs
+of the session. The commands and the file transfers of all the jobs are multiplexed over it as
+separate channels. The connection is kept alive with SSH keepalives and reopened when it has dropped.
+Once it could not be opened it is not tried again for Remote.reconnect_backoff seconds.
+"""
+
+import atexit
+import socket
+import threading
+import time
+
+from GangaCore.Core.exceptions import BackendError
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+config = getConfig('Remote')
+
+
+class SSHConnection(object):
+
+    """ The connection to one remote account, opened on first use and reopened when it has dropped """
+
+    def __init__(self, username, host, port, authenticate):
+        """
+        authenticate is called with a new paramiko transport and logs it on, e.g. with
+        transport.connect(username=..., password=...)
+        """
+        self.username = username
+        self.host = host
+        self.port = port
+        self._authenticate = authenticate
+        self._transport = None
+        self._sftp = None
+        # the time the connection was given up at, None if it has not been given up
+        self._failed_at = None
+        self._lock = threading.RLock()
+
+    def __str__(self):
+        return '%s@%s:%d' % (self.username, self.host, self.port)
+
+    def isActive(self):
+        return self._transport is not None and self._transport.is_active()
+
+    def transport(self):
+        """ Return the open transport, reconnecting if it has dropped """
+        with self._lock:
+            if not self.isActive():
+                self._connect()
+            return self._transport
+
+    def sftp(self):
+        """ Return the SFTP client on the open transport """
+        import paramiko
+        with self._lock:
+            transport = self.transport()
+            if self._sftp is None:
+                self._sftp = paramiko.SFTPClient.from_transport(transport)
+            return self._sftp
+
+    def openSession(self):
+        """ Open a new channel to run a command """
+        import paramiko
+        try:
+            return self.transport().open_session()
+        except (paramiko.SSHException, EOFError, socket.error) as err:
+            # the connection has dropped since it was last checked
+            logger.debug('reopening the connection to %s: %s', self, err)
+            with self._lock:
+                self._connect()
+                return self._transport.open_session()
+
+    def execute(self, command):
+        """ Run a command and return its exit status, stdout and stderr """
+        channel = self.openSession()
+        try:
+            channel.exec_command(command)
+            # both streams are read at the same time, a command filling the window of one of them would otherwise
+            # wait for ever for the other to be read
+            stderr = []
+            stderr_reader = threading.Thread(target=lambda: stderr.append(channel.makefile_stderr('rb').read()))
+            stderr_reader.daemon = True
+            stderr_reader.start()
+            stdout = channel.makefile('rb').read()
+            stderr_reader.join()
+            return channel.recv_exit_status(), stdout.decode(errors='replace'), b''.join(stderr).decode(errors='replace')
+        finally:
+            channel.close()
+
+    def _connect(self):
+        import paramiko
+
+        if self._failed_at is not None:
+            wait = self._failed_at + config['reconnect_backoff'] - time.time()
+            if wait > 0:
+                raise BackendError('Remote', 'Too many retries for remote host %s. Trying again in %d seconds.' % (self, wait))
+
+        self.close()
+        attempts = max(1, config['reconnect_attempts'])
+        for attempt in range(attempts):
+            transport = None
+            try:
+                transport = paramiko.Transport((self.host, self.port))
+                # avoid hang on exit by daemonising the thread
+                transport.daemon = True
+                self._authenticate(transport)
+                if config['keepalive']:
+                    transport.set_keepalive(config['keepalive'])
+                self._transport = transport
+                self._failed_at = None
+                logger.debug('opened the connection to %s', self)
+                return
+            except Exception as err:
+                logger.debug("Err: %s" % str(err))
+                logger.warning("Error when comunicating with remote host. Retrying...")
+                if transport is not None:
+                    transport.close()
+
+        self._failed_at = time.time()
+        raise BackendError('Remote', 'Could not logon to remote host %s after %d attempts. Trying again in %d seconds.' % (self, attempts, config['reconnect_backoff']))
+
+    def close(self):
+        with self._lock:
+            if self._sftp is not None:
+                self._sftp.close()
+                self._sftp = None
+            if self._transport is not None:
+                self._transport.close()
+                self._transport = None
+
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def getConnection(username, host, port, authenticate):
+    """ Return the connection to the remote account, shared by all the jobs """
+    key = (username, host, port)
+    with _connections_lock:
+        if key not in _connections:
+            _connections[key] = SSHConnection(username, host, port, authenticate)
+        return _connections[key]
+
+
+def closeConnections():
+    """ Close all the connections, at the end of the session """
+    with _connections_lock:
+        for connection in _connections.values():
+            connection.close()
+        _connections.clear()
+
+
+atexit.register(closeConnections)
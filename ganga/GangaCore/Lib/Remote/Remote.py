@@ -14,14 +14,43 @@ logger = GangaCore.Utility.logging.getLogger()
 
 import inspect
 import os
+import re
 from GangaCore.Lib.Root import randomString
 
+# token printed before the output of each job by the scripts which handle several jobs
+job_token = "***_JOB_%s_***"
+
+bulk_script = """#!/usr/bin/env python
+from __future__ import print_function
+#-----------------------------------------------------
+# This script runs the submission scripts of several
+# jobs in one ganga session. The output of each is
+# preceded by the token of the job
+#-----------------------------------------------------
+import os,traceback
+
+ganga_dir = ###GANGADIR###
+scripts = ###SCRIPTS###
+master_sandbox = ###MASTERSANDBOX###
+
+for code, script_name in scripts:
+    print("***_JOB_%s_***" % code)
+    try:
+        exec(compile(open(ganga_dir + script_name).read(), script_name, 'exec'), dict(globals()))
+    except Exception:
+        traceback.print_exc()
+    os.remove(ganga_dir + script_name)
+
+os.remove(os.path.expanduser(ganga_dir + master_sandbox))
+
+print("***_BULK_FINISHED_***")
+"""
 
-def shutdown_transport(tr):
-    """Shutdown the transport cleanly - otherwise python 2.5 throws a wobble"""
-    if (tr is not None):
-        tr.close()
-        tr = None
+
+def split_job_output(stdout):
+    """Split the output of a script handling several jobs into {job token: output for that job}"""
+    parts = re.split(r'\*\*\*_JOB_(\w+)_\*\*\*\n', stdout)
+    return dict(zip(parts[1::2], parts[2::2]))
 
 
 class Remote(IBackend):
@@ -119,10 +148,10 @@ class Remote(IBackend):
     _name = "Remote"
     #_hidden = False # KUBA: temporarily disabled from the public
     _port = 22
+    _connection = None
     _transport = None
     _sftp = None
     _code = randomString()
-    _transportarray = None
     _key = {}
 
     _exportmethods = ['setup']
@@ -130,11 +159,6 @@ class Remote(IBackend):
     def __init__(self):
         super(Remote, self).__init__()
 
-    def __del__(self):
-        if (self._transport is not None):
-            self._transport.close()
-            self._transport = None
-
     def setup(self):  # KUBA: generic setup hook
         job = self.getJobObject()
         if job.status in ['submitted', 'running', 'completing']:
@@ -173,140 +197,86 @@ print("***_FINISHED_***")
         return True
 
     def opentransport(self):
+        """Get the connection to the remote host, shared by all the jobs on that host, and make sure that the remote directory exists"""
 
-        import paramiko
-        import getpass
-        import atexit
-
-        if (self._transport is not None):
-            # transport is open
-            return
-
-        # check for a useable transport for this username and host
-        if Remote._transportarray is not None:
-            for t in Remote._transportarray:
-                if (t is not None) and (t[0] == self.username) and (t[1] == self.host):
-
-                    # check for too many retries on the same host
-                    if t[2] is None or t[3] is None:
-                        logger.warning("Too many retries for remote host " + self.username +
-                                       "@" + self.host + ". Restart Ganga to have another go.")
-                        return False
-
-                    self._transport = t[2]
-                    self._sftp = t[3]
-
-                    # ensure that the remote dir is still there - it will crash if the dir structure
-                    # changes with the sftp sill open
-                    channel = self._transport.open_session()
-                    channel.exec_command('mkdir -p ' + self.ganga_dir)
-                    bufout = ""
-                    while not channel.exit_status_ready():
-                        if channel.recv_ready():
-                            bufout = channel.recv(1024)
-
-                    return
-
-        # Ask user for password - give three tries
-        num_try = 0
-        password = ""
-        while num_try < 3:
-
-            try:
-                temp_host = self.host
-                temp_port = self._port
-                if self.host.find(":") != -1:
-                    # user specified port
-                    temp_port = eval(self.host[self.host.find(":") + 1:])
-                    temp_host = self.host[: self.host.find(":")]
-
-                self._transport = paramiko.Transport((temp_host, temp_port))
-
-                # avoid hang on exit my daemonising the thread
-                self._transport.setDaemon(True)
-
-                # register for proper shutdown
-                atexit.register(shutdown_transport, self._transport)
-
-                if self.ssh_key != "" and os.path.exists(os.path.expanduser(os.path.expandvars(self.ssh_key))):
-                    privatekeyfile = os.path.expanduser(
-                        os.path.expandvars(self.ssh_key))
-
-                    if self.ssh_key not in Remote._key:
-
-                        if self.key_type == "RSA":
-                            password = getpass.getpass(
-                                'Enter passphrase for key \'%s\': ' % (self.ssh_key))
-                            Remote._key[self.ssh_key] = paramiko.RSAKey.from_private_key_file(
-                                privatekeyfile, password=password)
-                        elif self.key_type == "DSS":
-                            password = getpass.getpass(
-                                'Enter passphrase for key \'%s\': ' % (self.ssh_key))
-                            Remote._key[self.ssh_key] = paramiko.DSSKey.from_private_key_file(
-                                privatekeyfile, password=password)
-                        else:
-                            logger.error(
-                                "Unknown ssh key_type '%s'. Unable to connect." % self.key_type)
-                            return False
-
-                    self._transport.connect(
-                        username=self.username, pkey=Remote._key[self.ssh_key])
-                else:
-                    logger.debug("SSH key: %s" % self.ssh_key)
-                    if os.path.exists(os.path.expanduser(os.path.expandvars(self.ssh_key))):
-                        logger.debug(
-                            "PATH: %s Exists" % os.path.expanduser(os.path.expandvars(self.ssh_key)))
-                    else:
-                        logger.debug("PATH: %s Does NOT Exist" % os.path.expanduser(
-                            os.path.expandvars(self.ssh_key)))
+        from GangaCore.Core.exceptions import BackendError
+        from GangaCore.Lib.Remote.ConnectionPool import getConnection
 
-                    if self.username != "" and self.host != "":
-                        password = getpass.getpass(
-                            'Password for %s@%s: ' % (self.username, self.host))
-                        self._transport.connect(
-                            username=self.username, password=password)
-                    elif self.username == "":
-                        logger.error("ERROR: USERNAME NOT DEFINED!!!")
-                        return False
-                    elif self.host == "":
-                        logger.error("ERROR: HOSTNAME NOT DEFINED!!!")
-                        return False
-                    else:
-                        pass
-
-                # blank the password just in case
-                password = "                                                "
-
-                channel = self._transport.open_session()
-                channel.exec_command('mkdir -p ' + self.ganga_dir)
-                self._sftp = paramiko.SFTPClient.from_transport(
-                    self._transport)
-
-                # Add to the transport array
-                Remote._transportarray = [Remote._transportarray,
-                                          [self.username, self.host, self._transport, self._sftp]]
-                num_try = 1000
-
-            except Exception as err:
-                logger.debug("Err: %s" %str(err))
-                logger.warning("Error when comunicating with remote host. Retrying...")
-                self._transport = None
-                self._sftp = None
-                if self.ssh_key in Remote._key:
-                    del Remote._key[self.ssh_key]
-
-            num_try = num_try + 1
-
-        if num_try == 3:
-            logger.error("Could not logon to remote host " + self.username + "@" +
-                         self.host + " after three attempts. Restart Ganga to have another go.")
-            Remote._transportarray = [Remote._transportarray,
-                                      [self.username, self.host, None, None]]
+        if self.username == "":
+            logger.error("ERROR: USERNAME NOT DEFINED!!!")
+            return False
+        if self.host == "":
+            logger.error("ERROR: HOSTNAME NOT DEFINED!!!")
+            return False
+
+        temp_host = self.host
+        temp_port = self._port
+        if self.host.find(":") != -1:
+            # user specified port
+            temp_port = int(self.host[self.host.find(":") + 1:])
+            temp_host = self.host[: self.host.find(":")]
+
+        connection = getConnection(self.username, temp_host, temp_port, self.authenticate)
+        try:
+            # ensure that the remote dir is still there - it will crash if the dir structure
+            # changes with the sftp still open
+            connection.execute('mkdir -p ' + self.ganga_dir)
+            self._sftp = connection.sftp()
+        except BackendError as err:
+            logger.error(str(err))
             return False
 
+        self._connection = connection
+        self._transport = connection.transport()
         return True
 
-    def run_remote_script(self, script_name, pre_script):
+    def authenticate(self, transport):
+        """Log on a new transport to the remote host with the ssh key or, without one, a password"""
+
+        import paramiko
+        import getpass
+
+        try:
+            if self.ssh_key != "" and os.path.exists(os.path.expanduser(os.path.expandvars(self.ssh_key))):
+                privatekeyfile = os.path.expanduser(
+                    os.path.expandvars(self.ssh_key))
+
+                if self.ssh_key not in Remote._key:
+
+                    if self.key_type == "RSA":
+                        password = getpass.getpass(
+                            'Enter passphrase for key \'%s\': ' % (self.ssh_key))
+                        Remote._key[self.ssh_key] = paramiko.RSAKey.from_private_key_file(
+                            privatekeyfile, password=password)
+                    elif self.key_type == "DSS":
+                        password = getpass.getpass(
+                            'Enter passphrase for key \'%s\': ' % (self.ssh_key))
+                        Remote._key[self.ssh_key] = paramiko.DSSKey.from_private_key_file(
+                            privatekeyfile, password=password)
+                    else:
+                        raise ValueError("Unknown ssh key_type '%s'. Unable to connect." % self.key_type)
+
+                transport.connect(
+                    username=self.username, pkey=Remote._key[self.ssh_key])
+            else:
+                logger.debug("SSH key: %s" % self.ssh_key)
+                if os.path.exists(os.path.expanduser(os.path.expandvars(self.ssh_key))):
+                    logger.debug(
+                        "PATH: %s Exists" % os.path.expanduser(os.path.expandvars(self.ssh_key)))
+                else:
+                    logger.debug("PATH: %s Does NOT Exist" % os.path.expanduser(
+                        os.path.expandvars(self.ssh_key)))
+
+                password = getpass.getpass(
+                    'Password for %s@%s: ' % (self.username, self.host))
+                transport.connect(
+                    username=self.username, password=password)
+        except Exception:
+            if self.ssh_key in Remote._key:
+                del Remote._key[self.ssh_key]
+            raise
+
+    def run_remote_script(self, script_name, pre_script, finished_token="***_FINISHED_***"):
         """Run a ganga script on the remote site"""
 
         import getpass
@@ -324,8 +294,8 @@ print("***_FINISHED_***")
             self.ganga_dir, "__gangacmd__" + randomString())
         self._sftp.open(cmd_file, 'w').write(cmd_str)
 
-        # run ganga command
-        channel = self._transport.open_session()
+        # run ganga command, in a new channel of the shared connection
+        channel = self._connection.openSession()
         channel.exec_command("source " + cmd_file)
 
         # Read the output after command
@@ -336,14 +306,14 @@ print("***_FINISHED_***")
         while not channel.exit_status_ready():
 
             if channel.recv_ready():
-                bufout = channel.recv(1024)
+                bufout = channel.recv(1024).decode(errors='replace')
                 stdout += bufout
 
             if channel.recv_stderr_ready():
-                buferr = channel.recv_stderr(1024)
+                buferr = channel.recv_stderr(1024).decode(errors='replace')
                 stderr += buferr
 
-            if stdout.find("***_FINISHED_***") != -1:
+            if stdout.find(finished_token) != -1:
                 break
 
             if (bufout.find("GRID pass") != -1 or buferr.find("GRID pass") != -1):
@@ -354,20 +324,14 @@ print("***_FINISHED_***")
 
             bufout = buferr = ""
 
+        channel.close()
         self._sftp.remove(cmd_file)
 
         return stdout, stderr
 
-    def submit(self, jobconfig, master_input_sandbox):
-        """Submit the job to the remote backend.
-
-            Return value: True if job is submitted successfully,
-                          or False otherwise"""
-
-        import os
-        import getpass
+    def checkSettings(self):
+        """Sanity checks of the settings needed to submit a job"""
 
-        # First some sanity checks...
         fail = 0
         if self.remote_backend is None:
             logger.error("No backend specified for remote host.")
@@ -385,58 +349,92 @@ print("***_FINISHED_***")
             logger.error("No ganga command specified.")
             fail = 1
 
-        if fail:
-            return 0
+        return not fail
 
-        # initiate the connection
-        if self.opentransport() == False:
-            return 0
+    def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False):
+        """Submit the job, or all its subjobs, with a single ganga session on the remote site"""
 
-        # Tar up the input sandbox and copy to the remote cluster
-        job = self.getJobObject()
-        subjob_input_sandbox = job.createPackedInputSandbox(
-            jobconfig.getSandboxFiles())
-        input_sandbox = subjob_input_sandbox + master_input_sandbox
+        from GangaCore.Core.exceptions import IncompleteJobSubmissionError
+        from GangaCore.GPIDev.Base.Proxy import getName, stripProxy
 
-        # send the sandbox
-        sbx_name = '/__subjob_input_sbx__%s' % self._code
-        self._sftp.put(subjob_input_sandbox[0], self.ganga_dir + sbx_name)
-        sbx_name = '/__master_input_sbx__%s' % self._code
-        self._sftp.put(master_input_sandbox[0], self.ganga_dir + sbx_name)
+        master_input_sandbox = self.master_prepare(masterjobconfig)
 
-        # run the submit script on the remote cluster
-        scriptpath = self.preparejob(jobconfig, master_input_sandbox)
+        for sj in rjobs:
+            logger.info("submitting job %s to %s backend", sj.getFQID('.'), getName(sj.backend))
+            sj.updateStatus('submitting')
 
-        # send the script
-        data = open(scriptpath, 'r').read()
-        script_name = '/__jobscript_run__%s.py' % self._code
-        self._sftp.open(self.ganga_dir + script_name, 'w').write(data)
+        submitted = self.submitJobs(list(zip(rjobs, subjobconfigs)), master_input_sandbox)
+
+        incomplete = []
+        for sj, ok in zip(rjobs, submitted):
+            if ok:
+                sj.updateStatus('submitted')
+                stripProxy(sj.info).increment()
+            else:
+                sj.updateStatus('new')
+                incomplete.append(sj.getFQID('.'))
+
+        if incomplete:
+            raise IncompleteJobSubmissionError(incomplete, 'submission failed for jobs %s' % incomplete)
+
+        return 1
+
+    def submit(self, jobconfig, master_input_sandbox):
+        """Submit the job to the remote backend.
+
+            Return value: True if job is submitted successfully,
+                          or False otherwise"""
+
+        return int(self.submitJobs([(self.getJobObject(), jobconfig)], master_input_sandbox)[0])
+
+    def submitJobs(self, jobs, master_input_sandbox):
+        """Create and submit the jobs, given as (job, jobconfig) pairs, with one ganga session on the remote site.
+
+            Return value: list of True for the jobs submitted successfully
+                          and False for the others"""
+
+        # First some sanity checks...
+        if not self.checkSettings():
+            return [False] * len(jobs)
+
+        # initiate the connection
+        if self.opentransport() == False:
+            return [False] * len(jobs)
+
+        # the master input sandbox is copied once for all the jobs, under a name of its own as the bulk script removes it
+        master_code = randomString()
+        master_sbx_name = '/__master_input_sbx__%s' % master_code
+        self._sftp.put(master_input_sandbox[0], self.ganga_dir + master_sbx_name)
+
+        # Tar up the input sandbox of each job and copy it with its script to the remote cluster
+        scripts = []
+        for job, jobconfig in jobs:
+            code = randomString()
+            subjob_input_sandbox = job.createPackedInputSandbox(
+                jobconfig.getSandboxFiles())
+            self._sftp.put(subjob_input_sandbox[0], self.ganga_dir + '/__subjob_input_sbx__%s' % code)
+
+            scriptpath = job.backend.preparejob(jobconfig, master_input_sandbox, code, master_code)
+            script_name = '/__jobscript_run__%s.py' % code
+            with open(scriptpath, 'r') as script_file:
+                self._sftp.open(self.ganga_dir + script_name, 'w').write(script_file.read())
+            scripts.append((code, script_name))
+
+        # one script runs the scripts of all the jobs
+        script = bulk_script.replace('###GANGADIR###', repr(self.ganga_dir))
+        script = script.replace('###SCRIPTS###', repr(scripts))
+        script = script.replace('###MASTERSANDBOX###', repr(master_sbx_name))
+        script_name = '/__jobscript_bulk__%s.py' % randomString()
+        self._sftp.open(self.ganga_dir + script_name, 'w').write(script)
 
         # run the script
-        stdout, stderr = self.run_remote_script(script_name, self.pre_script)
+        stdout, stderr = self.run_remote_script(script_name, self.pre_script, "***_BULK_FINISHED_***")
 
         # delete the jobscript
         self._sftp.remove(self.ganga_dir + script_name)
 
-        # Copy the job object
-        if stdout.find("***_FINISHED_***") != -1:
-            status, outputdir, id, be = self.grabremoteinfo(stdout)
-
-            self.remote_job_id = id
-            if hasattr(self.remote_backend, 'exitcode'):
-                self.exitcode = be.exitcode
-            if hasattr(self.remote_backend, 'actualCE'):
-                self.actualCE = be.actualCE
-
-            # copy each variable in the schema
-            # Please can someone tell me why I can't just do
-            # self.remote_backend = be?
-            for o in be._schema.allItems():
-                exec("self.remote_backend." + o[0] + " = be." + o[0])
-
-            return 1
-        else:
-            logger.error("Problem submitting the job on the remote site.")
+        if stdout.find("***_BULK_FINISHED_***") == -1:
+            logger.error("Problem submitting the jobs on the remote site.")
             logger.error("<last 1536 bytes of stderr>")
             cut = stderr[len(stderr) - 1536:]
 
@@ -444,8 +442,54 @@ print("***_FINISHED_***")
                 logger.error(ln)
 
             logger.error("<end of last 1536 bytes of stderr>")
+            return [False] * len(jobs)
 
-        return 0
+        # Copy the job objects
+        outputs = split_job_output(stdout)
+        submitted = []
+        for (job, jobconfig), (code, script_name) in zip(jobs, scripts):
+            out = outputs.get(code, '')
+            if out.find("***_END_PICKLE_***") == -1:
+                logger.error("Problem submitting the job %s on the remote site." % job.getFQID('.'))
+                submitted.append(False)
+                continue
+
+            status, outputdir, id, be = self.grabremoteinfo(out)
+            job.backend.updateRemoteInfo(be)
+            job.backend.remote_job_id = id
+            submitted.append(True)
+
+        return submitted
+
+    def updateRemoteInfo(self, be):
+        """Copy the information of the backend of the remote job"""
+
+        if hasattr(self.remote_backend, 'exitcode'):
+            self.exitcode = be.exitcode
+        if hasattr(self.remote_backend, 'actualCE'):
+            self.actualCE = be.actualCE
+
+        # copy each variable in the schema
+        for o in be._schema.allItems():
+            setattr(self.remote_backend, o[0], getattr(be, o[0]))
+
+    def master_kill(self):
+        """Kill the job, or all its running subjobs, with a single ganga session on the remote site"""
+
+        from GangaCore.Core.exceptions import IncompleteKillError
+
+        job = self.getJobObject()
+
+        if not len(job.subjobs):
+            return self.kill()
+
+        to_kill = [sj for sj in job.subjobs if sj.status in ['submitted', 'running']]
+        killed = self.killJobs(to_kill)
+        problems = [sj.id for sj, ok in zip(to_kill, killed) if not ok]
+        if problems:
+            raise IncompleteKillError(
+                'subjobs %s were not killed' % problems)
+        return True
 
     def kill(self):
         """Kill running job.
@@ -455,11 +499,19 @@ print("***_FINISHED_***")
            Return value: True if job killed successfully,
                          or False otherwise"""
 
+        return self.killJobs([self.getJobObject()])[0]
+
+    def killJobs(self, jobs):
+        """Kill the jobs with one ganga session on the remote site.
+
+           Return value: list of True for the jobs killed successfully
+                         and False for the others"""
+
         script = """#!/usr/bin/env python
 from __future__ import print_function
 #-----------------------------------------------------
-# This is a kill script for a remote job. It
-# attempts to kill the given job and returns
+# This is a kill script for remote jobs. It
+# attempts to kill the given jobs and returns
 #-----------------------------------------------------
 import os,os.path,shutil,tempfile
 import sys,popen2,time,traceback
@@ -471,47 +523,66 @@ import sys,popen2,time,traceback
 ############################################################################################
 
 code = ###CODE###
-jid = ###JOBID###
+jids = ###JOBID###
 
-j = jobs( jid )
-j.kill()
+import pickle
 
-# Start pickle token
-print("***_START_PICKLE_***")
+for jid in jids:
 
-# pickle the job
-import pickle
-print(j.outputdir)
-print(pickle.dumps(j._impl))
-print(j)
+    print("***_JOB_%d_***" % jid)
+
+    j = jobs( jid )
+    try:
+        j.kill()
+    except Exception:
+        traceback.print_exc()
+
+    # Start pickle token
+    print("***_START_PICKLE_***")
+
+    # pickle the job
+    print(j.outputdir)
+    print(pickle.dumps(j._impl))
+    print(j)
+
+    # print a finished token
+    print("***_END_PICKLE_***")
 
-# print a finished token
-print("***_END_PICKLE_***")
 print("***_FINISHED_***")
 """
 
         script = script.replace('###CODE###', repr(self._code))
-        script = script.replace('###JOBID###', str(self.remote_job_id))
+        script = script.replace('###JOBID###', str([j.backend.remote_job_id for j in jobs]))
 
         # check for the connection
         if (self.opentransport() == False):
-            return 0
+            return [False] * len(jobs)
 
         # send the script
-        script_name = '/__jobscript_kill__%s.py' % self._code
+        script_name = '/__jobscript_kill__%s.py' % randomString()
         self._sftp.open(self.ganga_dir + script_name, 'w').write(script)
 
         # run the script
         stdout, stderr = self.run_remote_script(script_name, self.pre_script)
 
+        # remove the script
+        self._sftp.remove(self.ganga_dir + script_name)
+
         # Copy the job object
-        if stdout.find("***_FINISHED_***") != -1:
-            status, outputdir, id, be = self.grabremoteinfo(stdout)
+        if stdout.find("***_FINISHED_***") == -1:
+            return [False] * len(jobs)
 
-            if status == 'killed':
-                return True
+        outputs = split_job_output(stdout)
+        killed = []
+        for j in jobs:
+            out = outputs.get(str(j.backend.remote_job_id), '')
+            if out.find("***_END_PICKLE_***") == -1:
+                killed.append(False)
+                continue
+            status, outputdir, id, be = self.grabremoteinfo(out)
+            killed.append(status == 'killed')
 
-        return False
+        return killed
 
     def remove(self):
         """Remove the selected job from the remote site
@@ -556,7 +627,7 @@ print("***_FINISHED_***")
             return 0
 
         # send the script
-        script_name = '/__jobscript_remove__%s.py' % self._code
+        script_name = '/__jobscript_remove__%s.py' % randomString()
         self._sftp.open(self.ganga_dir + script_name, 'w').write(script)
 
         # run the script
@@ -619,7 +690,7 @@ print("***_FINISHED_***")
             return 0
 
         # send the script
-        script_name = '/__jobscript_resubmit__%s.py' % self._code
+        script_name = '/__jobscript_resubmit__%s.py' % randomString()
         self._sftp.open(self.ganga_dir + script_name, 'w').write(script)
 
         # run the script
@@ -649,8 +720,8 @@ print("***_FINISHED_***")
 
         return j.status, outputdir, j.id, j.backend
 
-    def preparejob(self, jobconfig, master_input_sandbox):
-        """Prepare the script to create the job on the remote host"""
+    def preparejob(self, jobconfig, master_input_sandbox, code=None, master_code=None):
+        """Prepare the script to create the job on the remote host, code and master_code name the input sandbox of the job and the master input sandbox in the remote directory"""
 
         import tempfile
 
@@ -687,6 +758,7 @@ appargs = ###APPLICATIONARGS###
 back_end = ###BACKEND###
 ganga_dir = ###GANGADIR###
 code = ###CODE###
+master_code = ###MASTERCODE###
 environment = ###ENVIRONMENT###
 user_env = ###USERENV###
 
@@ -699,7 +771,8 @@ j.backend = back_end
 
 # Unpack the input sandboxes
 shutil.move(os.path.expanduser(ganga_dir + "/__subjob_input_sbx__" + code), j.inputdir+"/__subjob_input_sbx__")
-shutil.move(os.path.expanduser(ganga_dir + "/__master_input_sbx__" + code), j.inputdir+"/__master_input_sbx__")
+# the master input sandbox is shared by all the jobs submitted together
+shutil.copy(os.path.expanduser(ganga_dir + "/__master_input_sbx__" + master_code), j.inputdir+"/__master_input_sbx__")
 
 # Add the files in the sandbox to the job
 inputsbx = []
@@ -776,7 +849,8 @@ print("***_FINISHED_***")
         script = script.replace('###BACKEND###', be_str)
 
         script = script.replace('###GANGADIR###', repr(self.ganga_dir))
-        script = script.replace('###CODE###', repr(self._code))
+        script = script.replace('###CODE###', repr(code or self._code))
+        script = script.replace('###MASTERCODE###', repr(master_code or self._code))
 
         sandbox_list = jobconfig.getSandboxFiles()
 
@@ -865,7 +939,7 @@ print("***_FINISHED_***")
                 return 0
 
             # send the script
-            script_name = '/__jobscript__%s.py' % mj.backend._code
+            script_name = '/__jobscript__%s.py' % randomString()
             mj.backend._sftp.open(
                 mj.backend.ganga_dir + script_name, 'w').write(script)
 
@@ -928,7 +1002,7 @@ print("***_FINISHED_***")
                         "***_END_PICKLE_***", end_pos) + len("***_END_PICKLE_***")
 
             # remove the script
-            j.backend._sftp.remove(j.backend.ganga_dir + script_name)
+            mj.backend._sftp.remove(mj.backend.ganga_dir + script_name)
 
         return None
 
@@ -0,0 +1,145 @@
+import math
+import random
+import threading
+import time
+
+from GangaCore.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+from GangaCore.GPIDev.Adapters.IBackend import IBackend
+from GangaCore.GPIDev.Base.Proxy import isType
+from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+config = getConfig('SimulatedBackend')
+
+_random = random.Random()
+_seeded = [False]
+
+# the ids are unique across sessions as they start with the time of the session
+_session = '%x' % int(time.time())
+_id_lock = threading.Lock()
+_last_id = [0]
+
+
+def draw(option):
+    """
+    Return a number from the configuration option, which is either a number or a python
+    expression using 'random' as in the GridSimulator, e.g. 'random.expovariate(1/60.)'
+    """
+    if not _seeded[0]:
+        _random.seed(config['seed'])
+        _seeded[0] = True
+    value = config[option]
+    if isinstance(value, str):
+        value = eval(value, {'random': _random, 'math': math})
+    if not isinstance(value, (int, float)):
+        logger.error('problem with the configuration option [SimulatedBackend]%s, invalid value: %s', option, value)
+        return 0
+    return max(0, value)
+
+
+def _new_id():
+    with _id_lock:
+        _last_id[0] += 1
+        return 'sim-%s-%d' % (_session, _last_id[0])
+
+
+class SimulatedBackend(IBackend):
+
+    """Simulate jobs without running anything, for load testing the monitoring and finalisation.
+
+    Each job waits in a queue, runs and then completes or fails. The queueing and running times,
+    the latencies of submission and of status queries, and the failure rates are drawn from the
+    distributions of the [SimulatedBackend] configuration section. The status of many jobs is
+    updated with one (simulated) query, as a batch system or a grid would do.
+
+    The timeline of each job is drawn at submission, so it is kept across sessions.
+    """
+    _schema = Schema(Version(1, 0), {'id': SimpleItem(defvalue='', protected=1, copyable=0, doc='Simulated job id'),
+                                     'exitcode': SimpleItem(defvalue=None, typelist=[int, None], protected=1, copyable=0, doc='Simulated exit code'),
+                                     'actualCE': SimpleItem(defvalue='', protected=1, copyable=0, doc='Name of the simulated site'),
+                                     'submit_time': SimpleItem(defvalue=0., protected=1, copyable=0, hidden=1, doc='Time of the submission'),
+                                     'queue_time': SimpleItem(defvalue=0., protected=1, copyable=0, doc='Seconds the job waits in the queue'),
+                                     'run_time': SimpleItem(defvalue=0., protected=1, copyable=0, doc='Seconds the job runs for'),
+                                     'will_fail': SimpleItem(defvalue=False, protected=1, copyable=0, hidden=1, doc='Will the job fail'),
+                                     })
+    _category = 'backends'
+    _name = 'SimulatedBackend'
+
+    def __init__(self):
+        super(SimulatedBackend, self).__init__()
+
+    def submit(self, jobconfig, master_input_sandbox):
+        time.sleep(draw('submit_latency'))
+        if _random.random() < draw('submit_failure_rate'):
+            logger.warning('Simulated submission of job %s failed', self.getJobObject().getFQID('.'))
+            return 0
+        self.id = _new_id()
+        self.actualCE = 'simulated'
+        self.exitcode = None
+        self.submit_time = time.time()
+        self.queue_time = draw('queue_time')
+        self.run_time = draw('run_time')
+        self.will_fail = _random.random() < draw('job_failure_rate')
+        return 1
+
+    def resubmit(self):
+        return self.submit(None, None)
+
+    def kill(self):
+        # the job stops running, the framework sets its status to killed
+        self.run_time = 0.
+        return True
+
+    def simulatedStatus(self, now):
+        """ Return the status of the job at the time 'now' """
+        elapsed = now - self.submit_time
+        if elapsed < self.queue_time:
+            return 'submitted'
+        if elapsed < self.queue_time + self.run_time:
+            return 'running'
+        return 'failed' if self.will_fail else 'completed'
+
+    @staticmethod
+    def master_updateMonitoringInformation(jobs):
+        """
+        Update all the jobs, and the running subjobs of the split ones, in queries of
+        [SimulatedBackend]status_bulk_size jobs
+        """
+        to_update = []
+        for j in jobs:
+            if len(j.subjobs) == 0:
+                to_update.append(j)
+                continue
+            if isType(j.subjobs, SubJobXMLList):
+                # the finished subjobs are not loaded to find out that there is nothing to do
+                cache = j.subjobs.getAllCachedData()
+                to_update.extend(j.subjobs(i) for i in range(len(j.subjobs))
+                                 if cache[i]['status'] in ['submitted', 'running'])
+            else:
+                to_update.extend(sj for sj in j.subjobs if sj.status in ['submitted', 'running'])
+
+        bulk_size = max(1, config['status_bulk_size'])
+        for i in range(0, len(to_update), bulk_size):
+            SimulatedBackend.updateMonitoringInformation(to_update[i:i + bulk_size])
+
+        for j in jobs:
+            if len(j.subjobs) > 0:
+                j.updateMasterJobStatus()
+
+    @staticmethod
+    def updateMonitoringInformation(jobs):
+        """ One simulated status query for all the jobs """
+        time.sleep(draw('status_latency'))
+        now = time.time()
+        for j in jobs:
+            status = j.backend.simulatedStatus(now)
+            if status == j.status:
+                continue
+            if status in ['completed', 'failed'] and j.status == 'submitted':
+                # a job never goes from the queue straight to the end
+                j.updateStatus('running')
+            if status in ['completed', 'failed']:
+                j.backend.exitcode = 1 if status == 'failed' else 0
+            j.updateStatus(status)
@@ -0,0 +1 @@
+from .SimulatedBackend import SimulatedBackend
@@ -67,6 +67,18 @@ def plugins(category=None):
             d[c] = list(allPlugins.allCategories()[c].keys())
         return d
 
+def metrics(match=None, format='dict'):
+    """Return the counters and timings of the hot paths of this session.
+
+    Only the metrics with 'match' in their name are returned, e.g. metrics('repository').
+    The timings are in seconds. format='prometheus' returns the Prometheus text format instead
+    of a dictionary. The timers can be turned off with config.Configuration.Metrics = False
+    """
+    from GangaCore.Utility.Metrics import metrics as registry
+    if format == 'prometheus':
+        return registry.prometheus()
+    return registry.snapshot(match)
+
 # FIXME: DEPRECATED
 def list_plugins(category):
     """List all plugins in a given category, OBSOLETE: use plugins(category)"""
@@ -18,6 +18,47 @@ from GangaCore.GPIDev.Base.Proxy import isType, addProxy
 from GangaCore.GPIDev.Base.Objects import GangaObject
 from inspect import isclass
 
+class _LazyPluginClass(type):
+    '''
+    Metaclass of the stand-ins exported to the GPI for plugins which have been declared but not imported yet.
+    Any use of a stand-in (construction, isinstance, attribute access) imports the plugin and is passed on to its proxy class.
+    '''
+
+    def _resolve(cls):
+        proxy_class = cls.__dict__.get('_resolved')
+        if proxy_class is None:
+            from GangaCore.Utility.Plugin import allPlugins
+            proxy_class = addProxy(allPlugins.find(cls._category, cls._plugin_name))
+            type.__setattr__(cls, '_resolved', proxy_class)
+        return proxy_class
+
+    def __call__(cls, *args, **kwds):
+        return cls._resolve()(*args, **kwds)
+
+    def __getattr__(cls, name):
+        return getattr(cls._resolve(), name)
+
+    def __instancecheck__(cls, obj):
+        return isinstance(obj, cls._resolve())
+
+    def __subclasscheck__(cls, subclass):
+        return issubclass(subclass, cls._resolve())
+
+    @property
+    def __doc__(cls):
+        return cls._resolve().__doc__
+
+    def __repr__(cls):
+        return repr(cls._resolve())
+
+
+def lazyPluginClass(category, name):
+    '''
+    Return a stand-in for the GPI class of the plugin 'name' of 'category' which imports the plugin on first use
+    '''
+    return _LazyPluginClass(name, (object,), {'_category': category, '_plugin_name': name, '_resolved': None})
+
+
 def _addToInterface(interface, name, _object):
 
     setattr(interface, name, addProxy(_object))
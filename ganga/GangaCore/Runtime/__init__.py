@@ -5,17 +5,24 @@ Ganga Runtime subsystem: initialization, configuration and creation of runtime o
 
 import sys
 
-from .bootstrap import GangaProgram
+from .startup_profile import startup_profile
+
+with startup_profile.phase('import bootstrap'):
+    from .bootstrap import GangaProgram
 
 
 def setupGanga(argv=sys.argv, interactive=True):
     # Process options given at command line and in configuration file(s)
     # Perform environment setup and bootstrap
     import GangaCore.Runtime
-    GangaCore.Runtime._prog = GangaProgram(argv=argv)
-    GangaCore.Runtime._prog.parseOptions()
-    GangaCore.Runtime._prog.configure()
-    GangaCore.Runtime._prog.initEnvironment()
-    GangaCore.Runtime._prog.bootstrap(GangaCore.Runtime._prog.interactive)
+    with startup_profile.phase('parse options'):
+        GangaCore.Runtime._prog = GangaProgram(argv=argv)
+        GangaCore.Runtime._prog.parseOptions()
+    with startup_profile.phase('configure'):
+        GangaCore.Runtime._prog.configure()
+    with startup_profile.phase('environment'):
+        GangaCore.Runtime._prog.initEnvironment()
+    with startup_profile.phase('bootstrap'):
+        GangaCore.Runtime._prog.bootstrap(GangaCore.Runtime._prog.interactive)
     GangaCore.Runtime._prog.new_user_wizard(interactive)
 
@@ -31,6 +31,7 @@ from GangaCore import _gangaVersion, _gangaPythonPath, _development
 from GangaCore.Utility.Config.Config import getConfig
 from GangaCore.Utility import stacktracer
 import GangaCore.Runtime
+from GangaCore.Runtime.startup_profile import startup_profile
 
 from IPython.terminal.prompts import Prompts, Token
 class GangaPrompt(Prompts):
@@ -154,7 +155,7 @@ def manualExportToGPI(my_interface=None):
     exportToInterface(my_interface, 'ReadOnlyObjectError', ReadOnlyObjectError, 'Exceptions')
     exportToInterface(my_interface, 'JobError', JobError, 'Exceptions')
 
-    from GangaCore.Runtime.GPIFunctions import license, typename, categoryname, plugins, convert_merger_to_postprocessor
+    from GangaCore.Runtime.GPIFunctions import license, typename, categoryname, plugins, convert_merger_to_postprocessor, metrics
 
     exportToInterface(my_interface, 'license', license, 'Functions')
     # FIXME:
@@ -170,6 +171,7 @@ def manualExportToGPI(my_interface=None):
     exportToInterface(my_interface, 'typename', typename, 'Functions')
     exportToInterface(my_interface, 'categoryname', categoryname, 'Functions')
     exportToInterface(my_interface, 'plugins', plugins, 'Functions')
+    exportToInterface(my_interface, 'metrics', metrics, 'Functions')
     exportToInterface(my_interface, 'convert_merger_to_postprocessor', convert_merger_to_postprocessor, 'Functions')
 
     from GangaCore.GPIDev.Persistency import export, load
@@ -309,12 +311,19 @@ under certain conditions; type license() for details.
         parser.add_option("--daemon", dest='daemon', action="store_true", default=False,
                           help='run Ganga as service.')
 
+        parser.add_option("--profile-startup", dest='profile_startup', action="store_true", default=False,
+                          help='time the phases of the startup and write them as JSON to gangadir/logs/startup. '
+                               'Compare runs with GangaCore/scripts/compare_startup_profiles.py')
+
         parser.set_defaults(force_interactive=False, config_file=None,
                             force_loglevel=None, rexec=1, monitoring=1, prompt=1, generate_config=None)
         parser.disable_interspersed_args()
 
         (self.options, self.args) = parser.parse_args(args=self.argv[1:])
 
+        if self.options.profile_startup:
+            startup_profile.enabled = True
+
         # check for --no-rexec. It does nothing now!
         if self.options.rexec == 0:
             from GangaCore.Utility.logging import getLogger
@@ -886,16 +895,19 @@ under certain conditions; type license() for details.
         logger.debug("Import plugins")
         try:
             # load Ganga system plugins...
-            from GangaCore.Runtime import plugins
+            with startup_profile.phase('plugin import'):
+                from GangaCore.Runtime import plugins
         except Exception as x:
             logger.critical('Ganga system plugins could not be loaded due to the following reason: %s', x)
             logger.exception(x)
             raise GangaException(x).with_traceback(sys.exc_info()[2])
 
-        initSetupRuntimePackages()
+        with startup_profile.phase('runtime packages'):
+            initSetupRuntimePackages()
 
         from GangaCore.Core.GangaThread.WorkerThreads import startUpQueues
-        startUpQueues()
+        with startup_profile.phase('queues'):
+            startUpQueues()
 
     # bootstrap all system and user-defined runtime modules
     @staticmethod
@@ -904,10 +916,12 @@ under certain conditions; type license() for details.
         config = GangaCore.Utility.Config.getConfig('Configuration')
 
         from GangaCore.Utility.Runtime import loadPlugins, autoPopulateGPI
-        loadPlugins(GangaCore.GPI)
-        autoPopulateGPI()
-        from GangaCore.Utility.Runtime import setPluginDefaults
-        setPluginDefaults()
+        with startup_profile.phase('runtime plugins'):
+            loadPlugins(GangaCore.GPI)
+        with startup_profile.phase('GPI export'):
+            autoPopulateGPI()
+            from GangaCore.Utility.Runtime import setPluginDefaults
+            setPluginDefaults()
 
         # Start tracking all the threads and saving the information to a file
         stacktracer.trace_start()
@@ -918,40 +932,45 @@ under certain conditions; type license() for details.
         manualExportToGPI()
 
         from GangaCore.Runtime import Workspace_runtime, Repository_runtime
-        from GangaCore.GPIDev.Credentials import credential_store
-        if (Workspace_runtime.requiresAfsToken() or Repository_runtime.requiresAfsToken()) and not config['NoAfsToken']:
-            # If the registry or the workspace needs an AFS token then add one to the credential store.
-            # Note that this happens before the monitoring starts so that it gets tracked properly
+        with startup_profile.phase('credentials'):
+            from GangaCore.GPIDev.Credentials import credential_store
+            if (Workspace_runtime.requiresAfsToken() or Repository_runtime.requiresAfsToken()) and not config['NoAfsToken']:
+                # If the registry or the workspace needs an AFS token then add one to the credential store.
+                # Note that this happens before the monitoring starts so that it gets tracked properly
 
-            from GangaCore.GPIDev.Credentials.AfsToken import AfsToken
-            credential_store.create(AfsToken(), create=False, check_file=True)
+                from GangaCore.GPIDev.Credentials.AfsToken import AfsToken
+                credential_store.create(AfsToken(), create=False, check_file=True)
 
         import GangaCore.Core
         from GangaCore.Runtime.Repository_runtime import startUpRegistries
         if config['AutoStartReg']:
-            startUpRegistries()
+            with startup_profile.phase('registries'):
+                startUpRegistries()
 
         logger.debug("Bootstrap Core Modules")
         # bootstrap core modules
         from GangaCore.Core.GangaRepository import getRegistrySlice
         ## Here is where the monitoring loop and related services are started!
-        GangaCore.Core.bootstrap(getRegistrySlice('jobs'), interactive)
+        with startup_profile.phase('monitoring'):
+            GangaCore.Core.bootstrap(getRegistrySlice('jobs'), interactive)
 
         # export all configuration items, new options should not be added after
         # this point
-        GangaCore.GPIDev.Lib.Config.bootstrap()
+        with startup_profile.phase('config export'):
+            GangaCore.GPIDev.Lib.Config.bootstrap()
 
 
         logger.debug("Post-Bootstrap hooks")
         from GangaCore.Utility.Runtime import allRuntimes
         ###########
         # run post bootstrap hooks
-        for r in allRuntimes.values():
-            try:
-                r.postBootstrapHook()
-            except Exception as err:
-                logger.error("problems with post bootstrap hook for %s" % r.name)
-                logger.error("Reason: %s" % err)
+        with startup_profile.phase('post bootstrap hooks'):
+            for r in allRuntimes.values():
+                try:
+                    r.postBootstrapHook()
+                except Exception as err:
+                    logger.error("problems with post bootstrap hook for %s" % r.name)
+                    logger.error("Reason: %s" % err)
 
 
     @staticmethod
@@ -1019,29 +1038,30 @@ under certain conditions; type license() for details.
         # save a reference to the Ganga namespace as an instance attribute
         self.local_ns = local_ns
 
-        # load templates for user-defined runtime modules
-        from GangaCore.Utility.Runtime import allRuntimes
-        for r in allRuntimes.values():
-            r.loadTemplates(local_ns)
+        with startup_profile.phase('startup files'):
+            # load templates for user-defined runtime modules
+            from GangaCore.Utility.Runtime import allRuntimes
+            for r in allRuntimes.values():
+                r.loadTemplates(local_ns)
 
-        # exec ~/.ganga.py file
-        fileName = fullpath('~/.ganga.py')
-        if os.path.exists(fileName):
-            try:
-                exec(compile(open(fileName).read(), fileName, 'exec'), local_ns)
-            except Exception as x:
-                logger.error('Failed to source %s (Error was "%s"). Check your file for syntax errors.', fileName, x)
-        # exec StartupGPI code
-        from GangaCore.Utility.Config import getConfig
-        config = getConfig('Configuration')
-        if config['StartupGPI']:
-            # ConfigParser trims the lines and escape the space chars
-            # so we have only one possibility to insert python code :
-            # using explicitly '\n' and '\t' chars
+            # exec ~/.ganga.py file
+            fileName = fullpath('~/.ganga.py')
+            if os.path.exists(fileName):
+                try:
+                    exec(compile(open(fileName).read(), fileName, 'exec'), local_ns)
+                except Exception as x:
+                    logger.error('Failed to source %s (Error was "%s"). Check your file for syntax errors.', fileName, x)
+            # exec StartupGPI code
+            from GangaCore.Utility.Config import getConfig
+            config = getConfig('Configuration')
+            if config['StartupGPI']:
+                # ConfigParser trims the lines and escape the space chars
+                # so we have only one possibility to insert python code :
+                # using explicitly '\n' and '\t' chars
 #FIXME: Waiting for new site config to update print to python3
-            code = config['StartupGPI'].replace(
-                '\\t', '\t').replace('\\n', '\n')
-            exec(code, local_ns)
+                code = config['StartupGPI'].replace(
+                    '\\t', '\t').replace('\\n', '\n')
+                exec(code, local_ns)
 
         logger.debug("loaded .ganga.py")
 
@@ -1054,6 +1074,10 @@ under certain conditions; type license() for details.
             else:
                 session_type += 'startup_script'
 
+        # the startup is complete unless an IPython shell is still to be launched, see launch_IPython
+        if runs_script or self.options.TEST or not self.interactive or config['TextShell'] != 'IPython':
+            startup_profile.finish()
+
         if self.options.TEST:
             sys.argv = self.args
             try:
@@ -1212,6 +1236,9 @@ under certain conditions; type license() for details.
         Launch an embedded IPython session within the GangaCore.GPI namespace
         """
 
+        ipython_phase = startup_profile.phase('IPython launch')
+        ipython_phase.__enter__()
+
         import IPython
 
         # Based on examples/Embedding/embed_class_long.py from the IPython source tree
@@ -1251,6 +1278,9 @@ under certain conditions; type license() for details.
         config = getConfig('Configuration')
         ipshell.confirm_exit = config['confirm_exit']
 
+        ipython_phase.__exit__(None, None, None)
+        startup_profile.finish()
+
         # Launch embedded shell
         from GangaCore import GPI
         ipshell(local_ns=local_ns, module=GangaCore.GPI)
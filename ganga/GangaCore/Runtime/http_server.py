@@ -1,13 +1,21 @@
 from http.server import BaseHTTPRequestHandler
 from GangaCore.Core.GangaRepository import getRegistry, RegistryKeyError
+from GangaCore.Core.GangaRepository.Registry import IncompleteObject
 from GangaCore.Core.GangaThread import GangaThread
 from GangaCore.Utility.util import hostname
-from GangaCore.GPIDev.Base.Proxy import getName
+from GangaCore.GPIDev.Base.Proxy import getName, stripProxy
 from http.server import HTTPServer
+from socketserver import ThreadingMixIn
 
 import urllib.parse
 import GangaCore.GPI
 from GangaCore.GPIDev.Lib.Config import config
+import bisect
+import collections
+import gzip
+import hashlib
+import json
+import threading
 import time
 import datetime
 import os
@@ -25,6 +33,9 @@ job_status_color = {'new': '00FFFF',
                     'failed': 'FF0000'}
 
 
+# answers smaller than this many bytes are sent uncompressed
+compress_threshold = 1024
+
 subjob_status_color = {'new': '00ff7d',
                        'submitting': 'FFFFFF',
                        'submitted': '00007d',
@@ -68,180 +79,155 @@ def get_users_JSON():
 
 def get_subjob_JSON(job):
 
-    result = []
-    result.append("{")
-
-    result.append("\"id\": %s," % addQuotes(job.fqid))
-    result.append("\"status\": %s," % addQuotes(job.status))
-    result.append("\"name\": %s," % addQuotes(job.name))
-    result.append("\"application\": %s," %
-                  addQuotes(getName(job.application)))
-    result.append("\"backend\": %s," %
-                  addQuotes(getName(job.backend)))
-    result.append("\"actualCE\": %s" % addQuotes(job.backend.actualCE))
-
-    result.append("}")
-
-    return "".join(result)
+    return json.dumps(collections.OrderedDict([
+        ("id", job.fqid),
+        ("status", job.status),
+        ("name", job.name),
+        ("application", getName(job.application)),
+        ("backend", getName(job.backend)),
+        ("actualCE", job.backend.actualCE)]))
 
 
-def get_job_JSON(job):
-
-    undefinedAttribute = 'UNDEFINED'
+def get_monitoring_links_html(mon_links):
 
-    result = []
-    result.append("{")
-
-    result.append("\"id\": %s," % addQuotes(job.fqid))
-    result.append("\"status\": %s," % addQuotes(job.status))
-    result.append("\"name\": %s," % addQuotes(job.name))
-
-    # add mon links in the JSON
-    mon_links = job.info.monitoring_links
     mon_links_html = ''
-
-    if len(mon_links) > 0:
-        number = 1
-        for mon_link in mon_links:
-            # if it is string -> just the path to the link
-            if isinstance(mon_link, str):
+    number = 1
+    for mon_link in mon_links:
+        # if it is string -> just the path to the link
+        if isinstance(mon_link, str):
+            mon_links_html = mon_links_html + \
+                '<div>&nbsp;&nbsp;&nbsp;<a href=\'%s\'>mon_link_%s</a></div>' % (
+                    mon_link, number)
+            number += 1
+        elif isinstance(mon_link, tuple):
+            if len(mon_link) == 2:
+                mon_links_html = mon_links_html + \
+                    '<div>&nbsp;&nbsp;&nbsp;<a href=\'%s\'>%s</a></div>' % (
+                        mon_link[0], mon_link[1])
+            else:
                 mon_links_html = mon_links_html + \
                     '<div>&nbsp;&nbsp;&nbsp;<a href=\'%s\'>mon_link_%s</a></div>' % (
-                        mon_link, number)
+                        mon_link[0], number)
                 number += 1
-            elif isinstance(mon_link, tuple):
-                if len(mon_link) == 2:
-                    mon_links_html = mon_links_html + \
-                        '<div>&nbsp;&nbsp;&nbsp;<a href=\'%s\'>%s</a></div>' % (
-                            mon_link[0], mon_link[1])
-                else:
-                    mon_links_html = mon_links_html + \
-                        '<div>&nbsp;&nbsp;&nbsp;<a href=\'%s\'>mon_link_%s</a></div>' % (
-                            mon_link[0], number)
-                    number += 1
-
-    result.append("\"link\": %s," % addQuotes(mon_links_html))
-
-    # test for expandable data
-    result.append("\"inputdir\": %s," % addQuotes(job.inputdir))
-    result.append("\"outputdir\": %s," % addQuotes(job.outputdir))
-
-    try:
-        result.append("\"submitted\": %s," % addQuotes(
-            str(len(job.subjobs.select(status='submitted')))))
-        result.append("\"running\": %s," %
-                      addQuotes(str(len(job.subjobs.select(status='running')))))
-        result.append("\"completed\": %s," % addQuotes(
-            str(len(job.subjobs.select(status='completed')))))
-        result.append("\"failed\": %s," %
-                      addQuotes(str(len(job.subjobs.select(status='failed')))))
-
-        result.append("\"application\": %s," %
-                      addQuotes(getName(job.application)))
-        result.append("\"backend\": %s," %
-                      addQuotes(getName(job.backend)))
-        result.append("\"subjobs\": %s," % addQuotes(str(len(job.subjobs))))
-        result.append("\"uuid\": %s," % addQuotes(job.info.uuid))
-
-        try:
-            result.append("\"actualCE\": %s," %
-                          addQuotes(job.backend.actualCE))
-        except AttributeError:
-            result.append("\"actualCE\": %s," % addQuotes(undefinedAttribute))
-
-    except RegistryKeyError:
-        pass
-
-    # remove the last , -> else invalid JSON
-    if result[len(result) - 1][-1] == ',':
-        last = result[-1]
-        result = result[:-1]
-        result.append(last[:-1])
-
-    result.append("}")
-
-    return "".join(result)
-
-
-def get_subjobs_in_time_range(jobid, fromDate=None, toDate=None):
-    from GangaCore.Core.GangaRepository import getRegistryProxy
-
-    subjobs = []
-
-    for subjob in getRegistryProxy('jobs')(jobid).subjobs:
-
-        timeCreated = subjob.time.timestamps['new']
-
-        if fromDate is None and toDate is None:
 
-            subjobs.append(subjob)
+    return mon_links_html
 
-        elif fromDate is not None and toDate is not None:
 
-            if timeCreated >= fromDate and timeCreated <= toDate:
+def get_time_created(job, cache):
+    """
+    Returns the creation time of a job stored in its index cache, or read from the job itself
+    for the entries indexed before the time was stored there
+    """
+    if 'time:new' in cache:
+        return cache['time:new']
+    try:
+        return stripProxy(job).time.timestamps.get('new')
+    except Exception as err:
+        logger.debug("Could not read the creation time of a job: %s" % err)
+        return None
 
-                subjobs.append(subjob)
 
-        elif fromDate is not None and toDate is None:
+def get_subjob_status_counts(cache):
+    """
+    Returns a Counter of the subjob statuses stored in the index cache of a master job,
+    falling back to the flat list written by older versions
+    """
 
-            if timeCreated >= fromDate:
+    if 'subjobs:status_counts' in cache:
+        return collections.Counter(cache['subjobs:status_counts'])
+    return collections.Counter(cache.get('subjobs:status', []))
 
-                subjobs.append(subjob)
 
-    return subjobs
+def get_job_fields(job, cache):
+    """
+    Returns the fields shown for a master job by the web gui. The values are taken from the index cache
+    of the job so that jobs which have not been loaded are not loaded just to be displayed.
+    Details which are only known to a loaded job (monitoring links and uuid) are left empty otherwise.
+    Args:
+        job (Job): raw job object from the registry
+        cache (dict): the index cache of the job
+    """
 
+    undefinedAttribute = 'UNDEFINED'
 
-def get_subjobs_JSON(jobid, fromDate=None, toDate=None):
+    subjob_statuses = get_subjob_status_counts(cache)
+    loaded = job._getRegistry() is not None and job._getRegistry().has_loaded(job)
+
+    fields = collections.OrderedDict()
+    fields["id"] = str(cache.get('id', job.id))
+    fields["status"] = cache.get('status', '')
+    fields["name"] = cache.get('name', '')
+    fields["link"] = get_monitoring_links_html(job.info.monitoring_links) if loaded else ''
+    fields["inputdir"] = job.getStringInputDir()
+    fields["outputdir"] = job.getStringOutputDir()
+    fields["submitted"] = str(subjob_statuses['submitted'])
+    fields["running"] = str(subjob_statuses['running'])
+    fields["completed"] = str(subjob_statuses['completed'])
+    fields["failed"] = str(subjob_statuses['failed'])
+    fields["application"] = cache.get('display:application', '')
+    fields["backend"] = cache.get('display:backend', '')
+    fields["subjobs"] = str(sum(subjob_statuses.values()))
+    fields["uuid"] = job.info.uuid if loaded else ''
+    fields["actualCE"] = cache.get('display:backend.actualCE', '') or undefinedAttribute
+
+    return fields
 
-    json_subjobs_strings = []
-    json_subjobs_strings.append("{\"taskjobs\": [")
 
-    subjobs_in_time_range = get_subjobs_in_time_range(jobid, fromDate, toDate)
+def get_job_JSON(job):
 
-    for subjob in subjobs_in_time_range:
+    job = stripProxy(job)
+    return json.dumps(get_job_fields(job, job._index_cache))
 
-        json_subjobs_strings.append(get_subjob_JSON(subjob))
-        json_subjobs_strings.append(",")
 
-    if json_subjobs_strings[-1] == ",":
-        json_subjobs_strings = json_subjobs_strings[:-1]
+def get_subjob_fields(master_id, cache):
+    """
+    Returns the fields shown for a subjob by the web gui from its entry in the subjob index
+    Args:
+        master_id (int): id of the master job
+        cache (dict): the index cache of the subjob
+    """
 
-    json_subjobs_strings.append("]}")
+    fields = collections.OrderedDict()
+    fields["id"] = cache.get('display:fqid') or '%s.%s' % (master_id, cache.get('id'))
+    fields["status"] = cache.get('status', '')
+    fields["name"] = cache.get('name', '')
+    fields["application"] = cache.get('display:application', '')
+    fields["backend"] = cache.get('display:backend', '')
+    fields["actualCE"] = cache.get('display:backend.actualCE', '')
 
-    return "".join(json_subjobs_strings)
+    return fields
 
 
-def get_job_infos_in_time_range(fromDate=None, toDate=None):
+def in_time_range(timeCreated, fromDate=None, toDate=None):
 
-    job_infos = []
+    if timeCreated is None:
+        return fromDate is None and toDate is None
 
-    for jobInfo in jobs_dictionary.values():
+    if fromDate is not None and timeCreated < fromDate:
+        return False
 
-        timeCreated = jobInfo.getTimeCreated()
+    if toDate is not None and timeCreated > toDate:
+        return False
 
-        if timeCreated is None:
+    return True
 
-            if fromDate is None and toDate is None:
 
-                job_infos.append(jobInfo)
-
-        elif fromDate is None and toDate is None:
+def get_subjobs_in_time_range(jobid, fromDate=None, toDate=None):
 
-            job_infos.append(jobInfo)
+    return [info for info in snapshot.getSubjobInfos(jobid) if in_time_range(info.getTimeCreated(), fromDate, toDate)]
 
-        elif fromDate is not None and toDate is not None:
 
-            if timeCreated >= fromDate and timeCreated <= toDate:
+def get_subjobs_JSON(jobid, fromDate=None, toDate=None, page=None, pagesize=None):
 
-                job_infos.append(jobInfo)
+    subjobs_in_time_range = get_subjobs_in_time_range(jobid, fromDate, toDate)
+    subjob_infos, paging = paginate(subjobs_in_time_range, page, pagesize)
 
-        elif fromDate is not None and toDate is None:
+    return "{\"taskjobs\": [" + ",".join(info.getJobJSON() for info in subjob_infos) + "]" + paging + "}"
 
-            if timeCreated >= fromDate:
 
-                job_infos.append(jobInfo)
+def get_job_infos_in_time_range(fromDate=None, toDate=None):
 
-    return job_infos
+    return snapshot.getJobInfos(fromDate, toDate)
 
 # increment dictionary value method
 
@@ -256,9 +242,8 @@ def get_accumulated_subjobs_JSON(subjobs):
     completed_dates = []
 
     for subjob in subjobs:
-        if subjob.status == 'completed':
-            completed_dates.append(subjob.time.timestamps['final'])
-
+        if subjob.getJobStatus() == 'completed' and subjob.getTimeFinal() is not None:
+            completed_dates.append(subjob.getTimeFinal())
     if len(completed_dates) == 0:
         return ''
 
@@ -314,6 +299,12 @@ def get_accumulated_subjobs_JSON(subjobs):
 
 def create_subjobs_graphics(jobid, subjob_attribute, fromDate, toDate):
 
+    if subjob_attribute == 'status' and fromDate is None and toDate is None:
+        # the master job index already holds the status of every subjob
+        jobInfo = snapshot.getJobInfo(jobid)
+        if jobInfo is not None:
+            return get_pie_chart_json(dict(jobInfo.getSubjobStatuses()), colors=True, jobs=False)
+
     subjobs_in_time_range = get_subjobs_in_time_range(jobid, fromDate, toDate)
 
     if subjob_attribute == 'accumulate':
@@ -325,17 +316,16 @@ def create_subjobs_graphics(jobid, subjob_attribute, fromDate, toDate):
     for subjob in subjobs_in_time_range:
 
         if subjob_attribute == 'status':
-            increment(subjobs_attributes, subjob.status)
+            increment(subjobs_attributes, subjob.getJobStatus())
 
         elif subjob_attribute == 'application':
-            increment(
-                subjobs_attributes, getName(subjob.application))
+            increment(subjobs_attributes, subjob.getJobApplication())
 
         elif subjob_attribute == 'backend':
-            increment(subjobs_attributes, getName(subjob.backend))
+            increment(subjobs_attributes, subjob.getJobBackend())
 
         elif subjob_attribute == 'actualCE':
-            increment(subjobs_attributes, subjob.backend.actualCE)
+            increment(subjobs_attributes, subjob.getJobActualCE())
 
     if subjob_attribute == 'status':
         return get_pie_chart_json(subjobs_attributes, colors=True, jobs=False)
@@ -403,66 +393,57 @@ def create_jobs_graphics(job_attribute, fromDate=None, toDate=None):
         return get_pie_chart_json(jobs_attribute)
 
 
-def get_jobs_JSON(fromDate=None, toDate=None):
+def paginate(infos, page=None, pagesize=None):
+    """
+    Returns the infos of the requested page and a JSON fragment describing the paging,
+    or all infos and an empty fragment if no page was asked for
+    Args:
+        infos (list): the infos to page through
+        page (int): the page to return, starting at 0
+        pagesize (int): the number of infos on a page
+    """
 
-    json_jobs_strings = []
-    json_jobs_strings.append("{\"user_taskstable\": [")
+    if page is None or not pagesize:
+        return infos, ''
 
-    job_infos_in_time_range = get_job_infos_in_time_range(fromDate, toDate)
-
-    for jobInfo in job_infos_in_time_range:
+    start = page * pagesize
+    paging = ", \"page\": %d, \"pagesize\": %d, \"total\": %d" % (page, pagesize, len(infos))
+    return infos[start:start + pagesize], paging
 
-        json_jobs_strings.append(jobInfo.getJobJSON())
-        json_jobs_strings.append(",")
 
-    if json_jobs_strings[-1] == ",":
-        json_jobs_strings = json_jobs_strings[:-1]
+def get_jobs_JSON(fromDate=None, toDate=None, page=None, pagesize=None):
 
-    json_jobs_strings.append("]}")
+    job_infos_in_time_range = get_job_infos_in_time_range(fromDate, toDate)
+    job_infos, paging = paginate(job_infos_in_time_range, page, pagesize)
 
-    return "".join(json_jobs_strings)
+    # the fragments are serialised once per job change, so a response is just a join
+    return "{\"user_taskstable\": [" + ",".join(info.getJobJSON() for info in job_infos) + "]" + paging + "}"
 
 
-def update_jobs_dictionary():
-    from GangaCore.Core.GangaRepository import getRegistryProxy
+def get_status_histogram_JSON(fromDate=None, toDate=None):
+    """
+    Returns the number of jobs and of subjobs in each status. The subjob counts come from the
+    subjob statuses stored in the index of each master job, so no subjob is looked at.
+    """
 
-    reg = getRegistry("jobs")
-    # get the changed jobs
-    changed_ids = reg.pollChangedJobs("WebGUI")
+    job_statuses = collections.Counter()
+    subjob_statuses = collections.Counter()
 
-    for job_id in changed_ids:
-        try:
+    for jobInfo in get_job_infos_in_time_range(fromDate, toDate):
+        job_statuses[jobInfo.getJobStatus()] += 1
+        subjob_statuses.update(jobInfo.getSubjobStatuses())
 
-            job = getRegistryProxy('jobs')(job_id)
+    return json.dumps({"jobs": job_statuses, "subjobs": subjob_statuses}, sort_keys=True)
 
-            try:
-                jobs_dictionary[job_id] = JobRelatedInfo(
-                    job, job.time.timestamps['new'])
-            except RegistryKeyError:
-                jobs_dictionary[job_id] = JobRelatedInfo(job, None)
 
-        except RegistryKeyError:
+def update_jobs_dictionary():
 
-            del jobs_dictionary[job_id]
+    snapshot.update()
 
 
 def fill_jobs_dictionary():
-    from GangaCore.Core.GangaRepository import getRegistryProxy
-
-    for job in getRegistryProxy('jobs'):
-        try:
-            # get the id -> it could cause RegistryKeyError and the code below
-            # will not be executed
-            jobid = job.id
 
-            try:
-                jobs_dictionary[jobid] = JobRelatedInfo(
-                    job, job.time.timestamps['new'])
-            except RegistryKeyError:
-                jobs_dictionary[jobid] = JobRelatedInfo(job, None)
-
-        except RegistryKeyError:
-            pass
+    snapshot.update()
 
 # todo remove
 
@@ -493,6 +474,13 @@ def getProcessDetails():
         file.close()
 
 
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    """HTTPServer handling each request in its own thread so a slow query does not block the others"""
+
+    daemon_threads = True
+
+
 def getHttpServer():
 
     success = False
@@ -502,7 +490,7 @@ def getHttpServer():
     while not success:
 
         try:
-            server = HTTPServer((httpServerHost, port), GetHandler)
+            server = ThreadingHTTPServer((httpServerHost, port), GetHandler)
             success = True
         except Exception:
             port += 1
@@ -549,13 +537,16 @@ def getMonitoringLink(port):
 
 class JobRelatedInfo:
 
-    def __init__(self, job, time_created):
+    def __init__(self, fields, time_created, time_final=None, subjob_statuses=None):
 
-        self.job_json = get_job_JSON(job)
+        self.job_json = json.dumps(fields)
         self.time_created = time_created
-        self.job_status = job.status
-        self.job_application = getName(job.application)
-        self.job_backend = getName(job.backend)
+        self.time_final = time_final
+        self.subjob_statuses = subjob_statuses or collections.Counter()
+        self.job_status = fields['status']
+        self.job_application = fields['application']
+        self.job_backend = fields['backend']
+        self.job_actualCE = fields['actualCE']
 
     def getJobJSON(self):
 
@@ -565,6 +556,10 @@ class JobRelatedInfo:
 
         return self.time_created
 
+    def getTimeFinal(self):
+
+        return self.time_final
+
     def getJobStatus(self):
 
         return self.job_status
@@ -577,6 +572,14 @@ class JobRelatedInfo:
 
         return self.job_backend
 
+    def getJobActualCE(self):
+
+        return self.job_actualCE
+
+    def getSubjobStatuses(self):
+
+        return self.subjob_statuses
+
     def __hash__(self):
 
         return hash(self.job_json) + hash(self.time_created)
@@ -586,6 +589,132 @@ class JobRelatedInfo:
         return isinstance(other, JobRelatedInfo) and self.job_json == other.job_json and self.time_created == other.time_created
 
 
+class JobsSnapshot(object):
+
+    """
+    Incrementally maintained view of the jobs registry served by the web gui.
+
+    Each job is held as a JobRelatedInfo with its JSON fragment already serialised. Only the jobs
+    returned by pollChangedJobs are rebuilt on update, from their index cache, so jobs are not loaded
+    just to be displayed. Jobs are also indexed by the day they were created so that fromDate/toDate
+    queries only look at the matching days. Subjob infos are built on demand from the subjob index of
+    a master job and dropped whenever that master changes.
+    The version is increased on every change and is used to build the ETag of responses.
+    """
+
+    def __init__(self, registry_name='jobs', consumer='WebGUI'):
+
+        self.registry_name = registry_name
+        self.consumer = consumer
+        self.version = 0
+        self._lock = threading.RLock()
+        self._infos = {}
+        self._days = {}
+        self._sorted_days = []
+        self._undated = set()
+        self._subjob_infos = {}
+
+    def _index(self, job_id, info):
+
+        self._infos[job_id] = info
+        created = info.getTimeCreated()
+        if created is None:
+            self._undated.add(job_id)
+            return
+        day = created.date()
+        if day not in self._days:
+            self._days[day] = set()
+            bisect.insort(self._sorted_days, day)
+        self._days[day].add(job_id)
+
+    def _unindex(self, job_id):
+
+        info = self._infos.pop(job_id, None)
+        self._subjob_infos.pop(job_id, None)
+        if info is None:
+            return
+        created = info.getTimeCreated()
+        if created is None:
+            self._undated.discard(job_id)
+            return
+        day = created.date()
+        self._days[day].discard(job_id)
+        if not self._days[day]:
+            del self._days[day]
+            self._sorted_days.remove(day)
+
+    def update(self):
+        """Rebuilds the entries of the jobs which changed since the last update"""
+
+        reg = getRegistry(self.registry_name)
+        changed_ids = reg.pollChangedJobs(self.consumer)
+        if not changed_ids:
+            return
+
+        with self._lock:
+            for job_id in changed_ids:
+                self._unindex(job_id)
+                try:
+                    job = reg[job_id]
+                except RegistryKeyError:
+                    continue
+                if isinstance(job, IncompleteObject):
+                    continue
+                try:
+                    cache = job._index_cache
+                    self._index(job_id, JobRelatedInfo(get_job_fields(job, cache), get_time_created(job, cache),
+                                                       subjob_statuses=get_subjob_status_counts(cache)))
+                except RegistryKeyError:
+                    # removed while we were looking at it
+                    pass
+            self.version += 1
+
+    def getJobInfos(self, fromDate=None, toDate=None):
+        """Returns the infos of the jobs created between fromDate and toDate, ordered by id"""
+
+        with self._lock:
+            if fromDate is None and toDate is None:
+                return [self._infos[job_id] for job_id in sorted(self._infos)]
+
+            first = 0 if fromDate is None else bisect.bisect_left(self._sorted_days, fromDate.date())
+            last = len(self._sorted_days) if toDate is None else bisect.bisect_right(self._sorted_days, toDate.date())
+
+            job_ids = []
+            for day in self._sorted_days[first:last]:
+                job_ids.extend(self._days[day])
+
+            infos = [self._infos[job_id] for job_id in sorted(job_ids)]
+
+        return [info for info in infos if in_time_range(info.getTimeCreated(), fromDate, toDate)]
+
+    def getJobInfo(self, jobid):
+        """Returns the info of jobid, None if it is not in the snapshot"""
+
+        with self._lock:
+            return self._infos.get(jobid)
+
+    def getSubjobInfos(self, jobid):
+        """Returns the infos of the subjobs of jobid, built from the subjob index the first time they are asked for"""
+
+        with self._lock:
+            if jobid in self._subjob_infos:
+                return self._subjob_infos[jobid]
+
+            reg = getRegistry(self.registry_name)
+            job = stripProxy(reg[jobid])
+            subjobs = job.subjobs
+            if hasattr(subjobs, 'getAllCachedData'):
+                caches = subjobs.getAllCachedData()
+            else:
+                caches = [reg.getIndexCache(sj) for sj in subjobs]
+
+            infos = [JobRelatedInfo(get_subjob_fields(jobid, cache), get_time_created(subjobs[i], cache), cache.get('time:final'))
+                     for i, cache in enumerate(caches)]
+            self._subjob_infos[jobid] = infos
+
+            return infos
+
+
 class HTTPServerThread(GangaThread):
 
     def __init__(self, name):
@@ -619,10 +748,7 @@ class HTTPServerThread(GangaThread):
 
         #   initialization
 
-        reg = getRegistry("jobs")
-        # calling here first time will take all jobs
-        reg.pollChangedJobs("WebGUI")
-        # fill jobs dictionary at the begining
+        # the first update takes all jobs
         fill_jobs_dictionary()
 
         logger.info('Web gui monitoring server started successfully')
@@ -647,9 +773,12 @@ class GetHandler(BaseHTTPRequestHandler):
         logger.debug(format % args)
 
     def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            self.send_metrics()
+            return
+
         queryString = self.path.split('?')[1]
-        import cgi
-        qsDict = dict(cgi.parse_qsl(queryString))
+        qsDict = dict(urllib.parse.parse_qsl(queryString))
         query = qsDict['list']
 
         fromDate = None
@@ -663,71 +792,109 @@ class GetHandler(BaseHTTPRequestHandler):
         elif 'timerange' in qsDict:
             fromDate = getFromDateFromTimeRange(qsDict['timerange'])
 
-        json = ''
+        # the job and subjob tables can be asked for one page at a time
+        page = None
+        pagesize = None
+        if 'page' in qsDict and 'pagesize' in qsDict:
+            page = max(0, int(qsDict['page']))
+            pagesize = max(1, int(qsDict['pagesize']))
+
+        # every answer is built from the snapshot, so it can only change when the snapshot does
+        update_jobs_dictionary()
+        accept_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        etag = '"%s"' % hashlib.md5(('%s|%s|%s|%s|%s' % (snapshot.version, self.path, fromDate, toDate, accept_gzip)).encode()).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        response = ''
 
         if query == "users":
-            json = get_users_JSON()
+            response = get_users_JSON()
         elif query == "jobs":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
-            json = get_jobs_JSON(fromDate, toDate)
+            response = get_jobs_JSON(fromDate, toDate, page, pagesize)
+
+        elif query == "status_histogram":
+            response = get_status_histogram_JSON(fromDate, toDate)
 
         elif query == "subjobs":
             jobid = int(qsDict['taskmonid'])
-            json = get_subjobs_JSON(jobid, fromDate, toDate)
+            response = get_subjobs_JSON(jobid, fromDate, toDate, page, pagesize)
 
         elif query == "jobs_statuses":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
-            json = create_jobs_graphics('status', fromDate, toDate)
+            response = create_jobs_graphics('status', fromDate, toDate)
 
         elif query == "jobs_backends":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
-            json = create_jobs_graphics('backend', fromDate, toDate)
+            response = create_jobs_graphics('backend', fromDate, toDate)
 
         elif query == "jobs_applications":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
-            json = create_jobs_graphics('application', fromDate, toDate)
+            response = create_jobs_graphics('application', fromDate, toDate)
 
         elif query == "subjobs_statuses":
             jobid = int(qsDict['taskmonid'])
-            json = create_subjobs_graphics(jobid, 'status', fromDate, toDate)
+            response = create_subjobs_graphics(jobid, 'status', fromDate, toDate)
 
         elif query == "subjobs_backends":
             jobid = int(qsDict['taskmonid'])
-            json = create_subjobs_graphics(jobid, 'backend', fromDate, toDate)
+            response = create_subjobs_graphics(jobid, 'backend', fromDate, toDate)
 
         elif query == "subjobs_applications":
             jobid = int(qsDict['taskmonid'])
-            json = create_subjobs_graphics(
+            response = create_subjobs_graphics(
                 jobid, 'application', fromDate, toDate)
 
         elif query == "subjobs_actualCE":
             jobid = int(qsDict['taskmonid'])
-            json = create_subjobs_graphics(jobid, 'actualCE', fromDate, toDate)
+            response = create_subjobs_graphics(jobid, 'actualCE', fromDate, toDate)
 
         elif query == "subjobs_accumulate":
             jobid = int(qsDict['taskmonid'])
-            json = create_subjobs_graphics(
+            response = create_subjobs_graphics(
                 jobid, 'accumulate', fromDate, toDate)
 
         elif query == "testaccumulation":
 
-            json = "{\"totaljobs\": [[{\"TOTAL\": 92}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"procevents\": [[{\"NEventsPerJob\": 0}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"succjobs\": [[{\"TOTAL\": 92, \"TOTALEVENTS\": 1365491}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"meta\": {\"genactivity\": null, \"submissiontype\": null, \"site\": null, \"ce\": null, \"dataset\": null, \"submissiontool\": null, \"fail\": null, \"check\": [\"submitted\"], \"date1\": [\"2010-09-23 15:56:27\"], \"date2\": [\"2010-09-24 15:56:27\"], \"application\": null, \"rb\": null, \"status\": null, \"taskmonid\": [\"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"], \"args\": \"<![CDATA[taskmonid=ganga%3Ae60e5904-e63e-432f-b3df-63ca833cf080%3A]]>\", \"grid\": null, \"user\": null, \"task\": null, \"unixname\": null, \"sortby\": [\"activity\"], \"activity\": null, \"exitcode\": null}, \"allfinished\": [[{\"finished\": \"2010-08-13 14:02:18\", \"Events\": 2000}, {\"finished\": \"2010-08-13 14:39:13\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:39:25\", \"Events\": 14350}, {\"finished\": \"2010-08-13 14:39:58\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:40:03\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:18\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:40:19\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:40:37\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:38\", \"Events\": 14994}, {\"finished\": \"2010-08-13 14:40:52\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:53\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:40:54\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:25\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:27\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:29\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:32\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:32\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:34\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:35\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:43\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:44\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:41:45\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:53\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:54\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:59\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:03\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:03\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:42:06\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:07\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:42:14\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:14\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:42:27\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:27\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:42:28\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:38\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:53\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:42:54\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:57\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:57\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:42:58\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:58\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:43:01\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:02\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:11\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:15\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:15\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:17\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:22\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:23\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:24\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:25\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:28\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:32\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:36\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:36\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:39\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:43\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:56\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:57\", \"Events\": 14299}, {\"finished\": \"2010-08-13 14:43:57\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:04\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:15\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:15\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:34\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:36\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:45:03\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:45:10\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:45:25\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:45:26\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:45:45\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:45:50\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:45:50\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:46:01\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:46:07\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:46:14\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:46:23\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:46:26\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:46:30\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:47:09\", \"Events\": 14999}, {\"finished\": \"2010-08-13 15:57:09\", \"Events\": 14996}, {\"finished\": \"2010-08-13 16:17:45\", \"Events\": 14997}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"lastfinished\": [[{\"finished\": \"2010-08-13 16:17:45\"}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"firststarted\": [[{\"started\": \"2010-08-13 13:51:21\"}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}]}"
+            response = "{\"totaljobs\": [[{\"TOTAL\": 92}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"procevents\": [[{\"NEventsPerJob\": 0}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"succjobs\": [[{\"TOTAL\": 92, \"TOTALEVENTS\": 1365491}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"meta\": {\"genactivity\": null, \"submissiontype\": null, \"site\": null, \"ce\": null, \"dataset\": null, \"submissiontool\": null, \"fail\": null, \"check\": [\"submitted\"], \"date1\": [\"2010-09-23 15:56:27\"], \"date2\": [\"2010-09-24 15:56:27\"], \"application\": null, \"rb\": null, \"status\": null, \"taskmonid\": [\"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"], \"args\": \"<![CDATA[taskmonid=ganga%3Ae60e5904-e63e-432f-b3df-63ca833cf080%3A]]>\", \"grid\": null, \"user\": null, \"task\": null, \"unixname\": null, \"sortby\": [\"activity\"], \"activity\": null, \"exitcode\": null}, \"allfinished\": [[{\"finished\": \"2010-08-13 14:02:18\", \"Events\": 2000}, {\"finished\": \"2010-08-13 14:39:13\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:39:25\", \"Events\": 14350}, {\"finished\": \"2010-08-13 14:39:58\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:40:03\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:18\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:40:19\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:40:37\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:38\", \"Events\": 14994}, {\"finished\": \"2010-08-13 14:40:52\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:53\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:40:54\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:25\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:27\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:29\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:32\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:32\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:34\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:35\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:43\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:44\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:41:45\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:53\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:54\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:59\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:03\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:03\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:42:06\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:07\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:42:14\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:14\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:42:27\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:27\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:42:28\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:38\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:53\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:42:54\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:57\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:57\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:42:58\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:58\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:43:01\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:02\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:11\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:15\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:15\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:17\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:22\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:23\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:24\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:25\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:28\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:32\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:36\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:36\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:39\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:43\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:56\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:57\", \"Events\": 14299}, {\"finished\": \"2010-08-13 14:43:57\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:04\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:15\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:15\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:34\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:36\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:45:03\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:45:10\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:45:25\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:45:26\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:45:45\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:45:50\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:45:50\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:46:01\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:46:07\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:46:14\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:46:23\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:46:26\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:46:30\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:47:09\", \"Events\": 14999}, {\"finished\": \"2010-08-13 15:57:09\", \"Events\": 14996}, {\"finished\": \"2010-08-13 16:17:45\", \"Events\": 14997}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"lastfinished\": [[{\"finished\": \"2010-08-13 16:17:45\"}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"firststarted\": [[{\"started\": \"2010-08-13 13:51:21\"}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}]}"
+
+        jsonp_function = qsDict['jsonp_callback']
+        result = ("%s(%s);" % (jsonp_function, response)).encode()
+
+        # the job tables compress very well, so it is worth it for all but the smallest answers
+        compress = accept_gzip and len(result) > compress_threshold
+        if compress:
+            result = gzip.compress(result, compresslevel=5)
 
         self.send_response(200)
         self.send_header('Content-Type', 'text/html')
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(result)))
         self.end_headers()
 
-        jsonp_function = qsDict['jsonp_callback']
-        result = "%s(%s);" % (jsonp_function, json)
         self.wfile.write(result)
 
         return
 
-jobs_dictionary = {}
+    def send_metrics(self):
+        """ Answer /metrics with the metrics in the Prometheus text format, or as JSON with ?format=json """
+        from GangaCore.Utility.Metrics import metrics
+        if 'format=json' in self.path:
+            result = json.dumps(metrics.snapshot(), sort_keys=True).encode()
+            content_type = 'application/json'
+        else:
+            result = metrics.prometheus().encode()
+            content_type = 'text/plain; version=0.0.4'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(result)))
+        self.end_headers()
+        self.wfile.write(result)
+
+snapshot = JobsSnapshot()
 httpServerHost = 'localhost'
 httpServerStartTryPort = 8080
 
@@ -1,57 +1,80 @@
+import importlib
+import time
+
 import GangaCore.Utility.logging
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.Plugin import allPlugins
 logger = GangaCore.Utility.logging.getLogger()
 
-logger.debug("Loading IApplication")
-import GangaCore.GPIDev.Adapters.IApplication
-logger.debug("Loading IBackend")
-import GangaCore.GPIDev.Adapters.IBackend
-logger.debug("Loading ISplitter")
-import GangaCore.GPIDev.Adapters.ISplitter
-logger.debug("Loading IMerger")
-import GangaCore.GPIDev.Adapters.IMerger
-
-logger.debug("Loading GangaList")
-import GangaCore.GPIDev.Lib.GangaList
-logger.debug("Loading File")
-import GangaCore.GPIDev.Lib.File
-logger.debug("Loading Job")
-import GangaCore.GPIDev.Lib.Job
-
-logger.debug("Loading Mergers")
-import GangaCore.Lib.Mergers
-logger.debug("Loading Splitters")
-import GangaCore.Lib.Splitters
-
-logger.debug("Loading Executable")
-import GangaCore.Lib.Executable
-logger.debug("Loading Root")
-import GangaCore.Lib.Root
-logger.debug("Loading Notebook")
-import GangaCore.Lib.Notebook
-
-logger.debug("Loading LocalHost")
-import GangaCore.Lib.Localhost
-logger.debug("Loading LCG")
-import GangaCore.Lib.LCG
-logger.debug("Loading Condor")
-import GangaCore.Lib.Condor
-logger.debug("Loading Interactive")
-import GangaCore.Lib.Interactive
-logger.debug("Loading Batch")
-import GangaCore.Lib.Batch
-logger.debug("Loading Remote")
-import GangaCore.Lib.Remote
-
-logger.debug("Loading Tasks")
-import GangaCore.GPIDev.Lib.Tasks
-
-
-logger.debug("Loading Checkers")
-import GangaCore.Lib.Checkers
-logger.debug("Loading Notifier")
-import GangaCore.Lib.Notifier
-
-logger.debug("Loading virtualization classes")
-import GangaCore.Lib.Virtualization
+# The packages needed by every session, imported in this order at startup
+core_plugins = ['GangaCore.GPIDev.Adapters.IApplication',
+                'GangaCore.GPIDev.Adapters.IBackend',
+                'GangaCore.GPIDev.Adapters.ISplitter',
+                'GangaCore.GPIDev.Adapters.IMerger',
+                'GangaCore.GPIDev.Lib.GangaList',
+                'GangaCore.GPIDev.Lib.File',
+                'GangaCore.GPIDev.Lib.Job',
+                'GangaCore.Lib.Mergers',
+                'GangaCore.Lib.Splitters',
+                'GangaCore.Lib.Executable',
+                'GangaCore.Lib.Localhost',
+                'GangaCore.GPIDev.Lib.Tasks']
+
+# The packages which are only imported when one of their plugins is first used: when it is
+# constructed from the GPI, loaded from the repository or looked for in allPlugins.
+# Each package is listed with the (category, name) of every plugin it registers.
+lazy_plugins = {'GangaCore.Lib.Root': [('applications', 'Root')],
+                'GangaCore.Lib.Notebook': [('applications', 'Notebook')],
+                'GangaCore.Lib.LCG': [('backends', 'LCG'), ('backends', 'ARC'), ('backends', 'CREAM'),
+                                      ('LCGRequirements', 'LCGRequirements'),
+                                      ('GridFileIndex', 'GridFileIndex'), ('GridFileIndex', 'GridftpFileIndex'),
+                                      ('GridFileIndex', 'LCGFileIndex'), ('GridSandboxCache', 'GridSandboxCache'),
+                                      ('GridSandboxCache', 'GridftpSandboxCache'), ('GridSandboxCache', 'LCGSandboxCache')],
+                'GangaCore.Lib.Condor': [('backends', 'Condor'), ('condor_requirements', 'CondorRequirements')],
+                'GangaCore.Lib.Interactive': [('backends', 'Interactive')],
+                'GangaCore.Lib.Batch': [('backends', 'LSF'), ('backends', 'PBS'), ('backends', 'SGE'), ('backends', 'Slurm')],
+                'GangaCore.Lib.Remote': [('backends', 'Remote')],
+                'GangaCore.Lib.Simulated': [('backends', 'SimulatedBackend')],
+                'GangaCore.Lib.Checkers': [('postprocessor', 'CustomChecker'), ('postprocessor', 'FileChecker'),
+                                           ('postprocessor', 'RootFileChecker')],
+                'GangaCore.Lib.Notifier': [('postprocessor', 'Notifier')],
+                'GangaCore.Lib.Virtualization': [('virtualization', 'Docker'), ('virtualization', 'Singularity')],
+                }
+
+# {module: seconds} spent importing each package at startup
+import_times = {}
+
+
+def _timed_import(module_name):
+    logger.debug("Loading %s" % module_name)
+    start = time.time()
+    importlib.import_module(module_name)
+    import_times[module_name] = time.time() - start
+
+
+def importReport():
+    """
+    Return a table of the time spent importing each plugin package, slowest first,
+    including the lazy packages imported since startup
+    """
+    times = dict(import_times)
+    times.update(allPlugins.loadTimes())
+    lines = ['%9.1f ms  %s%s' % (1000. * t, m, '' if m in import_times else ' (on first use)')
+             for m, t in sorted(times.items(), key=lambda x: -x[1])]
+    lines.append('%9.1f ms  total' % (1000. * sum(times.values())))
+    return '\n'.join(lines)
+
+
+for module_name in core_plugins:
+    _timed_import(module_name)
+
+if getConfig('Configuration')['LazyLoadPlugins']:
+    for module_name, plugins in lazy_plugins.items():
+        for category, name in plugins:
+            allPlugins.declare(module_name, category, name)
+else:
+    for module_name in lazy_plugins:
+        _timed_import(module_name)
 
 logger.debug("Finished Runtime.plugins")
+logger.debug("Plugin import times:\n%s" % importReport())
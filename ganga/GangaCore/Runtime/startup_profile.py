@@ -0,0 +1,105 @@
+"""
+Timing of the phases of the Ganga startup.
+
+The bootstrap wraps each of its phases in startup_profile.phase(name). The wall time, the CPU time and the
+number of read and write calls made by the process are recorded for every phase. This costs a few
+microseconds per phase so it is always done. With 'ganga --profile-startup' the record is written as JSON
+under <gangadir>/logs/startup once the startup is complete. Use scripts/compare_startup_profiles.py to
+compare these files between runs.
+"""
+
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+
+def _io_counts():
+    """ Return the number of read and write calls made so far by this process """
+    try:
+        with open('/proc/self/io') as io_file:
+            fields = dict(line.split(':') for line in io_file)
+        return int(fields['syscr']), int(fields['syscw'])
+    except (IOError, OSError, KeyError, ValueError):
+        # block operations are the best available without /proc
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_inblock, usage.ru_oublock
+
+
+def _sample():
+    reads, writes = _io_counts()
+    return time.time(), time.process_time(), reads, writes
+
+
+class StartupProfile(object):
+
+    """ Record of the startup phases of this process """
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = time.time()
+        self.phases = []
+        self.written_to = None
+        self._depth = 0
+
+    @contextmanager
+    def phase(self, name):
+        """ Time the code run in this context as the startup phase 'name' """
+        start = _sample()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            end = _sample()
+            self.phases.append({'name': name,
+                                'depth': self._depth,
+                                'start': start[0] - self.start_time,
+                                'wall': end[0] - start[0],
+                                'cpu': end[1] - start[1],
+                                'read_calls': end[2] - start[2],
+                                'write_calls': end[3] - start[3]})
+
+    def report(self):
+        """ Return the profile as a JSON-serialisable dict """
+        from GangaCore import _gangaVersion
+        from GangaCore.Runtime import plugins
+        from GangaCore.Utility.Plugin import allPlugins
+        import_times = dict(plugins.import_times)
+        import_times.update(allPlugins.loadTimes())
+        return {'version': _gangaVersion,
+                'time': self.start_time,
+                'total': time.time() - self.start_time,
+                'phases': sorted(self.phases, key=lambda p: p['start']),
+                'plugin_imports': import_times}
+
+    def finish(self):
+        """
+        Write the profile, if enabled, once the startup is complete. Only the first call writes anything.
+        Returns the name of the file written or None
+        """
+        if not self.enabled or self.written_to is not None:
+            return None
+
+        from GangaCore.Utility.Config import getConfig
+        from GangaCore.Utility.logging import getLogger
+        logger = getLogger()
+
+        directory = os.path.join(getConfig('Configuration')['gangadir'], 'logs', 'startup')
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            file_name = os.path.join(directory, time.strftime('startup-%Y%m%d-%H%M%S.json', time.localtime(self.start_time)))
+            with open(file_name, 'w') as out:
+                json.dump(self.report(), out, indent=1)
+        except (IOError, OSError) as err:
+            logger.warning('Could not write the startup profile: %s' % err)
+            return None
+
+        self.written_to = file_name
+        logger.info('Startup profile written to %s' % file_name)
+        return file_name
+
+
+startup_profile = StartupProfile()
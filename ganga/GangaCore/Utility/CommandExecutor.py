@@ -0,0 +1,262 @@
+"""
+Run the command line tools of the grid middleware (gLite, CREAM, ARC, ...) without one blocked thread per command.
+
+The commands are asyncio subprocesses of one event loop running in a background thread. Any thread can hand
+commands over to it and wait for their results:
+
+    executor = getExecutor()
+    result = executor.run(Command('arcstat -i ids', env=shell.env, endpoint='ce1.example.org', timeout=300))
+    results = executor.run_many([Command(...), Command(...)])
+
+At most max_per_endpoint commands run at the same time for an endpoint (a CE, a WMS, ...) so that many jobs on one
+server do not flood it while the other servers are still queried in parallel. A command is killed, with its
+children, when it runs for longer than its timeout. It is run again, after an exponential backoff, when it timed
+out or exited with a status which is not in allowed_exit, at most retries times. parse is called with the result
+of the last attempt and its return value is kept as result.parsed.
+"""
+
+import asyncio
+import atexit
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+from GangaCore.Utility.Metrics import metrics
+
+logger = getLogger()
+
+command_seconds = metrics.histogram('grid_command_seconds', 'Time to run one middleware command, retries included')
+command_retries = metrics.counter('grid_command_retries', 'Middleware commands run again after a failure or a timeout')
+command_timeouts = metrics.counter('grid_command_timeouts', 'Middleware commands killed at their timeout')
+
+
+class Command(object):
+
+    """ A command line to run in a shell and how to run it """
+
+    def __init__(self, cmd, env=None, endpoint=None, timeout=None, retries=0, allowed_exit=(0,), parse=None):
+        """
+        Args:
+            cmd (str): the command, run by /bin/sh with its stderr merged into its stdout as Shell.cmd1 does
+            env (dict): the environment of the command, e.g. the one of the grid shell. Default the one of Ganga
+            endpoint (str): the server the command talks to, which bounds the commands running at the same time
+            timeout (float): seconds after which the command is killed, None for no limit
+            retries (int): how many times the command is run again if it fails or times out
+            allowed_exit (list): the exit statuses which are not a failure
+            parse (callable): called with the CommandResult, its return value is stored as result.parsed
+        """
+        self.cmd = cmd
+        self.env = env
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.retries = retries
+        self.allowed_exit = allowed_exit
+        self.parse = parse
+
+    def __repr__(self):
+        return 'Command(%r, endpoint=%r)' % (self.cmd, self.endpoint)
+
+
+class CommandResult(object):
+
+    """ The outcome of the last attempt of a command """
+
+    def __init__(self, command, rc, output, timed_out, attempts):
+        self.command = command
+        self.rc = rc
+        self.output = output
+        self.timed_out = timed_out
+        self.attempts = attempts
+        self.parsed = None
+        # seconds taken by all the attempts
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return not self.timed_out and self.rc in self.command.allowed_exit
+
+    def __repr__(self):
+        return 'CommandResult(rc=%r, timed_out=%r, attempts=%r)' % (self.rc, self.timed_out, self.attempts)
+
+
+class _ThreadedChildWatcher(asyncio.AbstractChildWatcher):
+
+    """
+    Waits for each child process in a thread of its own, as the default watcher of Python 3.8 does.
+
+    The watchers of Python 3.6 and 3.7 must be attached to the loop from the main thread, so they cannot serve the
+    loop of the executor, which runs in a background thread and may be started from any thread.
+    """
+
+    def add_child_handler(self, pid, callback, *args):
+        threading.Thread(target=self._wait, args=(pid, callback, args), name='GridCommandWaiter-%d' % pid,
+                         daemon=True).start()
+
+    @staticmethod
+    def _wait(pid, callback, args):
+        try:
+            _, status = os.waitpid(pid, 0)
+        except ChildProcessError:
+            # reaped by someone else
+            returncode = 255
+        else:
+            if os.WIFSIGNALED(status):
+                returncode = -os.WTERMSIG(status)
+            elif os.WIFEXITED(status):
+                returncode = os.WEXITSTATUS(status)
+            else:
+                returncode = status
+        # the callback of the loop hands the return code over to the loop thread safely
+        callback(pid, returncode, *args)
+
+    def remove_child_handler(self, pid):
+        return True
+
+    def attach_loop(self, loop):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _install_child_watcher():
+    """ Let the loops of any thread run subprocesses before Python 3.8 """
+    if sys.version_info >= (3, 8):
+        return
+    if not isinstance(getattr(asyncio.get_event_loop_policy(), '_watcher', None), _ThreadedChildWatcher):
+        asyncio.set_child_watcher(_ThreadedChildWatcher())
+
+
+class CommandExecutor(object):
+
+    """ An event loop in a background thread running the commands given to it by the other threads """
+
+    def __init__(self, max_per_endpoint=4, backoff=1.0, max_backoff=60.0):
+        self.max_per_endpoint = max_per_endpoint
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # {endpoint: semaphore}, only used from the loop
+        self._semaphores = {}
+        _install_child_watcher()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='GridCommandExecutor', daemon=True)
+        self._thread.start()
+
+    def submit(self, command):
+        """ Start a command and return the concurrent.futures.Future of its CommandResult """
+        return asyncio.run_coroutine_threadsafe(self._run(command), self._loop)
+
+    def run(self, command):
+        """ Run a command and return its CommandResult """
+        return self.submit(command).result()
+
+    def run_many(self, commands):
+        """ Run the commands at the same time, within the bounds of their endpoints, and return their results in order """
+        futures = [self.submit(command) for command in commands]
+        return [future.result() for future in futures]
+
+    def stop(self):
+        """ Stop the loop. The commands still running are left to finish on their own """
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+    def _semaphore(self, endpoint):
+        if endpoint not in self._semaphores:
+            self._semaphores[endpoint] = asyncio.Semaphore(self.max_per_endpoint)
+        return self._semaphores[endpoint]
+
+    def _delay(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+
+    async def _run(self, command):
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            async with self._semaphore(command.endpoint):
+                rc, output, timed_out = await self._attempt(command)
+            result = CommandResult(command, rc, output, timed_out, attempt)
+            if result.ok or attempt > command.retries:
+                break
+            delay = self._delay(attempt)
+            logger.debug('%s failed (exit status %s%s), trying again in %ss', command.cmd, rc,
+                         ', timed out' if timed_out else '', delay)
+            command_retries.inc()
+            await asyncio.sleep(delay)
+
+        result.seconds = time.perf_counter() - start
+        command_seconds.observe(result.seconds)
+        if not result.ok:
+            logger.warning('exit status [%s] of command %s', rc, command.cmd)
+        if command.parse is not None:
+            result.parsed = command.parse(result)
+        return result
+
+    async def _attempt(self, command):
+        """ Run the command once, returns (exit status, output, timed out) """
+        cwd = os.getcwd() if os.path.exists(os.getcwd()) else tempfile.gettempdir()
+        try:
+            # a session of its own, so that the children of the command are killed with it
+            process = await asyncio.create_subprocess_exec('/bin/sh', '-c', command.cmd, env=command.env, cwd=cwd,
+                                                           stdin=asyncio.subprocess.DEVNULL,
+                                                           stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.STDOUT,
+                                                           start_new_session=True)
+        except OSError as err:
+            logger.warning('Problem with shell command: %s, %s', err.errno, err.strerror)
+            return 255, '', False
+
+        # the output is read on the side, so that what was written before a timeout is kept
+        reading = asyncio.ensure_future(process.stdout.read())
+        timed_out = False
+        try:
+            await asyncio.wait_for(process.wait(), command.timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Command interrupted - timeout %ss reached: %s', command.timeout, command.cmd)
+            command_timeouts.inc()
+            timed_out = True
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            await process.wait()
+        stdout = await reading
+        return process.returncode, stdout.decode('utf-8', 'replace'), timed_out
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def getExecutor():
+    """ Return the executor of this session, started on first use with the settings of the [LCG] section """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            config = getConfig('LCG')
+            _executor = CommandExecutor(max_per_endpoint=config['CommandsPerEndpoint'],
+                                        backoff=config['CommandRetryBackoff'])
+        return _executor
+
+
+def stopExecutor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.stop()
+            _executor = None
+
+
+atexit.register(stopExecutor)
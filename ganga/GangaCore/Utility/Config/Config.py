@@ -68,6 +68,16 @@ The  effective value  takes  into account  default,  session and  user
 settings  and  may change  at  runtime.  In  GPI  users  only get  the
 effective values and may only set values at the user level.
 
+config[...] reads from a compiled snapshot of the effective values of the
+section (see getSnapshot()), so it is cheap enough to be used in code which
+runs often. The snapshot is replaced whenever an option of the section is
+changed at any level. To be told about such changes:
+
+def changed(opt,val):
+    print('the effective value is now',val)
+
+config.addChangeListener(changed)
+
 You  may also attach  the callback  handlers at  the session  and user
 level.     Pre-process   handlers   may    modify   what    has   been
 set. Post-process handlers may be used to trigger extra actions.
@@ -92,9 +102,12 @@ There is a GPI wrapper in GangaCore.GPIDev.Lib.Config which:
 
 import os
 import re
+import threading
 import traceback
 from collections import defaultdict
+from contextlib import contextmanager
 from functools import reduce
+from types import MappingProxyType
 
 from GangaCore.Core.exceptions import GangaException
 
@@ -182,19 +195,47 @@ def makeConfig(name, docstring, **kwds):
     Create a config package and attach metadata to it. makeConfig() should be called once for each package.
     """
 
-    if _after_bootstrap:
-        raise ConfigError('attempt to create a configuration section [%s] after bootstrap' % name)
+    with _config_lock:
+        if _after_bootstrap:
+            raise ConfigError('attempt to create a configuration section [%s] after bootstrap' % name)
+
+        try:
+            c = allConfigs[name]
+            c.docstring = docstring
+            for k in kwds:
+                setattr(c, k, kwds[k])
+        except KeyError:
+            c = allConfigs[name] = PackageConfig(name, docstring, **kwds)
+
+        c._config_made = True
+        return c
 
-    try:
-        c = allConfigs[name]
-        c.docstring = docstring
-        for k in kwds:
-            setattr(c, k, kwds[k])
-    except KeyError:
-        c = allConfigs[name] = PackageConfig(name, docstring, **kwds)
 
-    c._config_made = True
-    return c
+@contextmanager
+def lateSections():
+    """
+    Let the code run in this context make configuration sections and options after bootstrap, as the
+    plugin modules imported on first use would have done at startup. Yields a list which holds the
+    names of the sections made once the context is left. The config lock is held throughout, so that
+    other threads do not see the configuration as open.
+    """
+    global _after_bootstrap
+    with _config_lock:
+        before = set(allConfigs)
+        after_bootstrap, _after_bootstrap = _after_bootstrap, False
+        made = []
+        try:
+            yield made
+        finally:
+            _after_bootstrap = after_bootstrap
+            made.extend(name for name in allConfigs if name not in before)
+
+
+def setAfterBootstrap():
+    """ Forbid new configuration sections and options, once the GPI proxies for the configuration are made """
+    global _after_bootstrap
+    with _config_lock:
+        _after_bootstrap = True
 
 
 class ConfigOption(object):
@@ -212,7 +253,10 @@ class ConfigOption(object):
     The configuration option may also define the session_value and default_value. The value property gives the effective value.
     """
 
-    __slots__ = ('name', 'hidden', 'cfile', 'examples', 'filter', 'typelist', 'hasModified', 'default_value', 'docstring', 'type', 'user_value', 'session_value', 'gangarc_value')
+    __slots__ = ('name', 'hidden', 'cfile', 'examples', 'filter', 'typelist', 'hasModified', 'default_value', 'docstring', 'type', 'user_value', 'session_value', 'gangarc_value', '_section')
+
+    # the attributes which the effective value is made of
+    _value_attributes = ('user_value', 'gangarc_value', 'session_value', 'default_value')
 
     def __init__(self, name):
         self.name = name
@@ -358,6 +402,21 @@ class ConfigOption(object):
         super(ConfigOption, self).__setattr__(name, value)
         super(ConfigOption, self).__setattr__('hasModified', True)
 
+        if name in ConfigOption._value_attributes:
+            self._valueChanged()
+
+    def __delattr__(self, name):
+        super(ConfigOption, self).__delattr__(name)
+
+        if name in ConfigOption._value_attributes:
+            self._valueChanged()
+
+    def _valueChanged(self):
+        """ Tell the section this option belongs to (if any) that the effective value may have changed """
+        section = getattr(self, '_section', None)
+        if section is not None:
+            section._optionChanged(self.name)
+
     def check_defined(self):
         return hasattr(self, 'default_value')
 
@@ -424,6 +483,8 @@ class ConfigOption(object):
 
 # indicate if the GPI proxies for the configuration have been created
 _after_bootstrap = False
+# held while _after_bootstrap is checked or changed
+_config_lock = threading.RLock()
 
 # Scope used by eval when reading-in the configuration.
 # Symbols defined in this scope will be correctly evaluated. For example, File class adds itself here.
@@ -431,6 +492,9 @@ _after_bootstrap = False
 # repository.
 config_scope = {}
 
+# marks an option without an effective value in a snapshot comparison
+_no_value = object()
+
 
 class PackageConfig(object):
 
@@ -454,7 +518,8 @@ class PackageConfig(object):
 
     """
 
-    __slots__ = ('name', 'options', 'docstring', 'hidden', 'cfile', '_user_handlers', '_session_handlers', 'is_open', '_config_made', 'hasModified', '__dict__')
+    __slots__ = ('name', 'options', 'docstring', 'hidden', 'cfile', '_user_handlers', '_session_handlers', 'is_open', '_config_made', 'hasModified',
+                 '_snapshot', '_snapshot_lock', '_change_listeners', '__dict__')
 
     def __init__(self, name, docstring, **meta):
         """ Arguments:
@@ -484,6 +549,11 @@ class PackageConfig(object):
 
         self.hasModified = False
 
+        # compiled effective values, built on the first read and swapped for a new one on every change
+        self._snapshot = None
+        self._snapshot_lock = threading.RLock()
+        self._change_listeners = []
+
     def _addOpenOption(self, name, value):
         self.addOption(name, value, "", override=True)
 
@@ -494,14 +564,78 @@ class PackageConfig(object):
 
     def __getitem__(self, o):
         """ Get the effective value of option o. """
-        return self.getEffectiveOption(o)
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.getSnapshot()
+        try:
+            return snapshot[o]
+        except KeyError:
+            # unknown options and options without any value are reported by getEffectiveOption
+            return self.getEffectiveOption(o)
+
+    def getSnapshot(self):
+        """ Return a read-only mapping of the effective values of all the options of this section.
+        The mapping itself never changes: a new one replaces it when any option is modified. """
+        with self._snapshot_lock:
+            if self._snapshot is None:
+                values = {}
+                for name, option in list(self.options.items()):
+                    object.__setattr__(option, '_section', self)
+                    try:
+                        values[name] = option.value
+                    except AttributeError:
+                        pass
+                self._snapshot = MappingProxyType(values)
+            return self._snapshot
+
+    def _attachOption(self, option):
+        """ Add an option to this section so that its changes are seen by the snapshot """
+        self.options[option.name] = option
+        object.__setattr__(option, '_section', self)
+        self._optionChanged(option.name)
+
+    def _optionChanged(self, name):
+        """ Swap the snapshot for one holding the current effective value of the option name and notify the listeners """
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                # nothing has been read yet, the snapshot is compiled on the first read
+                return
+            values = dict(snapshot)
+            old_value = values.pop(name, _no_value)
+            option = self.options.get(name)
+            if option is not None:
+                try:
+                    values[name] = option.value
+                except AttributeError:
+                    pass
+            new_value = values.get(name, _no_value)
+            self._snapshot = MappingProxyType(values)
+
+        if new_value is old_value or (old_value is not _no_value and new_value is not _no_value and new_value == old_value):
+            return
+        for listener in self._change_listeners:
+            try:
+                listener(name, new_value if new_value is not _no_value else None)
+            except Exception as err:
+                getLogger().warning('Error in the change listener of option [%s]%s: %s', self.name, name, err)
+
+    def addChangeListener(self, listener):
+        """ Call listener(name, value) each time the effective value of an option of this section changes """
+        self.getSnapshot()
+        self._change_listeners.append(listener)
+
+    def removeChangeListener(self, listener):
+        """ Stop calling a listener added with addChangeListener() """
+        self._change_listeners.remove(listener)
 
     def addOption(self, name, default_value, docstring, override=False, typelist=None, **meta):
         """
         Add a new option to the configuration.
         """
-        if _after_bootstrap and not self.is_open:
-            raise ConfigError('attempt to add a new option [%s]%s after bootstrap' % (self.name, name))
+        with _config_lock:
+            if _after_bootstrap and not self.is_open:
+                raise ConfigError('attempt to add a new option [%s]%s after bootstrap' % (self.name, name))
 
         # has the option already been made
         try:
@@ -515,7 +649,7 @@ class PackageConfig(object):
             return
 
         option.defineOption(default_value, docstring, typelist, **meta)
-        self.options[option.name] = option
+        self._attachOption(option)
 
         # is it in the list of unknown options from the standard config files
         try:
@@ -591,8 +725,8 @@ class PackageConfig(object):
         try:
             this_opt = self.options[name]
         except KeyError:
-            self.options[name] = ConfigOption(name)
-            this_opt = self.options[name]
+            this_opt = ConfigOption(name)
+            self._attachOption(this_opt)
 
         this_opt.setSessionValue(value)
 
@@ -748,9 +882,10 @@ class PackageConfig(object):
         self._gangarc_handlers.append((pre, post))
 
     def deleteUndefinedOptions(self):
-        for o in self.options.keys():
+        for o in list(self.options.keys()):
             if not self.options[o].check_defined():
                 del self.options[o]
+                self._optionChanged(o)
 
 try:
     import configparser
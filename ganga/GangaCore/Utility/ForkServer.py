@@ -0,0 +1,230 @@
+"""
+The fork server used by GangaCore.Utility.execute to run commands.
+
+This script is started in the environment the commands run in, with the python found in that environment:
+
+    python ForkServer.py <socket fd>
+
+It only uses the standard library, as it may run with a different python than Ganga. It reads requests from the
+socket and forks a child for each of them, so a python command starts without the cost of a new interpreter and
+the environment is not passed over again for each command. Several commands can run at the same time: the server
+is a single thread waiting on the socket and on the pipes of all its children.
+
+The requests and the answers are pickled dictionaries, each preceded by its length:
+
+    {'id': n, 'command': str, 'shell': bool, 'python_setup': str, 'cwd': str or None, 'update_env': bool}
+    {'id': n, 'cancel': True}
+
+A command is answered with
+
+    {'id': n, 'returncode': int, 'stdout': str, 'stderr': str, 'output': bytes, 'env': dict or None}
+
+where output is the stream of objects pickled by output() in a python command and env holds the variables which
+the command has changed or added, if update_env was requested. A cancelled command is killed and not answered.
+The server stops, killing the commands still running, when the socket is closed.
+"""
+
+import sys
+
+# Run as a script the path starts with this directory, where GangaCore/Utility/logging and the like would hide the
+# modules of the standard library. The commands get the path of 'python -', which starts with the current directory.
+if __name__ == '__main__':
+    sys.path[0] = ''
+
+import fcntl
+import os
+import pickle
+import select
+import signal
+import socket
+import struct
+import traceback
+
+header = struct.Struct('!I')
+
+# the file descriptors of the pickled output and of the environment in a child
+OUTPUT_FD = 3
+ENV_FD = 4
+
+# appended to a shell command to write its environment, keeping its exit status
+shell_env_dump = '\n__ganga_status=$?\nenv -0 >&%d\nexit $__ganga_status\n' % ENV_FD
+
+# variables set by the shell itself, which are not sent back as changes of the environment, else each update
+# would give a new environment and so a new server
+shell_variables = ('_', 'SHLVL')
+
+
+def send(sock, message):
+    data = pickle.dumps(message, 2)
+    sock.sendall(header.pack(len(data)) + data)
+
+
+def receive(buffer):
+    """ Return the messages complete in the buffer and what is left of it """
+    messages = []
+    while len(buffer) >= header.size:
+        (length,) = header.unpack_from(buffer)
+        if len(buffer) < header.size + length:
+            break
+        messages.append(pickle.loads(buffer[header.size:header.size + length]))
+        buffer = buffer[header.size + length:]
+    return messages, buffer
+
+
+class Child(object):
+
+    """ A forked command and what it has written so far """
+
+    def __init__(self, request, pid, fds):
+        self.request = request
+        self.pid = pid
+        # {read end of a pipe: name of the stream}
+        self.fds = fds
+        self.data = dict((name, []) for name in fds.values())
+
+    def read(self, name):
+        return b''.join(self.data[name])
+
+
+def run_python(request):
+    """ Run a python command in the child the way python_wrapper does, writing the objects passed to output() """
+    stream = os.fdopen(OUTPUT_FD, 'wb')
+
+    def output(data):
+        pickle.dump(data, stream, 2)
+
+    local_ns = {'pickle': pickle,
+                'PICKLE_STREAM': stream,
+                'output': output}
+    try:
+        exec(request['python_setup'].strip() + ' \n' + request['command'].strip(), local_ns)
+    except:
+        pickle.dump(traceback.format_exc(), stream, 2)
+    stream.close()
+
+    if request['update_env']:
+        with os.fdopen(ENV_FD, 'wb') as env_stream:
+            pickle.dump(dict(os.environ), env_stream, 2)
+
+
+def start(request, server_fds):
+    """ Fork the child running the command """
+    pipes = [os.pipe() for _ in range(4)]
+    pid = os.fork()
+    if pid == 0:
+        status = 127
+        try:
+            os.setsid()
+            # the write ends are moved out of the way of the descriptors they are copied to
+            write_ends = [fcntl.fcntl(w, fcntl.F_DUPFD, 10) for r, w in pipes]
+            for fd in server_fds + [fd for pipe in pipes for fd in pipe]:
+                os.close(fd)
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            if devnull != 0:
+                os.dup2(devnull, 0)
+                os.close(devnull)
+            for target, w in zip((1, 2, OUTPUT_FD, ENV_FD), write_ends):
+                os.dup2(w, target)
+            for fd in write_ends:
+                os.close(fd)
+
+            if request['cwd']:
+                os.chdir(request['cwd'])
+            if request['shell']:
+                command = request['command']
+                if request['update_env']:
+                    command += shell_env_dump
+                os.execvp('bash', ['bash', '-c', command])
+            run_python(request)
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    for r, w in pipes:
+        os.close(w)
+    return Child(request, pid, dict(zip([r for r, w in pipes], ['stdout', 'stderr', 'output', 'env'])))
+
+
+def changed_env(child, base_env):
+    """ Return the variables changed or added by the command """
+    data = child.read('env')
+    if not data:
+        return None
+    if child.request['shell']:
+        env = dict(item.split('=', 1) for item in data.decode('utf-8', 'replace').split('\0') if '=' in item)
+    else:
+        env = pickle.loads(data)
+    return dict((key, value) for key, value in env.items() if base_env.get(key) != value and key not in shell_variables)
+
+
+def finish(sock, child, base_env):
+    """ Reap the child and send its results """
+    _, status = os.waitpid(child.pid, 0)
+    send(sock, {'id': child.request['id'],
+                'returncode': os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status),
+                'stdout': child.read('stdout').decode('utf-8', 'replace'),
+                'stderr': child.read('stderr').decode('utf-8', 'replace'),
+                'output': child.read('output'),
+                'env': changed_env(child, base_env) if child.request['update_env'] else None})
+
+
+def kill(child):
+    try:
+        os.killpg(child.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def serve(sock):
+    base_env = dict(os.environ)
+    # {read end of a pipe: child}
+    pipes = {}
+    # {request id: child}
+    running = {}
+    buffer = b''
+
+    while True:
+        readable, _, _ = select.select([sock] + list(pipes), [], [])
+        for fd in readable:
+            if fd is sock:
+                data = sock.recv(65536)
+                if not data:
+                    # Ganga has gone
+                    for child in running.values():
+                        kill(child)
+                    return
+                requests, buffer = receive(buffer + data)
+                for request in requests:
+                    if request.get('cancel'):
+                        if request['id'] in running:
+                            kill(running[request['id']])
+                            running[request['id']].request['cancelled'] = True
+                        continue
+                    child = start(request, [sock.fileno()] + list(pipes))
+                    running[request['id']] = child
+                    for r in child.fds:
+                        pipes[r] = child
+                continue
+
+            child = pipes[fd]
+            data = os.read(fd, 65536)
+            if data:
+                child.data[child.fds[fd]].append(data)
+                continue
+            os.close(fd)
+            del pipes[fd]
+            del child.fds[fd]
+            if not child.fds:
+                del running[child.request['id']]
+                if child.request.get('cancelled'):
+                    os.waitpid(child.pid, 0)
+                else:
+                    finish(sock, child, base_env)
+
+
+if __name__ == '__main__':
+    serve(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM, fileno=int(sys.argv[1])))
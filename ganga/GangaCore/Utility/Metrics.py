@@ -0,0 +1,311 @@
+"""
+Counters and timings of the hot paths of Ganga which are cheap enough to be always on.
+
+Metrics are created once, at import time of the module they instrument, from the registry 'metrics':
+
+    submit_timer = metrics.timer('job_submit_seconds', 'Time to submit a job')
+
+    @submit_timer.timed
+    def submit(...):
+
+    with submit_timer:
+        ...
+
+    flushed = metrics.counter('repository_flushed_objects_total', 'Objects written to disk')
+    flushed.inc(len(ids))
+
+A timer given sample=N measures one call in N and counts all of them, for code called so often that
+even reading the clock would show. Gauges are functions which are only called when the metrics are
+read. The current values are returned by the GPI function metrics() and, when the web gui is running,
+served as Prometheus text from http://localhost:<port>/metrics (or as JSON from /metrics?format=json).
+Setting config.Configuration.Metrics to False turns the timers off.
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+from GangaCore.Utility.Config import getConfig
+
+# upper bounds in seconds of the histogram buckets used by the timers
+default_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _labels_string(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (k, v) for k, v in labels)
+
+
+class Counter(object):
+
+    """ A count which only goes up """
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def values(self):
+        return {'value': self.value}
+
+    def prometheus(self, prefix):
+        """ Return the (family, kind, help, line) of each sample in the Prometheus text format """
+        name = prefix + self.name
+        return [(name, self.kind, self.help, '%s%s %s' % (name, _labels_string(self.labels), self.value))]
+
+
+class Gauge(object):
+
+    """ A value read from a function when the metrics are read, e.g. the length of a queue """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, function, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.function = function
+
+    @property
+    def value(self):
+        try:
+            return self.function()
+        except Exception:
+            return float('nan')
+
+    def values(self):
+        return {'value': self.value}
+
+    def prometheus(self, prefix):
+        name = prefix + self.name
+        return [(name, self.kind, self.help, '%s%s %s' % (name, _labels_string(self.labels), self.value))]
+
+
+class Histogram(object):
+
+    """ The distribution of observed values, kept as counts in fixed buckets """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=default_buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.
+            self._max = 0.
+            self._observed = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._observed += 1
+            if value > self._max:
+                self._max = value
+
+    def quantile(self, fraction):
+        """ Return the upper bound of the bucket holding the given quantile """
+        with self._lock:
+            counts = list(self._counts)
+        target = fraction * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            seen += count
+            if count and seen >= target:
+                return bound if bound != float('inf') else self._max
+        return 0.
+
+    def values(self):
+        with self._lock:
+            observed, total, largest = self._observed, self._sum, self._max
+        return {'count': observed,
+                'sum': total,
+                'mean': total / observed if observed else 0.,
+                'max': largest,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95)}
+
+    def prometheus(self, prefix):
+        name = prefix + self.name
+        with self._lock:
+            counts, total, observed = list(self._counts), self._sum, self._observed
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append('%s_bucket%s %s' % (name, _labels_string(self.labels + (('le', bound),)), cumulative))
+        lines.append('%s_sum%s %s' % (name, _labels_string(self.labels), total))
+        lines.append('%s_count%s %s' % (name, _labels_string(self.labels), observed))
+        return [(name, 'histogram', self.help, line) for line in lines]
+
+
+class Timer(Histogram):
+
+    """
+    A histogram of durations in seconds, used as a decorator or a context manager.
+    All calls are counted but only one in 'sample' is timed.
+    Each thread counts its own calls, so that a call which is not timed takes no lock
+    """
+
+    def __init__(self, registry, name, help, sample=1, buckets=default_buckets, labels=()):
+        super(Timer, self).__init__(name, help, buckets, labels)
+        self._registry = registry
+        self.sample = max(1, int(sample))
+        # the counts of calls of all the threads which have used the timer, [count] each
+        self._thread_calls = []
+        self._local = threading.local()
+
+    @property
+    def calls(self):
+        return sum(count[0] for count in list(self._thread_calls))
+
+    def _start(self):
+        """ Count a call and return the start time if it is to be timed, else None """
+        if not self._registry.enabled:
+            return None
+        local = self._local
+        try:
+            count = local.calls
+        except AttributeError:
+            count = local.calls = [0]
+            with self._lock:
+                self._thread_calls.append(count)
+        count[0] += 1
+        if count[0] % self.sample:
+            return None
+        return time.perf_counter()
+
+    def __enter__(self):
+        starts = getattr(self._local, 'starts', None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(self._start())
+        return self
+
+    def __exit__(self, *exc_info):
+        start = self._local.starts.pop()
+        if start is not None:
+            self.observe(time.perf_counter() - start)
+        return False
+
+    def timed(self, function):
+        """ Decorate function so that its calls are timed """
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start = self._start()
+            if start is None:
+                return function(*args, **kwargs)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - start)
+        return timed_function
+
+    def values(self):
+        values = super(Timer, self).values()
+        values['calls'] = self.calls
+        # the time spent in all the calls, estimated from the sampled ones
+        values['total'] = values['mean'] * values['calls']
+        return values
+
+    def prometheus(self, prefix):
+        calls = prefix + self.name + '_calls_total'
+        return super(Timer, self).prometheus(prefix) + \
+            [(calls, 'counter', 'Calls counted by ' + self.name, '%s%s %s' % (calls, _labels_string(self.labels), self.calls))]
+
+
+class MetricsRegistry(object):
+
+    """ All the metrics of this session, by name and labels """
+
+    prefix = 'ganga_'
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def _get(self, name, labels, make):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._metrics:
+                self._metrics[key] = make(key[1])
+            return self._metrics[key]
+
+    def counter(self, name, help, **labels):
+        """ Return the counter 'name', created on the first call """
+        return self._get(name, labels, lambda l: Counter(name, help, l))
+
+    def gauge(self, name, help, function, **labels):
+        """ Make function give the value of the gauge 'name' """
+        gauge = self._get(name, labels, lambda l: Gauge(name, help, function, l))
+        gauge.function = function
+        return gauge
+
+    def histogram(self, name, help, buckets=default_buckets, **labels):
+        """ Return the histogram 'name', created on the first call """
+        return self._get(name, labels, lambda l: Histogram(name, help, buckets, l))
+
+    def timer(self, name, help, sample=1, buckets=default_buckets, **labels):
+        """ Return the timer 'name', created on the first call. Only one call in 'sample' is timed """
+        return self._get(name, labels, lambda l: Timer(self, name, help, sample, buckets, l))
+
+    def all(self):
+        with self._lock:
+            return [self._metrics[k] for k in sorted(self._metrics)]
+
+    def snapshot(self, match=None):
+        """
+        Return {name: values} of the metrics with 'match' in their name,
+        the labels are added to the name as in 'name{label="value"}'
+        """
+        return dict((m.name + _labels_string(m.labels), m.values())
+                    for m in self.all() if match is None or match in m.name)
+
+    def prometheus(self):
+        """ Return the metrics in the Prometheus text exposition format """
+        families = {}
+        order = []
+        for m in self.all():
+            for family, kind, help, line in m.prometheus(self.prefix):
+                if family not in families:
+                    families[family] = ['# HELP %s %s' % (family, help), '# TYPE %s %s' % (family, kind)]
+                    order.append(family)
+                families[family].append(line)
+        return ''.join('\n'.join(families[f]) + '\n' for f in order)
+
+    def reset(self):
+        """ Empty the histograms and timers, the counters are left as they are """
+        for m in self.all():
+            if isinstance(m, Histogram):
+                m.reset()
+
+
+metrics = MetricsRegistry()
+
+
+def _configure(name=None, value=None):
+    if name in (None, 'Metrics'):
+        metrics.enabled = bool(getConfig('Configuration')['Metrics'])
+
+
+_configure()
+getConfig('Configuration').addChangeListener(_configure)
@@ -1,4 +1,9 @@
+import importlib
+import threading
+import time
+
 from GangaCore.Utility.logging import getLogger
+from GangaCore.Utility.Config import Config
 from GangaCore.Core.exceptions import GangaValueError
 logger = getLogger()
 
@@ -15,16 +20,25 @@ class PluginManagerError(GangaValueError):
 #
 # If you do not use category all plugins are registered in a flat list. Otherwise
 # there is a list of names for each category seaprately.
+#
+# A plugin may also be declared before it exists: declare() records the module which
+# registers it and the module is only imported the first time the plugin is looked for.
 
 
 class PluginManager(object):
 
-    __slots__ = ('all_dict', 'first', '_prev_found')
+    __slots__ = ('all_dict', 'first', '_prev_found', '_declared', '_aliases', '_load_times', '_load_lock')
 
     def __init__(self):
         self.all_dict = {}
         self.first = {}
         self._prev_found = {}
+        # {category: {name: module}} of the plugins which have been declared but not imported yet
+        self._declared = {}
+        # {(category, alias): name} of the aliases of declared plugins, added when the plugin is imported
+        self._aliases = {}
+        self._load_times = {}
+        self._load_lock = threading.RLock()
 
     def find(self, category, name):
         """
@@ -42,6 +56,9 @@ class PluginManager(object):
         if key in self._prev_found:
             return self._prev_found[key]
 
+        if name is not None and name in self._declared.get(category, ()):
+            self._loadDeclared(category, name)
+
         try:
             if name is not None:
                 if category in self.first:
@@ -79,6 +96,13 @@ class PluginManager(object):
             logger.error("Some Other unexpected ERROR!")
             raise
 
+        # the plugin may be declared in another category or be the default of a category not imported yet
+        if name is not None and self._loadDeclared(None, name):
+            return self.find(category, name)
+        if name is None and category not in self.first and self._declared.get(category):
+            self.load(next(iter(self._declared[category].values())))
+            return self.find(category, name)
+
         if name is None:
             s = "cannot find default plugin for category " + category
         else:
@@ -97,8 +121,78 @@ class PluginManager(object):
         cat = self.all_dict.setdefault(category, {})
         self.first.setdefault(category, pluginobj)
         cat[name] = pluginobj
+        self._declared.get(category, {}).pop(name, None)
         logger.debug('adding plugin %s (category "%s") ' % (name, category))
 
+    def declare(self, module_name, category, name):
+        """ Declare that importing module_name adds the plugin 'name' in the given 'category'.
+        The module is imported the first time the plugin is looked for with find(), or when all
+        the plugins of its category are listed.
+        """
+        if name not in self.all_dict.get(category, {}):
+            self._declared.setdefault(category, {})[name] = module_name
+
+    def addAlias(self, category, alias, name):
+        """ Add the plugin 'name' of 'category' under the name 'alias' too.
+        If the plugin is declared but not imported yet the alias is declared with it, so that
+        looking for the alias imports the plugin.
+        """
+        with self._load_lock:
+            module_name = self._declared.get(category, {}).get(name)
+            if module_name is None:
+                self.add(self.find(category, name), category, alias)
+            else:
+                self._aliases[(category, alias)] = name
+                self.declare(module_name, category, alias)
+
+    def allDeclared(self):
+        """ Return {category: {name: module}} for the plugins declared but not imported yet """
+        return dict((category, dict(names)) for category, names in self._declared.items() if names)
+
+    def load(self, module_name):
+        """ Import a module providing declared plugins and record how long it took """
+        with self._load_lock:
+            # forget the declarations first so that a module failing to import is not retried on every lookup
+            for names in self._declared.values():
+                for name in [n for n, m in names.items() if m == module_name]:
+                    del names[name]
+            self._prev_found.clear()
+            start = time.time()
+            with Config.lateSections() as sections:
+                importlib.import_module(module_name)
+            self._load_times[module_name] = time.time() - start
+            for (category, alias), name in list(self._aliases.items()):
+                if name in self.all_dict.get(category, {}):
+                    del self._aliases[(category, alias)]
+                    self.add(self.all_dict[category][name], category, alias)
+            if sections and Config._after_bootstrap:
+                # the GPI config object was made at bootstrap without these sections
+                from GangaCore.GPIDev.Lib.Config.Config import createSectionProxy
+                for name in sections:
+                    createSectionProxy(name)
+        logger.debug('imported plugin module %s in %.3fs' % (module_name, self._load_times[module_name]))
+
+    def loadTimes(self):
+        """ Return {module: seconds} for the modules imported by load() """
+        return dict(self._load_times)
+
+    def _loadDeclared(self, category, name):
+        """ Import the module declaring 'name' in 'category', or in any category if category is None.
+        Return True if a module was imported. """
+        with self._load_lock:
+            if category is None:
+                modules = [names[name] for names in self._declared.values() if name in names]
+            else:
+                modules = [self._declared[category][name]] if name in self._declared.get(category, ()) else []
+            if not modules:
+                return False
+            self.load(modules[0])
+            return True
+
+    def _loadCategory(self, category):
+        for module_name in set(self._declared.get(category, {}).values()):
+            self.load(module_name)
+
     def setDefault(self, category, name):
         """ Make the plugin 'name' be default in a given 'category'.
         You must first add() the plugin object before calling this method. Otherwise
@@ -108,10 +202,17 @@ class PluginManager(object):
         pluginobj = self.find(category, name)
         self.first[category] = pluginobj
 
-    def allCategories(self):
+    def allCategories(self, load=True):
+        """ Return {category: {name: plugin}}, importing the declared plugins first unless load is False """
+        if load:
+            for category in list(self._declared):
+                self._loadCategory(category)
         return self.all_dict
 
-    def allClasses(self, category):
+    def allClasses(self, category, load=True):
+        """ Return {name: plugin} for a category, importing the declared plugins first unless load is False """
+        if load:
+            self._loadCategory(category)
         cat = self.all_dict.get(category)
         if cat:
             return cat
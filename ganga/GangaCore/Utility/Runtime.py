@@ -316,16 +316,20 @@ def autoPopulateGPI(my_interface=None):
     if not my_interface:
         import GangaCore.GPI
         my_interface = GangaCore.GPI
-    from GangaCore.Runtime.GPIexport import exportToInterface
+    from GangaCore.Runtime.GPIexport import exportToInterface, lazyPluginClass
     from GangaCore.Utility.Plugin import allPlugins
     # make all plugins visible in GPI
-    for k in allPlugins.allCategories():
-        for n in allPlugins.allClasses(k):
+    for k in allPlugins.allCategories(load=False):
+        for n in allPlugins.allClasses(k, load=False):
             cls = allPlugins.find(k, n)
             if not cls._declared_property('hidden'):
                 if n != cls.__name__:
                     exportToInterface(my_interface, cls.__name__, cls, 'Classes')
                 exportToInterface(my_interface, n, cls, 'Classes')
+    # the plugins which are not imported yet get a stand-in which imports them on first use
+    for k, names in allPlugins.allDeclared().items():
+        for n in names:
+            exportToInterface(my_interface, n, lazyPluginClass(k, n), 'Classes')
 
 def setPluginDefaults(my_interface=None):
     """
@@ -358,16 +362,20 @@ def setPluginDefaults(my_interface=None):
 
     batch_default_name = getConfig('Configuration').getEffectiveOption('Batch')
     try:
-        batch_default = allPlugins.find('backends', batch_default_name)
+        allPlugins.addAlias('backends', 'Batch', batch_default_name)
     except Exception as x:
         from GangaCore.Utility.Config import ConfigError
         raise ConfigError('Check configuration. Unable to set default Batch backend alias (%s)' % str(x))
     else:
-        allPlugins.add(batch_default, 'backends', 'Batch')
-        from GangaCore.Runtime.GPIexport import exportToInterface
+        from GangaCore.Runtime.GPIexport import exportToInterface, lazyPluginClass
         if not my_interface:
             import GangaCore.GPI
             my_interface = GangaCore.GPI
+        # the batch backends are only imported when the alias is first used
+        if 'Batch' in allPlugins.allDeclared().get('backends', {}):
+            batch_default = lazyPluginClass('backends', 'Batch')
+        else:
+            batch_default = allPlugins.find('backends', 'Batch')
         exportToInterface(my_interface, 'Batch', batch_default, 'Classes')
 
 
@@ -1,14 +1,23 @@
 import os
 import base64
+import collections
+import itertools
+import socket
 import subprocess
 import threading
 import pickle as pickle
 import signal
 from copy import deepcopy
 from GangaCore.Core.exceptions import GangaException
+from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger
+from GangaCore.Utility.Metrics import metrics
+from GangaCore.Utility import ForkServer as fork_server_protocol
 logger = getLogger()
 
+forked_timer = metrics.timer('execute_seconds', 'Time to run one command with execute()', runner='forkserver')
+subprocess_timer = metrics.timer('execute_seconds', 'Time to run one command with execute()', runner='subprocess')
+
 
 def bytes2string(obj):
     if isinstance(obj, bytes):
@@ -161,6 +170,171 @@ def update_thread(pipes, thread_output, output_key, require_output):
     return ev
 
 
+class ForkServerError(GangaException):
+    """ The fork server running a command has stopped """
+
+
+class ForkServer(object):
+
+    """
+    A long-lived process started in one environment which forks a child for each command sent to it, see
+    GangaCore/Utility/ForkServer.py. Commands can be sent from several threads at the same time.
+    """
+
+    def __init__(self, env):
+        parent_socket, child_socket = socket.socketpair()
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ForkServer.py')
+        try:
+            # the python of the environment, as for the commands run with 'python -'
+            self.process = subprocess.Popen(['python', script, str(child_socket.fileno())], env=env,
+                                            pass_fds=(child_socket.fileno(),), start_new_session=True,
+                                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        finally:
+            child_socket.close()
+        self._socket = parent_socket
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # {request id: [event set when answered, answer]}
+        self._pending = {}
+        self._ids = itertools.count()
+        self.alive = True
+        self.commands = 0
+        self.answered = 0
+        self._reader = threading.Thread(target=self._read, name='ForkServer_%d' % self.process.pid)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def inFlight(self):
+        with self._lock:
+            return len(self._pending)
+
+    def run(self, command, shell, python_setup='', cwd=None, update_env=False, timeout=None):
+        """
+        Run a command and return the answer of the server, see ForkServer.py, or None if it timed out,
+        in which case it is killed
+        """
+        request_id = next(self._ids)
+        pending = [threading.Event(), None]
+        with self._lock:
+            self._pending[request_id] = pending
+            self.commands += 1
+        self._send({'id': request_id, 'command': command, 'shell': shell, 'python_setup': python_setup,
+                    'cwd': cwd, 'update_env': update_env})
+
+        if not pending[0].wait(timeout):
+            self.cancel(request_id)
+            return None
+        if pending[1] is None:
+            raise ForkServerError('The fork server %d stopped while running: %s' % (self.process.pid, command))
+        return pending[1]
+
+    def cancel(self, request_id):
+        """ Kill a command, which will not be answered """
+        with self._lock:
+            if self._pending.pop(request_id, None) is None:
+                return
+        self._send({'id': request_id, 'cancel': True})
+
+    def _send(self, message):
+        data = pickle.dumps(message, 2)
+        try:
+            with self._send_lock:
+                self._socket.sendall(fork_server_protocol.header.pack(len(data)) + data)
+        except OSError as err:
+            logger.debug('cannot send to the fork server %d: %s', self.process.pid, err)
+
+    def _read(self):
+        buffer = b''
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except OSError:
+                data = b''
+            if not data:
+                break
+            answers, buffer = fork_server_protocol.receive(buffer + data)
+            for answer in answers:
+                with self._lock:
+                    pending = self._pending.pop(answer['id'], None)
+                self.answered += 1
+                if pending is not None:
+                    pending[1] = answer
+                    pending[0].set()
+
+        # the server has stopped, the commands still waiting fail
+        self.alive = False
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for event, _ in pending:
+            event.set()
+        self.process.wait()
+
+    def stop(self):
+        """ Stop the server, which kills the commands it is running """
+        self.alive = False
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+
+
+# {environment: ForkServer}, the most recently used last
+_fork_servers = collections.OrderedDict()
+_fork_servers_lock = threading.Lock()
+
+
+def get_fork_server(env):
+    """
+    Return the fork server of the environment, started on first use. At most [Configuration]ForkServers servers
+    are kept, the least recently used idle ones are stopped.
+    """
+    key = frozenset(env.items())
+    with _fork_servers_lock:
+        server = _fork_servers.get(key)
+        if server is not None and server.alive:
+            _fork_servers.move_to_end(key)
+            return server
+
+        server = ForkServer(env)
+        _fork_servers[key] = server
+        extra = len(_fork_servers) - max(1, getConfig('Configuration')['ForkServers'])
+        for old_key, old_server in list(_fork_servers.items()):
+            if extra <= 0:
+                break
+            if old_server is not server and old_server.inFlight() == 0:
+                del _fork_servers[old_key]
+                old_server.stop()
+                extra -= 1
+        return server
+
+
+def stop_fork_servers():
+    """ Stop all the fork servers """
+    with _fork_servers_lock:
+        for server in _fork_servers.values():
+            server.stop()
+        _fork_servers.clear()
+
+
+def fork_server_stats():
+    """ Return the latency statistics of execute() and the state of the fork servers """
+    with _fork_servers_lock:
+        servers = [{'pid': server.process.pid, 'commands': server.commands, 'in_flight': server.inFlight()}
+                   for server in _fork_servers.values() if server.alive]
+    return {'servers': servers,
+            'forkserver': forked_timer.values(),
+            'subprocess': subprocess_timer.values()}
+
+
+def unpickle_output(data):
+    """ Return the first object in the pickled output of a python command, raise an exception if there is none """
+    try:
+        return pickle.loads(data)
+    except UnicodeDecodeError:
+        return bytes2string(pickle.loads(data, encoding="bytes"))
+
+
 def execute(command,
             timeout=None,
             env=None,
@@ -182,11 +356,66 @@ def execute(command,
         python_setup (str): A python command to be executed beore the main command is
         eval_includes (str): An string used to construct an environment which, if passed, is used to eval the stdout into a python object
         update_env (bool): Should we update the env being passed to what the env was after the command finished running
+    The command is run by the fork server of the environment, see get_fork_server, unless [Configuration]ForkServers is 0
     """
 
     if update_env and env is None:
         raise GangaException('Cannot update the environment if None given.')
 
+    if getConfig('Configuration')['ForkServers']:
+        try:
+            server = get_fork_server(os.environ if env is None else env)
+        except OSError as err:
+            logger.debug('cannot start a fork server, running the command in a new process: %s', err)
+        else:
+            try:
+                with forked_timer:
+                    return execute_forked(server, command, timeout, env, cwd, shell, python_setup, eval_includes, update_env)
+            except ForkServerError as err:
+                if server.answered:
+                    raise
+                # e.g. the python of the environment cannot run the server
+                logger.debug('the fork server does not work, running the command in a new process: %s', err)
+
+    with subprocess_timer:
+        return execute_subprocess(command, timeout, env, cwd, shell, python_setup, eval_includes, update_env)
+
+
+def execute_forked(server, command, timeout, env, cwd, shell, python_setup, eval_includes, update_env):
+    """ Run the command of execute() with a fork server """
+
+    logger.debug("Executing Command:\n'%s'" % str(command))
+    answer = server.run(command, shell, python_setup, cwd, update_env, timeout)
+    if answer is None:
+        return 'Command timed out!'
+
+    stdout, stderr = answer['stdout'], answer['stderr']
+    logger.debug("stdout: %s" % stdout)
+    logger.debug("stderr: %s" % stderr)
+    if stderr != '':
+        logger.debug(stderr)
+
+    if update_env:
+        if answer['env'] is None:
+            logger.error("Expected to find the updated env after running a command")
+            logger.error("Command: %s" % command)
+            logger.error("stdout: %s" % stdout)
+            logger.error("stderr: %s" % stderr)
+            raise RuntimeError("Missing update env after running command")
+        env.update(answer['env'])
+
+    if not shell and not eval_includes and answer['output']:
+        try:
+            return unpickle_output(answer['output'])
+        except Exception as err:
+            logger.debug('Error getting output stream from command: %s', err)
+
+    return decode_stdout(stdout, command, shell, eval_includes)
+
+
+def execute_subprocess(command, timeout, env, cwd, shell, python_setup, eval_includes, update_env):
+    """ Run the command of execute() in a new shell or python process """
+
     if not shell:
         # We want to run a python command inside a small Python wrapper
         stream_command = 'python -'
@@ -261,6 +490,12 @@ def execute(command,
         if pkl_output_key in thread_output:
             return thread_output[pkl_output_key]
 
+    return decode_stdout(stdout, command, shell, eval_includes)
+
+
+def decode_stdout(stdout, command, shell, eval_includes):
+    """ Return the object pickled in, or evaluated from, the stdout of a command, else the stdout itself """
+
     stdout_temp = None
     try:
         # If output
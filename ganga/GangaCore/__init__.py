@@ -131,6 +131,8 @@ conf_config.addOption('NoAfsToken', False, 'Do not require an AFS token when run
 conf_config.addOption('Profile_Memory', False, 'Run memory profiler on Ganga Objects')
 conf_config.addOption('Profile_CPU', False, 'Run cpu profiler on Ganga Objects')
 conf_config.addOption('Count_Calls', False, 'Run function call counters on Ganga Objects')
+conf_config.addOption('Metrics', True, 'Time the hot paths (monitoring loop, repository, queues, job submission), see metrics() and the /metrics page of the web gui')
+conf_config.addOption('ForkServers', 8, 'Number of environments in which execute() keeps a process forking a child for each command, instead of starting a new shell or python each time. 0 disables them')
 conf_config.addOption('UDockerlocation', '~', 'Directory where udocker will be installed for local jobs if used for virtualization')
 
 # add named template options
@@ -155,6 +157,8 @@ conf_config.addOption('IgnoreRuntimeWarnings', False, "runtime warnings issued b
 
 conf_config.addOption('Batch', 'LSF', 'default batch system')
 
+conf_config.addOption('LazyLoadPlugins', True, 'Import the less common plugin packages (such as the grid and batch backends) only when one of their classes is first used, to speed up the startup')
+
 conf_config.addOption('AutoStartReg', True, 'AutoStart the registries, needed to access any jobs in registry therefore needs to be True for 99.999% of use cases')
 # ------------------------------------------------
 # IPython
@@ -171,6 +175,9 @@ queues_config = makeConfig("Queues", "configuration section for the queues")
 queues_config.addOption('Timeout', None, 'default timeout for queue generated processes')
 queues_config.addOption('ShutDownTimeout', 0.1, 'timeout before looping again over queue to give shutdown a chance')
 queues_config.addOption('NumWorkerThreads', 5, 'default number of worker threads in the queues system')
+queues_config.addOption('NumFinalisationThreads', 5, 'number of worker threads finalising the jobs in the queues system')
+queues_config.addOption('FinalisationDeadline', 3600, 'seconds after which the finalisation of a job queued in the queues '
+                        'system is given up and its worker thread replaced, None for no limit', typelist=[None, int])
 
 # ------------------------------------------------
 # Plugins
@@ -211,6 +218,7 @@ poll_config.addOption('LSF', 20, 'Poll rate for LSF backend.')
 poll_config.addOption('PBS', 20, 'Poll rate for PBS backend.')
 poll_config.addOption('Dirac', 50, 'Poll rate for Dirac backend.')
 poll_config.addOption('Panda', 50, 'Poll rate for Panda backend.')
+poll_config.addOption('SimulatedBackend', 10, 'Poll rate for SimulatedBackend backend.')
 
 # Note: the rate of this callback is actually
 # MAX(base_poll_rate,callbacks_poll_rate)
@@ -279,6 +287,8 @@ root_config.addOption('version', '6.04.02', 'Version of ROOT')
 local_config = makeConfig('Local', 'parameters of the local backend (jobs in the background on localhost)')
 local_config.addOption('remove_workdir', True, 'remove automatically the local working directory when the job completed')
 local_config.addOption('location', None, 'The location where the workdir will be created. If None it defaults to the value of $TMPDIR')
+local_config.addOption('max_running', 0, 'The maximum number of jobs running at the same time, the others wait in the submitted state. 0 is the number of cores')
+local_config.addOption('min_free_memory', 0, 'Do not start more jobs while less memory than this is available, in MB. 0 disables the check')
 
 # ------------------------------------------------
 # LCG
@@ -341,6 +351,21 @@ lcg_config.addOption(
 lcg_config.addOption('StatusPollingTimeout', 300,
                  'sets the gLite job status polling timeout in seconds')
 
+lcg_config.addOption('CommandsPerEndpoint', 4,
+                 'sets the number of middleware commands (status, cancel, output retrieval, ...) run at the same time for one CE or WMS')
+
+lcg_config.addOption('CommandRetries', 2,
+                 'sets how many times a failed or timed out status, cancel or output retrieval command is run again. Submissions are never retried')
+
+lcg_config.addOption('CommandRetryBackoff', 5.0,
+                 'sets the seconds to wait before running a failed middleware command again, doubled at each further attempt')
+
+lcg_config.addOption('EndpointFailureThreshold', 3,
+                 'sets how many middleware commands in a row may fail or time out for a CE or WMS before the monitoring skips it for a while')
+
+lcg_config.addOption('EndpointBackoff', 600,
+                 'sets the seconds for which the monitoring skips a CE or WMS which keeps failing')
+
 lcg_config.addOption('OutputDownloaderThread', 10,
                  'sets the number of concurrent threads for downloading job\'s output sandbox from gLite WMS')
 
@@ -416,12 +441,40 @@ gridsim_config.addOption('job_finish_time', 'random.uniform(10,20)',
 gridsim_config.addOption(
     'job_failure_rate', 0.0, 'probability of the job to enter the Failed state')
 
+# ------------------------------------------------
+# SimulatedBackend
+simulated_config = makeConfig('SimulatedBackend', 'Distributions of the fake jobs run by the SimulatedBackend, used for load testing the monitoring')
+simulated_config.addOption('queue_time', 'random.expovariate(1/60.)',
+                           'python expression which returns the time (in seconds) a job waits in the queue before running')
+simulated_config.addOption('run_time', 'random.lognormvariate(5, 1)',
+                           'python expression which returns the time (in seconds) a job runs for')
+simulated_config.addOption('submit_latency', '0',
+                           'python expression which returns the time (in seconds) the submission of a job takes')
+simulated_config.addOption('status_latency', '0',
+                           'python expression which returns the time (in seconds) a status query takes, for all the jobs of one query')
+simulated_config.addOption('status_bulk_size', 1000, 'the largest number of jobs whose status is returned by one status query')
+simulated_config.addOption('submit_failure_rate', 0.0, 'probability that the submission of a job fails')
+simulated_config.addOption('job_failure_rate', 0.0, 'probability that a job ends in the failed state')
+simulated_config.addOption('seed', None, 'seed of the random numbers, for the same timelines in every session', typelist=[None, int])
+
+# ------------------------------------------------
+# Remote
+remote_config = makeConfig('Remote', 'Settings for the SSH connections of the Remote backend')
+remote_config.addOption('keepalive', 60, 'Seconds between the SSH keepalive messages on the connections to the remote hosts, 0 to disable them')
+remote_config.addOption('reconnect_attempts', 3, 'Number of attempts to open, or reopen, the connection to a remote host before giving up')
+remote_config.addOption('reconnect_backoff', 300, 'Seconds after the connection to a remote host has been given up before it is tried again')
+
 # ------------------------------------------------
 # Condor
 condor_config = makeConfig('Condor', 'Settings for Condor Batch system')
 
 condor_config.addOption('query_global_queues', True,
                  "Query global condor queues, i.e. use '-global' flag")
+condor_config.addOption('query_constraint', 'GangaJobId =!= undefined',
+                 "ClassAd constraint selecting the jobs of Ganga in the single condor_q query of each monitoring cycle")
+condor_config.addOption('query_history', True,
+                 "Ask condor_history for the exit code and CPU time of the jobs which have left the queue, "
+                 "instead of reading them from the files of the job")
 
 # ------------------------------------------------
 # LSF
@@ -462,6 +515,14 @@ def filefilter(fn):
 lsf_config.addOption('postexecute', tempstr, "String contains commands executing before submiting job to queue")
 lsf_config.addOption('jobnameopt', 'J', "String contains option name for name of job in batch system")
 lsf_config.addOption('timeout', 600, 'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
+lsf_config.addOption('status_str', 'bjobs -a -noheader -o "jobid stat queue exec_host"',
+                     "String used to query the state of all the jobs at once. If empty the status files of each job are read instead")
+lsf_config.addOption('status_res_pattern', r'^(?P<id>\d+)\s+(?P<status>\S+)\s+(?P<queue>\S+)\s+(?P<host>\S+)',
+                     "String pattern for each line of the output of the status command")
+lsf_config.addOption('status_map', {'PEND': 'submitted', 'PSUSP': 'submitted', 'WAIT': 'submitted',
+                                    'RUN': 'running', 'PROV': 'running', 'USUSP': 'running', 'SSUSP': 'running',
+                                    'DONE': 'finished', 'EXIT': 'finished', 'ZOMBI': 'finished'},
+                     "Map of the states of the status command to 'submitted', 'running' or 'finished'. The exit code of finished jobs is read from their status file")
 
 # ------------------------------------------------
 # PBS
@@ -505,6 +566,14 @@ pbs_config.addOption('postexecute', tempstr,
 pbs_config.addOption('jobnameopt', 'N', "String contains option name for name of job in batch system")
 pbs_config.addOption('timeout', 600,
                  'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
+pbs_config.addOption('status_str', 'qstat',
+                     "String used to query the state of all the jobs at once. If empty the status files of each job are read instead")
+pbs_config.addOption('status_res_pattern', r'^(?P<id>\d+)\S*\s+\S+\s+\S+\s+\S+\s+(?P<status>[A-Z])\s+(?P<queue>\S+)',
+                     "String pattern for each line of the output of the status command")
+pbs_config.addOption('status_map', {'Q': 'submitted', 'H': 'submitted', 'W': 'submitted', 'T': 'submitted',
+                                    'R': 'running', 'E': 'running', 'S': 'running',
+                                    'C': 'finished', 'F': 'finished'},
+                     "Map of the states of the status command to 'submitted', 'running' or 'finished'. The exit code of finished jobs is read from their status file")
 
 # ------------------------------------------------
 # SGE
@@ -547,6 +616,14 @@ sge_config.addOption('preexecute', 'os.chdir(os.environ["TMPDIR"])\nos.environ["
 sge_config.addOption('postexecute', '', "String contains commands executing before submiting job to queue")
 sge_config.addOption('jobnameopt', 'N', "String contains option name for name of job in batch system")
 sge_config.addOption('timeout', 600, 'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
+sge_config.addOption('status_str', 'qstat',
+                     "String used to query the state of all the jobs at once. If empty the status files of each job are read instead")
+sge_config.addOption('status_res_pattern', r'^\s*(?P<id>\d+)\s+\S+\s+\S+\s+\S+\s+(?P<status>\w+)\s+\S+\s+\S+\s+((?P<queue>[^@\s]+)@(?P<host>\S+))?',
+                     "String pattern for each line of the output of the status command")
+sge_config.addOption('status_map', {'qw': 'submitted', 'hqw': 'submitted', 'hRwq': 'submitted', 'Rq': 'submitted',
+                                    'r': 'running', 't': 'running', 'Rr': 'running', 'Rt': 'running',
+                                    's': 'running', 'S': 'running', 'T': 'running'},
+                     "Map of the states of the status command to 'submitted', 'running' or 'finished'. The exit code of finished jobs is read from their status file")
 
 # ------------------------------------------------
 # Slurm
@@ -617,6 +694,18 @@ slurm_config.addOption('postexecute', tempstr,
 slurm_config.addOption('jobnameopt', 'J', "String contains option name for name of job in batch system")
 slurm_config.addOption('timeout', 600,
                        'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
+slurm_config.addOption('status_str', 'squeue -h -u $USER -t all -o "%i %T %P %N"',
+                       "String used to query the state of all the jobs at once. If empty the status files of each job are read instead")
+slurm_config.addOption('status_res_pattern', r'^(?P<id>\d+)\s+(?P<status>\S+)\s+(?P<queue>\S+)\s*(?P<host>\S*)',
+                       "String pattern for each line of the output of the status command")
+slurm_config.addOption('status_map', {'PENDING': 'submitted', 'CONFIGURING': 'submitted', 'REQUEUED': 'submitted',
+                                      'REQUEUE_HOLD': 'submitted', 'RESV_DEL_HOLD': 'submitted',
+                                      'RUNNING': 'running', 'COMPLETING': 'running', 'SUSPENDED': 'running',
+                                      'STOPPED': 'running', 'SIGNALING': 'running', 'STAGE_OUT': 'running', 'RESIZING': 'running',
+                                      'COMPLETED': 'finished', 'FAILED': 'finished', 'CANCELLED': 'finished', 'TIMEOUT': 'finished',
+                                      'NODE_FAIL': 'finished', 'OUT_OF_MEMORY': 'finished', 'PREEMPTED': 'finished',
+                                      'BOOT_FAIL': 'finished', 'DEADLINE': 'finished', 'SPECIAL_EXIT': 'finished'},
+                       "Map of the states of the status command to 'submitted', 'running' or 'finished'. The exit code of finished jobs is read from their status file")
 
 # ------------------------------------------------
 # Mergers
@@ -627,6 +716,13 @@ gangadir = getConfig('Configuration')['gangadir']
 merge_config.addOption('merge_output_dir', gangadir +
                  '/merge_results', "location of the merger's outputdir")
 merge_config.addOption('std_merge', 'TextMerger', 'Standard (default) merger')
+merge_config.addOption('copy_chunk_size', 1024 * 1024, 'Size in bytes of the chunks used to stream files into a TextMerger output')
+merge_config.addOption('parallel_types', 4, 'Maximum number of file types merged concurrently by SmartMerger. Set to 1 to merge one type at a time')
+merge_config.addOption('tree_batch_size', 0, 'If larger than 1, RootMerger and CustomMerger merge files in batches of this size '
+                 'and then merge the partial results, repeating until a single output remains. 0 merges all files in one go')
+merge_config.addOption('tree_workers', 4, 'Number of batches merged concurrently when tree_batch_size is set')
+merge_config.addOption('incremental_batch_size', 10, 'Number of subjob output files an incremental merger collects '
+                 'before folding them into its partial merge')
 
 # ------------------------------------------------
 # Preparable
@@ -955,8 +1051,12 @@ Executable/* = GangaCore.Lib.MonitoringServices.DummyMS.DummyMS
 reg_config = makeConfig('Registry','This config controls the speed of flushing objects to disk')
 reg_config.addOption('AutoFlusherWaitTime', 30, 'Time to wait between auto-flusher runs')
 reg_config.addOption('EnableAutoFlush', True, 'Enable Registry auto-flushing feature')
+reg_config.addOption('FlushDelay', 2, 'Maximum time in seconds a changed object waits before being written to disk, changes made in the meantime are written together')
+reg_config.addOption('FlushWorkers', 4, 'Number of threads writing changed objects to disk')
+reg_config.addOption('FlushFsync', False, 'Sync the disk after each batch of objects written by the auto-flusher')
 reg_config.addOption('DisableLoadCheck', True, 'Disable the checking of recent bad jobs in bad state. Mainly used in testing.')
 
 cred_config = makeConfig('Credentials', 'This configures the credentials singleton')
 cred_config.addOption('CleanDelay', 1, 'Seconds between auto-clean of credentials when proxy externally destroyed')
 cred_config.addOption('AtomicDelay', 1, 'Seconds between checking credential on disk')
+cred_config.addOption('ExpiryMargin', 300, 'Seconds before the end of a proxy from which its file is checked for a renewal on every use')
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the schema attribute reads of GangaObjects across threads.
+
+--readers threads read an attribute of a root object and of one of its children --reads times each, whilst
+--writers threads keep setting both attributes, as the monitoring loop reads the status of subjobs whilst they
+are updated. Every value read is checked to be one which was set.
+
+The reads per second per reader thread and in total are printed, or written as JSON with --output.
+
+Example:
+
+    python attribute_benchmark.py --readers 8 --writers 1 --reads 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+ganga_python_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+
+def make_objects():
+    """ Return a new root object with a child, the classes are declared once GangaCore can be imported """
+    from GangaCore.GPIDev.Base import GangaObject
+    from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem, ComponentItem
+
+    class BenchmarkChildObject(GangaObject):
+        _schema = Schema(Version(1, 0), {
+            'a': SimpleItem(42, typelist=[int]),
+        })
+        _category = 'BenchmarkObject'
+        _hidden = True
+        _enable_plugin = True
+
+    class BenchmarkObject(GangaObject):
+        _schema = Schema(Version(1, 0), {
+            'a': SimpleItem(42, typelist=[int]),
+            'b': ComponentItem('BenchmarkObject', defvalue='BenchmarkChildObject'),
+        })
+        _category = 'BenchmarkObject'
+        _hidden = True
+        _enable_plugin = True
+
+    return BenchmarkObject()
+
+
+def benchmark(args):
+    sys.path.insert(0, ganga_python_dir)
+    root = make_objects()
+    child = root.b
+    valid = set(range(0, 1000)) | {42}
+    rates = []
+    errors = []
+    lock = threading.Lock()
+    reading = threading.Event()
+
+    def read():
+        try:
+            start = time.perf_counter()
+            for _ in range(args.reads):
+                assert root.a in valid
+                assert child.a in valid
+            rate = 2 * args.reads / (time.perf_counter() - start)
+            with lock:
+                rates.append(rate)
+        except Exception as err:
+            errors.append(err)
+
+    def write(number):
+        rand = random.Random(number)
+        while reading.is_set():
+            root.a = rand.randint(0, 999)
+            child.a = rand.randint(0, 999)
+
+    reading.set()
+    writers = [threading.Thread(target=write, args=(n,)) for n in range(args.writers)]
+    readers = [threading.Thread(target=read) for _ in range(args.readers)]
+    for w in writers:
+        w.start()
+    start = time.perf_counter()
+    for r in readers:
+        r.start()
+    for r in readers:
+        r.join()
+    wall = time.perf_counter() - start
+    reading.clear()
+    for w in writers:
+        w.join()
+
+    if errors:
+        raise errors[0]
+    return {'readers': args.readers,
+            'writers': args.writers,
+            'reads_per_second_per_thread': sum(rates) / len(rates),
+            'reads_per_second': 2 * args.reads * args.readers / wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the attribute reads of GangaObjects across threads')
+    parser.add_argument('--readers', type=int, default=4, help='number of threads reading the attributes')
+    parser.add_argument('--writers', type=int, default=1, help='number of threads setting the attributes')
+    parser.add_argument('--reads', type=int, default=20000, help='number of reads of each attribute per reader')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    print('%d readers, %d writers: %.0f reads per second per thread, %.0f reads per second in total' %
+          (results['readers'], results['writers'], results['reads_per_second_per_thread'], results['reads_per_second']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark of GangaCore.Core.GangaThread.BulkOperation against the MTRunner it replaces.
+
+The same function is run over --items small items with --threads threads:
+
+    noop      returns its item straight away, the time measured is the overhead of the runner
+    sleep     sleeps --sleep ms, as a stand-in for a short call to a grid service
+
+The wall time, the overhead per item in microseconds (wall time less the ideal time of the work shared by the
+threads) and the throughput are printed, or written as JSON with --output.
+
+Example:
+
+    python bulk_benchmark.py --items 10000 --threads 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ganga_python_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+
+def run_mtrunner(function, items, threads):
+    from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+
+    class BenchmarkAlgorithm(Algorithm):
+
+        def process(self, item):
+            self.__appendResult__(item, function(item))
+            return True
+
+    runner = MTRunner(name='benchmark', algorithm=BenchmarkAlgorithm(), data=Data(collection=list(items)),
+                      numThread=threads)
+    runner.start()
+    runner.join(-1)
+    return len(runner.getResults())
+
+
+def run_bulk(function, items, threads):
+    from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
+    return len([r for r in BulkOperation('benchmark', function, num_threads=threads).run(items) if r.ok])
+
+
+def benchmark(args):
+    sys.path.insert(0, ganga_python_dir)
+    # the runners register their threads with the pool of the session
+    from GangaCore.Core.GangaThread.GangaThreadPool import GangaThreadPool
+    GangaThreadPool.getInstance()
+
+    def noop(item):
+        return item
+
+    def sleep(item):
+        time.sleep(args.sleep / 1000.)
+        return item
+
+    results = {}
+    for name, function, work in [('noop', noop, 0.), ('sleep', sleep, args.sleep / 1000.)]:
+        items = list(range(args.items))
+        ideal = work * args.items / args.threads
+        for runner, run in [('mtrunner', run_mtrunner), ('bulkoperation', run_bulk)]:
+            start = time.perf_counter()
+            done = run(function, items, args.threads)
+            wall = time.perf_counter() - start
+            assert done == args.items, '%s/%s processed %d items out of %d' % (name, runner, done, args.items)
+            results['%s/%s' % (name, runner)] = {
+                'wall_s': wall,
+                'overhead_us': 1e6 * max(0., wall - ideal) / args.items,
+                'per_second': args.items / wall}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark BulkOperation against MTRunner')
+    parser.add_argument('--items', type=int, default=10000, help='number of items')
+    parser.add_argument('--threads', type=int, default=10, help='number of threads of the runners')
+    parser.add_argument('--sleep', type=float, default=1., help='ms slept for each item of the sleep benchmark')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    for key in sorted(results):
+        r = results[key]
+        print('%-30s wall %8.3f s  overhead %8.1f us/item  %10.1f items/s' %
+              (key, r['wall_s'], r['overhead_us'], r['per_second']))
+
+
+if __name__ == '__main__':
+    main()
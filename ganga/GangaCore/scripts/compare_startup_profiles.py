@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Compare the startup profiles written by 'ganga --profile-startup'.
+
+Prints the wall time of each startup phase for every profile given, oldest first, together with the
+change from the first profile. Directories are expanded to the profiles they contain, so the whole
+history of a gangadir can be compared at once. With --last only the most recent profiles are kept.
+
+Example:
+
+    python compare_startup_profiles.py ~/gangadir/logs/startup --last 5
+    python compare_startup_profiles.py before.json after.json --cpu
+"""
+
+import argparse
+import json
+import os
+
+
+def find_profiles(paths):
+    profiles = []
+    for path in paths:
+        if os.path.isdir(path):
+            profiles += [os.path.join(path, f) for f in sorted(os.listdir(path))
+                         if f.startswith('startup-') and f.endswith('.json')]
+        else:
+            profiles.append(path)
+    return profiles
+
+
+def load_profile(file_name):
+    with open(file_name) as profile_file:
+        return json.load(profile_file)
+
+
+def phase_table(profile, field):
+    """ Return an ordered list of (indented phase name, value) for a profile """
+    return [('  ' * phase['depth'] + phase['name'], phase[field]) for phase in profile['phases']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Ganga startup profiles between runs')
+    parser.add_argument('paths', nargs='+', help='profile files or directories holding them')
+    parser.add_argument('--last', default=None, type=int, help='only compare the most recent N profiles')
+    parser.add_argument('--cpu', action='store_true', help='compare the CPU time instead of the wall time')
+    parser.add_argument('--io', action='store_true', help='compare the number of read calls instead of the wall time')
+    parser.add_argument('--imports', action='store_true', help='also compare the plugin package import times')
+    args = parser.parse_args()
+
+    field = 'read_calls' if args.io else 'cpu' if args.cpu else 'wall'
+    scale, unit = (1, 'calls') if args.io else (1000, 'ms')
+
+    profiles = [(f, load_profile(f)) for f in find_profiles(args.paths)]
+    profiles.sort(key=lambda p: p[1]['time'])
+    if args.last:
+        profiles = profiles[-args.last:]
+    if not profiles:
+        parser.error('no startup profiles found')
+
+    for i, (file_name, profile) in enumerate(profiles):
+        print('[%d] %s (ganga %s)' % (i, file_name, profile['version']))
+    print('')
+
+    # phases are matched on their name and depth, in the order of the first profile they appear in
+    rows = []
+    for _, profile in profiles:
+        for name, _ in phase_table(profile, field):
+            if name not in rows:
+                rows.append(name)
+    tables = [dict(phase_table(profile, field)) for _, profile in profiles]
+
+    if args.imports and field == 'wall':
+        import_names = set()
+        for _, profile in profiles:
+            import_names.update(profile.get('plugin_imports', {}))
+        for name in sorted(import_names):
+            rows.append('import ' + name)
+        for table, (_, profile) in zip(tables, profiles):
+            table.update(('import ' + n, t) for n, t in profile.get('plugin_imports', {}).items())
+
+    header = '%s (%s)' % (field, unit)
+    width = max(len(r) for r in rows + ['total', header])
+    print('%-*s %s' % (width, header, ''.join('%16s' % ('[%d]' % i) for i in range(len(profiles)))))
+    for row in rows:
+        cells = []
+        first = tables[0].get(row)
+        for table in tables:
+            value = table.get(row)
+            if value is None:
+                cells.append('%16s' % '-')
+            elif first is None or table is tables[0]:
+                cells.append('%16.1f' % (scale * value))
+            else:
+                cells.append('%9.1f %+6.0f' % (scale * value, scale * (value - first)))
+        print('%-*s %s' % (width, row, ''.join(cells)))
+
+    if field == 'wall':
+        totals = [profile['total'] for _, profile in profiles]
+        print('%-*s %s' % (width, 'total', ''.join(['%16.1f' % (scale * totals[0])] +
+                                                   ['%9.1f %+6.0f' % (scale * t, scale * (t - totals[0])) for t in totals[1:]])))
+
+
+if __name__ == '__main__':
+    main()
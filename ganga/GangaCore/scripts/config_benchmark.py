@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Benchmark of the reads of config options from the compiled snapshot against the effective value of the option.
+
+--reads reads are made of an int option, a string option and a path option of a new section:
+
+    snapshot    config[option], served from the snapshot of the section
+    effective   config.getEffectiveOption(option), which works out the value from the levels of the option
+    changing    config[option] whilst another thread keeps setting a user value of another option of the section
+
+The reads per second are printed, or written as JSON with --output.
+
+Example:
+
+    python config_benchmark.py --reads 200000
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ganga_python_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+options = ['a', 's', 'p']
+
+
+def rate(function, reads):
+    start = time.perf_counter()
+    function()
+    return len(options) * reads / (time.perf_counter() - start)
+
+
+def benchmark(args):
+    sys.path.insert(0, ganga_python_dir)
+    from GangaCore.Utility.Config import makeConfig
+
+    config = makeConfig('ConfigBenchmark', 'benchmark of the config reads')
+    config.addOption('a', 1, 'an int option')
+    config.addOption('s', 'x', 'a string option')
+    config.addOption('p', '/a:/b', 'a path option')
+    config.addOption('w', 0, 'the option set whilst the others are read')
+    config.setSessionValue('p', '/c')
+    reads = args.reads
+
+    def read_snapshot():
+        for _ in range(reads):
+            for o in options:
+                config[o]
+
+    def read_effective():
+        for _ in range(reads):
+            for o in options:
+                config.getEffectiveOption(o)
+
+    writing = threading.Event()
+
+    def write():
+        n = 0
+        while writing.is_set():
+            n += 1
+            config.setUserValue('w', n)
+
+    writer = threading.Thread(target=write)
+    writing.set()
+    writer.start()
+    try:
+        changing = rate(read_snapshot, reads)
+    finally:
+        writing.clear()
+        writer.join()
+
+    return {'snapshot_per_second': rate(read_snapshot, reads),
+            'effective_per_second': rate(read_effective, reads),
+            'changing_per_second': changing}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the reads of config options')
+    parser.add_argument('--reads', type=int, default=100000, help='number of reads of each option and kind')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    for key in sorted(results):
+        print('%-25s %12.0f' % (key, results[key]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Benchmark of GangaCore.Utility.execute with the fork servers against a new process for each command.
+
+Each command is run --calls times, one after the other and then from --threads threads at once:
+
+    shell     a bash command, 'echo hello'
+    python    a python command returning an object, 'output({...})'
+    env       a bash command updating a copy of the environment of the session
+
+The latencies (mean, median and 95th percentile in ms) and the throughput are printed, or written as JSON with --output.
+
+Example:
+
+    python execute_benchmark.py --calls 200 --threads 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ganga_python_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+commands = {'shell': ('echo hello', True, False),
+            'python': ('output({"status": "Done", "sites": ["A", "B"]})', False, False),
+            'env': ('export GANGA_BENCHMARK=1', True, True)}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def measure(run, calls, threads):
+    """ Return the latencies of the calls and the wall time, with the calls shared by the threads """
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        for _ in range(n):
+            start = time.perf_counter()
+            run()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(calls // threads,)) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return latencies, time.perf_counter() - start
+
+
+def benchmark(args):
+    sys.path.insert(0, ganga_python_dir)
+    from GangaCore.Utility.execute import execute_subprocess, get_fork_server, execute_forked
+
+    results = {}
+    for name, (command, shell, update_env) in commands.items():
+        env = dict(os.environ)
+        runners = {'subprocess': lambda: execute_subprocess(command, None, env, None, shell, '', None, update_env),
+                   'forkserver': lambda: execute_forked(get_fork_server(env), command, None, env, None, shell, '', None, update_env)}
+        # the server is started before the measurements
+        get_fork_server(env)
+        for runner, run in runners.items():
+            for threads in sorted(set([1, args.threads])):
+                latencies, wall = measure(run, args.calls, threads)
+                results['%s/%s/threads=%d' % (name, runner, threads)] = {
+                    'mean_ms': 1000 * sum(latencies) / len(latencies),
+                    'median_ms': 1000 * percentile(latencies, 0.5),
+                    'p95_ms': 1000 * percentile(latencies, 0.95),
+                    'per_second': len(latencies) / wall}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark execute() with the fork servers against a new process for each command')
+    parser.add_argument('--calls', type=int, default=100, help='number of calls of each command')
+    parser.add_argument('--threads', type=int, default=4, help='number of threads running the calls at the same time')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    for key in sorted(results):
+        r = results[key]
+        print('%-40s mean %8.2f ms  median %8.2f ms  p95 %8.2f ms  %8.1f /s' %
+              (key, r['mean_ms'], r['median_ms'], r['p95_ms'], r['per_second']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of attribute reads through the GPI proxies.
+
+--reads reads are made of:
+
+    plain       an attribute of a proxied object, as in 'j.status'
+    filtered    an attribute read through _attribute_filter__get__ of the object
+    child       an attribute of a child object, which is handed out through its proxy, as in 'j.backend.id'
+    iterate     an attribute of each of --objects objects in a list, as in 'for sj in j.subjobs: sj.status'
+
+The reads per second are printed, or written as JSON with --output.
+
+Example:
+
+    python gpi_attribute_benchmark.py --reads 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ganga_python_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+
+def make_classes():
+    """ Return the classes read from, they are declared once GangaCore can be imported """
+    from GangaCore.GPIDev.Base import GangaObject
+    from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem, ComponentItem
+
+    class BenchmarkChildObject(GangaObject):
+        _schema = Schema(Version(1, 0), {
+            'a': SimpleItem(42, typelist=[int]),
+        })
+        _category = 'BenchmarkGPIObject'
+        _name = 'BenchmarkChildObject'
+        _enable_plugin = True
+
+    class BenchmarkObject(GangaObject):
+        _schema = Schema(Version(1, 0), {
+            'a': SimpleItem(42, typelist=[int]),
+            'b': ComponentItem('BenchmarkGPIObject', defvalue='BenchmarkChildObject'),
+        })
+        _category = 'BenchmarkGPIObject'
+        _name = 'BenchmarkObject'
+        _enable_plugin = True
+
+    class BenchmarkFilteredObject(BenchmarkObject):
+        _schema = BenchmarkObject._schema.inherit_copy()
+        _category = 'BenchmarkGPIObject'
+        _name = 'BenchmarkFilteredObject'
+
+        def _attribute_filter__get__(self, name):
+            return object.__getattribute__(self, name)
+
+    return BenchmarkObject, BenchmarkFilteredObject
+
+
+def rate(function, reads):
+    start = time.perf_counter()
+    function()
+    return reads / (time.perf_counter() - start)
+
+
+def benchmark(args):
+    sys.path.insert(0, ganga_python_dir)
+    from GangaCore.GPIDev.Base.Proxy import addProxy
+    plain_class, filtered_class = make_classes()
+    plain = addProxy(plain_class())
+    filtered = addProxy(filtered_class())
+    objects = [addProxy(plain_class()) for _ in range(args.objects)]
+    reads = args.reads
+
+    def read_plain():
+        for _ in range(reads):
+            plain.a
+
+    def read_filtered():
+        for _ in range(reads):
+            filtered.a
+
+    def read_child():
+        for _ in range(reads):
+            plain.b.a
+
+    def read_iterate():
+        for _ in range(reads // len(objects)):
+            for o in objects:
+                o.a
+
+    iterated = len(objects) * (reads // len(objects))
+    return {'plain_per_second': rate(read_plain, reads),
+            'filtered_per_second': rate(read_filtered, reads),
+            'child_per_second': rate(read_child, reads),
+            'iterate_per_second': rate(read_iterate, iterated)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the attribute reads through the GPI proxies')
+    parser.add_argument('--reads', type=int, default=20000, help='number of reads of each kind')
+    parser.add_argument('--objects', type=int, default=1000, help='number of objects in the list iterated over')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    for key in sorted(results):
+        print('%-25s %12.0f' % (key, results[key]))
+
+
+if __name__ == '__main__':
+    main()
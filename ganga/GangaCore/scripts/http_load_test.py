@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Load test for the web gui monitoring server started with 'ganga --webgui'.
+
+Fires the queries issued by the web gui at a running server from several client threads
+and reports the throughput and the latency of each query. With --etag the clients send back
+the ETag of their previous answer, as a browser does, so unchanged answers come back as 304.
+
+Example:
+
+    python http_load_test.py --port 8080 --clients 8 --requests 200 --etag --jobid 12
+"""
+
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+
+default_queries = ['users', 'jobs', 'jobs_statuses', 'jobs_backends', 'jobs_applications']
+subjob_queries = ['subjobs', 'subjobs_statuses', 'subjobs_backends', 'subjobs_applications', 'subjobs_actualCE', 'subjobs_accumulate']
+
+
+def build_urls(host, port, jobid, timerange):
+    base = 'http://%s:%s/?jsonp_callback=cb' % (host, port)
+    if timerange:
+        base += '&timerange=%s' % timerange
+    urls = [('%s&list=%s' % (base, query), query) for query in default_queries]
+    if jobid is not None:
+        urls += [('%s&list=%s&taskmonid=%s' % (base, query, jobid), query) for query in subjob_queries]
+    return urls
+
+
+def client(urls, n_requests, use_etag, results, lock):
+    etags = {}
+    timings = []
+    not_modified = 0
+    errors = 0
+    for i in range(n_requests):
+        url, query = urls[i % len(urls)]
+        request = urllib.request.Request(url)
+        if use_etag and url in etags:
+            request.add_header('If-None-Match', etags[url])
+        start = time.time()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                etags[url] = response.headers.get('ETag')
+        except urllib.error.HTTPError as err:
+            if err.code == 304:
+                not_modified += 1
+            else:
+                errors += 1
+        except Exception:
+            # refused or dropped connections count as errors but do not stop the client
+            errors += 1
+        timings.append((query, time.time() - start))
+    with lock:
+        results['timings'].extend(timings)
+        results['not_modified'] += not_modified
+        results['errors'] += errors
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Ganga web gui monitoring server')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', default=8080, type=int)
+    parser.add_argument('--clients', default=4, type=int, help='number of concurrent clients')
+    parser.add_argument('--requests', default=100, type=int, help='number of requests per client')
+    parser.add_argument('--jobid', default=None, type=int, help='master job to use for the subjob queries')
+    parser.add_argument('--timerange', default=None, help='e.g. lastDay, lastWeek')
+    parser.add_argument('--etag', action='store_true', help='send If-None-Match with the last ETag seen')
+    args = parser.parse_args()
+
+    urls = build_urls(args.host, args.port, args.jobid, args.timerange)
+    results = {'timings': [], 'not_modified': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    threads = [threading.Thread(target=client, args=(urls, args.requests, args.etag, results, lock))
+               for _ in range(args.clients)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    timings = results['timings']
+    print('%d requests in %.2fs: %.1f requests/s, %d not modified, %d errors' %
+          (len(timings), elapsed, len(timings) / elapsed, results['not_modified'], results['errors']))
+    print('%-22s %8s %10s %10s %10s' % ('query', 'count', 'mean ms', 'p50 ms', 'p95 ms'))
+    for query in default_queries + subjob_queries:
+        values = [t for q, t in timings if q == query]
+        if not values:
+            continue
+        print('%-22s %8d %10.2f %10.2f %10.2f' % (query, len(values), 1000 * sum(values) / len(values),
+                                                  1000 * percentile(values, 0.5), 1000 * percentile(values, 0.95)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark of the overhead of the timers of GangaCore.Utility.Metrics.
+
+An empty block is run --calls times, from --threads threads at once:
+
+    bare        without a timer, the cost of the loop itself
+    timed       in a timer which times every call
+    sampled     in a timer which times one call in --sample
+    decorated   as a function decorated by a timer which times one call in --sample
+    disabled    in a timer with the metrics turned off
+
+The overhead of a call over the bare loop is printed in microseconds, or written as JSON with --output.
+
+Example:
+
+    python metrics_benchmark.py --calls 1000000 --threads 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ganga_python_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+
+def measure(loop, calls, threads):
+    """ Return the wall time of the calls shared by the threads """
+    workers = [threading.Thread(target=loop, args=(calls // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - start
+
+
+def benchmark(args):
+    sys.path.insert(0, ganga_python_dir)
+    from GangaCore.Utility.Metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    timed = registry.timer('benchmark_timed_seconds', 'every call timed')
+    sampled = registry.timer('benchmark_sampled_seconds', 'sampled calls', sample=args.sample)
+    disabled = MetricsRegistry()
+    disabled.enabled = False
+    off = disabled.timer('benchmark_off_seconds', 'metrics turned off')
+
+    @sampled.timed
+    def work():
+        pass
+
+    def bare(n):
+        for _ in range(n):
+            pass
+
+    def in_timer(timer):
+        def loop(n):
+            for _ in range(n):
+                with timer:
+                    pass
+        return loop
+
+    def decorated(n):
+        for _ in range(n):
+            work()
+
+    loops = {'timed': in_timer(timed), 'sampled': in_timer(sampled), 'decorated': decorated, 'disabled': in_timer(off)}
+    baseline = measure(bare, args.calls, args.threads)
+    results = {'bare_us': 1e6 * baseline / args.calls}
+    for name, loop in loops.items():
+        results[name + '_overhead_us'] = 1e6 * (measure(loop, args.calls, args.threads) - baseline) / args.calls
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the overhead of the timers of the metrics')
+    parser.add_argument('--calls', type=int, default=100000, help='number of timed calls of each kind')
+    parser.add_argument('--threads', type=int, default=1, help='number of threads making the calls at the same time')
+    parser.add_argument('--sample', type=int, default=100, help='one call in this number is timed by the sampled timers')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    for key in sorted(results):
+        print('%-25s %8.3f us' % (key, results[key]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the job repository and the monitoring against synthetic job populations.
+
+For each population size a repository is generated once with the TestSubmitter backend (from GangaTest)
+and kept in --workdir, so later runs only pay for the measurements. A fresh copy of it is then opened
+in a new process which times:
+
+    startup        start of Ganga on the repository, including the imports
+    len            len(jobs)
+    select         jobs.select(status='completed') and jobs.select(minid, maxid)
+    display        str(jobs), as printed by 'jobs' at the prompt
+    subjob_load    reading the status of every subjob of the master jobs
+    split          splitting a job into --subjobs subjobs
+    flush          writing --changes jobs after a change of their status
+    monitoring     --cycles monitoring updates of all the running jobs, in the bunches the monitoring loop uses
+
+The results are written as JSON. Two result files are compared with --compare.
+
+Example:
+
+    python repository_benchmark.py --jobs 1000 10000 --masters 10 --subjobs 100 --output after.json
+    python repository_benchmark.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ganga_python_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+statuses = ['new', 'submitted', 'running', 'completed', 'failed', 'completed', 'completed', 'killed']
+
+
+def population_name(n_jobs, n_masters, n_subjobs):
+    return 'jobs%d_masters%d_subjobs%d' % (n_jobs, n_masters, n_subjobs)
+
+
+def start(gangadir):
+    sys.path.insert(0, ganga_python_dir)
+    from GangaCore.testlib.GangaUnitTest import start_ganga
+    start_ganga(gangadir, extra_opts=[('TestingFramework', 'AutoCleanup', 'False'),
+                                      ('PollThread', 'autostart', False)])
+
+
+def stop():
+    from GangaCore.testlib.GangaUnitTest import stop_ganga
+    stop_ganga()
+
+
+def make_subjobs(job, n_subjobs):
+    from GangaCore.GPI import ArgSplitter
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    job.splitter = ArgSplitter(args=[[str(i)] for i in range(n_subjobs)])
+    return stripProxy(job)._doSplitting()
+
+
+def generate(args):
+    """ Fill an empty repository with the synthetic population """
+    from GangaCore.GPI import Job, Executable, TestSubmitter
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    from GangaCore.Core.GangaRepository import getRegistry
+
+    for i in range(args.jobs):
+        # the jobs run for long enough not to complete during the benchmark
+        j = stripProxy(Job(application=Executable(), backend=TestSubmitter(time=10 * 24 * 3600)))
+        j.backend.start_time = time.time()
+        if i < args.masters and args.subjobs:
+            for sj in make_subjobs(j, args.subjobs):
+                sj.status = 'running'
+                sj.backend.start_time = time.time()
+            j.status = 'running'
+        else:
+            j.status = statuses[i % len(statuses)]
+        if i % 1000 == 999:
+            getRegistry('jobs').flush_all()
+    getRegistry('jobs').flush_all()
+
+
+def measure(args):
+    """ Time the operations on the repository opened by start() """
+    from GangaCore.GPI import jobs, Job, Executable, TestSubmitter
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    from GangaCore.Core.GangaRepository import getRegistry
+    from GangaCore.Utility.Config import getConfig
+
+    results = {}
+
+    def timed(name, function, *f_args):
+        begin = time.time()
+        value = function(*f_args)
+        results[name] = time.time() - begin
+        return value
+
+    timed('len', len, jobs)
+    timed('select_status', lambda: jobs.select(status='completed'))
+    timed('select_range', lambda: jobs.select(args.jobs // 4, args.jobs // 2))
+    timed('display', str, jobs)
+
+    masters = [stripProxy(j) for j in jobs.select(0, args.masters - 1)] if args.masters and args.subjobs else []
+    timed('subjob_load', lambda: [sj.status for m in masters for sj in m.subjobs])
+
+    split_job = stripProxy(Job(application=Executable(), backend=TestSubmitter()))
+    timed('split', make_subjobs, split_job, args.subjobs or 100)
+    split_job.remove()
+
+    changed = [stripProxy(j) for j in jobs.select(status='completed')][:args.changes]
+    for j in changed:
+        j.status = 'failed'
+    timed('flush', getRegistry('jobs').flush_all)
+    results['flush_jobs'] = len(changed)
+
+    running = [stripProxy(j) for j in jobs.select(status='running')]
+    running = [sj for j in running for sj in (j.subjobs or [j])]
+    bunch = getConfig('PollThread')['numParallelJobs']
+    results['monitoring_jobs'] = len(running)
+    cycles = []
+    for _ in range(args.cycles):
+        begin = time.time()
+        for i in range(0, len(running), bunch):
+            TestSubmitter._impl.master_updateMonitoringInformation(running[i:i + bunch])
+        getRegistry('jobs').flush_all()
+        cycles.append(time.time() - begin)
+    results['monitoring_cycle'] = min(cycles) if cycles else 0.
+
+    return results
+
+
+def child(args):
+    """ Run in a new process: generate or measure one population and write the results to --result-file """
+    begin = time.time()
+    start(args.gangadir)
+    if args.generate:
+        begin = time.time()
+        generate(args)
+        results = {'generate': time.time() - begin}
+    else:
+        results = {'startup': time.time() - begin}
+        results.update(measure(args))
+    stop()
+    with open(args.result_file, 'w') as result_file:
+        json.dump(results, result_file)
+
+
+def run_child(args, gangadir, generate=False):
+    fd, result_file = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    command = [sys.executable, os.path.realpath(__file__), '--child', '--gangadir', gangadir, '--result-file', result_file,
+               '--jobs', str(args.jobs), '--masters', str(args.masters), '--subjobs', str(args.subjobs),
+               '--changes', str(args.changes), '--cycles', str(args.cycles)]
+    if generate:
+        command.append('--generate')
+    with open(os.path.join(os.path.dirname(gangadir), os.path.basename(gangadir) + '.log'), 'w') as log:
+        subprocess.check_call(command, stdout=log, stderr=subprocess.STDOUT)
+    with open(result_file) as result:
+        results = json.load(result)
+    os.remove(result_file)
+    return results
+
+
+def run(args):
+    populations = []
+    for n_jobs in args.jobs:
+        population = argparse.Namespace(**vars(args))
+        population.jobs = n_jobs
+        population.masters = min(args.masters, n_jobs)
+        name = population_name(n_jobs, population.masters, args.subjobs)
+
+        cached = os.path.join(args.workdir, name)
+        generated = None
+        if not os.path.isdir(cached) or args.regenerate:
+            shutil.rmtree(cached, ignore_errors=True)
+            print('generating %s' % name)
+            # only a complete repository is kept
+            generated = run_child(population, cached + '_new', generate=True)['generate']
+            os.rename(cached + '_new', cached)
+
+        scratch = os.path.join(args.workdir, name + '_run')
+        shutil.rmtree(scratch, ignore_errors=True)
+        shutil.copytree(cached, scratch, symlinks=True)
+        print('measuring %s' % name)
+        results = run_child(population, scratch)
+        shutil.rmtree(scratch, ignore_errors=True)
+        if generated is not None:
+            results['generate'] = generated
+
+        populations.append({'name': name, 'jobs': n_jobs, 'masters': population.masters, 'subjobs': args.subjobs,
+                            'results': results})
+        print_results(populations[-1])
+
+    report = {'time': time.time(),
+              'host': platform.node(),
+              'python': platform.python_version(),
+              'populations': populations}
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=1, sort_keys=True)
+        print('results written to %s' % args.output)
+
+
+def print_results(population):
+    print('%s:' % population['name'])
+    for name, value in sorted(population['results'].items()):
+        if isinstance(value, float):
+            print('    %-18s %10.3f s' % (name, value))
+        else:
+            print('    %-18s %10d' % (name, value))
+
+
+def compare(files):
+    reports = []
+    for file_name in files:
+        with open(file_name) as report_file:
+            reports.append(json.load(report_file))
+    for i, file_name in enumerate(files):
+        print('[%d] %s' % (i, file_name))
+    names = []
+    for report in reports:
+        for population in report['populations']:
+            if population['name'] not in names:
+                names.append(population['name'])
+    for name in names:
+        tables = [dict((p['name'], p['results']) for p in report['populations']).get(name, {}) for report in reports]
+        print('\n%s' % name)
+        print('    %-18s %s' % ('seconds', ''.join('%18s' % ('[%d]' % i) for i in range(len(files)))))
+        for benchmark in sorted(set().union(*tables)):
+            first = tables[0].get(benchmark)
+            cells = []
+            for table in tables:
+                value = table.get(benchmark)
+                if value is None:
+                    cells.append('%18s' % '-')
+                elif not isinstance(value, float):
+                    cells.append('%18d' % value)
+                elif table is tables[0] or not first:
+                    cells.append('%18.3f' % value)
+                else:
+                    cells.append('%10.3f x%-6.2f' % (value, value / first))
+            print('    %-18s %s' % (benchmark, ''.join(cells)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Ganga job repository and monitoring with synthetic job populations')
+    parser.add_argument('--jobs', nargs='+', type=int, default=[1000], help='the number of jobs of each population to run')
+    parser.add_argument('--masters', default=10, type=int, help='the number of jobs of each population which have subjobs')
+    parser.add_argument('--subjobs', default=100, type=int, help='the number of subjobs of each of these jobs')
+    parser.add_argument('--changes', default=100, type=int, help='the number of jobs changed before the flush is timed')
+    parser.add_argument('--cycles', default=3, type=int, help='the number of monitoring cycles, the fastest is kept')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'ganga_benchmark'),
+                        help='where the generated repositories are kept between runs')
+    parser.add_argument('--regenerate', action='store_true', help='generate the repositories again')
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('--compare', nargs='+', default=None, help='compare these result files instead of running')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--generate', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--gangadir', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+    elif args.child:
+        args.jobs = args.jobs[0]
+        child(args)
+    else:
+        if not os.path.isdir(args.workdir):
+            os.makedirs(args.workdir)
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
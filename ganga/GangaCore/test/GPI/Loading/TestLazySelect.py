@@ -0,0 +1,50 @@
+
+
+import pytest
+
+from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+from GangaCore.testlib.decorators import add_config
+
+job_names = ['a', 'b', 'c', 'd']
+
+
+@add_config([('TestingFramework', 'AutoCleanup', 'False')])
+@pytest.mark.usefixtures('gpi')
+class TestLazySelect(object):
+
+    def test_a_JobConstruction(self):
+        """ First construct the jobs, with one of them on a different backend"""
+
+        from GangaCore.GPI import Job, Interactive, jobs
+
+        for name in job_names:
+            Job(name=name)
+        jobs(0).backend = Interactive()
+
+        assert len(jobs) == len(job_names)
+
+    def test_b_SelectFromIndex(self):
+        """ Selecting on indexed attributes must not load any job"""
+
+        from GangaCore.GPI import jobs, Local
+
+        assert len(jobs.select(status='new')) == len(job_names)
+        assert len(jobs.select(name='[ab]')) == 2
+        assert len(jobs.select(backend=Local)) == len(job_names) - 1
+        assert len(jobs.select(status='new', backend='Interactive')) == 1
+        assert len(jobs.select(status='running')) == 0
+
+        for j in jobs:
+            raw_j = stripProxy(j)
+            assert not raw_j._getRegistry().has_loaded(raw_j)
+
+    def test_c_SelectLoadedJob(self):
+        """ A job changed in memory must be selected on its live values"""
+
+        from GangaCore.GPI import jobs
+
+        jobs(1).name = 'renamed'
+
+        assert len(jobs.select(name='renamed')) == 1
+        assert len(jobs.select(name='b')) == 0
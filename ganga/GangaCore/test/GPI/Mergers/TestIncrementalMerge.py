@@ -0,0 +1,42 @@
+
+
+import os
+
+from GangaTest.Framework.utils import file_contains
+from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+from GangaCore.testlib.monitoring import run_until_completed
+
+
+class TestIncrementalMerge(GangaUnitTest):
+
+    def setUp(self):
+        super(TestIncrementalMerge, self).setUp()
+        from GangaCore.GPI import config
+
+        config['Mergers']['incremental_batch_size'] = 2
+
+    def testIncrementalTextMerge(self):
+        from GangaCore.GPI import Job, Executable, Local, ArgSplitter, LocalFile, TextMerger
+
+        j = Job(application=Executable(exe='sh'), backend=Local())
+        # the splitter sets all the arguments of each subjob
+        j.splitter = ArgSplitter(args=[['-c', 'echo "Output from job $0" > out.txt', str(i)] for i in range(5)])
+        j.outputfiles = [LocalFile('out.txt')]
+        j.postprocessors = TextMerger(files=['out.txt'], incremental=True)
+        j.submit()
+
+        assert run_until_completed(j, timeout=120), 'Timeout on job submission: job is still not finished'
+
+        output = os.path.join(j.outputdir, 'out.txt')
+        assert os.path.exists(output), 'Merged file must exist'
+        for i in range(5):
+            assert file_contains(output, 'Output from job %d' % i), 'Output of every subjob must be merged'
+        assert file_contains(output, '# Ganga Merge Ended Successfully #'), 'Merged file must be complete'
+
+        with open(output + '.merge_summary') as summary:
+            assert len([l for l in summary if not l.startswith('#')]) == 5, 'All files must be listed'
+
+        debug_dir = stripProxy(j).getDebugWorkspace(create=False).getPath()
+        assert not os.path.exists(os.path.join(debug_dir, 'incremental_merge')), 'The checkpoint must be removed'
@@ -0,0 +1,65 @@
+
+
+import gzip
+import os
+import tempfile
+
+from GangaTest.Framework.utils import write_file
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+def _concatenate(file_list, output_file):
+    with open(output_file, 'w') as out:
+        for f in file_list:
+            with open(f) as in_file:
+                out.write(in_file.read())
+
+
+class TestMergeTree(GangaUnitTest):
+
+    def setUp(self):
+        super(TestMergeTree, self).setUp()
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_list = []
+        for i in range(23):
+            file_name = os.path.join(self.tmpdir, 'in%d.txt' % i)
+            write_file(file_name, 'line %d\n' % i)
+            self.file_list.append(file_name)
+
+    def testTreeMergeKeepsAllInput(self):
+        from GangaCore.Lib.Mergers.Merger import treeMerge
+
+        output_file = os.path.join(self.tmpdir, 'out.txt')
+        treeMerge(_concatenate, self.file_list, output_file, batch_size=4, workers=3)
+
+        with open(output_file) as merged:
+            lines = merged.read().splitlines()
+        assert sorted(lines) == sorted('line %d' % i for i in range(23)), 'All input lines should be merged'
+        assert not [f for f in os.listdir(self.tmpdir) if f.startswith('.merge_tree_')], 'Intermediate files should be removed'
+
+    def testTreeMergeDisabled(self):
+        from GangaCore.Lib.Mergers.Merger import treeMerge
+
+        calls = []
+
+        def _merge(file_list, output_file):
+            calls.append(len(file_list))
+            _concatenate(file_list, output_file)
+
+        treeMerge(_merge, self.file_list, os.path.join(self.tmpdir, 'out.txt'), batch_size=0)
+        assert calls == [23], 'A batch size of 0 should do a single merge'
+
+    def testTextMergerStreamsGzip(self):
+        from GangaCore.GPI import TextMerger
+
+        output_file = os.path.join(self.tmpdir, 'out.txt')
+        tm = TextMerger(compress=True)
+        tm._impl.mergefiles(self.file_list, output_file)
+
+        with gzip.open(output_file + '.gz', 'rt') as merged:
+            content = merged.read()
+        for i in range(23):
+            assert 'line %d\n' % i in content, 'Each input should be copied to the output'
+        assert content.endswith('# Ganga Merge Ended Successfully #\n')
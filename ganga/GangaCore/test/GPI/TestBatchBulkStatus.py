@@ -0,0 +1,104 @@
+import os
+import stat
+
+import pytest
+
+from GangaCore.testlib.decorators import add_config
+
+# stand-ins for the LSF commands: bsub hands out increasing ids and bjobs prints the file bjobs_output
+bsub_script = """#!/bin/sh
+n=$(( $(cat {dir}/last_id 2>/dev/null || echo 100) + 1 ))
+echo $n > {dir}/last_id
+echo "Job <$n> is submitted to default queue <normal>."
+"""
+
+bjobs_script = """#!/bin/sh
+test -f {dir}/fail && exit 1
+cat {dir}/bjobs_output
+"""
+
+
+@pytest.fixture
+def fake_lsf(gpi, tmpdir):
+    from GangaCore.GPI import config
+
+    directory = str(tmpdir)
+    for name, text in [('bsub', bsub_script), ('bjobs', bjobs_script)]:
+        script = os.path.join(directory, name)
+        with open(script, 'w') as script_file:
+            script_file.write(text.format(dir=directory))
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+
+    config['LSF']['submit_str'] = 'cd %s; ' + directory + '/bsub %s %s %s %s'
+    config['LSF']['status_str'] = directory + '/bjobs'
+
+    def scheduler(output):
+        with open(os.path.join(directory, 'bjobs_output'), 'w') as output_file:
+            output_file.write(output)
+
+    return directory, scheduler
+
+
+def update(job):
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    stripProxy(job.backend).master_updateMonitoringInformation([stripProxy(job)])
+
+
+def write_status(job, text):
+    with open(os.path.join(job.outputdir, '__jobstatus__'), 'w') as status_file:
+        status_file.write(text)
+
+
+@add_config([('PollThread', 'autostart', False)])
+def test_bulk_status(fake_lsf):
+    from GangaCore.GPI import Job, LSF
+
+    _, scheduler = fake_lsf
+    j1 = Job(backend=LSF())
+    j2 = Job(backend=LSF())
+    j1.submit()
+    j2.submit()
+    assert (j1.backend.id, j2.backend.id) == ('101', '102')
+
+    scheduler('101 RUN normal node1\n102 PEND normal -\n')
+    update(j1)
+    update(j2)
+    assert j1.status == 'running'
+    assert j1.backend.actualCE == 'node1'
+    assert j2.status == 'submitted'
+
+    # the exit code of a finished job is read from its status file
+    scheduler('101 DONE normal node1\n102 RUN normal node2\n')
+    write_status(j1, 'EXITCODE: 0\n')
+    update(j1)
+    update(j2)
+    assert j1.status == 'completed'
+    assert j1.backend.exitcode == 0
+    assert j2.status == 'running'
+
+    # a job which leaves the batch system without an exit code is failed the second time it is missing
+    scheduler('')
+    update(j2)
+    assert j2.status == 'running'
+    update(j2)
+    assert j2.status == 'failed'
+
+
+@add_config([('PollThread', 'autostart', False)])
+def test_status_files_fallback(fake_lsf):
+    from GangaCore.GPI import Job, LSF
+
+    directory, scheduler = fake_lsf
+    j = Job(backend=LSF())
+    j.submit()
+
+    open(os.path.join(directory, 'fail'), 'w').close()
+    write_status(j, 'PID: 101\nQUEUE: short\n')
+    update(j)
+    assert j.status == 'running'
+    assert j.backend.actualqueue == 'short'
+
+    write_status(j, 'PID: 101\nQUEUE: short\nEXITCODE: 3\n')
+    update(j)
+    assert j.status == 'failed'
+    assert j.backend.exitcode == 3
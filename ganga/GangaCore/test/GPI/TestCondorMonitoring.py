@@ -0,0 +1,116 @@
+import os
+import stat
+
+import pytest
+
+from GangaCore.testlib.decorators import add_config
+
+# stand-ins for condor_q and condor_history: they log their arguments and print the file <command>_output
+fake_command = """#!/bin/sh
+echo "$@" >> {dir}/{name}_calls
+cat {dir}/{name}_output
+"""
+
+
+@pytest.fixture
+def fake_condor(gpi, tmpdir, monkeypatch):
+    directory = str(tmpdir)
+    for name in ['condor_q', 'condor_history']:
+        script = os.path.join(directory, name)
+        with open(script, 'w') as script_file:
+            script_file.write(fake_command.format(dir=directory, name=name))
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+        open(os.path.join(directory, name + '_output'), 'w').close()
+    monkeypatch.setenv('PATH', directory + os.pathsep + os.environ['PATH'])
+
+    def output(name, lines):
+        with open(os.path.join(directory, name + '_output'), 'w') as output_file:
+            output_file.write(''.join('\t'.join(line) + '\n' for line in lines))
+
+    def calls(name):
+        path = os.path.join(directory, name + '_calls')
+        if not os.path.exists(path):
+            return []
+        with open(path) as calls_file:
+            return calls_file.read().splitlines()
+
+    return output, calls
+
+
+def submitted_job(condor_id, tagged=True):
+    """ A Condor job as it is after its submission, tagged with GangaJobId unless submitted by an older Ganga """
+    from GangaCore.GPI import Job, Condor
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    j = Job(backend=Condor())
+    stripProxy(j).updateStatus('submitting')
+    stripProxy(j).updateStatus('submitted')
+    stripProxy(j.backend).id = condor_id
+    stripProxy(j.backend).tagged = tagged
+    return j
+
+
+def update(*jobs):
+    from GangaCore.GPI import Condor
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    Condor._impl.updateMonitoringInformation([stripProxy(j) for j in jobs])
+
+
+@add_config([('PollThread', 'autostart', False), ('Condor', 'query_global_queues', False)])
+def test_single_query(fake_condor):
+    output, calls = fake_condor
+    j1 = submitted_job('schedd#10.0#1500000000')
+    j2 = submitted_job('11.0')
+
+    output('condor_q', [('schedd#10.0#1500000000', '10', '0', '2', 'node1', '12.0'),
+                        ('schedd#11.0#1500000001', '11', '0', '1', 'undefined', '0.0')])
+    update(j1, j2)
+
+    assert len(calls('condor_q')) == 1
+    assert calls('condor_q')[0].startswith("-constraint GangaJobId =!= undefined -af:t")
+    assert j1.status == 'running'
+    assert j1.backend.actualCE == 'node1'
+    assert j1.backend.cputime == '12.0'
+    assert j2.status == 'submitted'
+    assert j2.backend.status == 'Idle'
+    # the GlobalJobId of the job submitted with a local id is kept
+    assert j2.backend.id == 'schedd#11.0#1500000001'
+
+
+@add_config([('PollThread', 'autostart', False), ('Condor', 'query_global_queues', False)])
+def test_history(fake_condor):
+    output, calls = fake_condor
+    j1 = submitted_job('schedd#10.0#1500000000')
+    j2 = submitted_job('schedd#11.0#1500000001')
+
+    output('condor_history', [('schedd#10.0#1500000000', '10', '0', '4', 'node1', '30.0', '0'),
+                              ('schedd#11.0#1500000001', '11', '0', '4', 'node2', '5.0', '2')])
+    update(j1, j2)
+
+    assert len(calls('condor_history')) == 1
+    assert j1.status == 'completed'
+    assert j1.backend.exitcode == 0
+    assert j1.backend.cputime == '30.0'
+    assert j2.status == 'failed'
+    assert j2.backend.exitcode == 2
+    assert j2.backend.actualCE == 'node2'
+
+
+@add_config([('PollThread', 'autostart', False), ('Condor', 'query_global_queues', False)])
+def test_untagged_job(fake_condor):
+    """ The jobs submitted before GangaJobId was added to their ClassAd are selected by their ids """
+    output, calls = fake_condor
+    j1 = submitted_job('schedd#10.0#1500000000')
+    j2 = submitted_job('schedd#11.0#1500000001', tagged=False)
+    j3 = submitted_job('12.0', tagged=False)
+
+    output('condor_q', [('schedd#11.0#1500000001', '11', '0', '2', 'node2', '1.0'),
+                        ('schedd#12.0#1500000002', '12', '0', '1', 'undefined', '0.0')])
+    update(j1, j2, j3)
+
+    query = calls('condor_q')[0]
+    assert '(GangaJobId =!= undefined) || ' in query
+    assert 'GlobalJobId == "schedd#11.0#1500000001"' in query
+    assert '(ClusterId == 12 && ProcId == 0)' in query
+    assert 'schedd#10.0#1500000000' not in query
+    assert j2.status == 'running'
+    assert j3.backend.status == 'Idle'
@@ -0,0 +1,191 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from GangaCore.testlib.decorators import add_config
+
+# the supervisor runs 'python2 <script> subprocess', this stand-in runs the script with sh instead
+fake_python = """#!/bin/sh
+exec sh "$1"
+"""
+
+job_script = """echo start {n} >> {log}
+sleep 0.3
+echo end {n} >> {log}
+exit {code}
+"""
+
+
+class FakeBackend(object):
+    wrapper_pid = -1
+
+
+class FakeJob(object):
+
+    def __init__(self, n):
+        self.n = n
+        self.backend = FakeBackend()
+
+    def getFQID(self, sep):
+        return str(self.n)
+
+    def _getSessionLock(self):
+        pass
+
+
+@pytest.fixture
+def supervisor(gpi, tmpdir, monkeypatch):
+    from GangaCore.Lib.Localhost.LocalSupervisor import LocalSupervisor
+
+    directory = str(tmpdir)
+    python = os.path.join(directory, 'python2')
+    with open(python, 'w') as script_file:
+        script_file.write(fake_python)
+    os.chmod(python, os.stat(python).st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', directory + os.pathsep + os.environ['PATH'])
+
+    finished = []
+    monkeypatch.setattr(LocalSupervisor, '_finished', staticmethod(finished.extend))
+    s = LocalSupervisor()
+    s.start()
+
+    def launch(n, code=0):
+        script = os.path.join(directory, 'job%d' % n)
+        with open(script, 'w') as script_file:
+            script_file.write(job_script.format(n=n, log=os.path.join(directory, 'log'), code=code))
+        job = FakeJob(n)
+        assert s.launch(job, script)
+        return job
+
+    def log():
+        with open(os.path.join(directory, 'log')) as log_file:
+            return log_file.read().split('\n')[:-1]
+
+    yield s, launch, log, finished
+    s.stop()
+    s.join()
+
+
+def wait_for(finished, n):
+    for _ in range(100):
+        if len(finished) >= n:
+            return
+        time.sleep(0.1)
+
+
+@add_config([('Local', 'max_running', 1)])
+def test_fifo_slots(supervisor):
+    s, launch, log, finished = supervisor
+    j1 = launch(1)
+    j2 = launch(2, code=3)
+    j3 = launch(3)
+    # only one job runs, the others wait
+    assert j1.backend.wrapper_pid != -1
+    assert j2.backend.wrapper_pid == -1
+    assert s.isKnown(j2)
+    assert s.dequeue(j3)
+
+    wait_for(finished, 2)
+    assert finished == [j1, j2]
+    assert log() == ['start 1', 'end 1', 'start 2', 'end 2']
+
+    status, resources = s.collect(j1.backend.wrapper_pid)
+    assert status == 0
+    assert set(resources) == set(['utime', 'stime', 'maxrss_kb'])
+    assert os.WEXITSTATUS(s.collect(j2.backend.wrapper_pid)[0]) == 3
+    # the exit status is only handed out once
+    assert s.collect(j1.backend.wrapper_pid) is None
+    assert not s.isKnown(j3)
+
+
+@add_config([('Local', 'max_running', 2)])
+def test_parallel_slots(supervisor):
+    s, launch, log, finished = supervisor
+    jobs = [launch(n) for n in range(3)]
+    assert [j.backend.wrapper_pid != -1 for j in jobs] == [True, True, False]
+
+    wait_for(finished, 3)
+    assert sorted(j.n for j in finished) == [0, 1, 2]
+    assert log()[:2] == ['start 0', 'start 1'] or log()[:2] == ['start 1', 'start 0']
+
+
+def test_updating(supervisor):
+    """
+    Test that a job held by a thread is skipped by the others, or waited for
+    """
+    s, launch, log, finished = supervisor
+    job = FakeJob(0)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with s.updating(job) as mine:
+            assert mine
+            # a thread may hold a job more than once
+            with s.updating(job) as again:
+                assert again
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert held.wait(5)
+
+    with s.updating(job) as mine:
+        assert not mine
+
+    waited = []
+
+    def wait():
+        with s.updating(job, wait=True) as mine:
+            waited.append(mine)
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.2)
+    assert waited == []
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+    assert waited == [True]
+
+
+def test_lost_child(supervisor, monkeypatch):
+    """
+    Test that a wrapper reaped by someone else is known to have exited, but not how
+    """
+    s, launch, log, finished = supervisor
+    real_wait4 = os.wait4
+
+    def lost_wait4(pid, options):
+        # the child exits but someone else gets its exit status
+        real_wait4(pid, 0)
+        raise ChildProcessError()
+
+    monkeypatch.setattr(os, 'wait4', lost_wait4)
+    job = launch(0)
+
+    wait_for(finished, 1)
+    assert finished == [job]
+    assert not s.isKnown(job)
+    status, resources = s.collect(job.backend.wrapper_pid)
+    assert status is None
+    assert resources == {}
+
+
+@add_config([('Local', 'max_running', 20)])
+def test_kill_at_once(gpi):
+    """
+    Test that the jobs killed straight after their submission are killed, whether their wrapper has made its own
+    process group yet or not
+    """
+    from GangaCore.GPI import Job, ArgSplitter, Local
+    j = Job(backend=Local(), splitter=ArgSplitter(args=[['400'] for _ in range(3)]))
+    j.application.exe = 'sleep'
+    j.submit()
+    j.kill()
+    assert j.status == 'killed'
+    assert [sj.status for sj in j.subjobs] == ['killed'] * 3
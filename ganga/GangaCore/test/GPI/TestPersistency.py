@@ -1,4 +1,7 @@
+import threading
+
 from GangaCore.GPIDev.Base.Proxy import stripProxy
+from GangaCore.testlib.decorators import add_config
 
 
 def test_export(gpi, tmpdir):
@@ -21,3 +24,59 @@ def test_roundtrip(gpi, tmpdir):
     assert type(d) == type(d2)
     assert len(d) == len(d2)
     assert d == d2
+
+
+# keep the write-behind flusher from writing the jobs first
+@add_config([('Registry', 'FlushDelay', 1000)])
+def test_parallel_flush(gpi, monkeypatch):
+    """ Jobs written from several threads at once are all written and their application checked once each """
+    from GangaCore.Core.GangaRepository import GangaRepositoryXML
+    checked = []
+    check_app_hash = GangaRepositoryXML.check_app_hash
+
+    def counting_check(obj):
+        checked.append(obj)
+        check_app_hash(obj)
+
+    monkeypatch.setattr(GangaRepositoryXML, 'check_app_hash', counting_check)
+
+    jobs = [stripProxy(gpi.Job()) for _ in range(20)]
+    registry = jobs[0]._getRegistry()
+    repository = registry.repository
+    for j in jobs:
+        j._setDirty()
+    del checked[:]
+
+    errors = []
+    writing = threading.Event()
+
+    def write(js):
+        try:
+            for j in js:
+                assert registry._flushObject(j)
+        except Exception as err:
+            errors.append(err)
+
+    def read():
+        try:
+            while writing.is_set():
+                repository.getLoadedIds()
+                for j in jobs:
+                    repository.isObjectLoaded(j)
+        except Exception as err:
+            errors.append(err)
+
+    writing.set()
+    reader = threading.Thread(target=read)
+    reader.start()
+    writers = [threading.Thread(target=write, args=(jobs[n::4],)) for n in range(4)]
+    for w in writers:
+        w.start()
+    for w in writers:
+        w.join()
+    writing.clear()
+    reader.join()
+
+    assert errors == []
+    assert sorted(id(o) for o in checked) == sorted(id(j) for j in jobs)
+    assert all(repository.isObjectLoaded(j) for j in jobs)
@@ -0,0 +1,45 @@
+from GangaCore.testlib.decorators import add_config
+
+instant = [('SimulatedBackend', 'queue_time', '0'), ('SimulatedBackend', 'run_time', '0')]
+
+
+@add_config(instant)
+def test_simulated_job_completes(gpi):
+    from GangaCore.GPI import Job, SimulatedBackend
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+    j = Job(backend=SimulatedBackend())
+    j.submit()
+    assert j.status == 'submitted'
+    assert j.backend.id.startswith('sim-')
+
+    stripProxy(j.backend).master_updateMonitoringInformation([stripProxy(j)])
+    assert j.status == 'completed'
+    assert j.backend.exitcode == 0
+
+
+@add_config(instant + [('SimulatedBackend', 'job_failure_rate', 1.0), ('SimulatedBackend', 'status_bulk_size', 3)])
+def test_simulated_subjobs_fail(gpi):
+    from GangaCore.GPI import Job, SimulatedBackend, ArgSplitter
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+    j = Job(backend=SimulatedBackend(), splitter=ArgSplitter(args=[[str(i)] for i in range(10)]))
+    j.submit()
+    assert len(j.subjobs) == 10
+
+    stripProxy(j.backend).master_updateMonitoringInformation([stripProxy(j)])
+    assert all(sj.status == 'failed' for sj in j.subjobs)
+    assert j.status == 'failed'
+
+
+@add_config([('SimulatedBackend', 'queue_time', '3600')])
+def test_simulated_job_queued(gpi):
+    from GangaCore.GPI import Job, SimulatedBackend
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+    j = Job(backend=SimulatedBackend())
+    j.submit()
+    stripProxy(j.backend).master_updateMonitoringInformation([stripProxy(j)])
+    assert j.status == 'submitted'
+    j.kill()
+    assert j.status == 'killed'
@@ -7,8 +7,8 @@ import string
 class TestSubjobs(GangaUnitTest):
 
     def setUp(self):
-        """Make sure that the Job object isn't destroyed between tests"""
-        extra_opts = [ ('TestingFramework', 'AutoCleanup', 'False') ]
+        """Make sure that the Job object isn't destroyed between tests, and that all the subjobs of a job can run at once"""
+        extra_opts = [ ('TestingFramework', 'AutoCleanup', 'False'), ('Local', 'max_running', 20) ]
         super(TestSubjobs, self).setUp(extra_opts=extra_opts)
 
     def testLargeJobSubmission(self):
@@ -81,3 +81,55 @@ class TestSubjobs(GangaUnitTest):
             assert sj.application.args == ['400']
             assert stripProxy(sj)._getRoot() is stripProxy(j)
             assert stripProxy(sj.application)._getRoot() is stripProxy(j)
+
+    def testStatusCounts(self):
+        """
+        Test that the master keeps its subjob status histogram up to date
+        """
+        from GangaCore.GPI import Job, GenericSplitter, Local
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaTest.Framework.utils import sleep_until_state
+        j = Job()
+        j.application.exe = "sleep"
+        j.splitter = GenericSplitter()
+        j.splitter.attribute = 'application.args'
+        j.splitter.values = [['400'] for _ in range(0, 5)]
+        j.backend = Local()
+        j.submit()
+
+        sleep_until_state(j, None, 'running')
+
+        j.subjobs(0).kill()
+        counts = stripProxy(j).getSubJobStatusCounts()
+        assert counts['killed'] == 1
+        assert sum(counts.values()) == 5
+
+        j.kill()
+        assert stripProxy(j).getSubJobStatusCounts() == {'killed': 5}
+        assert j.returnSubjobStatuses() == '0/5/0/0'
+        assert stripProxy(j)._index_cache['subjobs:status_counts'] == {'killed': 5}
+
+    def testStatusCountsChecked(self):
+        """
+        Test that the count of each status is checked once the histogram says all the subjobs have finished
+        """
+        from GangaCore.GPI import Job, GenericSplitter, Local
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaTest.Framework.utils import sleep_until_state
+        j = Job()
+        j.application.exe = "echo"
+        j.splitter = GenericSplitter()
+        j.splitter.attribute = 'application.args'
+        j.splitter.values = [['hello'] for _ in range(0, 3)]
+        j.backend = Local()
+        j.submit()
+
+        assert sleep_until_state(j, 60, 'completed')
+        assert stripProxy(j).getSubJobStatusCounts() == {'completed': 3}
+
+        # a status set around the descriptor is not seen by the histogram
+        stripProxy(j.subjobs(0)).setSchemaAttribute('status', 'running')
+        assert stripProxy(j).getSubJobStatusCounts() == {'completed': 3}
+
+        stripProxy(j.subjobs(1)).status = 'failed'
+        assert stripProxy(j).getSubJobStatusCounts() == {'running': 1, 'failed': 1, 'completed': 1}
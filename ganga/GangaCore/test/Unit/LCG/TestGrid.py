@@ -1,6 +1,9 @@
+import os
+import stat
 
+import pytest
 
-from GangaCore.Utility.GridShell import Shell
+from GangaCore.Utility.Config import getConfig
 
 from ..Credentials.TestCredentialStore import FakeCred
 
@@ -10,14 +13,13 @@ def test_submit_bad_output(mocker):
     Test that the external command returning bad data causes the job to fail
     """
     __set_submit_option__ = mocker.patch('GangaCore.Lib.LCG.Grid.__set_submit_option__', return_value='  ')
-    mocker.patch('GangaCore.Lib.LCG.Grid.getShell', return_value=Shell)
-    cmd1 = mocker.patch('GangaCore.Utility.GridShell.Shell.cmd1', return_value=(0, 'some bad output', False))
+    run = mocker.patch('GangaCore.Lib.LCG.Grid.__run__', return_value=(0, 'some bad output'))
 
     from GangaCore.Lib.LCG import Grid
     job_url = Grid.submit('/some/path', cred_req=FakeCred())
 
     assert __set_submit_option__.call_count == 1
-    assert cmd1.call_count == 1
+    assert run.call_count == 1
 
     assert job_url is None
 
@@ -27,14 +29,153 @@ def test_submit(mocker):
     Test that a job submit succeeds with valid input
     """
     __set_submit_option__ = mocker.patch('GangaCore.Lib.LCG.Grid.__set_submit_option__', return_value='  ')
-    mocker.patch('GangaCore.Lib.LCG.Grid.getShell', return_value=Shell)
-    cmd1 = mocker.patch('GangaCore.Utility.GridShell.Shell.cmd1', return_value=(0, 'https://example.com:9000/some_url', False))
+    run = mocker.patch('GangaCore.Lib.LCG.Grid.__run__', return_value=(0, 'https://example.com:9000/some_url'))
 
     from GangaCore.Lib.LCG import Grid
     job_url = Grid.submit('/some/path', cred_req=FakeCred())
 
     assert __set_submit_option__.call_count == 1
-    assert cmd1.call_count == 1
+    assert run.call_count == 1
 
-    assert '/some/path' in cmd1.call_args[0][0], 'JDL path was not passed correctly'
+    assert '/some/path' in run.call_args[0][0], 'JDL path was not passed correctly'
     assert job_url == 'https://example.com:9000/some_url'
+
+
+# stand-in for glite-ce-job-status: keeps a copy of the ids file it is given and prints the status of the jobs in it,
+# fails for the jobs on broken.example.com
+fake_cream_status = """#!/bin/sh
+cp "$5" {dir}/call.$$
+grep -q broken "$5" && exit 255
+grep https "$5" | while read jid; do
+echo "******  JobID=[$jid]"
+echo "	Status        = [RUNNING]"
+done
+"""
+
+
+@pytest.fixture
+def cream_status(tmpdir, monkeypatch):
+    """ Run Grid.cream_status with the stand-in command and return the ids files given to each call """
+    directory = str(tmpdir.mkdir('bin'))
+    script = os.path.join(directory, 'glite-ce-job-status')
+    with open(script, 'w') as script_file:
+        script_file.write(fake_cream_status.format(dir=directory))
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+
+    env = dict(os.environ)
+    env['PATH'] = directory + os.pathsep + env['PATH']
+
+    class FakeShell(object):
+        pass
+
+    shell = FakeShell()
+    shell.env = env
+
+    from GangaCore.Lib.LCG import Grid
+    from GangaCore.Lib.LCG.EndpointHealth import endpoint_health
+    monkeypatch.setattr(Grid, 'getShell', lambda cred_req=None: shell)
+    gangadir = getConfig('Configuration')['gangadir']
+    getConfig('Configuration').setSessionValue('gangadir', str(tmpdir.mkdir('gangadir')))
+    getConfig('LCG').setSessionValue('CommandRetries', 0)
+    endpoint_health.reset()
+
+    def run(jobids):
+        for name in os.listdir(directory):
+            if name.startswith('call.'):
+                os.remove(os.path.join(directory, name))
+        info = Grid.cream_status(jobids, FakeCred())
+        calls = []
+        for name in os.listdir(directory):
+            if name.startswith('call.'):
+                with open(os.path.join(directory, name)) as call_file:
+                    calls.append(call_file.read().split())
+        return info, sorted(calls)
+
+    yield run
+    endpoint_health.reset()
+    getConfig('LCG').revertToDefault('CommandRetries')
+    getConfig('Configuration').setSessionValue('gangadir', gangadir)
+
+
+def test_cream_status_per_ce(cream_status):
+    """
+    Test that the jobs of each CE are queried by a command of their own
+    """
+    jobids = ['https://ce1.example.com:8443/CREAM1', 'https://ce2.example.com:8443/CREAM2',
+              'https://ce1.example.com:8443/CREAM3']
+    info, calls = cream_status(jobids)
+
+    assert sorted(info) == sorted(jobids)
+    assert info[jobids[1]]['Status'] == 'RUNNING'
+    assert calls == [['##CREAMJOBS##', jobids[0], jobids[2]], ['##CREAMJOBS##', jobids[1]]]
+
+
+def test_cream_status_skips_failing_ce(cream_status):
+    """
+    Test that a CE failing repeatedly is left out of the status queries for a while
+    """
+    from GangaCore.Lib.LCG.EndpointHealth import endpoint_health
+
+    jobids = ['https://ce1.example.com:8443/CREAM1', 'https://broken.example.com:8443/CREAM2']
+    for _ in range(getConfig('LCG')['EndpointFailureThreshold']):
+        info, calls = cream_status(jobids)
+        assert sorted(info) == [jobids[0]]
+        assert len(calls) == 2
+
+    info, calls = cream_status(jobids)
+    assert sorted(info) == [jobids[0]]
+    assert calls == [['##CREAMJOBS##', jobids[0]]]
+
+    stats = endpoint_health.stats()
+    assert stats['broken.example.com']['failures'] == getConfig('LCG')['EndpointFailureThreshold']
+    assert stats['broken.example.com']['skipped_for'] > 0
+    assert stats['ce1.example.com']['failures'] == 0
+
+    # the ids files of the hosts are kept in the gangadir
+    jids = os.path.join(getConfig('Configuration')['gangadir'], 'LCG', 'jids')
+    assert len([name for name in os.listdir(jids) if name.startswith('cream-status_ce1.example.com_')]) == 1
+
+
+# stand-in for arcstat: logs when it starts and ends and prints the status of the jobs in the ids file given with -i
+fake_arcstat = """#!/bin/sh
+while [ $# -gt 0 ]; do [ "$1" = "-i" ] && ids="$2"; shift; done
+echo start >> {dir}/log
+sleep 0.2
+grep https "$ids" | while read jid; do
+echo "Job: $jid"
+echo " State: Running"
+done
+echo end >> {dir}/log
+"""
+
+
+def test_arc_status_one_at_a_time(tmpdir, monkeypatch):
+    """
+    Test that the queries of the CEs, which all update the ARC job list file, do not run at the same time
+    """
+    directory = str(tmpdir.mkdir('bin'))
+    script = os.path.join(directory, 'arcstat')
+    with open(script, 'w') as script_file:
+        script_file.write(fake_arcstat.format(dir=directory))
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+
+    class FakeShell(object):
+        env = dict(os.environ, PATH=directory + os.pathsep + os.environ['PATH'])
+
+    from GangaCore.Lib.LCG import Grid
+    from GangaCore.Lib.LCG.EndpointHealth import endpoint_health
+    monkeypatch.setattr(Grid, 'getShell', lambda cred_req=None: FakeShell())
+    gangadir = getConfig('Configuration')['gangadir']
+    getConfig('Configuration').setSessionValue('gangadir', str(tmpdir.mkdir('gangadir')))
+    endpoint_health.reset()
+    try:
+        jobids = ['https://ce%d.example.com:8443/arex/job%d' % (i, i) for i in range(3)]
+        info = Grid.arc_status(jobids, [''], FakeCred())
+    finally:
+        endpoint_health.reset()
+        getConfig('Configuration').setSessionValue('gangadir', gangadir)
+
+    assert sorted(info) == jobids
+    assert info[jobids[0]]['State'] == 'Running'
+    with open(os.path.join(directory, 'log')) as log_file:
+        assert log_file.read().split() == ['start', 'end'] * 3
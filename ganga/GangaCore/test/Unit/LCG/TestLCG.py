@@ -0,0 +1,66 @@
+import time
+
+
+def test_construct():
+    """
+    Test that the backend can be made and its middleware set: the item names a checkset method LCG does not define
+    """
+    from GangaCore.Lib.LCG import LCG
+    backend = LCG()
+    assert backend.middleware == 'GLITE'
+    backend.middleware = 'CREAM'
+    assert backend.middleware == 'CREAM'
+
+
+def test_downloader_stopped():
+    """
+    Test that a job whose download could not be queued is not remembered as being downloaded
+    """
+    import pytest
+    from GangaCore.Core.GangaThread.BulkOperation import BulkOperationStopped
+    from GangaCore.Lib.LCG.LCGOutputDownloader import LCGOutputDownloader
+
+    class FakeJob(object):
+        def getFQID(self, sep):
+            return '0'
+
+    downloader = LCGOutputDownloader(numThread=1)
+    downloader.stop()
+    with pytest.raises(BulkOperationStopped):
+        downloader.addTask(FakeJob())
+    assert downloader._tasks == set()
+
+
+def test_output_fetcher():
+    """
+    Test that a download runs in the background, is not started twice whilst it runs and can be started again after
+    """
+    import threading
+    from GangaCore.Lib.LCG.Utility import OutputFetcher
+
+    fetcher = OutputFetcher('test_output_fetcher', workers=2)
+    release = threading.Event()
+    done = threading.Event()
+    fetched = []
+
+    def download(key):
+        release.wait(5)
+        fetched.append(key)
+        done.set()
+        return True
+
+    try:
+        assert fetcher.fetch('job', download, 'job')
+        assert not fetcher.fetch('job', download, 'job')
+        assert fetched == []
+        release.set()
+        assert done.wait(5)
+        for _ in range(50):
+            if fetcher.fetch('job', download, 'job'):
+                break
+            time.sleep(0.1)
+        else:
+            assert False, 'the finished download could not be started again'
+    finally:
+        release.set()
+        fetcher.stop()
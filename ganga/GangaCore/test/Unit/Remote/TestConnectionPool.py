@@ -0,0 +1,167 @@
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+paramiko = pytest.importorskip('paramiko')
+
+from GangaCore.Core.exceptions import BackendError
+from GangaCore.Lib.Remote.ConnectionPool import getConnection, closeConnections
+from GangaCore.Utility.Config import getConfig
+
+
+class StandInServer(paramiko.ServerInterface):
+
+    """ An SSH server which accepts one password and runs the commands locally """
+
+    def check_auth_password(self, username, password):
+        if (username, password) == ('user', 'secret'):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        def run():
+            # the channel is closed only after the server has acknowledged the request
+            time.sleep(0.1)
+            result = subprocess.run(command.decode(), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            channel.sendall(result.stdout)
+            channel.sendall_stderr(result.stderr)
+            channel.send_exit_status(result.returncode)
+            channel.close()
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+
+@pytest.fixture(scope='module')
+def host_key():
+    return paramiko.RSAKey.generate(1024)
+
+
+@pytest.fixture
+def server(host_key):
+    """ Listen on a local port, return the port and the server side transports of the connections """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+    transports = []
+
+    def accept():
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(sock)
+            transport.add_server_key(host_key)
+            transport.start_server(server=StandInServer())
+            transports.append(transport)
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield listener.getsockname()[1], transports
+    closeConnections()
+    listener.close()
+    for transport in transports:
+        transport.close()
+
+
+def logon(password):
+    calls = []
+
+    def authenticate(transport):
+        calls.append(transport)
+        transport.connect(username='user', password=password)
+    return authenticate, calls
+
+
+def test_shared_connection(server):
+    port, transports = server
+    authenticate, calls = logon('secret')
+    connection = getConnection('user', '127.0.0.1', port, authenticate)
+    assert getConnection('user', '127.0.0.1', port, authenticate) is connection
+
+    results = []
+
+    def run(n):
+        results.append(connection.execute('echo %d; echo err%d >&2; exit %d' % (n, n, n)))
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # all the commands went over separate channels of one connection
+    assert sorted(results) == [(n, '%d\n' % n, 'err%d\n' % n) for n in range(5)]
+    assert len(calls) == 1
+    assert len(transports) == 1
+
+
+def test_reconnect(server):
+    port, transports = server
+    authenticate, calls = logon('secret')
+    connection = getConnection('user', '127.0.0.1', port, authenticate)
+    assert connection.execute('true')[0] == 0
+
+    # the server drops the connection
+    transports[0].close()
+    assert connection.execute('echo again') == (0, 'again\n', '')
+    assert len(calls) == 2
+    assert len(transports) == 2
+
+
+def test_failed_logon(server):
+    port, transports = server
+    authenticate, calls = logon('wrong')
+    connection = getConnection('user', '127.0.0.1', port, authenticate)
+    with pytest.raises(BackendError):
+        connection.execute('true')
+    assert len(calls) == 3
+
+    # no more attempts until Remote.reconnect_backoff seconds have passed
+    with pytest.raises(BackendError):
+        connection.execute('true')
+    assert len(calls) == 3
+
+    config = getConfig('Remote')
+    saved = config['reconnect_backoff']
+    config.setSessionValue('reconnect_backoff', 0)
+    try:
+        with pytest.raises(BackendError):
+            connection.execute('true')
+    finally:
+        config.setSessionValue('reconnect_backoff', saved)
+    assert len(calls) == 6
+
+
+def test_large_stderr(server):
+    """ A command which writes more to stderr than the window of the channel does not block """
+    port, transports = server
+    authenticate, calls = logon('secret')
+    connection = getConnection('user', '127.0.0.1', port, authenticate)
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(
+        connection.execute("head -c 4000000 /dev/zero | tr '\\0' x >&2; echo done")))
+    thread.daemon = True
+    thread.start()
+    thread.join(30)
+
+    assert results, 'the command did not finish'
+    status, stdout, stderr = results[0]
+    assert (status, stdout, len(stderr)) == (0, 'done\n', 4000000)
+
+
+def test_split_job_output():
+    from GangaCore.Lib.Remote.Remote import split_job_output
+    stdout = 'banner\n***_JOB_ABC_***\nfirst\n***_JOB_DEF_***\nsecond\nmore\n***_BULK_FINISHED_***\n'
+    assert split_job_output(stdout) == {'ABC': 'first\n', 'DEF': 'second\nmore\n***_BULK_FINISHED_***\n'}
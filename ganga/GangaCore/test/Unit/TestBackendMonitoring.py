@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from GangaCore.Utility.Config import getConfig
+
+
+class FakeBackend(object):
+
+    """ Records the jobs it is asked to monitor, slowly, as the threads running it """
+
+    monitored = []
+    lock = threading.Lock()
+
+    @staticmethod
+    def updateMonitoringInformation(jobs):
+        time.sleep(0.2)
+        with FakeBackend.lock:
+            FakeBackend.monitored.extend(j.id for j in jobs)
+
+
+class FakeJob(object):
+
+    def __init__(self, id, subjobs=()):
+        self.id = id
+        self.status = 'running'
+        self.backend = FakeBackend()
+        self.subjobs = list(subjobs)
+
+    def getFQID(self, sep):
+        return str(self.id)
+
+    def _repr(self):
+        return str(self.id)
+
+    def updateMasterJobStatus(self):
+        pass
+
+
+@pytest.fixture
+def multi_thread_monitoring(monkeypatch):
+    """ Monitor with the queues of a ThreadPoolQueueMonitor with 2 workers in each pool """
+    from GangaCore.Core.GangaThread.WorkerThreads.ThreadPoolQueueMonitor import ThreadPoolQueueMonitor
+    from GangaCore.Core.GangaThread.WorkerThreads.WorkerThreadPool import WorkerThreadPool
+    import GangaCore.Core
+    import GangaCore.GPIDev.Adapters.IBackend
+
+    class MonitoringComponent(object):
+        @staticmethod
+        def isEnabled(useRunning=True):
+            return True
+
+    monkeypatch.setattr(GangaCore.Core, 'monitoring_component', MonitoringComponent())
+    queues = ThreadPoolQueueMonitor(*[WorkerThreadPool(2, worker_thread_prefix='Test_%s_' % name)
+                                      for name in ('User', 'Monitoring', 'Finaliser')])
+    monkeypatch.setattr(GangaCore.GPIDev.Adapters.IBackend, 'getQueues', lambda: queues)
+
+    poll_config = getConfig('PollThread')
+    saved = poll_config['enable_multiThreadMon'], poll_config['numParallelJobs']
+    poll_config.setSessionValue('enable_multiThreadMon', True)
+    poll_config.setSessionValue('numParallelJobs', 1)
+    FakeBackend.monitored = []
+    yield queues
+    poll_config.setSessionValue('enable_multiThreadMon', saved[0])
+    poll_config.setSessionValue('numParallelJobs', saved[1])
+    queues._purge_all()
+    queues._stop_all_threads()
+
+
+def test_waits_for_queued_monitoring(multi_thread_monitoring):
+    """
+    Test that all the monitoring tasks have run when the method returns, including those queued behind busy workers
+    and those past the number of worker threads
+    """
+    from GangaCore.GPIDev.Adapters.IBackend import IBackend
+
+    num_blocks = 3 * getConfig('Queues')['NumWorkerThreads']
+    master = FakeJob(0, [FakeJob(i) for i in range(num_blocks)])
+    IBackend.master_updateMonitoringInformation([master, FakeJob(1000)])
+
+    assert sorted(FakeBackend.monitored) == list(range(num_blocks)) + [1000]
+    stats = multi_thread_monitoring.stats()['monitoring']
+    assert (stats['queued'], stats['running']) == (0, 0)
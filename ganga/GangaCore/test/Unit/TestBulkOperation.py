@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation, BulkOperationStopped
+
+
+def test_ordered_and_unordered():
+    def slow_square(x):
+        # the first items finish last
+        time.sleep(0.05 * (5 - x))
+        return x * x
+
+    results = BulkOperation('test_order', slow_square, num_threads=5).run(range(5))
+    assert [r.result for r in results] == [0, 1, 4, 9, 16]
+    assert all(r.ok and r.attempts == 1 for r in results)
+
+    streamed = [r.item for r in BulkOperation('test_stream', slow_square, num_threads=5).stream(range(5))]
+    assert sorted(streamed) == list(range(5))
+    assert streamed[0] == 4
+
+
+def test_retries():
+    calls = {}
+    lock = threading.Lock()
+
+    def flaky(x):
+        with lock:
+            calls[x] = calls.get(x, 0) + 1
+            if calls[x] < 3:
+                raise IOError('try again')
+        return x
+
+    results = BulkOperation('test_retries', flaky, retries=2, retry_backoff=0.01).run([1, 2])
+    assert [(r.ok, r.attempts) for r in results] == [(True, 3), (True, 3)]
+
+    results = BulkOperation('test_no_retries', flaky, retries=1).run([3])
+    assert not results[0].ok
+    assert isinstance(results[0].error, IOError)
+    assert results[0].attempts == 2
+
+
+def test_timeout():
+    release = threading.Event()
+
+    def stuck(x):
+        if x == 'stuck':
+            release.wait(10)
+        return x
+
+    start = time.time()
+    results = BulkOperation('test_timeout', stuck, num_threads=2, timeout=0.3).run(['stuck', 'fine'])
+    release.set()
+
+    assert time.time() - start < 5
+    assert isinstance(results[0].error, TimeoutError)
+    assert results[1].result == 'fine'
+
+
+def test_stop():
+    started = threading.Event()
+    release = threading.Event()
+    done = []
+
+    def work(x):
+        started.set()
+        release.wait(5)
+        done.append(x)
+        return x
+
+    operation = BulkOperation('test_stop', work, num_threads=1, keep_alive=True)
+    futures = [operation.submit(x) for x in range(3)]
+    assert started.wait(5)
+
+    stopper = threading.Thread(target=operation.stop)
+    stopper.start()
+    while not operation._stopping.is_set():
+        time.sleep(0.01)
+    release.set()
+    stopper.join(5)
+
+    # the item running finishes, the others are not started
+    results = [f.result(5) for f in futures]
+    assert results[0].ok
+    assert all(isinstance(r.error, BulkOperationStopped) for r in results[1:])
+    assert done == [0]
+    assert not operation.run([4])[0].ok
@@ -0,0 +1,47 @@
+import unittest
+
+from GangaCore.Utility.Config import makeConfig, ConfigError
+
+
+class TestConfigSnapshot(unittest.TestCase):
+    """
+    Test the compiled snapshot behind config[...] reads
+    """
+
+    def setUp(self):
+        self.c = makeConfig('TestConfigSnapshot_%s' % self._testMethodName, 'testing the config snapshot')
+        self.c.addOption('a', 1, 'an int option')
+        self.c.addOption('s', 'x', 'a string option')
+
+    def test_levels(self):
+        self.assertEqual(self.c['a'], 1)
+        self.c.setSessionValue('a', '2')
+        self.assertEqual(self.c['a'], 2)
+        self.c.setUserValue('a', 3)
+        self.assertEqual(self.c['a'], 3)
+        self.c.revertToSession('a')
+        self.assertEqual(self.c['a'], 2)
+        self.c.revertToDefault('a')
+        self.assertEqual(self.c['a'], 1)
+
+    def test_snapshot_is_swapped(self):
+        snapshot = self.c.getSnapshot()
+        self.c.setUserValue('s', 'y')
+        self.assertEqual(snapshot['s'], 'x')
+        self.assertEqual(self.c.getSnapshot()['s'], 'y')
+        with self.assertRaises(TypeError):
+            snapshot['s'] = 'z'
+
+    def test_new_option(self):
+        self.c['a']
+        self.c.addOption('b', 5, 'added after the first read')
+        self.assertEqual(self.c['b'], 5)
+        self.assertRaises(ConfigError, self.c.__getitem__, 'missing')
+
+    def test_change_listener(self):
+        changes = []
+        self.c.addChangeListener(lambda name, value: changes.append((name, value)))
+        self.c.setUserValue('a', 7)
+        self.c.setUserValue('a', 7)
+        self.c.overrideDefaultValue('s', 'z')
+        self.assertEqual(changes, [('a', 7), ('s', 'z')])
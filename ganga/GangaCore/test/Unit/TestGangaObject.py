@@ -315,3 +315,25 @@ class TestThreadSafeGangaObject(MultiThreadedTestCase):
                     assert o.b.a == num
 
         self.run_threads([change])
+
+    def test_unlocked_reads(self):
+        """
+        Unlocked reads from many threads must only ever see values which were set, whilst writers keep changing them.
+        """
+        o = ThreadedTestGangaObject()
+        child = o.b
+        reads_per_thread = 20000
+        valid = set(range(0, 1000)) | {42}
+
+        def read(thread_number):
+            for _ in range(reads_per_thread):
+                assert o.a in valid
+                assert child.a in valid
+
+        def write(thread_number):
+            rand = random.Random(thread_number)
+            for _ in range(1000):
+                o.a = rand.randint(0, 999)
+                child.a = rand.randint(0, 999)
+
+        self.run_threads([read, read, read, write], num_threads=16)
@@ -0,0 +1,101 @@
+import os
+
+from GangaCore.GPIDev.Adapters import IMerger
+from GangaCore.GPIDev.Adapters.IMerger import IncrementalMergeState
+
+
+class FakeWorkspace(object):
+
+    def __init__(self, path):
+        self.path = path
+
+    def getPath(self):
+        return self.path
+
+
+class FakeJob(object):
+
+    def __init__(self, path, fqid='0'):
+        self.path = path
+        self.fqid = fqid
+
+    def getDebugWorkspace(self):
+        return FakeWorkspace(self.path)
+
+    def getFQID(self, sep):
+        return self.fqid
+
+
+def test_journal(tmpdir):
+    job = FakeJob(str(tmpdir))
+    state = IncrementalMergeState(job)
+    for i in range(3):
+        state.record(i, {'out.txt': ['/out/%d/out.txt' % i]})
+    # a subjob is only recorded once
+    state.record(1, {'out.txt': ['/out/1/out.txt']})
+
+    location = os.path.join(str(tmpdir), 'incremental_merge')
+    assert not os.path.exists(os.path.join(location, state.checkpoint_name))
+    with open(os.path.join(location, state.journal_name), 'a') as journal:
+        # an append interrupted half way
+        journal.write('{"subjob": 3, "fi')
+
+    reloaded = IncrementalMergeState(job)
+    assert reloaded.subjobs == set([0, 1, 2])
+    assert reloaded.entry('out.txt')['pending'] == ['/out/%d/out.txt' % i for i in range(3)]
+
+    # a save takes over the journal
+    reloaded.entry('out.txt')['pending'] = []
+    reloaded.save()
+    assert not os.path.exists(os.path.join(location, state.journal_name))
+    reloaded = IncrementalMergeState(job)
+    assert reloaded.subjobs == set([0, 1, 2])
+    assert reloaded.entry('out.txt')['pending'] == []
+
+
+def test_state_kept_until_merged(tmpdir):
+    job = FakeJob(str(tmpdir), fqid='test_state_kept_until_merged')
+    state = IMerger._getIncrementalState(job)
+    assert IMerger._getIncrementalState(job) is state
+    IMerger._getIncrementalLock(job)
+
+    IMerger._forgetIncremental(job)
+    assert job.fqid not in IMerger._incremental_states
+    assert job.fqid not in IMerger._incremental_locks
+
+
+class FakeMerger(object):
+
+    _foldQueued = IMerger.IMerger._foldQueued
+
+    def __init__(self):
+        self.folded = []
+
+    def _foldPending(self, state, key):
+        self.folded.append(key)
+        state.entry(key)['pending'] = []
+
+
+def test_fold_queued(tmpdir):
+    from GangaCore.Utility.Config import getConfig
+    job = FakeJob(str(tmpdir), fqid='test_fold_queued')
+    merger = FakeMerger()
+    state = IMerger._getIncrementalState(job)
+    IMerger._getIncrementalLock(job)
+    batch_size = getConfig('Mergers')['incremental_batch_size']
+    state.entry('full.txt')['pending'] = ['/out/%d/full.txt' % i for i in range(batch_size)]
+    state.entry('short.txt')['pending'] = ['/out/0/short.txt']
+
+    merger._foldQueued(job, ['full.txt', 'short.txt'])
+    assert merger.folded == ['full.txt']
+    # a second fold queued for the same files finds nothing left to do
+    merger._foldQueued(job, ['full.txt'])
+    assert merger.folded == ['full.txt']
+
+    # a fold which runs after the final merge neither folds nor brings the state back
+    state.entry('full.txt')['pending'] = ['/out/%d/full.txt' % i for i in range(batch_size)]
+    IMerger._forgetIncremental(job)
+    merger._foldQueued(job, ['full.txt'])
+    assert merger.folded == ['full.txt']
+    assert job.fqid not in IMerger._incremental_states
+    assert job.fqid not in IMerger._incremental_locks
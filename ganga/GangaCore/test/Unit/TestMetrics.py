@@ -0,0 +1,91 @@
+import threading
+import unittest
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.Metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Test the counters and timers of the hot paths
+    """
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.metrics.counter('things_total', 'things')
+        counter.inc()
+        counter.inc(4)
+        self.assertIs(self.metrics.counter('things_total', 'things'), counter)
+        self.assertEqual(self.metrics.snapshot()['things_total'], {'value': 5})
+
+    def test_timer(self):
+        timer = self.metrics.timer('work_seconds', 'work', backend='Local')
+
+        @timer.timed
+        def work(x):
+            return x * 2
+
+        self.assertEqual(work(2), 4)
+        with timer:
+            pass
+        values = self.metrics.snapshot('work')['work_seconds{backend="Local"}']
+        self.assertEqual(values['calls'], 2)
+        self.assertEqual(values['count'], 2)
+
+    def test_sampling(self):
+        timer = self.metrics.timer('sampled_seconds', 'sampled', sample=10)
+        for _ in range(100):
+            with timer:
+                pass
+        self.assertEqual(timer.calls, 100)
+        self.assertEqual(timer.values()['count'], 10)
+
+    def test_threads(self):
+        timer = self.metrics.timer('threads_seconds', 'threads', sample=10)
+
+        @timer.timed
+        def work():
+            """some work"""
+
+        def run():
+            for _ in range(1000):
+                work()
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(timer.calls, 4000)
+        self.assertEqual(timer.values()['count'], 400)
+        self.assertEqual(work.__name__, 'work')
+        self.assertEqual(work.__doc__, 'some work')
+
+    def test_disabled(self):
+        timer = self.metrics.timer('off_seconds', 'off')
+        self.metrics.enabled = False
+        with timer:
+            pass
+        self.assertEqual(timer.calls, 0)
+
+    def test_config(self):
+        from GangaCore.Utility.Metrics import metrics
+        config = getConfig('Configuration')
+        config.setUserValue('Metrics', False)
+        try:
+            self.assertFalse(metrics.enabled)
+        finally:
+            config.revertToDefault('Metrics')
+        self.assertTrue(metrics.enabled)
+
+    def test_prometheus(self):
+        self.metrics.gauge('queue_length', 'queued', lambda: 3, pool='User')
+        with self.metrics.timer('work_seconds', 'work'):
+            pass
+        text = self.metrics.prometheus()
+        self.assertIn('# TYPE ganga_queue_length gauge\nganga_queue_length{pool="User"} 3\n', text)
+        self.assertIn('# TYPE ganga_work_seconds histogram\n', text)
+        self.assertIn('ganga_work_seconds_bucket{le="+Inf"} 1\n', text)
+        self.assertIn('ganga_work_seconds_calls_total 1\n', text)
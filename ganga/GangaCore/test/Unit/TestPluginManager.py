@@ -0,0 +1,86 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from GangaCore.Utility.Config import Config
+from GangaCore.Utility.Plugin import allPlugins, PluginManagerError
+
+plugin_module = """
+from GangaCore.Utility.Plugin import allPlugins
+
+class LazyThing(object):
+    pass
+
+class OtherLazyThing(object):
+    pass
+
+allPlugins.add(LazyThing, 'testlazy', 'LazyThing')
+allPlugins.add(OtherLazyThing, 'testlazy', 'OtherLazyThing')
+
+from GangaCore.Utility.Config import makeConfig
+config = makeConfig('%(module_name)s', 'made when the plugin is imported')
+config.addOption('option', 1, 'an option')
+"""
+
+
+class TestLazyPlugins(unittest.TestCase):
+    """
+    Test the plugins which are declared and only imported on first use
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.module_name = 'lazy_plugin_%s' % self._testMethodName
+        with open(os.path.join(self.tmpdir, self.module_name + '.py'), 'w') as module_file:
+            module_file.write(plugin_module % {'module_name': self.module_name})
+        sys.path.insert(0, self.tmpdir)
+        allPlugins.declare(self.module_name, 'testlazy', 'LazyThing')
+        allPlugins.declare(self.module_name, 'testlazy', 'OtherLazyThing')
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        shutil.rmtree(self.tmpdir)
+        allPlugins.all_dict.pop('testlazy', None)
+        allPlugins.first.pop('testlazy', None)
+        allPlugins._declared.pop('testlazy', None)
+        allPlugins._prev_found.clear()
+        Config.allConfigs.pop(self.module_name, None)
+
+    def test_find_imports(self):
+        self.assertNotIn(self.module_name, sys.modules)
+        self.assertIn('LazyThing', allPlugins.allDeclared()['testlazy'])
+        self.assertEqual(allPlugins.find('testlazy', 'LazyThing').__name__, 'LazyThing')
+        self.assertIn(self.module_name, sys.modules)
+        self.assertNotIn('testlazy', allPlugins.allDeclared())
+        self.assertIn(self.module_name, allPlugins.loadTimes())
+
+    def test_find_elsewhere(self):
+        self.assertEqual(allPlugins.find('othercategory', 'OtherLazyThing').__name__, 'OtherLazyThing')
+
+    def test_list_category(self):
+        self.assertEqual(allPlugins.allClasses('testlazy', load=False), {})
+        self.assertEqual(sorted(allPlugins.allClasses('testlazy')), ['LazyThing', 'OtherLazyThing'])
+
+    def test_unknown(self):
+        self.assertRaises(PluginManagerError, allPlugins.find, 'testlazy', 'Missing')
+
+    def test_alias(self):
+        allPlugins.addAlias('testlazy', 'Thing', 'LazyThing')
+        self.assertNotIn(self.module_name, sys.modules)
+        self.assertIn('Thing', allPlugins.allDeclared()['testlazy'])
+        self.assertIs(allPlugins.find('testlazy', 'Thing'), allPlugins.find('testlazy', 'LazyThing'))
+
+    def test_config_after_bootstrap(self):
+        # the new section is also added to the GPI config object
+        from GangaCore.GPIDev.Lib.Config.Config import config
+        after_bootstrap = Config._after_bootstrap
+        Config._after_bootstrap = True
+        try:
+            allPlugins.find('testlazy', 'LazyThing')
+            self.assertTrue(Config._after_bootstrap)
+        finally:
+            Config._after_bootstrap = after_bootstrap
+        self.assertEqual(Config.getConfig(self.module_name)['option'], 1)
+        self.assertEqual(config[self.module_name]['option'], 1)
@@ -38,6 +38,22 @@ class NonProxiedGangaObject(GangaObject):
     _name = 'TestGangaObject'
 
 
+class FilteredGangaObject(GangaObject):
+    """
+    A class whose attribute reads go through _attribute_filter__get__, which returns a plain list of objects
+    """
+    _schema = Schema(Version(1, 0), {
+        'a': SimpleItem(42, typelist=[int]),
+    })
+    _category = 'TestGangaObject'
+    _name = 'FilteredGangaObject'
+
+    def _attribute_filter__get__(self, name):
+        if name == 'a':
+            return [SampleGangaObject(), {'b': SampleGangaObject()}]
+        return object.__getattribute__(self, name)
+
+
 import GangaCore.GPIDev.Base.Proxy
 import GangaCore.Core.exceptions
 
@@ -159,3 +175,22 @@ class TestProxy(unittest.TestCase):
             self.p.not_proxied()
 
         self.assertRaises(GangaCore.Core.exceptions.GangaAttributeError, _call)
+
+    def test_proxy_is_cached(self):
+        """The same proxy should be handed out for an object every time"""
+        raw = GangaCore.GPIDev.Base.Proxy.stripProxy(self.p)
+        self.assertTrue(GangaCore.GPIDev.Base.Proxy.addProxy(raw) is self.p)
+        self.assertTrue(self.p.c is self.p.c)
+
+    def test_repeated_attribute_reads(self):
+        """Attribute reads served from the dispatch table of the class keep returning the value"""
+        for _ in range(1000):
+            self.assertEqual(self.p.a, 42)
+
+    def test_filtered_attribute_proxied(self):
+        """The lists and dicts returned by _attribute_filter__get__ hold proxies rather than raw objects"""
+        p = GangaCore.GPIDev.Base.Proxy.addProxy(FilteredGangaObject())
+        value = p.a
+        self.assertTrue(isinstance(value, list))
+        self.assertTrue(GangaCore.GPIDev.Base.Proxy.isProxy(value[0]))
+        self.assertTrue(GangaCore.GPIDev.Base.Proxy.isProxy(value[1]['b']))
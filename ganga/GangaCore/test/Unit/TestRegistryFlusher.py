@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from GangaCore.Core.GangaRepository.Registry import RegistryFlusher
+from GangaCore.Utility.Config import getConfig
+
+
+class FakeObject(object):
+
+    def __init__(self, registry_id):
+        self._registry_id = registry_id
+        self._dirty = True
+
+
+class FakeRegistry(object):
+
+    """ Records the objects written, failing for those in fail """
+
+    name = 'fake'
+
+    def __init__(self):
+        self.written = []
+        self.fail = set()
+        self.lock = threading.Lock()
+
+    def _flushObject(self, obj):
+        if obj._registry_id in self.fail:
+            raise IOError('disk full')
+        with self.lock:
+            self.written.append((obj._registry_id, time.time()))
+
+    def _getLoadedObjects(self):
+        return []
+
+
+@pytest.fixture
+def flusher():
+    registry = FakeRegistry()
+    flusher = RegistryFlusher(registry, 'TestRegistryFlusher')
+    yield flusher
+    if flusher.is_alive():
+        flusher.join()
+    else:
+        flusher._writers.shutdown()
+
+
+def test_coalesce(flusher):
+    obj = FakeObject(1)
+    for _ in range(3):
+        flusher.enqueue(obj)
+    flusher.enqueue(FakeObject(2))
+
+    stats = flusher.getStatistics()
+    assert (stats['queued'], stats['coalesced'], stats['queue_depth']) == (2, 2, 2)
+
+    flusher._writeBatch(flusher._takeDue())
+    assert sorted(i for i, _ in flusher.registry.written) == [1, 2]
+    assert flusher.getStatistics()['queue_depth'] == 0
+
+
+def test_staleness_bound(flusher):
+    """
+    An object changing all the time is still written FlushDelay seconds after it first became dirty
+    """
+    config = getConfig('Registry')
+    saved = config['FlushDelay']
+    config.setSessionValue('FlushDelay', 1)
+    try:
+        obj = FakeObject(1)
+        first_dirty = time.time()
+        flusher.enqueue(obj)
+        assert flusher._takeDue(first_dirty - 1) == []
+
+        flusher.start()
+        while time.time() - first_dirty < 3 and not flusher.registry.written:
+            flusher.enqueue(obj)
+            time.sleep(0.02)
+    finally:
+        config.setSessionValue('FlushDelay', saved)
+
+    assert flusher.registry.written
+    assert 1. <= flusher.registry.written[0][1] - first_dirty < 2.
+
+
+def test_discard(flusher):
+    obj = FakeObject(1)
+    flusher.enqueue(obj)
+    flusher.enqueue(FakeObject(2))
+    flusher.discard(obj)
+
+    assert [o._registry_id for o in flusher._takeDue()] == [2]
+    assert flusher.getStatistics()['queue_depth'] == 0
+
+
+def test_statistics(flusher):
+    flusher.registry.fail.add(3)
+    for i in range(1, 4):
+        flusher.enqueue(FakeObject(i))
+    flusher._writeBatch(flusher._takeDue())
+
+    stats = flusher.getStatistics()
+    assert (stats['written'], stats['errors']) == (2, 1)
+    assert stats['max_write_time'] >= stats['mean_write_time'] >= 0.
+    assert stats['write_time'] == pytest.approx(2 * stats['mean_write_time'])
@@ -33,3 +33,31 @@ def test_safe_save_threadcalls():
     assert os.path.isfile(testfn+'~')
     os.remove(testfn+'~')
     assert not os.path.isfile(testfn+'.new')
+
+
+def test_safe_save_parallel_files():
+    """Test that different files can be written from many threads at once"""
+
+    from GangaCore.Core.GangaRepository.GangaRepositoryXML import safe_save
+
+    def my_to_file(obj, fhandle, ignore_subs):
+        fhandle.write("!" * 1000)
+
+    testfns = ['/tmp/xmltest.tmp' + str(uuid.uuid4()) for _ in range(0, 50)]
+
+    o = LocalFile()
+
+    ths = [threading.Thread(target=safe_save, args=(fn, o, my_to_file)) for fn in testfns for _ in range(0, 4)]
+
+    for th in ths:
+        th.start()
+
+    for th in ths:
+        th.join()
+
+    for testfn in testfns:
+        assert os.path.isfile(testfn)
+        os.remove(testfn)
+        assert os.path.isfile(testfn+'~')
+        os.remove(testfn+'~')
+        assert not os.path.isfile(testfn+'.new')
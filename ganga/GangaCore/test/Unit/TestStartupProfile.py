@@ -0,0 +1,53 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from GangaCore.Runtime.startup_profile import StartupProfile
+from GangaCore.Utility.Config import getConfig
+
+
+class TestStartupProfile(unittest.TestCase):
+    """
+    Test the record of the startup phases
+    """
+
+    def setUp(self):
+        self.gangadir = tempfile.mkdtemp()
+        self.saved_gangadir = getConfig('Configuration')['gangadir']
+        getConfig('Configuration').setSessionValue('gangadir', self.gangadir)
+
+    def tearDown(self):
+        getConfig('Configuration').setSessionValue('gangadir', self.saved_gangadir)
+        shutil.rmtree(self.gangadir)
+
+    def test_phases(self):
+        profile = StartupProfile()
+        with profile.phase('outer'):
+            with profile.phase('inner'):
+                pass
+        self.assertEqual([(p['name'], p['depth']) for p in profile.phases], [('inner', 1), ('outer', 0)])
+        self.assertGreaterEqual(profile.phases[1]['wall'], profile.phases[0]['wall'])
+        self.assertEqual([p['name'] for p in profile.report()['phases']], ['outer', 'inner'])
+
+    def test_finish_when_disabled(self):
+        profile = StartupProfile()
+        with profile.phase('configure'):
+            pass
+        self.assertIsNone(profile.finish())
+        self.assertFalse(os.path.exists(os.path.join(self.gangadir, 'logs')))
+
+    def test_finish_writes_once(self):
+        profile = StartupProfile()
+        profile.enabled = True
+        with profile.phase('configure'):
+            pass
+        file_name = profile.finish()
+        self.assertEqual(os.path.dirname(file_name), os.path.join(self.gangadir, 'logs', 'startup'))
+        with open(file_name) as profile_file:
+            written = json.load(profile_file)
+        self.assertEqual([p['name'] for p in written['phases']], ['configure'])
+        for field in ('wall', 'cpu', 'read_calls', 'write_calls'):
+            self.assertIn(field, written['phases'][0])
+        self.assertIsNone(profile.finish())
@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from GangaCore.Core.GangaThread.WorkerThreads.WorkerThreadPool import WorkerThreadPool, TaskAbandoned
+
+
+@pytest.fixture
+def pools():
+    made = []
+
+    def make(num_worker_threads, prefix):
+        pool = WorkerThreadPool(num_worker_threads, worker_thread_prefix='Test_%s_%s_' % (prefix, id(made)))
+        made.append(pool)
+        return pool
+    yield make
+    for pool in made:
+        pool.clear_queue()
+        pool._stop_worker_threads()
+
+
+def test_futures(pools):
+    pool = pools(2, 'futures')
+    results = []
+
+    assert pool.add_function(sum, ([1, 2, 3],)).result(5) == 6
+    future = pool.add_function(sum, ([1, 2],), callback_func=results.append)
+    assert future.result(5) == 3
+    assert results == [3]
+
+    failures = []
+    future = pool.add_function(int, ('x',), fallback_func=failures.append)
+    with pytest.raises(ValueError):
+        future.result(5)
+    assert len(failures) == 1
+
+    assert [f.result(5) for f in pool.map(pow, [2, 3], [2, 2])] == [4, 9]
+
+
+def started(future):
+    for _ in range(50):
+        if future.running():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_cancel_queued(pools):
+    pool = pools(1, 'cancel')
+    release = threading.Event()
+    busy = pool.add_function(release.wait)
+    assert started(busy)
+    ran = []
+    queued = pool.add_function(ran.append, (1,))
+
+    assert queued.cancel()
+    assert len(pool.get_queue()) == 0
+    release.set()
+    assert busy.result(5)
+    pool.add_function(time.sleep, (0,)).result(5)
+    assert ran == []
+
+
+def test_deadline_replaces_stuck_worker(pools):
+    pool = pools(1, 'deadline')
+    release = threading.Event()
+    given_up = []
+    stuck = pool.add_function(release.wait, deadline=0.3, fallback_func=given_up.append)
+
+    with pytest.raises(TaskAbandoned):
+        stuck.result(5)
+    assert len(given_up) == 1
+    # a new worker runs the tasks queued behind the stuck one
+    assert pool.add_function(sum, ([1, 1],)).result(5) == 2
+    assert len(pool.worker_status()) == 1
+    release.set()
+
+
+def test_deadline_before_start(pools):
+    pool = pools(1, 'late')
+    release = threading.Event()
+    given_up = []
+    assert started(pool.add_function(release.wait))
+    late = pool.add_function(time.sleep, (0,), deadline=0.1, fallback_func=given_up.append)
+    time.sleep(0.3)
+    release.set()
+
+    with pytest.raises(TimeoutError):
+        late.result(5)
+    # the task never ran so it was not abandoned
+    assert len(given_up) == 1 and not isinstance(given_up[0], TaskAbandoned)
+
+
+def test_borrow_idle_workers(pools):
+    busy = pools(1, 'busy')
+    idle = pools(2, 'idle')
+    idle.share_with(busy)
+    release = threading.Event()
+    assert started(busy.add_function(release.wait))
+
+    names = [busy.add_function(lambda: threading.current_thread().gangaName) for _ in range(3)]
+    try:
+        assert all(name.result(5).startswith(idle._saved_thread_prefix) for name in names)
+    finally:
+        release.set()
+
+
+def test_stats(pools):
+    pool = pools(1, 'stats')
+    release = threading.Event()
+    assert started(pool.add_function(release.wait))
+    queued = [pool.add_function(time.sleep, (0,)) for _ in range(3)]
+    time.sleep(0.1)
+
+    stats = pool.stats()
+    assert stats['workers'] == 1
+    assert stats['running'] == 1
+    assert stats['queued'] == 3
+    release.set()
+    for future in queued:
+        future.result(5)
+    assert pool.stats()['queued'] == 0
+    assert pool.stats()['wait_p95'] > 0
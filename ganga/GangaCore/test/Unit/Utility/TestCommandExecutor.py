@@ -0,0 +1,120 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from GangaCore.Utility.CommandExecutor import Command, CommandExecutor
+
+
+def write_script(directory, name, body):
+    script = os.path.join(directory, name)
+    with open(script, 'w') as script_file:
+        script_file.write('#!/bin/sh\n' + body)
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+
+
+@pytest.fixture
+def executor():
+    executor = CommandExecutor(max_per_endpoint=2, backoff=0.05)
+    yield executor
+    executor.stop()
+
+
+@pytest.fixture
+def path(tmpdir):
+    """ A directory of stand-in commands, first in the PATH of the commands """
+    directory = str(tmpdir)
+    env = dict(os.environ)
+    env['PATH'] = directory + os.pathsep + env['PATH']
+    return directory, env
+
+
+def test_output_and_parse(executor, path):
+    directory, env = path
+    write_script(directory, 'fake-status', 'echo "State: Running"\necho "warning" >&2\nexit 1\n')
+
+    def parse(result):
+        return [line.split(': ')[1] for line in result.output.splitlines() if line.startswith('State:')]
+
+    result = executor.run(Command('fake-status', env=env, allowed_exit=(0, 1), parse=parse))
+
+    assert result.rc == 1
+    assert result.ok
+    assert 'warning' in result.output
+    assert result.parsed == ['Running']
+
+
+def test_endpoint_bound(executor, path):
+    directory, env = path
+    log = os.path.join(directory, 'log')
+    # log the start and the end of each call
+    write_script(directory, 'fake-cancel', 'echo start >> %s\nsleep 0.3\necho end >> %s\n' % (log, log))
+
+    commands = [Command('fake-cancel', env=env, endpoint='ce1') for _ in range(5)]
+    # another endpoint is not held up by the first one
+    commands.append(Command('fake-cancel', env=env, endpoint='ce2'))
+    results = executor.run_many(commands)
+    assert all(r.ok for r in results)
+
+    running = 0
+    most = 0
+    with open(log) as log_file:
+        for line in log_file.read().split():
+            running += 1 if line == 'start' else -1
+            most = max(most, running)
+    assert most == 3
+
+
+def test_timeout(executor, path):
+    directory, env = path
+    write_script(directory, 'fake-hang', 'echo started\nsleep 30\n')
+
+    start = time.time()
+    result = executor.run(Command('fake-hang', env=env, timeout=0.5))
+
+    assert time.time() - start < 5
+    assert result.timed_out
+    assert not result.ok
+    assert 'started' in result.output
+
+
+def test_retries(executor, path):
+    directory, env = path
+    count = os.path.join(directory, 'count')
+    # fails on the first two calls
+    write_script(directory, 'fake-flaky', 'echo x >> %s\n[ $(wc -l < %s) -ge 3 ] || exit 2\necho done\n' % (count, count))
+
+    result = executor.run(Command('fake-flaky', env=env, retries=3))
+    assert result.ok
+    assert result.attempts == 3
+    assert result.output.strip() == 'done'
+
+    os.remove(count)
+    result = executor.run(Command('fake-flaky', env=env, retries=1))
+    assert result.rc == 2
+    assert result.attempts == 2
+
+
+def test_started_from_thread(path):
+    """
+    Test that an executor started and used from a thread other than the main one runs its commands, which needs
+    its own child watcher before Python 3.8
+    """
+    directory, env = path
+    write_script(directory, 'fake-submit', 'echo https://ce.example.org:8443/job1\nexit 4\n')
+    results = []
+
+    def submit():
+        executor = CommandExecutor()
+        try:
+            results.append(executor.run(Command('fake-submit', env=env, allowed_exit=(4,))))
+        finally:
+            executor.stop()
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    thread.join(10)
+
+    assert [(r.rc, r.output) for r in results] == [(4, 'https://ce.example.org:8443/job1\n')]
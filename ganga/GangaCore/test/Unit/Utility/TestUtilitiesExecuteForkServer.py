@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+from GangaCore.Utility.execute import execute, execute_subprocess, fork_server_stats, get_fork_server
+
+# This file tests the fork servers running the commands of execute
+
+
+def test_env_update():
+    ''' The variables changed by a command are sent back, for shell and python commands '''
+    env = {'PATH': os.environ.get('PATH', ''), 'GANGATEST': 'before'}
+
+    execute('export GANGATEST=after; export GANGANEW=new', shell=True, env=env, update_env=True)
+    assert env['GANGATEST'] == 'after'
+    assert env['GANGANEW'] == 'new'
+
+    execute('import os\nos.environ["GANGANEW"]="newer"', shell=False, env=env, update_env=True)
+    assert env['GANGANEW'] == 'newer'
+
+    # the environment is not updated by default
+    execute('export GANGATEST=again', shell=True, env=env)
+    assert env['GANGATEST'] == 'after'
+
+
+def test_same_results():
+    ''' The fork server returns what a new process returns '''
+    env = {'PATH': os.environ.get('PATH', '')}
+    for command, shell in [('echo hello', True),
+                           ('echo "{\'a\': [1, 2]}"', True),
+                           ('output({"a": [1, 2]})', False),
+                           ('print("{\'b\': 3}")', False)]:
+        forked = execute(command, shell=shell, env=env)
+        assert forked == execute_subprocess(command, None, env, None, shell, '', None, False)
+
+    # the traceback of a failed python command is returned
+    assert execute('raise ValueError("bad")', shell=False, env=env).endswith('ValueError: bad\n')
+
+
+def test_server_per_env():
+    ''' One server is started for each environment and reused '''
+    env = {'PATH': os.environ.get('PATH', ''), 'GANGASERVER': '1'}
+    other = dict(env, GANGASERVER='2')
+    assert get_fork_server(env) is get_fork_server(dict(env))
+    assert get_fork_server(env) is not get_fork_server(other)
+    assert execute('echo $GANGASERVER', env=other) == 2
+
+
+def test_concurrent_commands():
+    ''' Commands sent from several threads run at the same time in one server '''
+    env = {'PATH': os.environ.get('PATH', '')}
+    results = []
+
+    def run(n):
+        results.append(execute('sleep 1; echo job%d' % n, env=env).strip())
+
+    start = time.time()
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == ['job0', 'job1', 'job2', 'job3', 'job4']
+    assert time.time() - start < 4
+
+
+def test_cancel_on_timeout():
+    ''' A command which times out is killed and the server keeps working '''
+    env = {'PATH': os.environ.get('PATH', '')}
+    server = get_fork_server(env)
+    assert execute('sleep 30', env=env, timeout=1) == 'Command timed out!'
+    assert server.inFlight() == 0
+    assert execute('echo alive', env=env).strip() == 'alive'
+    assert get_fork_server(env) is server
+
+    stats = fork_server_stats()
+    assert any(s['pid'] == server.process.pid for s in stats['servers'])
+    assert stats['forkserver']['calls'] > 0
+
+
+def test_stdlib_modules():
+    ''' Python commands import the standard library modules which share a name with a package of GangaCore/Utility '''
+    env = {'PATH': os.environ.get('PATH', '')}
+    path = execute('import logging.handlers; output(logging.__file__)', shell=False, env=env)
+    assert path == execute_subprocess('import logging.handlers; output(logging.__file__)', None, env, None, False, '',
+                                      None, False)
+    assert os.path.join('GangaCore', 'Utility') not in path
@@ -25,6 +25,7 @@ from GangaCore.Utility.logging import getLogger, log_user_exception
 from GangaCore.GPIDev.Credentials import require_credential, credential_store, needed_credentials
 from GangaCore.GPIDev.Base.Proxy import stripProxy, isType, getName
 from GangaCore.Core.GangaThread.WorkerThreads import getQueues
+from GangaCore.Core.GangaThread.WorkerThreads.WorkerThreadPool import TaskAbandoned
 from GangaCore.Core import monitoring_component
 from GangaCore.Runtime.GPIexport import exportToGPI
 from subprocess import check_output, CalledProcessError
@@ -1184,7 +1185,27 @@ class DiracBase(IBackend):
 
         for i in range(0,int(nProcessToUse)):
             jobSlice = jobs[i*nPerProcess:(i+1)*nPerProcess]      
-            getQueues()._monitoring_threadpool.add_function(DiracBase.finalise_jobs_thread_func, (jobSlice, downloadSandbox))
+            getQueues()._addFinalisation(DiracBase.finalise_jobs_thread_func, (jobSlice, downloadSandbox),
+                                         name="Finalising %s jobs" % len(jobSlice),
+                                         fallback_func=DiracBase.finalisation_given_up, fallback_args=(jobSlice,))
+
+    @staticmethod
+    def finalisation_given_up(error, jobs):
+        """
+        Called when the finalisation of jobs in the queues fails or runs past Queues.FinalisationDeadline.
+        A finalisation abandoned whilst running may still finish, so its jobs are left queued rather than being
+        finalised a second time. Otherwise the jobs are no longer queued and the monitoring requeues them
+        Args:
+            error (Exception): The reason the finalisation was given up
+            jobs (list): The jobs which were being finalised
+        """
+        job_ids = ", ".join(j.getFQID('.') for j in jobs)
+        if isinstance(error, TaskAbandoned):
+            logger.error("The finalisation of job(s) %s was abandoned whilst running: %s" % (job_ids, error))
+            return
+        logger.error("The finalisation of job(s) %s was given up, it will be tried again: %s" % (job_ids, error))
+        for j in jobs:
+            j.been_queued = False
 
     @staticmethod
     def finalise_jobs_thread_func(jobSlice, downloadSandbox = True):
@@ -1292,9 +1313,10 @@ class DiracBase(IBackend):
                 j.been_queued = False
                 continue
             if not configDirac['serializeBackend']:
-                getQueues()._monitoring_threadpool.add_function(DiracBase.job_finalisation,
-                                                           args=(j, finalised_statuses[j.backend.status]),
-                                                           priority=5, name="Job %s Finalizing" % j.fqid)
+                getQueues()._addFinalisation(DiracBase.job_finalisation,
+                                             args=(j, finalised_statuses[j.backend.status]),
+                                             priority=5, name="Job %s Finalizing" % j.fqid,
+                                             fallback_func=DiracBase.finalisation_given_up, fallback_args=([j],))
                 j.been_queued = True
             else:
                 DiracBase.job_finalisation(j, finalised_statuses[j.backend.status])
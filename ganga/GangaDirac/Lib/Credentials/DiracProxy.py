@@ -14,6 +14,7 @@ from GangaCore.GPIDev.Adapters.ICredentialInfo import cache, retry_command
 from GangaCore.GPIDev.Adapters.ICredentialRequirement import ICredentialRequirement
 from GangaCore.Core.exceptions import CredentialRenewalError
 from GangaCore.GPIDev.Credentials.VomsProxy import VomsProxyInfo
+from GangaCore.GPIDev.Credentials.CredentialState import credential_states
 from GangaCore.Utility.Shell import Shell
 
 from GangaDirac.Lib.Utilities.DiracUtilities import getDiracEnv
@@ -64,6 +65,7 @@ class DiracProxyInfo(VomsProxyInfo):
         except subprocess.CalledProcessError:
             raise CredentialRenewalError('Failed to create DIRAC proxy')
         else:
+            credential_states.forget(self.location)
             logger.debug('Grid proxy {path} created. Valid for {time}'.format(path=self.location, time=self.time_left()))
 
     @property
@@ -82,6 +84,7 @@ class DiracProxyInfo(VomsProxyInfo):
         """
         if os.path.isfile(self.location):
             os.remove(self.location)
+        credential_states.forget(self.location)
 
     @cache
     def info(self):
@@ -146,9 +149,9 @@ class DiracProxyInfo(VomsProxyInfo):
         return self.initial_requirements.encodeDefaultProxyFileName
 
     @cache
-    def expiry_time(self):
+    def command_expiry_time(self):
         """
-        Returns the time in the future when the proxy will expire in seconds
+        Returns the time in the future when the proxy will expire as given by the dirac tools
         """
         time = self.field('timeleft')
         split_time = time.split(':')
@@ -11,12 +11,15 @@ import re
 from copy import deepcopy
 from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger
+from GangaCore.Utility.Metrics import metrics
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.GPIDev.Base.Proxy import isType
 from GangaCore.GPIDev.Credentials import credential_store
 import GangaCore.Utility.execute as gexecute
 logger = getLogger()
 
+execute_timer = metrics.timer('dirac_execute_seconds', 'Time for a command to run against DIRAC')
+
 # Cache
 # /\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
 DIRAC_ENV = {}
@@ -192,6 +195,7 @@ def getValidDiracFiles(job, names=None):
                     yield df
 
 
+@execute_timer.timed
 def execute(command,
             timeout=getConfig('DIRAC')['Timeout'],
             env=None,
@@ -434,3 +434,21 @@ def test_getOutputDataLFNs(db):
 
         subjob = True
         assert db.getOutputDataLFNs() == ['a', 'b', 'c'] * 3
+
+
+def test_finalisation_given_up(db):
+    from GangaDirac.Lib.Backends.DiracBase import DiracBase
+    from GangaCore.Core.GangaThread.WorkerThreads.WorkerThreadPool import TaskAbandoned
+
+    j = Job()
+    j.backend = db
+    db._parent = j
+
+    # a finalisation abandoned whilst running may still finish, so the job stays queued
+    j.been_queued = True
+    DiracBase.finalisation_given_up(TaskAbandoned('ran past its deadline'), [j])
+    assert j.been_queued
+
+    # otherwise the job is requeued by the monitoring
+    DiracBase.finalisation_given_up(GangaDiracError('failed'), [j])
+    assert not j.been_queued
@@ -7,7 +7,7 @@ The ThreadedSubmitter class provides a generic submitter implementation.
 from GangaRobot.Lib.Core.CoreSubmitter import CoreSubmitter
 from GangaCore.Utility.logging import getLogger
 from GangaCore.GPI import load
-from GangaCore.Core.GangaThread.MTRunner import MTRunner, Data, Algorithm
+from GangaCore.Core.GangaThread.BulkOperation import BulkOperation
 from GangaCore.GPIDev.Base.Proxy import stripProxy
 
 logger = getLogger()
@@ -34,23 +34,22 @@ class ThreadedSubmitter(CoreSubmitter):
         logger.info("Searching for job files matching patterns %s.", patterns)
         matches = self._getmatches(patterns)
         logger.info("Found %d matching job files.", len(matches))
-        runner = MTRunner(
-            'ThreadedSubmitterMTRunner',
-            algorithm=ThreadedSubmitterAlgorithm(), 
-            data=Data([(m,jobids) for m in matches]), 
-            numThread=int(self.getoption('ThreadedSubmitter_numThreads'))
+        submission = BulkOperation(
+            'ThreadedSubmitter',
+            submit_matching_jobs,
+            num_threads=int(self.getoption('ThreadedSubmitter_numThreads'))
         )
-        runner.start()
-        runner.join()
-
-
-class ThreadedSubmitterAlgorithm(Algorithm):
-    def process(self, item):
-        (match,jobids) = item
-        jobs = load(match)
-        logger.info("Loaded %d jobs from '%s'.", len(jobs), match)
-        for j in jobs:
-            stripProxy(j.application).is_prepared = True
-            j.submit()
-            jobids.append(j.id)
+        for result in submission.stream([(m, jobids) for m in matches]):
+            if not result.ok:
+                logger.error("Failed to submit the jobs of '%s': %s", result.item[0], result.error)
+
+
+def submit_matching_jobs(item):
+    (match,jobids) = item
+    jobs = load(match)
+    logger.info("Loaded %d jobs from '%s'.", len(jobs), match)
+    for j in jobs:
+        stripProxy(j.application).is_prepared = True
+        j.submit()
+        jobids.append(j.id)
 